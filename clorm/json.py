@@ -14,7 +14,7 @@ from collections.abc import Mapping
 
 import clingo
 
-from clorm import FactBase, Predicate, path
+from clorm import FactBase, Predicate, hash_index, path
 
 __all__ = ["symbol_encoder", "symbol_decoder", "FactBaseCoder"]
 
@@ -169,7 +169,10 @@ class FactBaseCoder(object):
             return symbol_encoder(obj)
         if isinstance(obj, FactBase):
             return {
-                "clorm.FactBase": [str(fp) for fp in obj.indexes],
+                "clorm.FactBase": [
+                    [str(p) for p in fp] if isinstance(fp, tuple) else str(fp)
+                    for fp in obj.indexes
+                ],
                 "facts": [self.encoder(fct) for fct in obj],
             }
         for p in self._preds:
@@ -199,8 +202,8 @@ class FactBaseCoder(object):
         if "clingo.SymbolType" in obj:
             return symbol_decoder(obj)
         if "clorm.FactBase" in obj and "facts" in obj:
-            indexes = []
-            for fname in obj["clorm.FactBase"]:
+
+            def decode_path(fname):
                 fs = fname.split(".")
                 if len(fs) < 2:
                     raise ValueError(("Expecting a field '.' split for index " "{}").format(fs))
@@ -213,7 +216,16 @@ class FactBaseCoder(object):
                 ppath = path(self._name2pred[fs[0]])
                 for key in fs[1:]:
                     ppath = ppath[key]
-                indexes.append(ppath)
+                return ppath
+
+            indexes = []
+            for fname in obj["clorm.FactBase"]:
+                if isinstance(fname, list):
+                    indexes.append(tuple([decode_path(fn) for fn in fname]))
+                elif fname.startswith("hash_index(") and fname.endswith(")"):
+                    indexes.append(hash_index(decode_path(fname[len("hash_index(") : -1])))
+                else:
+                    indexes.append(decode_path(fname))
             facts = [self.decoder(f) for f in obj["facts"]]
             return FactBase(facts=facts, indexes=indexes)
         if not "clorm.Predicate" in obj:
@@ -24,7 +24,11 @@ __all__ = [
     "Predicate",
     "PredicatePath",
     "ComplexTerm",
+    "InternCache",
     "FactBase",
+    "FrozenFactBase",
+    "MaterializedView",
+    "hash_index",
     "SymbolPredicateUnifier",
     "Unifier",
     "ContextBuilder",
@@ -58,9 +62,16 @@ __all__ = [
     "cross",
     "in_",
     "notin_",
+    "Aggregate",
+    "count_",
+    "sum_",
+    "min_",
+    "max_",
     "fixed_join_order",
     "basic_join_order",
     "oppref_join_order",
+    "cost_join_order",
+    "AutoIndexer",
     "make_function_asp_callable",
     "make_method_asp_callable",
     "SymbolMode",
@@ -9,6 +9,7 @@ from typing import (
     Any,
     Callable,
     Dict,
+    FrozenSet,
     Generator,
     Generic,
     Iterator,
@@ -24,13 +25,19 @@ from clorm.orm.factcontainers import FactMap
 from ._typing import _T0, _T1, _T2, _T3, _T4
 from .core import Predicate, and_
 from .query import (
+    Aggregate,
     Query,
     QueryExecutor,
+    QueryPlanCache,
     QuerySpec,
+    count_,
     make_query_plan,
+    max_,
+    min_,
     process_join,
     process_orderby,
     process_where,
+    sum_,
 )
 
 # ------------------------------------------------------------------------------
@@ -97,6 +104,38 @@ def _check_join_called_first(_fn=None, *, endpoint=False):
     return wrap(_fn)
 
 
+# ------------------------------------------------------------------------------
+# Count and aggregate support functions shared by queries and prepared queries.
+# A count is computed by the query executor's aggregation unless the distinct,
+# limit, or offset modifiers change the results that are counted.
+# ------------------------------------------------------------------------------
+
+
+def _count(qe: QueryExecutor, qspec: QuerySpec) -> Any:
+    def group_by_generator():
+        for k, g in qe.all():
+            yield k, sum(1 for _ in g)
+
+    if qspec.distinct or qspec.limit is not None or qspec.offset is not None:
+        if qspec.group_by:
+            return group_by_generator()
+        return sum(1 for _ in qe.all())
+    return _aggregate_one(qe, qspec, count_())
+
+
+def _aggregate_one(qe: QueryExecutor, qspec: QuerySpec, agg: Aggregate) -> Any:
+    result = qe.aggregate([agg])
+    if qspec.group_by:
+        return ((k, v[0]) for k, v in result)
+    return result[0]
+
+
+def _check_count(name: str, num: Any) -> int:
+    if isinstance(num, bool) or not isinstance(num, int) or num < 0:
+        raise ValueError("'{}' must be a non-negative integer: {}".format(name, num))
+    return num
+
+
 class BaseQueryImpl(Query, Generic[_T]):
     def __init__(self, factmaps: Dict[Type[Predicate], FactMap], qspec: QuerySpec) -> None:
         self._factmaps = factmaps
@@ -183,6 +222,21 @@ class BaseQueryImpl(Query, Generic[_T]):
         self._qspec = self._qspec.newp(distinct=True)
         return self
 
+    # --------------------------------------------------------------------------
+    # Limit the number of results and skip the first results
+    # --------------------------------------------------------------------------
+    @_generate
+    @_check_join_called_first
+    def limit(self: SelfQuery, num: int) -> SelfQuery:
+        self._qspec = self._qspec.newp(limit=_check_count("limit", num))
+        return self
+
+    @_generate
+    @_check_join_called_first
+    def offset(self: SelfQuery, num: int) -> SelfQuery:
+        self._qspec = self._qspec.newp(offset=_check_count("offset", num))
+        return self
+
     # --------------------------------------------------------------------------
     # Ground - bind
     # --------------------------------------------------------------------------
@@ -221,7 +275,7 @@ class BaseQueryImpl(Query, Generic[_T]):
         qspec = self._qspec.fill_defaults()
 
         factsets, factindexes = QueryExecutor.get_factmap_data(self._factmaps, qspec)
-        return make_query_plan(factindexes.keys(), qspec)
+        return make_query_plan(factindexes, qspec.cardinalityp(factsets))
 
     # --------------------------------------------------------------------------
     # Return the placeholders
@@ -230,6 +284,13 @@ class BaseQueryImpl(Query, Generic[_T]):
     def qspec(self):
         return self._qspec
 
+    # --------------------------------------------------------------------------
+    # Prepare the query for repeated execution
+    # --------------------------------------------------------------------------
+    @_check_join_called_first(endpoint=True)
+    def prepare(self) -> "PreparedQuery[_T]":
+        return PreparedQuery(self._factmaps, self._qspec, QueryPlanCache())
+
     # --------------------------------------------------------------------------
     # Select to display all the output of the query
     # --------------------------------------------------------------------------
@@ -238,12 +299,15 @@ class BaseQueryImpl(Query, Generic[_T]):
         qe = QueryExecutor(self._factmaps, self._qspec)
         return qe.all()
 
+    def _membership_set(self) -> FrozenSet[Any]:
+        return QueryExecutor(self._factmaps, self._qspec).membership_set()
+
     # --------------------------------------------------------------------------
     # Show the single element and throw an exception if there is more than one
     # --------------------------------------------------------------------------
     @_check_join_called_first(endpoint=True)
     def singleton(self) -> _T:
-        qe = QueryExecutor(self._factmaps, self._qspec)
+        qe = QueryExecutor(self._factmaps, self._qspec.limitp(2))
         gen = qe.all()
         first = next(gen, None)
         if first is None:
@@ -265,25 +329,62 @@ class BaseQueryImpl(Query, Generic[_T]):
 
     @_check_join_called_first(endpoint=True)
     def count(self) -> Union[Iterator[Tuple[Any, int]], int]:
-        qe = QueryExecutor(self._factmaps, self._qspec)
-
-        def group_by_generator():
-            for k, g in qe.all():
-                yield k, sum(1 for _ in g)
-
         # If group_by is set then we want to count records associated with each
         # key and not just total records.
-        if self._qspec.group_by:
-            return group_by_generator()
-        else:
-            return sum(1 for _ in qe.all())
+        return _count(QueryExecutor(self._factmaps, self._qspec), self._qspec)
+
+    # --------------------------------------------------------------------------
+    # Aggregation - Note: as for count() a grouped query returns an iterator
+    # over the (key, value) pairs for each group.
+    # --------------------------------------------------------------------------
+    @overload
+    def sum(self: "GroupedQuery[_T0, Any]", pth: Any) -> Iterator[Tuple[_T0, Any]]: ...  # type: ignore
+
+    @overload
+    def sum(self: "BaseQueryImpl[Any]", pth: Any) -> Any: ...
+
+    @_check_join_called_first(endpoint=True)
+    def sum(self, pth: Any) -> Any:
+        return _aggregate_one(QueryExecutor(self._factmaps, self._qspec), self._qspec, sum_(pth))
+
+    @overload
+    def min(self: "GroupedQuery[_T0, Any]", pth: Any) -> Iterator[Tuple[_T0, Any]]: ...  # type: ignore
+
+    @overload
+    def min(self: "BaseQueryImpl[Any]", pth: Any) -> Any: ...
+
+    @_check_join_called_first(endpoint=True)
+    def min(self, pth: Any) -> Any:
+        return _aggregate_one(QueryExecutor(self._factmaps, self._qspec), self._qspec, min_(pth))
+
+    @overload
+    def max(self: "GroupedQuery[_T0, Any]", pth: Any) -> Iterator[Tuple[_T0, Any]]: ...  # type: ignore
+
+    @overload
+    def max(self: "BaseQueryImpl[Any]", pth: Any) -> Any: ...
+
+    @_check_join_called_first(endpoint=True)
+    def max(self, pth: Any) -> Any:
+        return _aggregate_one(QueryExecutor(self._factmaps, self._qspec), self._qspec, max_(pth))
+
+    @overload
+    def aggregate(  # type: ignore
+        self: "GroupedQuery[_T0, Any]", *aggregates: Aggregate
+    ) -> Iterator[Tuple[_T0, Tuple[Any, ...]]]: ...
+
+    @overload
+    def aggregate(self: "BaseQueryImpl[Any]", *aggregates: Aggregate) -> Tuple[Any, ...]: ...
+
+    @_check_join_called_first(endpoint=True)
+    def aggregate(self, *aggregates: Aggregate) -> Any:
+        return QueryExecutor(self._factmaps, self._qspec).aggregate(aggregates)
 
     # --------------------------------------------------------------------------
     # Return the first element of the query
     # --------------------------------------------------------------------------
     @_check_join_called_first(endpoint=True)
     def first(self) -> _T:
-        qe = QueryExecutor(self._factmaps, self._qspec)
+        qe = QueryExecutor(self._factmaps, self._qspec.limitp(1))
 
         for out in qe.all():
             return out
@@ -657,13 +758,15 @@ class UnGroupedQuery(BaseQueryImpl[_T], Generic[_T]):
     # END OVERLOADED FUNCTIONS self.group_by
 
     @overload
-    def group_by(self, *expressions: Any) -> "GroupedQuery[Any, _T]": ...
+    def group_by(self, *expressions: Any, ordered: bool = True) -> "GroupedQuery[Any, _T]": ...
 
-    def group_by(self, *expressions: Any) -> "GroupedQuery[Any, _T]":
+    def group_by(self, *expressions: Any, ordered: bool = True) -> "GroupedQuery[Any, _T]":
         if not expressions:
             nqspec = self._qspec.newp(group_by=None)  # raise exception
         else:
             nqspec = self._qspec.newp(group_by=process_orderby(expressions, self._qspec.roots))
+        if not ordered:
+            nqspec = nqspec.newp(hash_group=True)
         return GroupedQuery(self._factmaps, nqspec)
 
     # --------------------------------------------------------------------------
@@ -1022,7 +1125,7 @@ _GT = TypeVar("_GT", bound=Any)  # Group type of GroupedQuery
 
 
 class GroupedQuery(BaseQueryImpl[Tuple[_KT, Iterator[_GT]]], Generic[_KT, _GT]):
-    def group_by(self, *expressions):
+    def group_by(self, *expressions, ordered=True):
         # ABC 'Query' requires to implement group_by, but multiple group_by are not allowed
         # so we raise an error here
         # a better solution would be to somehow adjust 'Query' that GroupedQuery
@@ -1376,6 +1479,82 @@ class GroupedQuery(BaseQueryImpl[Tuple[_KT, Iterator[_GT]]], Generic[_KT, _GT]):
         return super().select(*outsig)
 
 
+# ------------------------------------------------------------------------------
+# PreparedQuery - a query where the query plan is built once and reused for
+# every execution. Binding the placeholders doesn't modify the query
+# specification; the values are only substituted into the cached plan when the
+# query is executed.
+# ------------------------------------------------------------------------------
+
+
+class PreparedQuery(Generic[_T]):
+    def __init__(
+        self,
+        factmaps: Dict[Type[Predicate], FactMap],
+        qspec: QuerySpec,
+        plancache: QueryPlanCache,
+        bindargs: Any = None,
+    ) -> None:
+        self._factmaps = factmaps
+        self._qspec = qspec
+        self._plancache = plancache
+        self._bindargs = bindargs
+
+    def _executor(self, qspec: Union[QuerySpec, None] = None) -> QueryExecutor:
+        qspec = self._qspec if qspec is None else qspec
+        return QueryExecutor(self._factmaps, qspec, self._plancache, self._bindargs)
+
+    # --------------------------------------------------------------------------
+    # Bind the placeholders - returns a copy that shares the cached plan
+    # --------------------------------------------------------------------------
+    def bind(self, *args: Any, **kwargs: Any) -> "PreparedQuery[_T]":
+        self._qspec.check_bindp(*args, **kwargs)
+        return PreparedQuery(self._factmaps, self._qspec, self._plancache, (args, kwargs))
+
+    def query_plan(self, *args, **kwargs):
+        return self._executor().query_plan()
+
+    @property
+    def qspec(self):
+        return self._qspec
+
+    # --------------------------------------------------------------------------
+    # End points
+    # --------------------------------------------------------------------------
+    def all(self) -> Generator[_T, None, None]:
+        return self._executor().all()
+
+    def singleton(self) -> _T:
+        gen = self._executor(self._qspec.limitp(2)).all()
+        first = next(gen, None)
+        if first is None:
+            raise ValueError("Query has no matching elements")
+        second = next(gen, None)
+        if second is not None:
+            raise ValueError("Query returned more than a single element")
+        return first
+
+    def count(self) -> Union[Iterator[Tuple[Any, int]], int]:
+        return _count(self._executor(), self._qspec)
+
+    def sum(self, pth: Any) -> Any:
+        return _aggregate_one(self._executor(), self._qspec, sum_(pth))
+
+    def min(self, pth: Any) -> Any:
+        return _aggregate_one(self._executor(), self._qspec, min_(pth))
+
+    def max(self, pth: Any) -> Any:
+        return _aggregate_one(self._executor(), self._qspec, max_(pth))
+
+    def aggregate(self, *aggregates: Aggregate) -> Any:
+        return self._executor().aggregate(aggregates)
+
+    def first(self) -> _T:
+        for out in self._executor(self._qspec.limitp(1)).all():
+            return out
+        raise ValueError("Query has no matching elements")
+
+
 # ------------------------------------------------------------------------------
 # main
 # ------------------------------------------------------------------------------
@@ -26,6 +26,7 @@ import datetime
 import enum
 import functools
 import inspect
+import itertools
 import operator
 import re
 import sys
@@ -84,6 +85,7 @@ from .templating import (
     NO_DEFAULTS_TEMPLATE,
     PREDICATE_TEMPLATE,
     PREDICATE_UNIFY_DOCSTRING,
+    PREDICATE_UNIFY_LAZY_DOCSTRING,
     expand_template,
 )
 
@@ -100,6 +102,7 @@ __all__ = [
     "Predicate",
     "PredicatePath",
     "ComplexTerm",
+    "InternCache",
     "refine_field",
     "combine_fields",
     "define_flat_list_field",
@@ -223,7 +226,7 @@ class Comparator(QElement):
         pass
 
     @abc.abstractmethod
-    def fixed(self):
+    def fixed(self, memo=None):
         pass
 
     @abc.abstractmethod
@@ -814,6 +817,24 @@ class PredicatePath(object, metaclass=_PredicatePathMeta):
         # Functions that do something with the parent PredicatePath instance
         # --------------------------------------------------------------------------
 
+        # --------------------------------------------------------------------------
+        # Python code (as a string) to access the value of the path from a fact
+        # given by the expression 'var'. Follows the same steps as the
+        # attrgetter but reads the field values directly. Used to generate
+        # efficient query functions.
+        # --------------------------------------------------------------------------
+        def access_code(self, var):
+            pseq = self._parent._pathseq
+            cls = cast(PathIdentity, pseq[0]).predicate
+            code = var
+            for name in pseq[1:]:
+                if name == "sign":
+                    return "{}._sign".format(code)
+                fa = cls.meta[name]
+                code = "{}._field_values[{}]".format(code, fa.index)
+                cls = fa.defn.complex
+            return code
+
         # --------------------------------------------------------------------------
         # Resolve (extract the component) the path wrt a fact
         # --------------------------------------------------------------------------
@@ -2384,7 +2405,7 @@ class FieldAccessor(object):
         self._parent_cls = pc
 
     def __get__(self, instance, owner=None):
-        if not instance:
+        if instance is None:
             # Return the PredicatePath object corresponding to this field
             return self.parent.meta.path[self._index]
 
@@ -2428,7 +2449,7 @@ class SignAccessor(object):
         self._parent_cls = pc
 
     def __get__(self, instance, owner=None):
-        if not instance:
+        if instance is None:
             # Return the PredicatePath object corresponding to this sign
             return self.parent.meta.path.sign
 
@@ -2639,6 +2660,9 @@ class PredicateDefn(object):
         field_accessors: List[FieldAccessor],
         anon: bool = False,
         sign: Optional[bool] = None,
+        lazy_unify: bool = False,
+        lazy_symbol: bool = False,
+        intern_cache: Optional[InternCache] = None,
     ) -> None:
         self._name = name
         self._byidx = tuple(field_accessors)
@@ -2650,6 +2674,9 @@ class PredicateDefn(object):
         self._parent_cls: Type[Predicate] = None  # type: ignore
         self._indexed_fields = ()
         self._sign = sign
+        self._lazy_unify = lazy_unify
+        self._lazy_symbol = lazy_symbol
+        self._intern_cache = intern_cache
 
     @property
     def name(self):
@@ -2678,6 +2705,31 @@ class PredicateDefn(object):
         """Returns true if the definition corresponds to a tuple"""
         return self.name == ""
 
+    @property
+    def lazy_unify(self):
+        """Returns true if unifying a symbol defers converting the field values
+
+        A lazily unified fact only checks the name, arity, and sign of the
+        symbol. Each field value is converted when it is first accessed.
+
+        """
+        return self._lazy_unify
+
+    @property
+    def lazy_symbol(self):
+        """Returns true if creating a fact defers building its raw symbol
+
+        The raw symbol is built when it is first needed. Facts of the predicate
+        are hashed and compared for equality on their sign and field values.
+
+        """
+        return self._lazy_symbol
+
+    @property
+    def intern_cache(self):
+        """Returns the InternCache for the field values (or None if not interned)"""
+        return self._intern_cache
+
     def unify(self: PredicateDefn, symbol: AnySymbol) -> Optional[_P]:
         """Return the result of trying to unify a symbol with the Predicate."""
         return self._parent_cls._unify(symbol)
@@ -2767,6 +2819,177 @@ class PredicateDefn(object):
         return iter(self._byidx)
 
 
+# ------------------------------------------------------------------------------
+# The field values of a lazily unified fact. It is used in place of the tuple of
+# field values and converts the symbol of a field when the field is first
+# accessed. Since the fact already exists a symbol that cannot be converted
+# raises a ValueError (rather than the fact failing to unify).
+# ------------------------------------------------------------------------------
+
+_UNCONVERTED = object()
+
+
+class _LazyFieldValues(object):
+    __slots__ = ("_pdefn", "_args", "_values")
+
+    def __init__(self, pdefn: PredicateDefn, args: Sequence[AnySymbol]) -> None:
+        self._pdefn = pdefn
+        self._args = args
+        self._values = [_UNCONVERTED] * len(args)
+
+    def __getitem__(self, idx):
+        value = self._values[idx]
+        if value is not _UNCONVERTED:
+            return value
+        fa = self._pdefn[idx]
+        try:
+            value = fa.defn.cltopy(self._args[idx])
+        except (TypeError, ValueError) as e:
+            raise ValueError(
+                "Cannot unify the symbol '{}' with field '{}' of the lazily unified {}: {}".format(
+                    self._args[idx], fa.name, self._pdefn.parent.__name__, e
+                )
+            )
+        self._values[idx] = value
+        return value
+
+    def __len__(self):
+        return len(self._values)
+
+    def __iter__(self):
+        return iter([self[idx] for idx in range(len(self._values))])
+
+
+# ------------------------------------------------------------------------------
+# Interning of field values. Models often contain many facts whose field values
+# come from a small vocabulary, so an InternCache makes the facts share a single
+# instance of each equal value (including complex-term sub-facts).
+# ------------------------------------------------------------------------------
+
+
+# An estimate of the memory used by a value, including the field values of a fact
+def _sizeof(value: Any) -> int:
+    size = sys.getsizeof(value)
+    if isinstance(value, Predicate):
+        fvs = value._field_values
+        if isinstance(fvs, tuple):
+            size += sys.getsizeof(fvs) + sum([_sizeof(v) for v in fvs])
+    return size
+
+
+class InternCache(object):
+    """A bounded cache that makes equal field values share a single instance.
+
+    A predicate that is defined with the ``intern`` option uses an intern cache
+    for its field values. When a symbol is unified with the predicate the
+    result of converting each argument is looked up in the cache, so the
+    facts unified from equal symbols share the same field values, and the
+    conversion of a repeated symbol (in particular of a complex-term) is only
+    done once. When a fact is created the field values are interned in the
+    same way.
+
+    The cache can be shared by many predicates and when it is full the values
+    that were added first are removed. The :attr:`saved_bytes` property
+    reports an estimate of the memory saved by reusing the cached values.
+
+    Args:
+      maxsize: the maximum number of cached conversions and of cached values
+        (default: 100000).
+
+    """
+
+    def __init__(self, maxsize: int = 100000) -> None:
+        if maxsize <= 0:
+            raise ValueError("The maximum size of an InternCache must be positive")
+        self._maxsize = maxsize
+        self._conversions: Dict[Any, Tuple[Any, int]] = {}
+        self._values: Dict[Any, Tuple[Any, int]] = {}
+        self._hits = 0
+        self._misses = 0
+        self._saved_bytes = 0
+
+    # Add an entry to one of the tables, removing the oldest entry if it is full
+    def _add(self, table, key, entry):
+        if len(table) >= self._maxsize:
+            del table[next(iter(table))]
+        table[key] = entry
+        self._misses += 1
+
+    # Wrap a field's Clingo to Python conversion function so that the result
+    # of converting a symbol is cached.
+    def _wrap_cltopy(self, cltopy: Callable[[Any], Any]) -> Callable[[Any], Any]:
+        table = self._conversions
+
+        def interned_cltopy(symbol):
+            key = (cltopy, symbol)
+            entry = table.get(key)
+            if entry is not None:
+                self._hits += 1
+                self._saved_bytes += entry[1]
+                return entry[0]
+            value = cltopy(symbol)
+            self._add(table, key, (value, _sizeof(value)))
+            return value
+
+        return interned_cltopy
+
+    def intern(self, value: _T) -> _T:
+        """Return the cached instance that is equal to the value.
+
+        If there is no equal value in the cache (of the same type) then the
+        value is added to the cache and returned. Unhashable values are
+        returned unchanged.
+
+        """
+        try:
+            key = (value.__class__, value)
+            entry = self._values.get(key)
+        except TypeError:
+            return value
+        if entry is not None:
+            self._hits += 1
+            if entry[0] is not value:
+                self._saved_bytes += entry[1]
+            return entry[0]
+        self._add(self._values, key, (value, _sizeof(value)))
+        return value
+
+    def clear(self) -> None:
+        """Remove all the cached values and reset the statistics."""
+        self._conversions.clear()
+        self._values.clear()
+        self._hits = 0
+        self._misses = 0
+        self._saved_bytes = 0
+
+    @property
+    def maxsize(self) -> int:
+        """The maximum number of cached conversions and of cached values."""
+        return self._maxsize
+
+    @property
+    def hits(self) -> int:
+        """The number of conversions and values that were found in the cache."""
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """The number of conversions and values that were added to the cache."""
+        return self._misses
+
+    @property
+    def saved_bytes(self) -> int:
+        """An estimate of the memory saved by sharing the cached values."""
+        return self._saved_bytes
+
+    def __len__(self) -> int:
+        return len(self._conversions) + len(self._values)
+
+
+# The intern cache that is used by predicates defined with ``intern=True``
+_default_intern_cache = InternCache()
+
+
 # ------------------------------------------------------------------------------
 # Helper function that performs some data conversion on a value to make it match
 # a field's input. If the value is a tuple and the field definition is a
@@ -2790,12 +3013,17 @@ def _generate_dynamic_predicate_functions(class_name: str, namespace: Dict) -> N
         "Sequence": Sequence,
         "_P": _P,
         "PREDICATE_IS_TUPLE": pdefn.is_tuple,
+        "PREDICATE_DEFN": pdefn,
+        "LazyFieldValues": _LazyFieldValues,
     }
 
+    cache = pdefn.intern_cache
     for f in pdefn:
         gdict[f"{f.name}_field"] = f.defn
         gdict[f"{f.name}_pytocl"] = f.defn.pytocl
-        gdict[f"{f.name}_cltopy"] = f.defn.cltopy
+        gdict[f"{f.name}_cltopy"] = (
+            cache._wrap_cltopy(f.defn.cltopy) if cache is not None else f.defn.cltopy
+        )
 
         if f.defn.complex:
             gdict[f"{f.name}_class"] = f.defn.complex
@@ -2809,6 +3037,11 @@ def _generate_dynamic_predicate_functions(class_name: str, namespace: Dict) -> N
             tmp.append(f"{f.name}=MISSING, ")
     args_signature = "".join(tmp)
     args = "".join([f"{f.name}, " for f in pdefn])
+    if cache is not None:
+        gdict["INTERN"] = cache.intern
+        args_values = "".join([f"INTERN({f.name}), " for f in pdefn])
+    else:
+        args_values = args
 
     sign_check = (
         ""
@@ -2844,6 +3077,13 @@ def _generate_dynamic_predicate_functions(class_name: str, namespace: Dict) -> N
             tmp3.append(f"{f.name}_pytocl({f.name}), ")
     check_complex = "".join(tmp)
     args_raw = "".join(tmp3)
+    if pdefn.lazy_symbol:
+        create_raw = "self._raw = None"
+    else:
+        create_raw = (
+            "# Create the raw symbol\n"
+            f'self._raw = Function("{pdefn.name}", ({args_raw}), self._sign)'
+        )
 
     tmp = []
     for idx, f in enumerate(pdefn):
@@ -2854,10 +3094,12 @@ def _generate_dynamic_predicate_functions(class_name: str, namespace: Dict) -> N
         "args_signature": args_signature,
         "sign_check": sign_check,
         "args": args,
+        "args_values": args_values,
         "check_no_defaults": check_no_defaults,
         "assign_defaults": assign_defaults,
         "check_complex": check_complex,
         "args_raw": args_raw,
+        "create_raw": create_raw,
         "sign_check_unify": sign_check_unify,
         "args_cltopy": args_cltopy,
     }
@@ -2875,9 +3117,16 @@ def _generate_dynamic_predicate_functions(class_name: str, namespace: Dict) -> N
         tmp.__doc = docstring
         namespace[fname] = tmp
 
-    # Assign the __init__, _unify, __hash__, and appropriate comparison functions
+    # Assign the __init__, _unify, __hash__, and appropriate comparison functions.
+    # The strict and lazy unify functions are both available and _unify is the
+    # one chosen by the predicate definition.
     _set_fn("__init__", f"{class_name}({args_signature}*, sign=True, raw=None)")
     _set_fn("_unify", PREDICATE_UNIFY_DOCSTRING)
+    _set_fn("_unify_lazy", PREDICATE_UNIFY_LAZY_DOCSTRING)
+    namespace["_unify_strict"] = namespace["_unify"]
+    if pdefn.lazy_unify:
+        namespace["_unify"] = namespace["_unify_lazy"]
+    _set_fn("_build_raw", "Build the raw symbol from the field values")
     _set_fn("__hash__", "Hash operator")
     _set_fn("__eq__", "Equality operator")
     _set_fn("__lt__", "Less than operator")
@@ -2885,6 +3134,12 @@ def _generate_dynamic_predicate_functions(class_name: str, namespace: Dict) -> N
     _set_fn("__gt__", "Greater than operator")
     _set_fn("__ge__", "Greater than operator")
 
+    # A lazy symbol predicate must hash and compare facts without the raw symbol
+    if pdefn.lazy_symbol:
+        for fname in ["__hash__", "__eq__", "__lt__", "__gt__"]:
+            namespace[fname] = ldict[f"lazy{fname}"]
+            namespace[fname].__name__ = fname
+
 
 # ------------------------------------------------------------------------------
 # Metaclass constructor support functions to create the fields
@@ -3053,6 +3308,9 @@ def _make_predicatedefn(
     anon = False
     sign = None
     is_tuple = False
+    lazy_unify = False
+    lazy_symbol = False
+    intern_cache = None
 
     if meta_dct:
 
@@ -3084,6 +3342,16 @@ def _make_predicatedefn(
             sign = meta_dct["sign"]
         if sign is not None:
             sign = bool(sign)
+        if "lazy_unify" in meta_dct:
+            lazy_unify = bool(meta_dct["lazy_unify"])
+        if "lazy_symbol" in meta_dct:
+            lazy_symbol = bool(meta_dct["lazy_symbol"])
+        if "intern" in meta_dct:
+            intern = meta_dct["intern"]
+            if isinstance(intern, InternCache):
+                intern_cache = intern
+            elif intern:
+                intern_cache = _default_intern_cache
 
         if is_tuple and not sign:
             raise ValueError(
@@ -3194,7 +3462,15 @@ def _make_predicatedefn(
     namespace["sign"] = SignAccessor()
 
     # Now create the PredicateDefn object
-    return PredicateDefn(name=pname, field_accessors=fas, anon=anon, sign=sign)
+    return PredicateDefn(
+        name=pname,
+        field_accessors=fas,
+        anon=anon,
+        sign=sign,
+        lazy_unify=lazy_unify,
+        lazy_symbol=lazy_symbol,
+        intern_cache=intern_cache,
+    )
 
 
 # ------------------------------------------------------------------------------
@@ -3228,9 +3504,10 @@ def _define_field_for_predicate(cls_meta: "_PredicateMeta") -> Type[BaseField]:
                 )
         raise TypeError("Value {} ({}) is not an instance of {}".format(v, type(v), cls))
 
+    # Note: the value of a complex-term field is always fully converted
     def _cltopy(v):
         try:
-            instance = cls._unify(v)
+            instance = cls._unify_strict(v)
             if instance is not None:
                 return instance
         except:
@@ -3270,7 +3547,14 @@ class _PredicateMeta(type):
         # Create the metadata AND populate dct - the class dict (including the fields)
 
         # create meta-dict
-        allowed_meta_kwargs = {"name", "is_tuple", "sign"}
+        allowed_meta_kwargs = {
+            "name",
+            "is_tuple",
+            "sign",
+            "lazy_unify",
+            "lazy_symbol",
+            "intern",
+        }
         meta_kwargs = {key: kwargs.pop(key) for key in kwargs.keys() & allowed_meta_kwargs}
         meta_from_namespace = namespace.pop("Meta", None)
         if meta_from_namespace and not inspect.isclass(meta_from_namespace):
@@ -3402,6 +3686,12 @@ class Predicate(object, metaclass=_PredicateMeta):
         ) -> Optional[_P]:
             pass
 
+        _unify_strict = _unify
+        _unify_lazy = _unify
+
+        def _build_raw(self) -> AnySymbol:
+            pass
+
     # --------------------------------------------------------------------------
     # Properties and functions for Predicate
     # --------------------------------------------------------------------------
@@ -3413,13 +3703,15 @@ class Predicate(object, metaclass=_PredicateMeta):
 
         The type of the object maybe either a ``clingo.Symbol`` or ``noclingo.Symbol``.
         """
-        return self._raw
+        raw = self._raw
+        return raw if raw is not None else self._build_raw()
 
     # Get the underlying clingo.Symbol object
     @property
     def raw(self) -> Symbol:
         """Returns the underlying ``clingo.Symbol`` object"""
-        return self._raw if isinstance(self._raw, Symbol) else noclingo_to_clingo(self._raw)
+        raw = self.symbol
+        return raw if isinstance(raw, Symbol) else noclingo_to_clingo(raw)
 
     @_classproperty
     @classmethod
@@ -3469,6 +3761,115 @@ class Predicate(object, metaclass=_PredicateMeta):
         """The meta data (definitional information) for the Predicate."""
         return cls._meta
 
+    @classmethod
+    def from_columns(
+        cls: Type[_P], *columns: Iterable[Any], sign: bool = True, **named_columns: Iterable[Any]
+    ) -> List[_P]:
+        """Create a list of facts from columns of field values.
+
+        Each column is a sequence of values for a field, specified in the same
+        way as the arguments of the constructor. The i-th fact is created from
+        the i-th value of every column. A column can also be a NumPy array (or
+        any object with a ``tolist()`` member function). Missing columns are
+        filled with the field's default value.
+
+        The values of each column are converted and checked with the field's
+        definition before the facts are created, so creating many facts is
+        faster than calling the constructor for each fact. As with the
+        constructor, the values are interned if the predicate has an
+        ``intern`` cache.
+
+        Args:
+          *columns: the columns for the fields in order.
+          sign: the sign of all the facts (default: True).
+          **named_columns: the columns for the named fields.
+
+        """
+        pdefn = cls.meta
+        sign = bool(sign)
+        if pdefn.sign is not None and sign != pdefn.sign:
+            raise ValueError(
+                f"Predicate {cls.__name__} is defined to only allow {pdefn.sign} instances"
+            )
+        if len(columns) > pdefn.arity:
+            raise TypeError(
+                f"{cls.__name__} has {pdefn.arity} fields but {len(columns)} columns were given"
+            )
+        bycolumn = {f.name: c for f, c in zip(pdefn, columns)}
+        for name, column in named_columns.items():
+            if name not in pdefn.keys():
+                raise TypeError(f'{cls.__name__} has no field "{name}"')
+            if name in bycolumn:
+                raise TypeError(f'Multiple columns for field "{name}"')
+            bycolumn[name] = column
+        if not bycolumn:
+            raise ValueError(f"No columns were given to create {cls.__name__} facts")
+
+        # Convert the columns into lists of equal length
+        for name, column in bycolumn.items():
+            bycolumn[name] = column.tolist() if hasattr(column, "tolist") else list(column)
+        size = len(next(iter(bycolumn.values())))
+        if any(len(column) != size for column in bycolumn.values()):
+            raise ValueError("The columns must all have the same length")
+
+        # Fill the missing columns with defaults and the tuple values of complex fields
+        pycolumns = []
+        for f in pdefn:
+            column = bycolumn.get(f.name, MISSING)
+            if column is MISSING:
+                if not f.defn.has_default:
+                    raise TypeError(
+                        f'Missing column for field "{f.name}" (which has no default value)'
+                    )
+                if f.defn.has_default_factory:
+                    column = [f.defn.default for _ in range(size)]
+                else:
+                    column = [f.defn.default] * size
+            cmplx = f.defn.complex
+            if cmplx and cmplx.meta.is_tuple:
+                for idx, v in enumerate(column):
+                    if isinstance(v, cmplx):
+                        continue
+                    if not isinstance(v, tuple) and not (
+                        isinstance(v, Predicate) and v.meta.is_tuple
+                    ):
+                        raise TypeError(f"Value {v} ({type(v)}) is not a tuple")
+                    column[idx] = cmplx(*v)
+            pycolumns.append(column)
+
+        # Convert (and so check) the columns. For lazy symbol predicates the sub-facts were
+        # checked when they were created and converting them would build their symbols.
+        clcolumns = []
+        for f, column in zip(pdefn, pycolumns):
+            cmplx = f.defn.complex
+            if pdefn.lazy_symbol and cmplx:
+                column = [v for v in column if v.__class__ is not cmplx]
+            clcolumns.append(_convert_column(f.defn.pytocl, column))
+
+        # Build the raw symbols from the converted columns
+        if pdefn.lazy_symbol:
+            raws: Iterable[Optional[AnySymbol]] = itertools.repeat(None, size)
+        else:
+            name = pdefn.name
+            raws = [Function(name, args, sign) for args in zip(*clcolumns)]
+
+        # Share equal field values in the same way as the constructor
+        cache = pdefn.intern_cache
+        if cache is not None:
+            intern = cache.intern
+            pycolumns = [[intern(v) for v in column] for column in pycolumns]
+
+        facts = []
+        new = cls.__new__
+        for raw, values in zip(raws, zip(*pycolumns)):
+            instance = new(cls)
+            instance._raw = raw
+            instance._hash = None
+            instance._sign = sign
+            instance._field_values = values
+            facts.append(instance)
+        return facts
+
     # --------------------------------------------------------------------------
     # Overloaded index operator to access the values and len operator
     # --------------------------------------------------------------------------
@@ -3532,17 +3933,38 @@ class Predicate(object, metaclass=_PredicateMeta):
         return self.__str__()
 
     def __getstate__(self):
-        return {"_field_values": self._field_values, "_sign": self._sign}
+        return {"_field_values": tuple(self._field_values), "_sign": self._sign}
 
     def __setstate__(self, newstate):
         self._hash = None
         self._field_values = newstate["_field_values"]
         self._sign = newstate["_sign"]
+        self._raw = None
+        if not self.meta.lazy_symbol:
+            self._build_raw()
+
 
-        clingoargs = []
-        for f, v in zip(self.meta, self._field_values):
-            clingoargs.append(v.symbol if f.defn.complex else f.defn.pytocl(v))
-        self._raw = Function(self.meta.name, clingoargs, self._sign)
+# ------------------------------------------------------------------------------
+# Convert a column of Python values to clingo symbols. The values of a column
+# are often repeated so each distinct value is only converted once. The type is
+# part of the key so that, for example, 1 and 1.0 are converted separately.
+# ------------------------------------------------------------------------------
+
+
+def _convert_column(pytocl: Callable[[Any], Any], column: List[Any]) -> List[Any]:
+    converted: Dict[Any, Any] = {}
+    out = []
+    for v in column:
+        try:
+            key = (v.__class__, v)
+            s = converted.get(key)
+            if s is None:
+                s = converted[key] = pytocl(v)
+        except TypeError:
+            # An unhashable value
+            s = pytocl(v)
+        out.append(s)
+    return out
 
 
 # ------------------------------------------------------------------------------
@@ -6,12 +6,14 @@
 from __future__ import annotations
 
 import abc
+import collections
 import io
 import itertools
 import sys
 from typing import (
     Any,
     Callable,
+    Dict,
     Iterable,
     Iterator,
     List,
@@ -27,13 +29,33 @@ from typing import (
 from ._queryimpl import UnGroupedQuery
 from ._typing import _T0, _T1, _T2, _T3, _T4
 from .core import Predicate, PredicateDefn, PredicatePath, and_, validate_root_paths
-from .factcontainers import FactMap, factset_equality
-from .query import QueryExecutor, QuerySpec, make_query_plan, process_orderby, process_where
+from .factcontainers import (
+    FactJournal,
+    FactMap,
+    FactSet,
+    FrozenFactMap,
+    HashIndex,
+    factset_equality,
+    hash_index,
+)
+from .query import (
+    AutoIndexer,
+    IncrementalQuery,
+    Query,
+    QueryExecutor,
+    QuerySpec,
+    make_query_plan,
+    process_orderby,
+    process_where,
+)
 
 __all__ = [
     "FactBase",
+    "FrozenFactBase",
+    "MaterializedView",
     "Select",
     "Delete",
+    "hash_index",
 ]
 
 # ------------------------------------------------------------------------------
@@ -144,6 +166,43 @@ def _format_commented(fm: FactMap, out: TextIO) -> None:
     return
 
 
+# ------------------------------------------------------------------------------
+# Group the index specifications by predicate type
+# ------------------------------------------------------------------------------
+
+
+def _group_indexes(indexes):
+    grouped = {}
+    for spec in indexes:
+        if isinstance(spec, HashIndex):
+            path = spec.path
+        elif isinstance(spec, tuple):
+            if not spec:
+                raise ValueError("A composite index cannot be an empty tuple")
+            path = spec[0]
+        else:
+            path = spec
+        if path.meta.predicate not in grouped:
+            grouped[path.meta.predicate] = []
+        grouped[path.meta.predicate].append(spec)
+    return grouped
+
+
+# ------------------------------------------------------------------------------
+# The field values of the facts of a FactMap (which may be None) as columns
+# ------------------------------------------------------------------------------
+
+
+def _to_columns(ptype, fm):
+    if not issubclass(ptype, Predicate):
+        raise TypeError(f"'{ptype}' is not a Predicate sub-class")
+    names = list(ptype.meta.keys())
+    rows = [f._field_values for f in fm.factset] if fm else []
+    if not rows:
+        return {name: [] for name in names}
+    return {name: list(column) for name, column in zip(names, zip(*rows))}
+
+
 # ------------------------------------------------------------------------------
 # A FactBase consisting of facts of different types
 # ------------------------------------------------------------------------------
@@ -176,7 +235,16 @@ class FactBase(object):
          facts. If a functor is passed then the fact base performs a delayed
          initialisation. If a fact base is passed and no index is specified then
          an index will be created matching in input fact base.
-      indexes(Field): a list of fields that are to be indexed.
+      indexes(Field): a list of fields that are to be indexed. A field wrapped
+         with ``hash_index()`` is indexed for equality and membership lookups
+         only. A tuple of fields (of the same predicate) creates a composite
+         index that is used when a query tests all of its fields for equality.
+      auto_index(AutoIndexer): optionally, automatically create indexes for
+         the fields that queries repeatedly search or join on (see
+         :class:`AutoIndexer`).
+      journal(bool): record the facts that are added and removed so that the
+         changes since an earlier :attr:`version` can be found with
+         :meth:`changes_since` (default: False).
 
     """
 
@@ -185,10 +253,11 @@ class FactBase(object):
     # --------------------------------------------------------------------------
 
     # A special purpose initialiser so that we can delayed initialisation
-    def _init(self, facts=None, indexes=None):
+    def _init(self, facts=None, indexes=None, journal=False):
 
         # flag that initialisation has taken place
         self._delayed_init: Optional[Callable[[], None]] = None
+        self._journal: Optional[FactJournal] = None
 
         # If it is delayed initialisation then get the facts
         if facts and callable(facts):
@@ -199,18 +268,38 @@ class FactBase(object):
             indexes = []
 
         # Create FactMaps for the predicate types with indexed fields
-        grouped = {}
-
         self._indexes = tuple(indexes)
-        for path in self._indexes:
-            if path.meta.predicate not in grouped:
-                grouped[path.meta.predicate] = []
-            grouped[path.meta.predicate].append(path)
+        grouped = _group_indexes(self._indexes)
         self._factmaps = {pt: FactMap(pt, idxs) for pt, idxs in grouped.items()}
 
-        if facts is None:
-            return
-        self._add(facts)
+        if facts is not None:
+            self._add(facts)
+
+        # The journal only records the changes after the initial facts
+        if journal:
+            self._journal = FactJournal()
+            for fm in self._factmaps.values():
+                fm.add_observer(self._journal)
+
+    # Return the FactMap for a predicate type, creating it if necessary
+    def _factmap(self, ptype, indexes=()):
+        fm = self._factmaps.get(ptype, None)
+        if fm is None:
+            fm = FactMap(ptype, indexes)
+            if self._journal is not None:
+                fm.add_observer(self._journal)
+            self._factmaps[ptype] = fm
+        return fm
+
+    # Add a (copy-on-write) copy of the FactMap of another FactBase for a
+    # predicate type that isn't in this FactBase
+    def _copy_factmap(self, fm):
+        nfm = fm.copy()
+        self._factmaps[fm.predicate] = nfm
+        if self._journal is not None:
+            nfm.add_observer(self._journal)
+            if nfm:
+                self._journal.facts_added(fm.predicate, nfm.factset)
 
     # Make sure the FactBase has been initialised
     def _check_init(self):
@@ -223,10 +312,7 @@ class FactBase(object):
 
     def _add(self, arg: Union[Predicate, Iterable[Predicate]]) -> None:
         if isinstance(arg, Predicate):
-            ptype = arg.__class__
-            if not ptype in self._factmaps:
-                self._factmaps[ptype] = FactMap(ptype)
-            return self._factmaps[ptype].add_fact(arg)
+            return self._factmap(arg.__class__).add_fact(arg)
 
         if isinstance(arg, str) or not isinstance(arg, Iterable):
             raise TypeError(f"'{arg}' is not a Predicate instance")
@@ -235,9 +321,7 @@ class FactBase(object):
         for type_, grouped_facts in itertools.groupby(sorted_facts, lambda x: x.__class__):
             if not issubclass(type_, Predicate):
                 raise TypeError(f"{list(grouped_facts)} are not Predicate instances")
-            if not type_ in self._factmaps:
-                self._factmaps[type_] = FactMap(type_)
-            self._factmaps[type_].add_facts(grouped_facts)
+            self._factmap(type_).add_facts(grouped_facts)
         return
 
     def _remove(self, fact, raise_on_missing):
@@ -251,17 +335,25 @@ class FactBase(object):
     # Initiliser
     # --------------------------------------------------------------------------
     def __init__(
-        self, facts: Optional[_Facts] = None, indexes: Optional[Iterable[PredicatePath]] = None
+        self,
+        facts: Optional[_Facts] = None,
+        indexes: Optional[Iterable[PredicatePath]] = None,
+        *,
+        auto_index: Optional[AutoIndexer] = None,
+        journal: bool = False,
     ) -> None:
+        if auto_index is not None and not isinstance(auto_index, AutoIndexer):
+            raise TypeError("'{}' is not an AutoIndexer".format(auto_index))
+        self._auto_index = auto_index
         self._delayed_init = None
         if callable(facts):
 
             def delayed_init():
-                self._init(facts, indexes)
+                self._init(facts, indexes, journal)
 
             self._delayed_init = delayed_init
         else:
-            self._init(facts, indexes)
+            self._init(facts, indexes, journal)
 
     # --------------------------------------------------------------------------
     # An internal API for the query mechanism. Not to be called by users.
@@ -289,6 +381,30 @@ class FactBase(object):
         self._check_init()  # Check for delayed init
         return self._add(arg)
 
+    def add_columns(
+        self,
+        ptype: Type[Predicate],
+        /,
+        *columns: Iterable[Any],
+        sign: bool = True,
+        **named_columns: Iterable[Any],
+    ) -> None:
+        """Add the facts of a predicate type created from columns of field values.
+
+        The facts are created with :meth:`Predicate.from_columns` and added
+        directly to the facts of the predicate type.
+
+        Args:
+          ptype: the predicate type of the facts.
+          *columns: the columns for the fields in order.
+          sign: the sign of all the facts (default: True).
+          **named_columns: the columns for the named fields.
+
+        """
+        self._check_init()  # Check for delayed init
+        facts = ptype.from_columns(*columns, sign=sign, **named_columns)
+        self._factmap(ptype).add_facts(facts)
+
     def remove(self, arg: Predicate) -> None:
         """Remove a fact from the fact base (raises an exception if no fact)."""
         self._check_init()  # Check for delayed init
@@ -347,7 +463,7 @@ class FactBase(object):
 
         # Make sure there are factmaps for each referenced predicate type
         for ptype in ptypes:
-            self._factmaps.setdefault(ptype, FactMap(ptype))
+            self._factmap(ptype)
 
         return SelectImpl(self, QuerySpec(roots=roots))
 
@@ -359,7 +475,7 @@ class FactBase(object):
 
         # Make sure there are factmaps for each referenced predicate type
         for ptype in ptypes:
-            self._factmaps.setdefault(ptype, FactMap(ptype))
+            self._factmap(ptype)
 
         return _Delete(self, QuerySpec(roots=roots))
 
@@ -420,11 +536,36 @@ class FactBase(object):
         # Make sure there are factmaps for each referenced predicate type
         ptypes = set([r.meta.predicate for r in validate_root_paths(roots)])
         for ptype in ptypes:
-            self._factmaps.setdefault(ptype, FactMap(ptype))
+            self._factmap(ptype)
 
-        qspec = QuerySpec(roots=roots)
+        if self._auto_index is not None:
+            qspec = QuerySpec(roots=roots, autoindex=self._auto_index)
+        else:
+            qspec = QuerySpec(roots=roots)
         return UnGroupedQuery(self._factmaps, qspec)
 
+    def materialize(
+        self, query: Query, indexes: Optional[Iterable[PredicatePath]] = None
+    ) -> "MaterializedView":
+        """Materialize the results of a query over the fact base.
+
+        Returns a :class:`MaterializedView` containing the results of the query.
+        Rather than re-running the query the view is updated incrementally as
+        facts are added to and removed from the fact base. The query can only
+        consist of a ``join`` and ``where`` clause (and the ``tuple`` flag), and
+        any placeholders must be bound.
+
+        Args:
+           query: the query to materialize.
+           indexes: the fields to index in the view's fact base.
+
+        Returns:
+           Returns a MaterializedView object.
+
+        """
+        self._check_init()  # Check for delayed init
+        return MaterializedView(self, query, indexes)
+
     @property
     def predicates(self) -> Tuple[Type[Predicate], ...]:
         """Return the list of predicate types that this fact base contains."""
@@ -437,6 +578,61 @@ class FactBase(object):
         self._check_init()  # Check for delayed init
         return self._indexes
 
+    @property
+    def auto_index(self) -> Optional[AutoIndexer]:
+        """Return the AutoIndexer (if any) that creates indexes for this fact base."""
+        return self._auto_index
+
+    # --------------------------------------------------------------------------
+    # The journal of changes
+    # --------------------------------------------------------------------------
+    def _check_journal(self) -> FactJournal:
+        self._check_init()  # Check for delayed init
+        if self._journal is None:
+            raise ValueError("The FactBase was not created with a journal (journal=True)")
+        return self._journal
+
+    @property
+    def version(self) -> int:
+        """Return the current journal version of the fact base.
+
+        The version is 0 when the fact base is created and is incremented by
+        every change to the facts. Only available for a fact base created with
+        ``journal=True``.
+
+        """
+        return self._check_journal().version
+
+    def changes_since(self, version: int) -> Dict[Type[Predicate], Tuple[FactSet, FactSet]]:
+        """Return the facts that have been inserted and deleted since a version.
+
+        Only the net changes are returned; a fact that was added and then
+        removed again since the version is neither inserted nor deleted. Only
+        available for a fact base created with ``journal=True``.
+
+        Args:
+           version: an earlier (not discarded) :attr:`version` of the fact base.
+
+        Returns:
+           Returns a dictionary that maps each predicate type with changes to a
+           pair of ordered sets of the inserted and the deleted facts.
+
+        """
+        return self._check_journal().changes_since(version)
+
+    def discard_changes(self, version: int) -> None:
+        """Discard the journal of changes up to a version.
+
+        The journal grows with every change to the fact base. Once the changes
+        up to a version have been consumed they can be discarded, after which
+        :meth:`changes_since` can only be called with a later version.
+
+        Args:
+           version: a :attr:`version` of the fact base.
+
+        """
+        self._check_journal().discard(version)
+
     def facts(self) -> List[Predicate]:
         """Return all facts."""
 
@@ -444,6 +640,20 @@ class FactBase(object):
         tmp = [fm.factset for fm in self._factmaps.values() if fm]
         return list(itertools.chain(*tmp))
 
+    def to_columns(self, ptype: Type[Predicate]) -> Dict[str, List[Any]]:
+        """Return the field values of the facts of a predicate type as columns.
+
+        The columns are returned as a dictionary from field names to lists of
+        values, where the i-th value of every column belongs to the same
+        fact. This is the inverse of :meth:`add_columns`.
+
+        Args:
+          ptype: the predicate type of the facts.
+
+        """
+        self._check_init()  # Check for delayed init
+        return _to_columns(ptype, self._factmaps.get(ptype))
+
     def asp_str(self, *, width: int = 0, commented: bool = False, sorted: bool = False) -> str:
         """Return a ASP string representation of the fact base.
 
@@ -664,6 +874,13 @@ class FactBase(object):
         self._check_init()
         return self.__dict__
 
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault("_journal", None)
+        if self._journal is not None:
+            for fm in self._factmaps.values():
+                fm.add_observer(self._journal)
+
     # --------------------------------------------------------------------------
     # Set functions
     # --------------------------------------------------------------------------
@@ -754,7 +971,7 @@ class FactBase(object):
                 if p in self._factmaps:
                     self._factmaps[p].update(fm)
                 else:
-                    self._factmaps[p] = fm.copy()
+                    self._copy_factmap(fm)
 
     def intersection_update(self, *others: _Facts) -> None:
         """Implements the set intersection_update() function"""
@@ -798,9 +1015,8 @@ class FactBase(object):
         for p in predicates:
             if p in self._factmaps and p in other._factmaps:
                 self._factmaps[p].symmetric_difference_update(other._factmaps[p])
-            else:
-                if p in other._factmaps:
-                    self._factmaps[p] = other._factmaps[p].copy()
+            elif p in other._factmaps:
+                self._copy_factmap(other._factmaps[p])
 
     def copy(self) -> "FactBase":
         """Implements the set copy() function"""
@@ -811,6 +1027,341 @@ class FactBase(object):
         return fb
 
 
+# ------------------------------------------------------------------------------
+# FrozenFactBase is an immutable fact base built on FrozenFactMaps. Adding or
+# removing facts returns a new FrozenFactBase that shares the FrozenFactMaps of
+# the unchanged predicates and, through the persistent containers, nearly all
+# of the storage of the changed ones.
+# ------------------------------------------------------------------------------
+
+
+class FrozenFactBase(object):
+    """An immutable fact base where adding or removing facts returns a new fact base.
+
+    ``FrozenFactBase`` supports the same :meth:`query` API and container
+    operations (``in``, ``len``, iteration, and equality) as :class:`FactBase`.
+    However, it cannot be modified. Instead, :meth:`add`, :meth:`remove`, and
+    :meth:`discard` return a new ``FrozenFactBase``. The facts and indexes are
+    stored in persistent data structures (a hash array mapped trie), so each
+    new version is created in logarithmic time and shares almost all of its
+    memory with the original. This makes it cheap to keep many versions of a
+    fact base alive at the same time.
+
+    The query end-points that modify the fact base (``delete``, ``replace``,
+    and ``modify``) raise a ``TypeError``.
+
+    Args:
+      facts([Predicate]|FactBase|FrozenFactBase): a collection of facts. If a
+         fact base is passed and no index is specified then the indexes of the
+         input fact base are used.
+      indexes(Field): a list of fields that are to be indexed (see
+         :class:`FactBase`).
+
+    """
+
+    def __init__(
+        self,
+        facts: Optional[Iterable[Predicate]] = None,
+        indexes: Optional[Iterable[PredicatePath]] = None,
+    ) -> None:
+        if isinstance(facts, (FactBase, FrozenFactBase)) and indexes is None:
+            indexes = facts.indexes
+        self._indexes = tuple(indexes) if indexes is not None else ()
+        self._ptype2indexes = _group_indexes(self._indexes)
+        self._factmaps = {pt: FrozenFactMap(pt, idxs) for pt, idxs in self._ptype2indexes.items()}
+        if facts is not None:
+            self._factmaps = self._add(facts)._factmaps
+
+    def _make(self, factmaps):
+        tmp = FrozenFactBase.__new__(FrozenFactBase)
+        tmp._indexes = self._indexes
+        tmp._ptype2indexes = self._ptype2indexes
+        tmp._factmaps = factmaps
+        return tmp
+
+    def _factmap(self, ptype):
+        fm = self._factmaps.get(ptype, None)
+        if fm is None:
+            fm = FrozenFactMap(ptype, self._ptype2indexes.get(ptype, []))
+        return fm
+
+    def _add(self, arg):
+        if isinstance(arg, Predicate):
+            arg = [arg]
+        elif isinstance(arg, str) or not isinstance(arg, Iterable):
+            raise TypeError(f"'{arg}' is not a Predicate instance")
+        grouped = {}
+        for f in arg:
+            if not isinstance(f, Predicate):
+                raise TypeError(f"{f} is not a Predicate instance")
+            grouped.setdefault(type(f), []).append(f)
+        factmaps = dict(self._factmaps)
+        for ptype, facts in grouped.items():
+            factmaps[ptype] = self._factmap(ptype).with_facts(facts)
+        return self._make(factmaps)
+
+    # --------------------------------------------------------------------------
+    # Functions that return a modified fact base
+    # --------------------------------------------------------------------------
+    def add(self, arg: Union[Predicate, Iterable[Predicate]]) -> "FrozenFactBase":
+        """Return a fact base with a single fact or a collection of facts added.
+
+        Args:
+          arg: a single fact or a collection of facts.
+
+        """
+        return self._add(arg)
+
+    def remove(self, arg: Predicate) -> "FrozenFactBase":
+        """Return a fact base with a fact removed (raises an exception if no fact)."""
+        if arg not in self:
+            raise KeyError(arg)
+        return self.discard(arg)
+
+    def discard(self, arg: Predicate) -> "FrozenFactBase":
+        """Return a fact base with a fact removed (if it exists)."""
+        if arg not in self:
+            return self
+        factmaps = dict(self._factmaps)
+        factmaps[type(arg)] = factmaps[type(arg)].without_facts([arg])
+        return self._make(factmaps)
+
+    # --------------------------------------------------------------------------
+    # Querying and other member functions
+    # --------------------------------------------------------------------------
+    def query(self, *roots):
+        """Define a query using the new Query API :class:`Query`.
+
+        See :meth:`FactBase.query`.
+        """
+        # Queries need a (possibly empty) FactMap for each referenced predicate.
+        # These are added to a local copy so that the fact base is unchanged.
+        factmaps = dict(self._factmaps)
+        for r in validate_root_paths(roots):
+            ptype = r.meta.predicate
+            if ptype not in factmaps:
+                factmaps[ptype] = self._factmap(ptype)
+        return UnGroupedQuery(factmaps, QuerySpec(roots=roots))
+
+    @property
+    def predicates(self) -> Tuple[Type[Predicate], ...]:
+        """Return the list of predicate types that this fact base contains."""
+        return tuple([pt for pt, fm in self._factmaps.items() if fm])
+
+    @property
+    def indexes(self) -> Tuple[PredicatePath, ...]:
+        return self._indexes
+
+    def facts(self) -> List[Predicate]:
+        """Return all facts."""
+        return list(self)
+
+    def to_columns(self, ptype: Type[Predicate]) -> Dict[str, List[Any]]:
+        """Return the field values of the facts of a predicate type as columns.
+
+        See :meth:`FactBase.to_columns`.
+        """
+        return _to_columns(ptype, self._factmaps.get(ptype))
+
+    def thaw(self) -> FactBase:
+        """Return a (mutable) FactBase with the same facts and indexes."""
+        return FactBase(self, indexes=self._indexes)
+
+    def __contains__(self, fact):
+        if not isinstance(fact, Predicate):
+            return False
+        fm = self._factmaps.get(type(fact), None)
+        return fm is not None and fact in fm.factset
+
+    def __bool__(self):
+        return any(self._factmaps.values())
+
+    def __len__(self):
+        return sum([len(fm) for fm in self._factmaps.values()])
+
+    def __iter__(self) -> Iterator[Predicate]:
+        for fm in self._factmaps.values():
+            for f in fm.factset:
+                yield f
+
+    def __eq__(self, other):
+        if not isinstance(other, (FrozenFactBase, FactBase)):
+            other = FrozenFactBase(other)
+        self_fms = {p: fm for p, fm in self._factmaps.items() if fm}
+        other_fms = {p: fm for p, fm in other.factmaps.items() if fm}
+        if self_fms.keys() != other_fms.keys():
+            return False
+        for p, fm1 in self_fms.items():
+            if not factset_equality(fm1.factset, other_fms[p].factset):
+                return False
+        return True
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None  # type: ignore
+
+    @property
+    def factmaps(self):
+        return self._factmaps
+
+    def __str__(self) -> str:
+        return "{" + ", ".join([str(f) for f in self]) + "}"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+# ------------------------------------------------------------------------------
+# MaterializedView maintains the results of a query as the FactBase changes. It
+# observes the FactMaps of the query predicates. The new facts of a predicate
+# are joined with the other predicates to find the new result tuples (see
+# IncrementalQuery). When a fact is removed the result tuples that contain the
+# fact are found from a mapping, for each query root, of the facts to the
+# result tuples that contain them. A reference count of the facts in the result
+# tuples maintains a FactBase of these facts.
+# ------------------------------------------------------------------------------
+
+
+class MaterializedView(object):
+    """The incrementally maintained results of a query over a fact base.
+
+    A ``MaterializedView`` is created with :meth:`FactBase.materialize`. It
+    behaves as a read-only container of the query results (facts, or tuples of
+    facts for a query with multiple roots or the ``tuple`` flag) that is kept
+    up to date as facts are added to and removed from the fact base. The facts
+    that appear in the results are available as a :class:`FactBase` that can
+    be queried.
+
+    Note: any membership sequence or sub-query in the ``where`` clause is only
+    evaluated when the view is created.
+
+    """
+
+    _unsupported = ("select", "order_by", "ordered", "group_by", "distinct", "limit", "offset")
+
+    def __init__(
+        self,
+        factbase: FactBase,
+        query: Query,
+        indexes: Optional[Iterable[PredicatePath]] = None,
+    ) -> None:
+        if not isinstance(query, Query):
+            raise TypeError("'{}' is not a Query".format(query))
+        qspec = query.qspec
+        for name in MaterializedView._unsupported:
+            if qspec.getp(name, None):
+                raise ValueError("'{}' is not supported by a materialized view".format(name))
+        self._iquery = IncrementalQuery(qspec)
+        self._unwrap = len(self._iquery.roots) == 1 and not qspec.tuple
+        self._factmaps = factbase.factmaps
+        self._results: collections.OrderedDict = collections.OrderedDict()
+        self._byfact: List[dict] = [{} for _ in self._iquery.roots]
+        self._refs: collections.Counter = collections.Counter()
+        self._factbase = FactBase(indexes=indexes)
+        for ptype in self._iquery.predicates:
+            factbase._factmap(ptype)
+        self._add_results(self._iquery.all(self._factmaps))
+        for ptype in self._iquery.predicates:
+            self._factmaps[ptype].add_observer(self)
+
+    # --------------------------------------------------------------------------
+    # Internal functions to add and remove result tuples
+    # --------------------------------------------------------------------------
+    def _add_results(self, tuples):
+        results = self._results
+        for t in tuples:
+            if t in results:
+                continue
+            results[t] = None
+            for idx, f in enumerate(t):
+                self._byfact[idx].setdefault(f, set()).add(t)
+                self._refs[f] += 1
+                if self._refs[f] == 1:
+                    self._factbase.add(f)
+
+    def _remove_result(self, t):
+        del self._results[t]
+        for idx, f in enumerate(t):
+            tuples = self._byfact[idx][f]
+            tuples.discard(t)
+            if not tuples:
+                del self._byfact[idx][f]
+            self._refs[f] -= 1
+            if not self._refs[f]:
+                del self._refs[f]
+                self._factbase.remove(f)
+
+    # --------------------------------------------------------------------------
+    # FactMap observer functions
+    # --------------------------------------------------------------------------
+    def facts_added(self, ptype, facts):
+        tuples = self._iquery.delta(self._factmaps, ptype, facts)
+        if tuples is not None:
+            self._add_results(tuples)
+            return
+        current = collections.OrderedDict.fromkeys(self._iquery.all(self._factmaps))
+        for t in [t for t in self._results if t not in current]:
+            self._remove_result(t)
+        self._add_results(current)
+
+    def facts_removed(self, ptype, facts):
+        for idx in self._iquery.positions(ptype):
+            byfact = self._byfact[idx]
+            for f in facts:
+                for t in list(byfact.get(f, ())):
+                    self._remove_result(t)
+
+    def facts_cleared(self, ptype, facts):
+        # Every result tuple contains a fact of each query predicate
+        self._results.clear()
+        self._byfact = [{} for _ in self._iquery.roots]
+        self._refs.clear()
+        self._factbase.clear()
+
+    # --------------------------------------------------------------------------
+    # Public functions
+    # --------------------------------------------------------------------------
+    @property
+    def factbase(self) -> FactBase:
+        """The facts that appear in the results (the FactBase must not be modified)."""
+        return self._factbase
+
+    def query(self, *roots):
+        """Define a query over the facts that appear in the results.
+
+        Equivalent to ``view.factbase.query(*roots)``.
+        """
+        return self._factbase.query(*roots)
+
+    def close(self) -> None:
+        """Stop maintaining the view."""
+        for ptype in self._iquery.predicates:
+            self._factmaps[ptype].remove_observer(self)
+
+    def __len__(self):
+        return len(self._results)
+
+    def __bool__(self):
+        return bool(self._results)
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._unwrap:
+            return (t[0] for t in self._results)
+        return iter(self._results)
+
+    def __contains__(self, item):
+        if self._unwrap:
+            return (item,) in self._results
+        return tuple(item) in self._results
+
+    def __str__(self):
+        return "{" + ", ".join([str(r) for r in self]) + "}"
+
+    def __repr__(self):
+        return self.__str__()
+
+
 # ------------------------------------------------------------------------------
 # Select is an interface query over a FactBase.
 # ------------------------------------------------------------------------------
@@ -982,7 +1533,7 @@ class SelectImpl(Select):
         qspec = self._qspec.fill_defaults()
 
         factsets, factindexes = QueryExecutor.get_factmap_data(self._factbase.factmaps, qspec)
-        qplan = make_query_plan(factindexes.keys(), qspec)
+        qplan = make_query_plan(factindexes, qspec.cardinalityp(factsets))
 
         return qplan.ground(*args, **kwargs)
 
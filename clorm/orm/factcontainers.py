@@ -5,13 +5,16 @@
 
 from __future__ import annotations
 
-import bisect
 import collections
+import copy
 import itertools
 import operator
+import weakref
 from typing import Any, Iterable, List, Type
 
 from ..util import OrderedSet as FactSet
+from ..util import SortedList
+from ..util.persistent import PersistentMap, PersistentOrderedSet, PersistentSortedSet
 from .core import Predicate, hashable_path, notcontains, path
 
 # ------------------------------------------------------------------------------
@@ -45,7 +48,15 @@ from .core import Predicate, hashable_path, notcontains, path
 __all__ = [
     "FactSet",
     "FactIndex",
+    "HashFactIndex",
+    "CompositeFactIndex",
+    "HashIndex",
+    "hash_index",
+    "hashable_index",
     "FactMap",
+    "FactJournal",
+    "PersistentFactIndex",
+    "FrozenFactMap",
     "factset_equality",
 ]
 
@@ -53,19 +64,113 @@ __all__ = [
 # Global
 # ------------------------------------------------------------------------------
 
+# ------------------------------------------------------------------------------
+# The facts of an index key are stored in a bucket with an adaptive
+# representation. Most keys of an index on a (nearly) unique field, such as an
+# id or a timestamp, have a single fact, so creating a FactSet for every key
+# would use several times more memory than the facts themselves. Instead a
+# bucket is the fact itself for a single fact, a tuple for up to _BUCKET_SIZE
+# facts, and a FactSet beyond that. The facts of a bucket are kept in insertion
+# order. Tuples and single facts are immutable so only FactSet buckets need to
+# be copied when an index is copied.
+# ------------------------------------------------------------------------------
+
+_BUCKET_SIZE = 8
+
+
+def _bucket_iter(values):
+    return (values,) if isinstance(values, Predicate) else values
+
+
+def _bucket_len(values):
+    return 1 if isinstance(values, Predicate) else len(values)
+
+
+def _bucket_make(facts):
+    if len(facts) == 1:
+        return facts[0]
+    facts = tuple(dict.fromkeys(facts))
+    if len(facts) == 1:
+        return facts[0]
+    if len(facts) <= _BUCKET_SIZE:
+        return facts
+    return FactSet(facts)
+
+
+def _bucket_copy(values):
+    return values.copy() if isinstance(values, FactSet) else values
+
+
+# Returns the bucket with the fact added
+def _bucket_add(values, fact):
+    if isinstance(values, Predicate):
+        if values == fact:
+            return values
+        return (values, fact)
+    if isinstance(values, tuple):
+        if fact in values:
+            return values
+        if len(values) < _BUCKET_SIZE:
+            return values + (fact,)
+        return FactSet(values + (fact,))
+    values.add(fact)
+    return values
+
+
+# Returns the bucket with the fact removed (or None if it is now empty) and
+# whether the fact was found
+def _bucket_remove(values, fact):
+    if isinstance(values, Predicate):
+        if values == fact:
+            return None, True
+        return values, False
+    if fact not in values:
+        return values, False
+    if isinstance(values, tuple):
+        values = tuple([f for f in values if f != fact])
+        return (values[0] if len(values) == 1 else values), True
+    values.remove(fact)
+    return (values if values else None), True
+
+
 # ------------------------------------------------------------------------------
 # FactIndex indexes facts by a given field
+#
+# The facts are stored in a dictionary mapping each key to the bucket of facts
+# with that key, while a separate ordered container maintains the sorted keys for
+# range (and ordered) lookups. The ordered container is pluggable: 'keylist' is
+# a class that provides add(), update(), remove(), irange(), __contains__,
+# __len__, __iter__, and __reversed__. The default SortedList is a shallow B+-tree so key
+# insertion and deletion don't shift the entire list of keys (as happens with
+# bisect.insort() on a plain list).
 # ------------------------------------------------------------------------------
 
 
 class FactIndex(object):
-    def __init__(self, path):
+    # The operators that can be used to find() facts and whether iterating over
+    # the index returns the facts in key order.
+    operators = frozenset(
+        [
+            operator.eq,
+            operator.ne,
+            operator.lt,
+            operator.le,
+            operator.gt,
+            operator.ge,
+            operator.contains,
+            notcontains,
+        ]
+    )
+    ordered = True
+
+    def __init__(self, path, keylist=SortedList):
         try:
             self._path = path
             self._attrgetter = self._path.meta.attrgetter
             self._predicate = self._path.meta.predicate
-            self._keylist = []
-            self._key2values = collections.OrderedDict()
+            self._keylist_type = keylist
+            self._keylist = keylist()
+            self._key2values = {}
         except:
             raise TypeError("{} is not a valid PredicatePath object".format(path))
 
@@ -73,22 +178,103 @@ class FactIndex(object):
     def path(self):
         return self._path
 
+    def supports(self, op):
+        return op in self.operators
+
     def add(self, fact):
         if not isinstance(fact, self._predicate):
             raise TypeError("{} is not a {}".format(fact, self._predicate))
         key = self._attrgetter(fact)
 
-        # Index the fact by the key - Note: using OrderedSet to preserve
-        # insertion order for repeatability
-        if key not in self._key2values:
-            self._key2values[key] = FactSet()
-        self._key2values[key].add(fact)
+        # Index the fact by the key - Note: the buckets preserve insertion order
+        # for repeatability. Only a new key needs to be added to the sorted list
+        # of keys.
+        values = self._key2values.get(key)
+        if values is None:
+            self._key2values[key] = fact
+            self._keylist.add(key)
+        else:
+            self._key2values[key] = _bucket_add(values, fact)
 
-        # Maintain the sorted list of keys
-        posn = bisect.bisect_left(self._keylist, key)
-        if len(self._keylist) > posn and self._keylist[posn] == key:
+    # Bulk load a collection of facts. The facts are grouped by key in a single
+    # pass and the new keys are then sorted and merged into the key list in one
+    # go (rather than inserting each new key individually).
+    def add_facts(self, facts):
+        predicate = self._predicate
+        attrgetter = self._attrgetter
+        key2values = self._key2values
+        newgroups = {}
+        for fact in facts:
+            if not isinstance(fact, predicate):
+                raise TypeError("{} is not a {}".format(fact, predicate))
+            key = attrgetter(fact)
+            values = key2values.get(key)
+            if values is not None:
+                key2values[key] = _bucket_add(values, fact)
+                continue
+            group = newgroups.get(key)
+            if group is None:
+                newgroups[key] = [fact]
+            else:
+                group.append(fact)
+        if not newgroups:
             return
-        bisect.insort_left(self._keylist, key)
+        for key, group in newgroups.items():
+            key2values[key] = _bucket_make(group)
+        self._add_keys(newgroups.keys())
+
+    def _add_keys(self, keys):
+        self._keylist.update(keys)
+
+    # Merge the facts of an index with the same definition (for example the
+    # corresponding index of another FactMap). The facts are already grouped by
+    # key so the keys don't need to be re-computed.
+    def merge(self, other):
+        key2values = self._key2values
+        newkeys = []
+        for key, values in other._key2values.items():
+            existing = key2values.get(key)
+            if existing is None:
+                key2values[key] = _bucket_copy(values)
+                newkeys.append(key)
+                continue
+            for fact in _bucket_iter(values):
+                existing = _bucket_add(existing, fact)
+            key2values[key] = existing
+        if newkeys:
+            self._add_keys(newkeys)
+
+    # Bulk removal of a collection of facts. Facts that are not in the index are
+    # ignored and the keys that no longer have any facts are removed together.
+    def remove_facts(self, facts):
+        predicate = self._predicate
+        attrgetter = self._attrgetter
+        key2values = self._key2values
+        oldkeys = []
+        for fact in facts:
+            if not isinstance(fact, predicate):
+                raise TypeError("{} is not a {}".format(fact, predicate))
+            key = attrgetter(fact)
+            values = key2values.get(key)
+            if values is None:
+                continue
+            values, _ = _bucket_remove(values, fact)
+            if values is None:
+                del key2values[key]
+                oldkeys.append(key)
+            else:
+                key2values[key] = values
+        if oldkeys:
+            self._remove_keys(oldkeys)
+
+    # If most of the keys are removed it is cheaper to rebuild the key list
+    def _remove_keys(self, keys):
+        if len(keys) > len(self._key2values):
+            self._keylist = self._keylist_type()
+            self._keylist.update(self._key2values.keys())
+            return
+        for key in keys:
+            self._keylist.remove(key)
 
     def discard(self, fact):
         self.remove(fact, False)
@@ -99,35 +285,70 @@ class FactIndex(object):
         key = self._attrgetter(fact)
 
         # Remove the value
-        if key not in self._key2values:
+        values = self._key2values.get(key)
+        if values is not None:
+            values, found = _bucket_remove(values, fact)
+        else:
+            found = False
+        if not found:
             if raise_on_missing:
                 raise KeyError("{} is not in the FactIndex".format(fact))
             return
-        values = self._key2values[key]
-        if raise_on_missing:
-            values.remove(fact)
-        else:
-            values.discard(fact)
 
         # If still have values then we're done
-        if values:
+        if values is not None:
+            self._key2values[key] = values
             return
 
         # remove the key
         del self._key2values[key]
-        posn = bisect.bisect_left(self._keylist, key)
-        del self._keylist[posn]
+        self._keylist.remove(key)
 
     def clear(self):
-        self._keylist = []
-        self._key2values = collections.OrderedDict()
+        self._keylist = self._keylist_type()
+        self._key2values = {}
+
+    # A copy of the index that doesn't share any mutable structure
+    def copy(self):
+        nfi = copy.copy(self)
+        nfi._key2values = {key: _bucket_copy(values) for key, values in self._key2values.items()}
+        nfi._copy_keys(self)
+        return nfi
+
+    def _copy_keys(self, other):
+        self._keylist = self._keylist_type()
+        self._keylist.update(other._keylist)
 
     @property
     def keys(self):
         return self._keylist
 
+    # The number of distinct keys (used by the query planner's cost estimates)
+    @property
+    def num_keys(self):
+        return len(self._key2values)
+
+    # --------------------------------------------------------------------------
+    # Direct access to the facts of each key (used by the query engine's join
+    # operators). lookup() returns the facts with the given key without copying
+    # and groups() returns the (key, facts) pairs in key order (or in key
+    # insertion order for an unordered index).
+    # --------------------------------------------------------------------------
+    def lookup(self, key):
+        values = self._key2values.get(key)
+        if values is None:
+            return ()
+        return _bucket_iter(values)
+
+    def groups(self, reverse=False):
+        keys = reversed(self.keys) if reverse else self.keys
+        for key in keys:
+            yield (key, _bucket_iter(self._key2values[key]))
+
     # --------------------------------------------------------------------------
-    # Internal functions to get keys matching some boolean operator
+    # Internal functions to get keys matching some boolean operator. Note: the
+    # keys are copied into a list so that the index can be modified while the
+    # matching facts are being iterated over.
     # --------------------------------------------------------------------------
 
     def _keys_eq(self, key):
@@ -136,27 +357,21 @@ class FactIndex(object):
         return []
 
     def _keys_ne(self, key):
-        posn1 = bisect.bisect_left(self._keylist, key)
-        left = self._keylist[:posn1]
-        posn2 = bisect.bisect_right(self._keylist, key)
-        right = self._keylist[posn2:]
-        return left + right
+        left = self._keylist.irange(maximum=key, inclusive=(True, False))
+        right = self._keylist.irange(minimum=key, inclusive=(False, True))
+        return list(itertools.chain(left, right))
 
     def _keys_lt(self, key):
-        posn = bisect.bisect_left(self._keylist, key)
-        return self._keylist[:posn]
+        return list(self._keylist.irange(maximum=key, inclusive=(True, False)))
 
     def _keys_le(self, key):
-        posn = bisect.bisect_right(self._keylist, key)
-        return self._keylist[:posn]
+        return list(self._keylist.irange(maximum=key))
 
     def _keys_gt(self, key):
-        posn = bisect.bisect_right(self._keylist, key)
-        return self._keylist[posn:]
+        return list(self._keylist.irange(minimum=key, inclusive=(False, True)))
 
     def _keys_ge(self, key):
-        posn = bisect.bisect_left(self._keylist, key)
-        return self._keylist[posn:]
+        return list(self._keylist.irange(minimum=key))
 
     def _keys_contains(self, seq):
         tmp = []
@@ -166,12 +381,14 @@ class FactIndex(object):
         tmp.sort()
         return tmp
 
+    # An anti-join with a small sequence only has to find the few keys that
+    # are excluded (and if there are none it is a copy of the key list).
     def _keys_notcontains(self, seq):
-        tmp = []
-        for key in self._keylist:
-            if key not in seq:
-                tmp.append(key)
-        return tmp
+        if len(seq) < len(self._key2values):
+            seq = set([key for key in seq if key in self._key2values])
+            if not seq:
+                return list(self._keylist)
+        return [key for key in self._keylist if key not in seq]
 
     # --------------------------------------------------------------------------
     # Find elements based on boolean match to a key
@@ -198,13 +415,13 @@ class FactIndex(object):
             raise ValueError("unsupported operator {}".format(op))
 
         if reverse:
-            for k in reversed(keys):
-                for fact in self._key2values[k]:
-                    yield fact
-        else:
-            for k in keys:
-                for fact in self._key2values[k]:
-                    yield fact
+            keys = reversed(keys)
+        for k in keys:
+            values = self._key2values[k]
+            if isinstance(values, Predicate):
+                yield values
+            else:
+                yield from values
 
     # --------------------------------------------------------------------------
     # Iterate in descending key order
@@ -212,8 +429,7 @@ class FactIndex(object):
 
     def __reversed__(self):
         for key in reversed(self._keylist):
-            for f in self._key2values[key]:
-                yield f
+            yield from _bucket_iter(self._key2values[key])
 
     # --------------------------------------------------------------------------
     # Iterate in key ascending order
@@ -221,37 +437,232 @@ class FactIndex(object):
 
     def __iter__(self):
         for key in self._keylist:
-            for f in self._key2values[key]:
-                yield f
+            yield from _bucket_iter(self._key2values[key])
 
     def __bool__(self):
-        for facts in self._key2values.values():
-            if facts:
-                return True
-        return False
+        return bool(self._key2values)
 
     def __len__(self):
-        return sum([len(facts) for facts in self._key2values.values()])
+        return sum([_bucket_len(values) for values in self._key2values.values()])
 
     def __eq__(self, other):
         if not isinstance(other, self.__class__):
             return NotImplemented
-        if hashable_path(self._path) != hashable_path(other._path):
+        if hashable_index(self._path) != hashable_index(other._path):
+            return False
+        if list(self._key2values.keys()) != list(other._key2values.keys()):
             return False
-        return self._key2values == other._key2values
+        for key, values in self._key2values.items():
+            if list(_bucket_iter(values)) != list(_bucket_iter(other._key2values[key])):
+                return False
+        return True
 
     def __str__(self):
         if not self:
             return "{}"
         tmp = []
         for k, v in self._key2values.items():
-            tmp.extend(v)
+            tmp.extend(_bucket_iter(v))
         return "{" + ", ".join([repr(f) for f in tmp]) + "}"
 
     def __repr__(self):
         return self.__str__()
 
 
+# ------------------------------------------------------------------------------
+# HashFactIndex is a FactIndex that only maintains the dictionary from keys to
+# facts and not the sorted list of keys. This makes adding and removing facts
+# cheaper but it can only be used for equality and membership lookups and
+# iterating over the index returns the facts in key insertion order (rather than
+# key order). The query planner checks supports() and the 'ordered' attribute so
+# that it never uses a HashFactIndex for other operators or for ordering.
+# ------------------------------------------------------------------------------
+
+
+class HashFactIndex(FactIndex):
+    operators = frozenset([operator.eq, operator.contains])
+    ordered = False
+
+    def __init__(self, path):
+        try:
+            self._path = path
+            self._attrgetter = self._path.meta.attrgetter
+            self._predicate = self._path.meta.predicate
+            self._key2values = {}
+        except:
+            raise TypeError("{} is not a valid PredicatePath object".format(path))
+
+    def add(self, fact):
+        if not isinstance(fact, self._predicate):
+            raise TypeError("{} is not a {}".format(fact, self._predicate))
+        key = self._attrgetter(fact)
+        values = self._key2values.get(key)
+        if values is None:
+            self._key2values[key] = fact
+        else:
+            self._key2values[key] = _bucket_add(values, fact)
+
+    def _add_keys(self, keys):
+        pass
+
+    def _remove_keys(self, keys):
+        pass
+
+    def _copy_keys(self, other):
+        pass
+
+    def remove(self, fact, raise_on_missing=True):
+        if not isinstance(fact, self._predicate):
+            raise TypeError("{} is not a {}".format(fact, self._predicate))
+        key = self._attrgetter(fact)
+        values = self._key2values.get(key)
+        if values is not None:
+            values, found = _bucket_remove(values, fact)
+        else:
+            found = False
+        if not found:
+            if raise_on_missing:
+                raise KeyError("{} is not in the FactIndex".format(fact))
+            return
+        if values is None:
+            del self._key2values[key]
+        else:
+            self._key2values[key] = values
+
+    def clear(self):
+        self._key2values = {}
+
+    @property
+    def keys(self):
+        return list(self._key2values.keys())
+
+    # --------------------------------------------------------------------------
+    # Find elements based on equality or membership of a key. Note: the matching
+    # keys of a membership lookup are still sorted so that the results don't
+    # depend on the iteration order of the sequence.
+    # --------------------------------------------------------------------------
+    def find(self, op, val, reverse=False):
+        if op == operator.eq:
+            keys = self._keys_eq(val)
+        elif op == operator.contains:
+            keys = self._keys_contains(val)
+        else:
+            raise ValueError("unsupported operator {} for a hash index".format(op))
+        if reverse:
+            keys.reverse()
+        for k in keys:
+            values = self._key2values[k]
+            if isinstance(values, Predicate):
+                yield values
+            else:
+                yield from values
+
+    # --------------------------------------------------------------------------
+    # Iterate in key insertion order
+    # --------------------------------------------------------------------------
+
+    def __reversed__(self):
+        for key in reversed(self._key2values):
+            yield from _bucket_iter(self._key2values[key])
+
+    def __iter__(self):
+        for values in self._key2values.values():
+            yield from _bucket_iter(values)
+
+
+# ------------------------------------------------------------------------------
+# CompositeFactIndex indexes facts by the tuple of values of multiple fields of
+# the same predicate. It is specified by passing a tuple of paths as an index,
+# for example FactBase(indexes=[(P.a, P.b)]), and is used by the query engine
+# for a conjunction of equality comparisons over all of its fields. Its path is
+# the tuple of paths and its keys are tuples of values.
+# ------------------------------------------------------------------------------
+
+
+class CompositeFactIndex(FactIndex):
+    operators = frozenset([operator.eq])
+
+    def __init__(self, paths, keylist=SortedList):
+        try:
+            self._path = tuple(paths)
+            getters = tuple([p.meta.attrgetter for p in self._path])
+            predicates = set([p.meta.predicate for p in self._path])
+        except:
+            raise TypeError("{} is not a valid tuple of PredicatePath objects".format(paths))
+        if len(self._path) < 2:
+            raise ValueError("A composite index requires at least two paths: {}".format(paths))
+        if len(predicates) != 1:
+            raise ValueError(
+                "The paths of a composite index must refer to the same predicate: {}".format(
+                    paths
+                )
+            )
+        self._attrgetter = lambda f: tuple([g(f) for g in getters])
+        self._predicate = predicates.pop()
+        self._keylist_type = keylist
+        self._keylist = keylist()
+        self._key2values = {}
+
+
+# ------------------------------------------------------------------------------
+# Returns a hashable representation of an index specification. For a single
+# path this is its hashable path and for a composite index it is the tuple of
+# hashable paths. This is used as the key of the FactMap.path2factindex
+# dictionary.
+# ------------------------------------------------------------------------------
+
+
+def hashable_index(idx):
+    if isinstance(idx, tuple):
+        return tuple([hashable_path(p) for p in idx])
+    return hashable_path(idx)
+
+
+# ------------------------------------------------------------------------------
+# HashIndex is used to specify that a path should be indexed with a
+# HashFactIndex rather than a (sorted) FactIndex. For example:
+#
+#   fb = FactBase(indexes=[P.a, hash_index(P.b)])
+# ------------------------------------------------------------------------------
+
+
+class HashIndex(object):
+    def __init__(self, pth):
+        self._path = path(pth)
+
+    @property
+    def path(self):
+        return self._path
+
+    def __hash__(self):
+        return hash((HashIndex, hashable_path(self._path)))
+
+    def __eq__(self, other):
+        if not isinstance(other, HashIndex):
+            return NotImplemented
+        return hashable_path(self._path) == hashable_path(other._path)
+
+    def __str__(self):
+        return "hash_index({})".format(self._path)
+
+    def __repr__(self):
+        return self.__str__()
+
+
+def hash_index(pth):
+    """Specify that a path is to be indexed for equality only lookups.
+
+    A hash index avoids the cost of maintaining the index keys in sorted order,
+    but can only be used by the query engine for equality (``==``) and
+    membership (``in_``) lookups. Other comparisons fall back to a search.
+
+    Args:
+      pth: a path to a sub-field of a predicate.
+
+    """
+    return HashIndex(pth)
+
+
 # ------------------------------------------------------------------------------
 # A helper function to determine if two collections have the same elements
 # (irrespective of ordering). This is useful if the underlying objects are two
@@ -284,6 +695,16 @@ def factset_equality(s1, s2):
 # engine is passed the FactMap and then choses the appropriate way of accessing
 # the data.
 #
+# Objects that maintain data derived from the facts (such as a materialized
+# view) can observe a FactMap. After each modification the observers are passed
+# the facts that were actually added or removed (or told that the FactMap was
+# cleared). The observers are weakly referenced and are not pickled.
+#
+# Copying a FactMap is copy-on-write. The copy shares the FactSet and FactIndex
+# objects with the original, and whichever FactMap is modified first makes its
+# own copy of them. The FactMaps that share storage hold a common counter of the
+# number of sharers, so the last sharer doesn't have to copy anything.
+#
 # ------------------------------------------------------------------------------
 
 
@@ -295,6 +716,9 @@ def _fm_iterable(other):
 
 
 class FactMap(object):
+    # The maximum number of items in the cache of derived data
+    _cache_size = 32
+
     def __init__(self, ptype: Type[Predicate], indexes: Iterable[Any] = []) -> None:
         def clean_path(p):
             p = path(p)
@@ -313,11 +737,30 @@ class FactMap(object):
         self._ptype = ptype
         self._factset = FactSet()
         self._path2factindex = collections.OrderedDict()
-
-        # Validate the paths to be indexed
-        allindexes = set([clean_path(p) for p in indexes])
+        self._version = 0
+        self._cache = collections.OrderedDict()
+        self._cache_version = 0
+        self._observers = None
+        self._shared = None
+
+        # Validate the paths to be indexed. A path may be indexed with a hash
+        # index, but if it is also given as a normal index then the (more
+        # general) sorted index is used. A tuple of paths is a composite index.
+        allindexes = collections.OrderedDict()
+        for spec in indexes:
+            if isinstance(spec, HashIndex):
+                allindexes.setdefault(clean_path(spec.path), HashFactIndex)
+            elif isinstance(spec, tuple):
+                allindexes[tuple([clean_path(p) for p in spec])] = CompositeFactIndex
+            else:
+                allindexes[clean_path(spec)] = FactIndex
         factindexes: List[FactIndex] = []
-        for pth in allindexes:
+        for pth, fitype in allindexes.items():
+            if isinstance(pth, tuple):
+                tmpfi = CompositeFactIndex([path(hp) for hp in pth])
+                self._path2factindex[pth] = tmpfi
+                factindexes.append(tmpfi)
+                continue
             tmppath = path(pth)
             if hashable_path(tmppath.meta.dealiased) != hashable_path(tmppath):
                 raise ValueError(
@@ -329,32 +772,147 @@ class FactMap(object):
                         tmppath, path(ptype)
                     )
                 )
-            tmpfi = FactIndex(tmppath)
+            tmpfi = fitype(tmppath)
             self._path2factindex[hashable_path(tmppath)] = tmpfi
             factindexes.append(tmpfi)
         self._factindexes = tuple(factindexes)
 
+    # --------------------------------------------------------------------------
+    # Add or remove an index after the FactMap has been created. A new index is
+    # bulk loaded with the existing facts, while adding an index that already
+    # exists simply returns the existing index.
+    # --------------------------------------------------------------------------
+    def add_index(self, spec):
+        tmp = FactMap(self._ptype, [spec])
+        ((key, fi),) = tmp._path2factindex.items()
+        existing = self._path2factindex.get(key, None)
+        if existing is not None:
+            return existing
+        fi.add_facts(self._factset)
+        self._path2factindex = collections.OrderedDict(self._path2factindex)
+        self._path2factindex[key] = fi
+        self._factindexes = self._factindexes + (fi,)
+        return fi
+
+    def remove_index(self, spec):
+        key = hashable_index(spec.path if isinstance(spec, HashIndex) else spec)
+        if key not in self._path2factindex:
+            raise KeyError("No index '{}' for predicate '{}'".format(spec, self._ptype))
+        self._path2factindex = collections.OrderedDict(self._path2factindex)
+        fi = self._path2factindex.pop(key)
+        self._factindexes = tuple([f for f in self._factindexes if f is not fi])
+
+    # --------------------------------------------------------------------------
+    # Data derived from the facts (such as the temporary indexes built by the
+    # query engine) can be cached against the FactMap. The cache is keyed by an
+    # arbitrary hashable key and is only valid for the current version of the
+    # FactMap; the version is incremented on every modification so any change
+    # to the facts invalidates the cache. The number of cached items is bounded
+    # with the least recently used item discarded first.
+    # --------------------------------------------------------------------------
+    def cached(self, key, make):
+        cache = self._cache
+        if self._cache_version != self._version:
+            cache.clear()
+            self._cache_version = self._version
+        value = cache.get(key, None)
+        if value is not None:
+            cache.move_to_end(key)
+            return value
+        value = make()
+        if self._cache_version != self._version:
+            return value
+        cache[key] = value
+        if len(cache) > self._cache_size:
+            cache.popitem(last=False)
+        return value
+
+    # --------------------------------------------------------------------------
+    # Observers are objects with facts_added(ptype, facts), facts_removed(ptype,
+    # facts), and facts_cleared(ptype, facts) member functions.
+    # --------------------------------------------------------------------------
+    def add_observer(self, observer):
+        if self._observers is None:
+            self._observers = weakref.WeakSet()
+        self._observers.add(observer)
+
+    def remove_observer(self, observer):
+        if self._observers is not None:
+            self._observers.discard(observer)
+
+    def _notify(self, name, *args):
+        for observer in list(self._observers):
+            getattr(observer, name)(self._ptype, *args)
+
+    # --------------------------------------------------------------------------
+    # Copy-on-write. Before modifying shared storage a FactMap makes its own copy
+    # of the FactSet and FactIndexes (or new empty ones if it is being cleared).
+    # --------------------------------------------------------------------------
+    def _unshare(self, keep_facts=True):
+        shared = self._shared
+        self._shared = None
+        if shared[0] == 1:
+            return
+        shared[0] -= 1
+        if keep_facts:
+            self._factset = self._factset.copy()
+            fi2nfi = {id(fi): fi.copy() for fi in self._factindexes}
+        else:
+            self._factset = FactSet()
+            fi2nfi = {id(fi): copy.copy(fi) for fi in self._factindexes}
+            for nfi in fi2nfi.values():
+                nfi.clear()
+        self._path2factindex = collections.OrderedDict(
+            [(key, fi2nfi[id(fi)]) for key, fi in self._path2factindex.items()]
+        )
+        self._factindexes = tuple([fi2nfi[id(fi)] for fi in self._factindexes])
+
     def add_facts(self, facts):
-        for f in facts:
-            self._factset.add(f)
+        self._version += 1
+        if self._shared is not None:
+            self._unshare()
+        if self._observers:
+            facts = [f for f in dict.fromkeys(facts) if f not in self._factset]
+        if not self._factindexes:
+            self._factset.update(facts)
+        else:
+            if not isinstance(facts, (list, tuple, FactSet)):
+                facts = list(facts)
+            self._factset.update(facts)
             for fi in self._factindexes:
-                fi.add(f)
+                fi.add_facts(facts)
+        if self._observers and facts:
+            self._notify("facts_added", facts)
 
     def add_fact(self, fact):
+        self._version += 1
+        if self._shared is not None:
+            self._unshare()
+        if self._observers and fact in self._factset:
+            return
         self._factset.add(fact)
         for fi in self._factindexes:
             fi.add(fact)
+        if self._observers:
+            self._notify("facts_added", [fact])
 
     def discard(self, fact):
         self.remove(fact, False)
 
     def remove(self, fact, raise_on_missing=True):
+        self._version += 1
+        if self._shared is not None:
+            self._unshare()
+        if self._observers and not raise_on_missing and fact not in self._factset:
+            return
         if raise_on_missing:
             self._factset.remove(fact)
         else:
             self._factset.discard(fact)
         for fi in self._factindexes:
             fi.remove(fact, raise_on_missing)
+        if self._observers:
+            self._notify("facts_removed", [fact])
 
     def pop(self):
         if not self._factset:
@@ -364,9 +922,25 @@ class FactMap(object):
         return fact
 
     def clear(self):
+        self._version += 1
+        facts = list(self._factset) if self._observers else None
+        if self._shared is not None:
+            self._unshare(keep_facts=False)
         self._factset.clear()
         for fi in self._factindexes:
             fi.clear()
+        if self._observers:
+            self._notify("facts_cleared", facts)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_observers"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault("_observers", None)
+        self.__dict__.setdefault("_shared", None)
 
     @property
     def predicate(self) -> Type[Predicate]:
@@ -380,6 +954,19 @@ class FactMap(object):
     def path2factindex(self):
         return self._path2factindex
 
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def indexes(self):
+        return tuple(
+            [
+                HashIndex(fi.path) if isinstance(fi, HashFactIndex) else fi.path
+                for fi in self._factindexes
+            ]
+        )
+
     def __len__(self):
         return len(self._factset)
 
@@ -387,66 +974,376 @@ class FactMap(object):
         return bool(self._factset)
 
     # --------------------------------------------------------------------------
-    # Set functions
+    # Set functions. The results are built from a (copy-on-write) copy of this
+    # FactMap so that the indexes are only modified by the facts that actually
+    # change, and a FactMap that isn't changed shares its storage with the
+    # original. The facts of a FactMap with the same index definitions are
+    # merged into the indexes already grouped by key.
     # --------------------------------------------------------------------------
     def union(self, *others):
-        nfm = FactMap(self.predicate, self._path2factindex.keys())
-        tmpothers = [_fm_iterable(o) for o in others]
-        tmp = self.factset.union(*tmpothers)
-        nfm.add_facts(tmp)
+        nfm = self.copy()
+        nfm.update(*others)
         return nfm
 
     def intersection(self, *others):
-        nfm = FactMap(self.predicate, self._path2factindex.keys())
-        tmpothers = [_fm_iterable(o) for o in others]
-        tmp = self.factset.intersection(*tmpothers)
-        nfm.add_facts(tmp)
+        nfm = self.copy()
+        nfm.intersection_update(*others)
         return nfm
 
     def difference(self, *others):
-        nfm = FactMap(self.predicate, self._path2factindex.keys())
-        tmpothers = [_fm_iterable(o) for o in others]
-        tmp = self.factset.difference(*tmpothers)
-        nfm.add_facts(tmp)
+        nfm = self.copy()
+        nfm.difference_update(*others)
         return nfm
 
     def symmetric_difference(self, other):
-        nfm = FactMap(self.predicate, self._path2factindex.keys())
-        tmp = self.factset.symmetric_difference(_fm_iterable(other))
-        nfm.add_facts(tmp)
+        nfm = self.copy()
+        nfm.symmetric_difference_update(other)
         return nfm
 
+    def _same_indexes(self, other):
+        if not isinstance(other, FactMap) or other._ptype != self._ptype:
+            return False
+        tmp1 = [(key, type(fi)) for key, fi in self._path2factindex.items()]
+        tmp2 = [(key, type(fi)) for key, fi in other._path2factindex.items()]
+        return tmp1 == tmp2
+
+    # Merge another FactMap with the same index definitions. Merging visits all
+    # of the other FactMap's facts so it is only cheaper than adding the new
+    # facts if nearly all of them are new.
+    def _merge(self, other):
+        factset = self._factset
+        facts = [f for f in other._factset if f not in factset]
+        if not facts:
+            return
+        if len(facts) * 10 < len(other._factset) * 9:
+            self.add_facts(facts)
+            return
+        self._version += 1
+        if self._shared is not None:
+            self._unshare()
+        self._factset.update(facts)
+        for key, fi in self._path2factindex.items():
+            fi.merge(other._path2factindex[key])
+        if self._observers:
+            self._notify("facts_added", facts)
+
     def update(self, *others):
-        self.add_facts(itertools.chain(*[_fm_iterable(o) for o in others]))
+        for o in others:
+            if self._same_indexes(o):
+                self._merge(o)
+                continue
+            factset = self._factset
+            facts = [f for f in _fm_iterable(o) if f not in factset]
+            if facts:
+                self.add_facts(facts)
+
+    # Remove a collection of facts from the FactSet and the indexes in bulk.
+    # Facts that are not in the FactMap are ignored. Copying shared storage
+    # costs about as much as rebuilding the FactMap, so (if nobody is observing
+    # the individual removals) a shared FactMap or one losing most of its facts
+    # is rebuilt from the remaining facts.
+    def remove_facts(self, facts):
+        factset = self._factset
+        self._remove_facts([f for f in dict.fromkeys(facts) if f in factset])
+
+    # The facts must be distinct and in the FactMap
+    def _remove_facts(self, facts):
+        if not facts:
+            return
+        factset = self._factset
+        if not self._observers and (
+            self._shared is not None or len(facts) > 2 * (len(factset) - len(facts))
+        ):
+            removed = set(facts)
+            remaining = [f for f in factset if f not in removed]
+            self.clear()
+            self.add_facts(remaining)
+            return
+        self._version += 1
+        if self._shared is not None:
+            self._unshare()
+        self._factset.difference_update(facts)
+        for fi in self._factindexes:
+            fi.remove_facts(facts)
+        if self._observers:
+            self._notify("facts_removed", facts)
 
+    # Note: the facts to remove are found using plain sets of the facts of this
+    # FactMap so that they are removed using the same (identical) instances.
     def intersection_update(self, *others):
-        for f in set(self.factset):
-            for o in others:
-                if f not in _fm_iterable(o):
-                    self.discard(f)
+        factset = self._factset
+        keep = set(factset).intersection(*[_fm_iterable(o) for o in others])
+        self._remove_facts([f for f in factset if f not in keep])
 
     def difference_update(self, *others):
-        for f in itertools.chain(*[o.factset for o in others]):
-            self.discard(f)
+        factset = self._factset
+        keep = set(factset)
+        keep.difference_update(*[_fm_iterable(o) for o in others])
+        self._remove_facts([f for f in factset if f not in keep])
 
     def symmetric_difference_update(self, other):
-        to_remove = FactSet()
-        to_add = FactSet()
-        for f in self._factset:
-            if f in _fm_iterable(other):
-                to_remove.add(f)
-        for f in _fm_iterable(other):
-            if f not in self._factset:
-                to_add.add(f)
-        for f in to_remove:
-            self.discard(f)
-        self.add_facts(to_add)
+        factset = self._factset
+        keep = set(factset)
+        to_add = []
+        for f in dict.fromkeys(_fm_iterable(other)):
+            if f in keep:
+                keep.discard(f)
+            else:
+                to_add.append(f)
+        self._remove_facts([f for f in factset if f not in keep])
+        if to_add:
+            self.add_facts(to_add)
+
+    # A copy-on-write copy that shares the storage (and cached data) with this
+    # FactMap but not the observers.
+    def copy(self):
+        if self._shared is None:
+            self._shared = [1]
+        self._shared[0] += 1
+        nfm = copy.copy(self)
+        nfm._cache = collections.OrderedDict(self._cache)
+        nfm._observers = None
+        return nfm
+
+
+# ------------------------------------------------------------------------------
+# FactJournal is a FactMap observer that records the facts that are added to and
+# removed from the observed FactMaps. Each modification is an entry in the
+# journal and increments the journal version, so the changes since an earlier
+# version are found by replaying the entries after that version. Replaying
+# cancels out a fact that is added and then removed (or removed and then
+# re-added), so only the net changes are returned. Entries can be discarded
+# once they are no longer needed.
+# ------------------------------------------------------------------------------
+
+
+class FactJournal(object):
+    def __init__(self) -> None:
+        self._entries: List[Any] = []
+        self._start = 0
+
+    @property
+    def version(self):
+        return self._start + len(self._entries)
+
+    @property
+    def start(self):
+        return self._start
+
+    def facts_added(self, ptype, facts):
+        self._entries.append((ptype, True, tuple(facts)))
+
+    def facts_removed(self, ptype, facts):
+        self._entries.append((ptype, False, tuple(facts)))
+
+    def facts_cleared(self, ptype, facts):
+        if facts:
+            self._entries.append((ptype, False, tuple(facts)))
+
+    def _check_version(self, version):
+        if not isinstance(version, int) or version > self.version:
+            raise ValueError("Invalid journal version '{}'".format(version))
+        if version < self._start:
+            raise ValueError(
+                "Journal version '{}' has been discarded (earliest version '{}')".format(
+                    version, self._start
+                )
+            )
+
+    def changes_since(self, version):
+        self._check_version(version)
+        changes = {}
+        for ptype, added, facts in itertools.islice(self._entries, version - self._start, None):
+            inserted, deleted = changes.setdefault(ptype, (FactSet(), FactSet()))
+            if not added:
+                inserted, deleted = deleted, inserted
+            for f in facts:
+                if f in deleted:
+                    deleted.remove(f)
+                else:
+                    inserted.add(f)
+        return {ptype: pair for ptype, pair in changes.items() if pair[0] or pair[1]}
+
+    def discard(self, version):
+        self._check_version(version)
+        del self._entries[: version - self._start]
+        self._start = version
+
+
+# ------------------------------------------------------------------------------
+# PersistentFactIndex and FrozenFactMap are the immutable counterparts of
+# FactIndex and FactMap that are used by FrozenFactBase. The facts are stored in
+# persistent containers (see clorm.util.persistent) so with_facts() and
+# without_facts() return a new object that shares almost all of its storage
+# with the original. A PersistentFactIndex is created from an (empty) FactIndex
+# of the same kind, whose path, key and operators it copies, and it inherits the
+# read-only FactIndex functions used by the query engine. The keys of an
+# unordered (hash) index are kept in insertion order, as for HashFactIndex. The functions that
+# would modify a FactIndex or FactMap raise a TypeError, so the query end-points
+# that modify the facts (delete, replace, modify) fail on a FrozenFactBase.
+# ------------------------------------------------------------------------------
+
+
+def _immutable(self, *args, **kwargs):
+    raise TypeError("A {} cannot be modified".format(type(self).__name__))
+
+
+class PersistentFactIndex(FactIndex):
+    def __init__(self, template):
+        self._path = template.path
+        self._attrgetter = template._attrgetter
+        self._predicate = template._predicate
+        self.operators = template.operators
+        self.ordered = template.ordered
+        self._key2values = PersistentMap()
+        self._keylist_type = PersistentSortedSet if template.ordered else PersistentOrderedSet
+        self._keylist = self._keylist_type()
+
+    def _make(self, key2values, keylist):
+        nfi = copy.copy(self)
+        nfi._key2values = key2values
+        nfi._keylist = keylist
+        return nfi
+
+    add = add_facts = merge = remove = remove_facts = clear = _immutable
 
     def copy(self):
-        nfm = FactMap(self.predicate, self._path2factindex.keys())
-        nfm.add_facts(self.factset)
+        return self
+
+    @property
+    def keys(self):
+        return self._keylist
+
+    def with_facts(self, facts):
+        predicate = self._predicate
+        attrgetter = self._attrgetter
+        groups = {}
+        for fact in facts:
+            if not isinstance(fact, predicate):
+                raise TypeError("{} is not a {}".format(fact, predicate))
+            groups.setdefault(attrgetter(fact), []).append(fact)
+        if not groups:
+            return self
+        key2values = self._key2values
+        keylist = self._keylist
+        if not key2values:
+            key2values = PersistentMap(
+                [(key, PersistentOrderedSet(group)) for key, group in groups.items()]
+            )
+            return self._make(key2values, self._keylist_type(groups.keys()))
+        for key, group in groups.items():
+            values = key2values.get(key)
+            if values is None:
+                key2values = key2values.set(key, PersistentOrderedSet(group))
+                keylist = keylist.add(key)
+            else:
+                key2values = key2values.set(key, values.update(group))
+        return self._make(key2values, keylist)
+
+    def without_facts(self, facts):
+        attrgetter = self._attrgetter
+        key2values = self._key2values
+        keylist = self._keylist
+        for fact in facts:
+            key = attrgetter(fact)
+            values = key2values.get(key)
+            if values is None:
+                continue
+            values = values.discard(fact)
+            if values:
+                key2values = key2values.set(key, values)
+                continue
+            key2values = key2values.remove(key)
+            keylist = keylist.remove(key)
+        return self._make(key2values, keylist)
+
+
+class FrozenFactMap(object):
+    _cache_size = FactMap._cache_size
+
+    def __init__(self, ptype: Type[Predicate], indexes: Iterable[Any] = []) -> None:
+        template = FactMap(ptype, indexes)
+        self._ptype = ptype
+        self._indexes = template.indexes
+        self._factset = PersistentOrderedSet()
+        self._path2factindex = collections.OrderedDict(
+            [(key, PersistentFactIndex(fi)) for key, fi in template.path2factindex.items()]
+        )
+        self._cache = collections.OrderedDict()
+
+    def _make(self, factset, path2factindex):
+        nfm = copy.copy(self)
+        nfm._factset = factset
+        nfm._path2factindex = path2factindex
+        nfm._cache = collections.OrderedDict()
         return nfm
 
+    add_facts = add_fact = remove = remove_facts = discard = pop = clear = _immutable
+    add_index = remove_index = add_observer = _immutable
+    update = intersection_update = difference_update = symmetric_difference_update = _immutable
+
+    def with_facts(self, facts):
+        factset = self._factset
+        facts = [f for f in dict.fromkeys(facts) if f not in factset]
+        if not facts:
+            return self
+        factset = factset.update(facts) if factset else PersistentOrderedSet(facts)
+        path2factindex = collections.OrderedDict(
+            [(key, fi.with_facts(facts)) for key, fi in self._path2factindex.items()]
+        )
+        return self._make(factset, path2factindex)
+
+    def without_facts(self, facts):
+        factset = self._factset
+        facts = [f for f in dict.fromkeys(facts) if f in factset]
+        if not facts:
+            return self
+        for f in facts:
+            factset = factset.remove(f)
+        path2factindex = collections.OrderedDict(
+            [(key, fi.without_facts(facts)) for key, fi in self._path2factindex.items()]
+        )
+        return self._make(factset, path2factindex)
+
+    # The facts never change so the cached data is valid for the lifetime of
+    # the FrozenFactMap
+    def cached(self, key, make):
+        cache = self._cache
+        value = cache.get(key, None)
+        if value is not None:
+            cache.move_to_end(key)
+            return value
+        value = make()
+        cache[key] = value
+        if len(cache) > self._cache_size:
+            cache.popitem(last=False)
+        return value
+
+    @property
+    def predicate(self) -> Type[Predicate]:
+        return self._ptype
+
+    @property
+    def factset(self):
+        return self._factset
+
+    @property
+    def path2factindex(self):
+        return self._path2factindex
+
+    @property
+    def indexes(self):
+        return self._indexes
+
+    def __len__(self):
+        return len(self._factset)
+
+    def __bool__(self):
+        return bool(self._factset)
+
+    def copy(self):
+        return self
+
 
 # ------------------------------------------------------------------------------
 # main
@@ -7,11 +7,13 @@ from __future__ import annotations
 import abc
 import collections
 import enum
+import heapq
 import inspect
 import io
 import itertools
 import operator
 import sys
+from collections.abc import Mapping
 from typing import Any, Callable, Generator, List, NamedTuple, Set, TypeVar, cast
 
 from ..util import OrderedSet
@@ -30,7 +32,7 @@ from .core import (
     path,
     trueall,
 )
-from .factcontainers import FactIndex
+from .factcontainers import CompositeFactIndex, FactIndex, HashFactIndex, hashable_index
 
 __all__ = [
     "Query",
@@ -43,9 +45,16 @@ __all__ = [
     "ph3_",
     "ph4_",
     "func",
+    "Aggregate",
+    "count_",
+    "sum_",
+    "min_",
+    "max_",
     "fixed_join_order",
     "basic_join_order",
     "oppref_join_order",
+    "cost_join_order",
+    "AutoIndexer",
 ]
 
 # ------------------------------------------------------------------------------
@@ -237,6 +246,96 @@ def func(paths: List[Any], functor: Callable[..., _T]) -> _T:
     # return FunctionComparator.from_specification(paths, func)
 
 
+# ------------------------------------------------------------------------------
+# Aggregate specifies an aggregation over the results of a query as a fold; a
+# step function that combines an accumulated value with the value of the path
+# for each result. The API functions count_(), sum_(), min_(), and max_() build
+# the aggregates that can be passed to Query.aggregate().
+# ------------------------------------------------------------------------------
+
+_EMPTY = object()
+
+
+class Aggregate(object):
+    """An aggregation over the results of a query.
+
+    Aggregates are created with the :func:`count_`, :func:`sum_`, :func:`min_`,
+    and :func:`max_` functions and are passed to :meth:`Query.aggregate`.
+
+    """
+
+    def __init__(self, name, pth, initial, step, reduce=None):
+        self._name = name
+        self._path = path(pth) if pth is not None else None
+        self._initial = initial
+        self._step = step
+        self._reduce = reduce
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def initial(self):
+        return self._initial
+
+    @property
+    def step(self):
+        return self._step
+
+    @property
+    def reduce(self):
+        """An optional function that folds an iterable of values in one call"""
+        return self._reduce
+
+    def result(self, value):
+        if value is _EMPTY:
+            raise ValueError("Query has no matching elements")
+        return value
+
+    def __str__(self):
+        return "{}({})".format(self._name, "" if self._path is None else self._path)
+
+    def __repr__(self):
+        return self.__str__()
+
+
+def count_() -> Aggregate:
+    """Return an aggregate that counts the query results"""
+    return Aggregate("count", None, 0, lambda acc, _: acc + 1, lambda vs: sum(1 for _ in vs))
+
+
+def sum_(pth: Any) -> Aggregate:
+    """Return an aggregate that sums the value of a path over the query results"""
+    return Aggregate("sum", pth, 0, operator.add, sum)
+
+
+def min_(pth: Any) -> Aggregate:
+    """Return an aggregate for the minimum value of a path over the query results"""
+    return Aggregate(
+        "min",
+        pth,
+        _EMPTY,
+        lambda acc, v: v if acc is _EMPTY or v < acc else acc,
+        lambda vs: min(vs, default=_EMPTY),
+    )
+
+
+def max_(pth: Any) -> Aggregate:
+    """Return an aggregate for the maximum value of a path over the query results"""
+    return Aggregate(
+        "max",
+        pth,
+        _EMPTY,
+        lambda acc, v: v if acc is _EMPTY or acc < v else acc,
+        lambda vs: max(vs, default=_EMPTY),
+    )
+
+
 # ------------------------------------------------------------------------------
 # QCondition objects are generated by the Clorm API. But we want to treat the
 # different components differently depending on whether they are a comparison
@@ -286,6 +385,13 @@ def _hashables(seq):
 # membership comparisons. So any update of the reference sequence after the
 # query is declared but before the query is executed will affect the execution
 # of the query. It also also for the sequence to be specified as a sub-query.
+#
+# A sub-query is evaluated once for each execution of the outer query (the memo
+# dictionary is shared when fixing all the comparators of a query, which matters
+# when normalising the where clause has duplicated the membership condition).
+# The resulting set is the build side of a hash semi-join (or anti-join) that is
+# probed for each candidate fact, or is used to probe an index of the outer
+# query's path for the matching keys.
 # ------------------------------------------------------------------------------
 
 
@@ -293,13 +399,18 @@ class MembershipSeq(object):
     def __init__(self, src):
         self._src = src
 
-    def fixed(self):
+    def fixed(self, memo=None):
         if isinstance(self._src, Placeholder):
             raise ValueError(("Cannot fix unground sequence specification : " "{}").format(self))
-        if isinstance(self._src, Query):
-            return frozenset(self._src.all())
-        else:
+        if not isinstance(self._src, Query):
             return frozenset(self._src)
+        if memo is None:
+            return self._src._membership_set()
+        values = memo.get(id(self._src), None)
+        if values is None:
+            values = self._src._membership_set()
+            memo[id(self._src)] = values
+        return values
 
     def ground(self, *args, **kwargs):
         def get(arg):
@@ -331,7 +442,7 @@ class MembershipSeq(object):
 
         if isinstance(self._src, Query):
             where = self._src.qspec.where
-            if where is None:
+            if where is None or not where.placeholders:
                 return self
             return MembershipSeq(self._src.bind(*args, **kwargs))
 
@@ -462,11 +573,24 @@ def join_comparison_op(qcond):
 # information form StandardComparator instances. This is then used to give keyed
 # lookups on a FactIndex. If the function returns None then the comparator
 # cannot be used to key on the given list of indexes.
+#
+# The indexes can either be a collection of paths, in which case each index is
+# assumed to support every operator, or a mapping from hashable paths to
+# FactIndex objects, in which case the FactIndex is asked if it supports the
+# operator (a HashFactIndex only supports equality and membership lookups).
 # ------------------------------------------------------------------------------
 
 
+def index_supports(indexes, hpath, op):
+    if isinstance(indexes, Mapping):
+        fi = indexes.get(hpath, None)
+        return fi is not None and fi.supports(op)
+    if isinstance(hpath, tuple):
+        return op == operator.eq and hpath in set([hashable_index(p) for p in indexes])
+    return hpath in set([hashable_index(p) for p in indexes])
+
+
 def comparison_op_keyable(sc, indexes):
-    indexes = set([hashable_path(p) for p in indexes])
     swapop = {
         operator.eq: operator.eq,
         operator.ne: operator.ne,
@@ -486,17 +610,18 @@ def comparison_op_keyable(sc, indexes):
 
     a0 = hp(sc.args[0])
     a1 = hp(sc.args[1])
-    if isinstance(a0, PredicatePath.Hashable) and a0 in indexes:
+    if isinstance(a0, PredicatePath.Hashable) and index_supports(indexes, a0, sc.operator):
         return (a0, sc.operator, sc.args[1])
-    if isinstance(a1, PredicatePath.Hashable) and a1 in indexes:
-        return (a1, swapop[sc.operator], sc.args[0])
+    if isinstance(a1, PredicatePath.Hashable):
+        op = swapop[sc.operator]
+        if index_supports(indexes, a1, op):
+            return (a1, op, sc.args[0])
     return None
 
 
 def membership_op_keyable(sc, indexes):
-    indexes = set([hashable_path(p) for p in indexes])
     hpa1 = hashable_path(sc.args[1])
-    if hpa1 not in indexes:
+    if not index_supports(indexes, hpa1, sc.operator):
         return None
     return (hpa1, sc.operator, sc.args[0])
 
@@ -736,7 +861,7 @@ class StandardComparator(Comparator):
     # Implement ABC functions
     # -------------------------------------------------------------------------
 
-    def fixed(self):
+    def fixed(self, memo=None):
         gself = self.ground()
         if gself._operator not in [operator.contains, notcontains]:
             return gself
@@ -748,7 +873,7 @@ class StandardComparator(Comparator):
                     gself._args[0]
                 )
             )
-        return StandardComparator(self._operator, [gself._args[0].fixed(), gself._args[1]])
+        return StandardComparator(self._operator, [gself._args[0].fixed(memo), gself._args[1]])
 
     def ground(self, *args, **kwargs):
         def get(arg):
@@ -1051,7 +1176,7 @@ class FunctionComparator(Comparator):
             self._func, newpathsig, self._negative, assignment=self._assignment
         )
 
-    def fixed(self):
+    def fixed(self, memo=None):
         return self.ground()
 
     def ground(self, *args, **kwargs):
@@ -1133,6 +1258,130 @@ class FunctionComparator(Comparator):
         return self.__str__()
 
 
+# ------------------------------------------------------------------------------
+# CompositeComparator is a conjunction of equality StandardComparators that is
+# matched against a composite (multi-field) index. It is not generated from the
+# user query API but is built by the query planner, both for a prejoin key (eg.
+# "F.a == 1 & F.b == 2") and for a multi-column join key (eg. "F.a == G.a & F.b
+# == G.b"). The keyable() function returns the tuple of index paths, the
+# equality operator, and the tuple of values to search for.
+# ------------------------------------------------------------------------------
+
+
+class CompositeComparator(Comparator):
+    def __init__(self, comparators):
+        if len(comparators) < 2:
+            raise ValueError(
+                (
+                    "Internal bug: a CompositeComparator requires at least two comparators: {}"
+                ).format(comparators)
+            )
+        for sc in comparators:
+            if not isinstance(sc, StandardComparator) or sc.operator != operator.eq:
+                raise ValueError(
+                    ("Internal bug: '{}' is not an equality StandardComparator").format(sc)
+                )
+        self._comparators = tuple(comparators)
+
+        tmppaths = set([])
+        tmproots = set([])
+        for sc in self._comparators:
+            tmppaths.update([hashable_path(p) for p in sc.paths])
+            tmproots.update([hashable_path(r) for r in sc.roots])
+        self._paths = tuple([path(hp) for hp in tmppaths])
+        self._roots = tuple([path(hp) for hp in tmproots])
+
+    def _rebuild(self, comparators):
+        if tuple(comparators) == self._comparators:
+            return self
+        return CompositeComparator(comparators)
+
+    # -------------------------------------------------------------------------
+    # Implement ABC functions
+    # -------------------------------------------------------------------------
+
+    def fixed(self, memo=None):
+        return self._rebuild([sc.fixed(memo) for sc in self._comparators])
+
+    def ground(self, *args, **kwargs):
+        return self._rebuild([sc.ground(*args, **kwargs) for sc in self._comparators])
+
+    def negate(self):
+        raise ValueError("Internal bug: cannot negate a CompositeComparator '{}'".format(self))
+
+    def dealias(self):
+        return self._rebuild([sc.dealias() for sc in self._comparators])
+
+    def swap(self):
+        return self._rebuild([sc.swap() for sc in self._comparators])
+
+    # Note: the planner builds the comparators so that the first argument of
+    # each is the (indexed) path.
+    def keyable(self, indexes):
+        kpath = tuple([hashable_path(sc.args[0]) for sc in self._comparators])
+        if not index_supports(indexes, kpath, operator.eq):
+            return None
+        return (kpath, operator.eq, tuple([sc.args[1] for sc in self._comparators]))
+
+    @property
+    def comparators(self):
+        return self._comparators
+
+    @property
+    def paths(self):
+        return self._paths
+
+    @property
+    def placeholders(self):
+        return set(itertools.chain.from_iterable([sc.placeholders for sc in self._comparators]))
+
+    @property
+    def preference(self):
+        return StandardComparator.Preference.HIGH
+
+    @property
+    def form(self):
+        return QCondition.Form.INFIX
+
+    @property
+    def operator(self):
+        return operator.eq
+
+    @property
+    def roots(self):
+        return self._roots
+
+    @property
+    def executable(self):
+        for sc in self._comparators:
+            if not sc.executable:
+                return False
+        return True
+
+    def make_callable(self, root_signature):
+        return compile_clauses([[self]], root_signature)
+
+    def __eq__(self, other):
+        if not isinstance(other, CompositeComparator):
+            return NotImplemented
+        return self._comparators == other._comparators
+
+    def __hash__(self):
+        return hash(self._comparators)
+
+    def __len__(self):
+        return len(self._comparators)
+
+    def __iter__(self):
+        return iter(self._comparators)
+
+    def __str__(self):
+        return " & ".join([str(sc) for sc in self._comparators])
+
+    def __repr__(self):
+        return self.__str__()
+
+
 # ------------------------------------------------------------------------------
 # Comparators (Standard and Function) have a comparison function and input of
 # some form; eg "F.anum == 3" has operator.eq_ and input (F.anum,3) where F.anum
@@ -1255,6 +1504,76 @@ class ComparisonCallable(object):
         return self._operator(*args)
 
 
+# ------------------------------------------------------------------------------
+# Compile a set of clauses (a conjunction of disjunctions of comparators) into a
+# single Python function that takes a tuple of facts (as determined by the root
+# signature) and returns whether the facts satisfy the clauses. Similarly to the
+# Predicate sub-class functions, the code is generated as a string and compiled
+# with exec(). The generated function has no nested function calls for the
+# standard comparison operators and reads the field values of each fact
+# directly. Comparators that can't be compiled (such as FunctionComparator) are
+# called through their normal callable.
+# ------------------------------------------------------------------------------
+
+_COMPILED_OPERATORS = {
+    operator.eq: "({0} == {1})",
+    operator.ne: "({0} != {1})",
+    operator.lt: "({0} < {1})",
+    operator.le: "({0} <= {1})",
+    operator.gt: "({0} > {1})",
+    operator.ge: "({0} >= {1})",
+    operator.contains: "({1} in {0})",
+    notcontains: "({1} not in {0})",
+}
+
+
+def compile_clauses(clauses, root_signature):
+    rp2idx = {hashable_path(rp): idx for idx, rp in enumerate(root_signature)}
+    gdict = {}
+    used = set()
+
+    def constant(value):
+        name = "_c{}".format(len(gdict))
+        gdict[name] = value
+        return name
+
+    def arg_code(arg):
+        p = path(arg, exception=False)
+        if p is None:
+            return constant(arg)
+        idx = rp2idx.get(hashable_path(p.meta.root), None)
+        if idx is None:
+            return None
+        used.add(idx)
+        return p.meta.access_code("_f{}".format(idx))
+
+    def comparator_code(comp):
+        if isinstance(comp, CompositeComparator):
+            tmp = [comparator_code(sc) for sc in comp.comparators]
+            return "({})".format(" and ".join(tmp))
+        if isinstance(comp, StandardComparator) and not any(
+            isinstance(a, Placeholder) for a in comp.args
+        ):
+            args = [arg_code(a) for a in comp.args]
+            if None not in args:
+                template = _COMPILED_OPERATORS.get(comp.operator, None)
+                if template:
+                    return template.format(*args)
+                return "{}({})".format(constant(comp.operator), ", ".join(args))
+        return "{}(facts)".format(constant(comp.make_callable(root_signature)))
+
+    tmp = []
+    for clause in clauses:
+        tmp.append("({})".format(" or ".join([comparator_code(c) for c in clause])))
+    body = " and ".join(tmp) if tmp else "True"
+    assignments = "".join(["    _f{0} = facts[{0}]\n".format(idx) for idx in sorted(used)])
+    code = "def compiled_clauses(facts):\n{}    return {}\n".format(assignments, body)
+
+    ldict = {}
+    exec(code, gdict, ldict)
+    return ldict["compiled_clauses"]
+
+
 # ------------------------------------------------------------------------------
 # 'Where' query clauses handling.
 #
@@ -1547,16 +1866,7 @@ class Clause(object):
         self._roots = tuple([path(hp) for hp in tmproots])
 
     def make_callable(self, root_signature):
-        callables = [c.make_callable(root_signature) for c in self._comparators]
-        callables = tuple(callables)
-
-        def comparison_callable(facts):
-            for c in callables:
-                if c(facts):
-                    return True
-            return False
-
-        return comparison_callable
+        return compile_clauses([self._comparators], root_signature)
 
     @property
     def paths(self):
@@ -1583,8 +1893,8 @@ class Clause(object):
             return self
         return Clause(newcomps)
 
-    def fixed(self):
-        newcomps = tuple([c.fixed() for c in self._comparators])
+    def fixed(self, memo=None):
+        newcomps = tuple([c.fixed(memo) for c in self._comparators])
         if self._comparators == newcomps:
             return self
         return Clause(newcomps)
@@ -1676,8 +1986,9 @@ class ClauseBlock(object):
                 return False
         return True
 
-    def fixed(self):
-        newclauses = tuple([cl.fixed() for cl in self._clauses])
+    def fixed(self, memo=None):
+        memo = {} if memo is None else memo
+        newclauses = tuple([cl.fixed(memo) for cl in self._clauses])
         if self._clauses == newclauses:
             return self
         return ClauseBlock(newclauses)
@@ -1695,16 +2006,7 @@ class ClauseBlock(object):
         return ClauseBlock(newclauses)
 
     def make_callable(self, root_signature):
-        callables = [c.make_callable(root_signature) for c in self._clauses]
-        callables = tuple(callables)
-
-        def comparison_callable(facts):
-            for c in callables:
-                if not c(facts):
-                    return False
-            return True
-
-        return comparison_callable
+        return compile_clauses(self._clauses, root_signature)
 
     def __add__(self, other):
         if not isinstance(other, self.__class__):
@@ -2149,7 +2451,8 @@ def process_ordered(roots):
 # Given a set of indexed paths and a set of clauses that refer to a single root
 # try to extract a preferred clause that can be used for indexing.
 #
-# - indexed_paths - a list of paths for which there is a factindex
+# - indexed_paths - a list of paths for which there is a factindex (or a
+#   mapping from hashable paths to the factindex)
 # - clauses - a clause block that can only refer to a single root
 # ------------------------------------------------------------------------------
 def make_prejoin_pair(indexed_paths, clauseblock):
@@ -2160,7 +2463,9 @@ def make_prejoin_pair(indexed_paths, clauseblock):
     def is_candidate_sc(indexes, sc):
         if len(sc.paths) != 1:
             return False
-        return hashable_path(sc.paths[0].meta.dealiased) in indexes
+        if hashable_path(sc.paths[0].meta.dealiased) not in indexes:
+            return False
+        return sc.dealias().keyable(indexed_paths) is not None
 
     def is_candidate(indexes, cl):
         for c in cl:
@@ -2173,8 +2478,17 @@ def make_prejoin_pair(indexed_paths, clauseblock):
     if not clauseblock:
         return (None, None)
 
+    # A conjunction of equality clauses that matches a composite index is
+    # preferred over a clause that matches a single index
+    composite = make_composite_prejoin_pair(indexed_paths, clauseblock)
+    if composite:
+        return composite
+
     tmp = set([hashable_path(p.meta.dealiased) for p in clauseblock.paths])
-    indexes = set(filter(lambda x: x in tmp, [hashable_path(p) for p in indexed_paths]))
+    hindexes = [hashable_index(p) for p in indexed_paths]
+    indexes = set(
+        filter(lambda x: x in tmp, [hi for hi in hindexes if not isinstance(hi, tuple)])
+    )
 
     # Search for a candidate to use with a fact index
     keyclause = None
@@ -2195,17 +2509,97 @@ def make_prejoin_pair(indexed_paths, clauseblock):
     return (candidates[0], cb)
 
 
+# ------------------------------------------------------------------------------
+# make_composite_prejoin_pair(indexed_paths, clauseblock)
+#
+# Try to match a composite index against a set of single comparator equality
+# clauses (eg. "F.a == 1" and "F.b == ph1_"). If there is a match then returns
+# a pair consisting of a clause containing a CompositeComparator and the
+# remaining clauses. If more than one composite index matches then the one with
+# the most fields is chosen. Returns None if there is no match.
+# ------------------------------------------------------------------------------
+def make_composite_prejoin_pair(indexed_paths, clauseblock):
+    hpath2cl = {}
+    for cl in clauseblock:
+        if len(cl) != 1:
+            continue
+        sc = cl[0]
+        if not isinstance(sc, StandardComparator) or sc.operator != operator.eq:
+            continue
+        if len(sc.paths) != 1:
+            continue
+        if not isinstance(sc.args[0], PredicatePath):
+            sc = sc.swap()
+        if isinstance(sc.args[1], PredicatePath):
+            continue
+        hpath2cl.setdefault(hashable_path(sc.args[0].meta.dealiased), (cl, sc))
+
+    best = None
+    for hidx in [hashable_index(p) for p in indexed_paths]:
+        if not isinstance(hidx, tuple) or not all([hp in hpath2cl for hp in hidx]):
+            continue
+        if not index_supports(indexed_paths, hidx, operator.eq):
+            continue
+        if best is None or len(hidx) > len(best):
+            best = hidx
+    if best is None:
+        return None
+
+    used = [hpath2cl[hp][0] for hp in best]
+    keyclause = Clause([CompositeComparator([hpath2cl[hp][1] for hp in best])])
+    rest = [cl for cl in clauseblock if not any([cl is u for u in used])]
+    return (keyclause, ClauseBlock(rest) if rest else None)
+
+
+# ------------------------------------------------------------------------------
+# make_composite_join(root, joins, indexed_paths)
+#
+# Try to match a composite index of the root against the equality joins that
+# reference the root. If there is a match then returns a pair consisting of a
+# CompositeComparator, with each join aligned so that the root path is the first
+# argument, and the list of remaining joins. Otherwise returns None.
+# ------------------------------------------------------------------------------
+def make_composite_join(root, joins, indexed_paths):
+    hpath2sc = {}
+    for sc in joins:
+        if not isinstance(sc, StandardComparator) or sc.operator != operator.eq:
+            continue
+        try:
+            asc = _align_sc_path(root, sc)
+        except ValueError:
+            continue
+        hpath2sc.setdefault(hashable_path(asc.args[0].meta.dealiased), (sc, asc))
+
+    best = None
+    for hidx in [hashable_index(p) for p in indexed_paths]:
+        if not isinstance(hidx, tuple) or not all([hp in hpath2sc for hp in hidx]):
+            continue
+        if not index_supports(indexed_paths, hidx, operator.eq):
+            continue
+        if best is None or len(hidx) > len(best):
+            best = hidx
+    if best is None:
+        return None
+    used = [hpath2sc[hp][0] for hp in best]
+    rest = [sc for sc in joins if not any([sc is u for u in used])]
+    return (CompositeComparator([hpath2sc[hp][1] for hp in best]), rest)
+
+
 # ------------------------------------------------------------------------------
 # make_join_pair(joins, clauseblock)
 # - a list of join StandardComparators
 # - an existing clauseblock (or None)
 # - a list of orderby statements
 #
+# - the root being joined and its indexes (optional)
+#
 # Takes a list of joins and picks the best one for indexing (based on their
-# operator preference and the orderby statements). Returns a pair that is the
-# chosen join and the rest of the joins added to the input clauseblock.
+# operator preference and the orderby statements). If the root is given and a
+# composite index matches a set of equality joins then these joins are combined
+# and chosen. Returns a pair that is the chosen join and the rest of the joins
+# added to the input clauseblock.
 # ------------------------------------------------------------------------------
-def make_join_pair(joins, clauseblock, orderbys=[]):
+def make_join_pair(joins, clauseblock, orderbys=[], root=None, indexed_paths=[]):
     opaths = set([hashable_path(ob.path) for ob in orderbys])
 
     def num(sc):
@@ -2213,9 +2607,13 @@ def make_join_pair(joins, clauseblock, orderbys=[]):
 
     if not joins:
         return (None, clauseblock)
-    joins = sorted(joins, key=lambda x: (x.preference, num(x)), reverse=True)
-    joinsc = joins[0]
-    remainder = joins[1:]
+    composite = make_composite_join(root, joins, indexed_paths) if root is not None else None
+    if composite:
+        joinsc, remainder = composite
+    else:
+        joins = sorted(joins, key=lambda x: (x.preference, num(x)), reverse=True)
+        joinsc = joins[0]
+        remainder = joins[1:]
     if remainder:
         remainder = ClauseBlock([Clause([sc]) for sc in remainder])
         if clauseblock:
@@ -2244,12 +2642,21 @@ def _check_roots(allowable_roots, formula):
     return hroots.issubset(allowable_hroots)
 
 
+# The predicate of a single or composite index
+def _index_predicate(idx):
+    if isinstance(idx, tuple):
+        return path(idx[0]).meta.predicate
+    return path(idx).meta.predicate
+
+
 # Align the arguments in a standard comparator so that the first argument is a
 # path whose root is the given root
 def _align_sc_path(root, sc):
     hroot = hashable_path(root)
     if not sc:
         return None
+    if isinstance(sc, CompositeComparator):
+        return CompositeComparator([_align_sc_path(root, c) for c in sc])
     if isinstance(sc.args[0], PredicatePath) and hashable_path(sc.args[0].meta.root) == hroot:
         return sc
     sc = sc.swap()
@@ -2273,6 +2680,49 @@ def _extract_placeholders(elements):
     return output
 
 
+# ------------------------------------------------------------------------------
+# The operator used to join a root to the tuples of the previous roots:
+#
+# - "nested loop": there is no join key so every input tuple is paired with
+#   every fact.
+# - "index": the facts are found by a lookup for each input tuple. Used when
+#   there is an existing index that supports the join key operator (and no
+#   prejoin filtering), for the join key operators that are not suitable for a
+#   hash or sort-merge join, and when there is a prejoin ordering.
+# - "hash": an equality join key. A hash table is built on the smaller side of
+#   the join (or reused from the cache of temporary indexes) and probed by the
+#   other side.
+# - "sort-merge": a range (<, <=, >, >=) join key. The input tuples are sorted
+#   by their join value and merged with the facts in key order.
+#
+# If the input tuples are already sorted (by an order_by of a previous root)
+# then the join must preserve the input order; so a sort-merge join is not used
+# and a hash join always builds the hash table on the facts.
+# ------------------------------------------------------------------------------
+
+JOIN_METHODS = ("nested loop", "index", "hash", "sort-merge")
+_MERGE_OPERATORS = (operator.lt, operator.le, operator.gt, operator.ge)
+
+
+def _join_method(indexes, joinsc, prejoincl, prejoincb, prejoinobb, ordered_input=False):
+    if not joinsc:
+        return "nested loop"
+    if prejoinobb:
+        return "index"
+    op = joinsc.operator
+    if isinstance(joinsc, CompositeComparator):
+        kpath = tuple([hashable_path(sc.args[0].meta.dealiased) for sc in joinsc])
+    else:
+        kpath = hashable_path(joinsc.args[0].meta.dealiased)
+    if not prejoincl and not prejoincb and index_supports(indexes, kpath, op):
+        return "index"
+    if op == operator.eq:
+        return "hash"
+    if op in _MERGE_OPERATORS and not ordered_input:
+        return "sort-merge"
+    return "index"
+
+
 # ------------------------------------------------------------------------------
 # JoinQueryPlan class is a single join within a broader QueryPlan
 # ------------------------------------------------------------------------------
@@ -2289,6 +2739,7 @@ class JoinQueryPlan(object):
     - a join standard comparator (or None),
     - a postjoin clauseblock (or None)
     - a postjoin orderbyblock (or None)
+    - the join method (or None to choose it based on the indexes)
     """
 
     def __init__(
@@ -2302,14 +2753,20 @@ class JoinQueryPlan(object):
         joinsc,
         postjoincb,
         postjoinobb,
+        join_method=None,
     ):
         if not indexes:
             indexes = []
         self._insig = tuple([path(r) for r in input_signature])
         self._root = path(root)
         self._predicate = self._root.meta.predicate
-        self._indexes = tuple([p for p in indexes if path(p).meta.predicate == self._predicate])
+        self._indexes = tuple([p for p in indexes if _index_predicate(p) == self._predicate])
         self._joinsc = _align_sc_path(self._root, joinsc)
+        if join_method is None:
+            join_method = _join_method(indexes, self._joinsc, prejoincl, prejoincb, prejoinobb)
+        elif join_method not in JOIN_METHODS:
+            raise ValueError("Internal bug: unknown join method '{}'".format(join_method))
+        self._join_method = join_method
         self._postjoincb = postjoincb
         self._postjoinobb = postjoinobb
         self._prejoincl = prejoincl
@@ -2382,7 +2839,14 @@ class JoinQueryPlan(object):
     # -------------------------------------------------------------------------
     @classmethod
     def from_specification(
-        cls, indexes, input_signature, root, joins=[], clauses=[], orderbys=[]
+        cls,
+        indexes,
+        input_signature,
+        root,
+        joins=[],
+        clauses=[],
+        orderbys=[],
+        ordered_input=False,
     ):
         def _paths(inputs):
             return [path(p) for p in inputs]
@@ -2422,6 +2886,10 @@ class JoinQueryPlan(object):
         #            hashable_path(root): postjoinobb = OrderByBlock(orderbys) else:
         #            prejoinobb = orderbys.dealias()
 
+        joinsc = _align_sc_path(root, joinsc)
+        join_method = _join_method(
+            indexes, joinsc, prejoincl, prejoincb, prejoinobb, ordered_input
+        )
         return cls(
             input_signature,
             root,
@@ -2432,6 +2900,7 @@ class JoinQueryPlan(object):
             joinsc,
             postjoincb,
             postjoinobb,
+            join_method,
         )
 
     # -------------------------------------------------------------------------
@@ -2457,6 +2926,10 @@ class JoinQueryPlan(object):
     def join_key(self):
         return self._joinsc
 
+    @property
+    def join_method(self):
+        return self._join_method
+
     @property
     def prejoin_clauses(self):
         return self._prejoincb
@@ -2508,6 +2981,32 @@ class JoinQueryPlan(object):
             self._joinsc,
             gpostjoincb,
             self._postjoinobb,
+            self._join_method,
+        )
+
+    def fixed(self, memo=None):
+        memo = {} if memo is None else memo
+        fprejoincl = self._prejoincl.fixed(memo) if self._prejoincl else None
+        fprejoincb = self._prejoincb.fixed(memo) if self._prejoincb else None
+        fpostjoincb = self._postjoincb.fixed(memo) if self._postjoincb else None
+
+        if (
+            fprejoincl is self._prejoincl
+            and fprejoincb is self._prejoincb
+            and fpostjoincb is self._postjoincb
+        ):
+            return self
+        return JoinQueryPlan(
+            self._insig,
+            self._root,
+            self._indexes,
+            fprejoincl,
+            fprejoincb,
+            self._prejoinobb,
+            self._joinsc,
+            fpostjoincb,
+            self._postjoinobb,
+            self._join_method,
         )
 
     def print(self, file=sys.stdout, pre=""):
@@ -2519,6 +3018,8 @@ class JoinQueryPlan(object):
         print("{}\tPrejoin filter clauses: {}".format(pre, self._prejoincb), file=file)
         print("{}\tPrejoin order_by: {}".format(pre, self._prejoinobb), file=file)
         print("{}\tJoin key: {}".format(pre, self._joinsc), file=file)
+        if self._insig:
+            print("{}\tJoin method: {}".format(pre, self._join_method), file=file)
         print("{}\tPost join clauses: {}".format(pre, self._postjoincb), file=file)
         print("{}\tPost join order_by: {}".format(pre, self._postjoinobb), file=file)
 
@@ -2559,7 +3060,7 @@ class JoinQueryPlan(object):
 
 
 class QueryPlan(object):
-    def __init__(self, subplans):
+    def __init__(self, subplans, estimates=None):
         if not subplans:
             raise ValueError("An empty QueryPlan is not valid")
         sig = []
@@ -2574,6 +3075,12 @@ class QueryPlan(object):
                 )
             sig.append(hashable_path(jqp.root))
         self._jqps = tuple(subplans)
+        self._estimates = tuple(estimates) if estimates else None
+
+    # The estimated (output rows, cost) for each sub-plan (or None)
+    @property
+    def estimates(self):
+        return self._estimates
 
     @property
     def placeholders(self):
@@ -2595,7 +3102,14 @@ class QueryPlan(object):
         newqpjs = [qpj.ground(*args, **kwargs) for qpj in self._jqps]
         if tuple(newqpjs) == self._jqps:
             return self
-        return QueryPlan(newqpjs)
+        return QueryPlan(newqpjs, self._estimates)
+
+    def fixed(self):
+        memo = {}
+        newqpjs = [qpj.fixed(memo) for qpj in self._jqps]
+        if all(a is b for a, b in zip(newqpjs, self._jqps)):
+            return self
+        return QueryPlan(newqpjs, self._estimates)
 
     def __eq__(self, other):
         if not isinstance(other, self.__class__):
@@ -2613,8 +3127,16 @@ class QueryPlan(object):
 
     def print(self, file=sys.stdout, pre=""):
         print("------------------------------------------------------", file=file)
-        for qpj in self._jqps:
+        for idx, qpj in enumerate(self._jqps):
             qpj.print(file, pre)
+            if self._estimates:
+                rows, cost = self._estimates[idx]
+                print(
+                    "{}\tEstimated rows: {:.1f}, cost: {:.1f}".format(pre, rows, cost), file=file
+                )
+        if self._estimates:
+            total = sum(cost for _, cost in self._estimates)
+            print("{}Estimated total cost: {:.1f}".format(pre, total), file=file)
         print("------------------------------------------------------", file=file)
 
     def __str__(self):
@@ -2785,12 +3307,17 @@ class QuerySpec(object):
         "order_by",
         "ordered",
         "group_by",
+        "hash_group",
         "tuple",
         "distinct",
         "bind",
         "select",
         "heuristic",
         "joh",
+        "autoindex",
+        "cardinality",
+        "limit",
+        "offset",
     ]
 
     def __init__(self, **kwargs):
@@ -2844,7 +3371,8 @@ class QuerySpec(object):
     def getp(self, name, default=None):
         return self._params.get(name, default)
 
-    def bindp(self, *args, **kwargs):
+    # Check that the arguments match placeholders in the where clause
+    def check_bindp(self, *args, **kwargs):
         where = self.where
         if where is None:
             raise ValueError("'where' must be specified before binding placeholders")
@@ -2875,7 +3403,21 @@ class QuerySpec(object):
                         "'{}'"
                     ).format(v, k, where)
                 )
-        nwhere = where.ground(*args, **kwargs)
+
+    # Return a new QuerySpec with the number of facts of each predicate (used by
+    # the cost based join order heuristic and the query plan estimates)
+    def cardinalityp(self, factsets):
+        return self.modp(cardinality={ptype: len(fs) for ptype, fs in factsets.items()})
+
+    # Return a new QuerySpec where at most num results are needed (used by the
+    # first() and singleton() end-points)
+    def limitp(self, num):
+        limit = self.limit
+        return self.modp(limit=num if limit is None else min(limit, num))
+
+    def bindp(self, *args, **kwargs):
+        self.check_bindp(*args, **kwargs)
+        nwhere = self.where.ground(*args, **kwargs)
         return self.modp(where=nwhere, bind=True)
 
     def fill_defaults(self):
@@ -2958,6 +3500,7 @@ def make_query_plan_preordered_roots(indexed_paths, root_join_order, qspec):
     # Generate a list of JoinQueryPlan consisting of a root path and join
     # comparator and clauses that only reference previous plans in the list.
     output = []
+    ordered = False
     for idx, (root, rorderbys) in enumerate(zip(root_join_order, orderbygroups)):
         if rorderbys:
             rorderbys = OrderByBlock(rorderbys)
@@ -2966,16 +3509,23 @@ def make_query_plan_preordered_roots(indexed_paths, root_join_order, qspec):
         rpclauses = visitedsubset(visited, clauseset)
         if rpclauses:
             rpclauses = ClauseBlock(rpclauses)
-        joinsc, rpclauses = make_join_pair(rpjoins, rpclauses, rorderbys)
+        joinsc, rpclauses = make_join_pair(rpjoins, rpclauses, rorderbys, root, indexed_paths)
         if not rpclauses:
             rpclauses = []
         rpjoins = [joinsc] if joinsc else []
 
         output.append(
             JoinQueryPlan.from_specification(
-                indexed_paths, root_join_order[:idx], root, rpjoins, rpclauses, rorderbys
+                indexed_paths,
+                root_join_order[:idx],
+                root,
+                rpjoins,
+                rpclauses,
+                rorderbys,
+                ordered,
             )
         )
+        ordered = ordered or bool(rorderbys)
     return QueryPlan(output)
 
 
@@ -3053,41 +3603,396 @@ def oppref_join_order(indexed_paths, qspec):
 
 
 # ------------------------------------------------------------------------------
-# Take a join order heuristic, a list of joins, and a list of clause blocks and
-# and generates a query.
+# A cost model for left-deep join orders. For each root it estimates the number
+# of facts that satisfy the where clauses that only refer to that root, and for
+# each join the fraction of tuples that satisfy the join (and any other where
+# clauses that refer to multiple roots). The statistics are the number of facts
+# of each predicate (the 'cardinality' parameter of the query specification,
+# which is provided by the query executor) and the number of distinct keys of
+# each index. Where there are no statistics the traditional default
+# selectivities are used (eg., 1/10 for an equality and 1/3 for a range).
+#
+# The cost of adding a root to a join is the cost of building its data source
+# plus the cost of iterating over the input tuples and the matching facts; which
+# is a lookup if there is a join key and a nested loop otherwise.
 # ------------------------------------------------------------------------------
 
+DEFAULT_CARDINALITY = 1000
+_EQ_SELECTIVITY = 0.1
+_RANGE_SELECTIVITY = 1.0 / 3.0
+_MAX_EXHAUSTIVE_ROOTS = 10
+
+
+class JoinCostModel(object):
+    def __init__(self, indexed_paths, qspec):
+        cardinality = qspec.cardinality if qspec.cardinality else {}
+        self._indexes = indexed_paths if isinstance(indexed_paths, Mapping) else {}
+        self._roots = [hashable_path(r) for r in qspec.roots]
+        self._rows = {}
+        for hr in self._roots:
+            rows = cardinality.get(hr.path.meta.predicate, None)
+            self._rows[hr] = DEFAULT_CARDINALITY if rows is None else rows
+
+        # The selectivity of the single root where clauses and whether a
+        # clause can be looked up by an index; and the selectivity of the
+        # multi-root where clauses and joins (and if they can be a join key).
+        self._filters = {hr: 1.0 for hr in self._roots}
+        self._keyed = set()
+        self._joins = []
+        for clause in qspec.where if qspec.where else []:
+            roots = frozenset([hashable_path(r) for r in clause.roots])
+            sel = self.clause_selectivity(clause)
+            if len(roots) == 1:
+                (hr,) = roots
+                self._filters[hr] *= sel
+                if (
+                    len(clause) == 1
+                    and isinstance(clause[0], StandardComparator)
+                    and clause[0].keyable(indexed_paths)
+                ):
+                    self._keyed.add(hr)
+            elif roots:
+                self._joins.append((roots, sel, False))
+        for comp in qspec.join if qspec.join else []:
+            roots = frozenset([hashable_path(r) for r in comp.roots])
+            self._joins.append((roots, self.comparator_selectivity(comp), True))
 
-def make_query_plan(indexed_paths, qspec):
-    qspec = qspec.fill_defaults()
-    root_order = qspec.joh(indexed_paths, qspec)
-    return make_query_plan_preordered_roots(indexed_paths, root_order, qspec)
+    # --------------------------------------------------------------------------
+    # Selectivity estimates
+    # --------------------------------------------------------------------------
+    def _distinct(self, p):
+        fi = self._indexes.get(hashable_path(p.meta.dealiased), None)
+        return max(1, fi.num_keys) if fi is not None else None
+
+    def _rows_of(self, p):
+        rows = self._rows.get(hashable_path(p.meta.root), DEFAULT_CARDINALITY)
+        return max(1, rows)
+
+    def comparator_selectivity(self, comp):
+        if isinstance(comp, CompositeComparator):
+            sel = 1.0
+            for sc in comp.comparators:
+                sel *= self.comparator_selectivity(sc)
+            return sel
+        if not isinstance(comp, StandardComparator):
+            return _RANGE_SELECTIVITY
+        op = comp.operator
+        if op == trueall:
+            return 1.0
+        if op == falseall:
+            return 0.0
+        paths = [path(a, exception=False) for a in comp.args]
+        if all(p is not None for p in paths):
+            if op != operator.eq and op != operator.ne:
+                return _RANGE_SELECTIVITY
+            tmp = [self._distinct(p) for p in paths]
+            tmp = [d if d else self._rows_of(p) for d, p in zip(tmp, paths)]
+            sel = 1.0 / max(tmp)
+            return sel if op == operator.eq else 1.0 - sel
+        paths = [p for p in paths if p is not None]
+        if not paths:
+            return 1.0
+        d = self._distinct(paths[0])
+        eqsel = 1.0 / d if d else _EQ_SELECTIVITY
+        if op == operator.eq:
+            return eqsel
+        if op == operator.ne:
+            return 1.0 - eqsel
+        if op == operator.contains or op == notcontains:
+            try:
+                sel = min(1.0, len(comp.args[0]) * eqsel)
+            except TypeError:
+                sel = 0.5
+            return sel if op == operator.contains else 1.0 - sel
+        return _RANGE_SELECTIVITY
+
+    # A clause is a disjunction of comparators
+    def clause_selectivity(self, clause):
+        if len(clause) == 1:
+            return self.comparator_selectivity(clause[0])
+        nsel = 1.0
+        for comp in clause:
+            nsel *= 1.0 - self.comparator_selectivity(comp)
+        return 1.0 - nsel
 
+    # --------------------------------------------------------------------------
+    # The estimated (output rows, cost) of joining a root to the tuples of the
+    # previous (visited) roots.
+    # --------------------------------------------------------------------------
+    def step(self, visited, inrows, hr):
+        rows = self._rows[hr]
+        frows = rows * self._filters[hr]
+        if not visited:
+            return (frows, frows if hr in self._keyed else float(rows))
+        sel = 1.0
+        haskey = False
+        for roots, jsel, iskey in self._joins:
+            if hr in roots and roots <= visited | {hr}:
+                sel *= jsel
+                haskey = haskey or iskey
+        outrows = inrows * frows * sel
+        if haskey:
+            return (outrows, rows + inrows + outrows)
+        return (outrows, rows + inrows * frows)
+
+    # Estimates for each root of a join order
+    def estimate(self, order):
+        visited = frozenset()
+        rows = 1.0
+        out = []
+        for r in order:
+            hr = hashable_path(r)
+            rows, cost = self.step(visited, rows, hr)
+            visited = visited | {hr}
+            out.append((rows, cost))
+        return out
 
-# ------------------------------------------------------------------------------
-# Implementing Queries - taking a QuerySpec, QueryPlan, and a FactMap and
-# generating an actual query.
-# ------------------------------------------------------------------------------
+    # --------------------------------------------------------------------------
+    # Find the cheapest order. Exhaustive dynamic programming over the subsets
+    # of roots (the number of output rows of a set of roots doesn't depend on
+    # the join order) or a greedy search if there are too many roots.
+    # --------------------------------------------------------------------------
+    def best_order(self):
+        roots = self._roots
+        if len(roots) > _MAX_EXHAUSTIVE_ROOTS:
+            return self._greedy_order()
+        best = {frozenset(): (0.0, 1.0, ())}
+        for size in range(1, len(roots) + 1):
+            for subset in itertools.combinations(roots, size):
+                visited = frozenset(subset)
+                candidate = None
+                # Try the last root first so that ties keep the original order
+                for hr in reversed(subset):
+                    prev = visited - {hr}
+                    pcost, prows, porder = best[prev]
+                    rows, cost = self.step(prev, prows, hr)
+                    if candidate is None or pcost + cost < candidate[0]:
+                        candidate = (pcost + cost, rows, porder + (hr,))
+                best[visited] = candidate
+        return [hr.path for hr in best[frozenset(roots)][2]]
+
+    def _greedy_order(self):
+        visited = frozenset()
+        rows = 1.0
+        order = []
+        remaining = list(self._roots)
+        while remaining:
+            estimates = [(self.step(visited, rows, hr), hr) for hr in remaining]
+            (rows, _), hr = min(estimates, key=lambda e: e[0][1])
+            remaining.remove(hr)
+            visited = visited | {hr}
+            order.append(hr.path)
+        return order
+
+
+def cost_join_order(indexed_paths, qspec):
+    return JoinCostModel(indexed_paths, qspec).best_order()
 
 
 # ------------------------------------------------------------------------------
-# Creates a mechanism for sorting using the order_by statements within queries.
-#
-# Works by creating a list of pairs consisting of a keyfunction and reverse
-# flag, corresponding to the orderbyblocks in reverse order. A list can then by
-# sorted by successively applying each sort function. Stable sort guarantees
-# that the the result is a multi-criteria sort.
+# AutoIndexer adaptively creates indexes for a FactBase based on the query
+# workload. After each query plan is made it records the fields that would have
+# benefited from an index: a join key for which a temporary FactIndex has to be
+# built from the whole factset, or a prejoin where clause that has to filter the
+# whole factset. When a field has been recorded 'threshold' times an index is
+# added to the FactMap (so it is maintained as facts are added and removed) and
+# the query is re-planned. The automatically created indexes are kept in least
+# recently used order and the oldest is removed when there are more than
+# 'max_indexes'.
 # ------------------------------------------------------------------------------
-class InQuerySorter(object):
-    def __init__(self, orderbyblock, insig=None):
-        if insig is None and len(orderbyblock.roots) > 1:
-            raise ValueError(
-                (
-                    "Cannot create an InQuerySorter with no input "
-                    "signature and an OrderByBlock with multiple "
-                    "roots '{}'"
-                ).format(orderbyblock)
-            )
+
+
+class AutoIndexer(object):
+    """Automatically create FactBase indexes based on the query workload.
+
+    An ``AutoIndexer`` is passed to a FactBase using the ``auto_index``
+    parameter. It records the fields that queries search or join on without an
+    index and, once a field has been used by ``threshold`` query executions,
+    creates an index for that field. The number of automatically created
+    indexes is limited to ``max_indexes``, with the least recently used index
+    removed when the limit is exceeded.
+
+    The ``created``, ``evicted``, and ``hits`` counters map the hashable path
+    (or tuple of hashable paths for a composite index) of each automatically
+    created index to the number of times the index was created, removed, and
+    used by a query.
+
+    Args:
+      threshold: the number of query executions using a field before it is
+         indexed (default: 3).
+      max_indexes: the maximum number of automatically created indexes
+         (default: 8).
+
+    """
+
+    _operators = frozenset(
+        [operator.eq, operator.lt, operator.le, operator.gt, operator.ge, operator.contains]
+    )
+
+    def __init__(self, threshold: int = 3, max_indexes: int = 8) -> None:
+        if threshold < 1:
+            raise ValueError("AutoIndexer threshold must be a positive integer")
+        if max_indexes < 1:
+            raise ValueError("AutoIndexer max_indexes must be a positive integer")
+        self._threshold = threshold
+        self._max_indexes = max_indexes
+        self._counts: collections.Counter = collections.Counter()
+        self._autoindexes: collections.OrderedDict = collections.OrderedDict()
+        self._created: collections.Counter = collections.Counter()
+        self._evicted: collections.Counter = collections.Counter()
+        self._hits: collections.Counter = collections.Counter()
+
+    @property
+    def threshold(self) -> int:
+        return self._threshold
+
+    @property
+    def max_indexes(self) -> int:
+        return self._max_indexes
+
+    @property
+    def indexes(self):
+        """The automatically created indexes in least recently used order."""
+        return tuple(self._autoindexes.keys())
+
+    @property
+    def counts(self):
+        """The number of recorded uses of fields that are not yet indexed."""
+        return collections.Counter(self._counts)
+
+    @property
+    def created(self):
+        return collections.Counter(self._created)
+
+    @property
+    def evicted(self):
+        return collections.Counter(self._evicted)
+
+    @property
+    def hits(self):
+        return collections.Counter(self._hits)
+
+    # --------------------------------------------------------------------------
+    # Internal functions
+    # --------------------------------------------------------------------------
+
+    # Returns the indexes that a query plan uses and the indexes that it would
+    # have used if they had existed.
+    def _candidates(self, qplan, factindexes):
+        used = []
+        wanted = []
+        for jqp in qplan:
+            pjk = jqp.prejoin_key_clause
+            if pjk:
+                for sc in pjk:
+                    keyable = sc.keyable(factindexes)
+                    if keyable:
+                        used.append(keyable[0])
+            elif jqp.prejoin_clauses:
+                for cl in jqp.prejoin_clauses:
+                    if len(cl) != 1 or not isinstance(cl[0], StandardComparator):
+                        continue
+                    sc = cl[0].dealias()
+                    if len(sc.paths) != 1 or sc.operator not in self._operators:
+                        continue
+                    keyable = sc.keyable(sc.paths)
+                    if keyable:
+                        wanted.append(keyable[0])
+            jk = jqp.join_key
+            if not jk or pjk or jqp.prejoin_clauses:
+                continue
+            if isinstance(jk, CompositeComparator):
+                key = tuple([hashable_path(sc.args[0].meta.dealiased) for sc in jk])
+            else:
+                key = hashable_path(jk.args[0].meta.dealiased)
+            fi = factindexes.get(key, None)
+            if fi is not None and fi.supports(jk.operator):
+                used.append(key)
+            elif jk.operator in self._operators:
+                wanted.append(key)
+        return (used, wanted)
+
+    def _create(self, factmaps, key):
+        del self._counts[key]
+        fm = factmaps[_index_predicate(key)]
+        if key in fm.path2factindex:
+            return False
+        fm.add_index(tuple([path(hp) for hp in key]) if isinstance(key, tuple) else path(key))
+        self._autoindexes[key] = fm
+        self._created[key] += 1
+        while len(self._autoindexes) > self._max_indexes:
+            oldkey, oldfm = self._autoindexes.popitem(last=False)
+            if oldkey in oldfm.path2factindex:
+                oldfm.remove_index(oldkey)
+            self._evicted[oldkey] += 1
+        return True
+
+    # --------------------------------------------------------------------------
+    # Record the indexes used by a query plan and create any new indexes.
+    # Returns True if an index was created (so the query should be re-planned).
+    # --------------------------------------------------------------------------
+    def record(self, factmaps, qplan, factindexes):
+        used, wanted = self._candidates(qplan, factindexes)
+        for key in used:
+            if key in self._autoindexes:
+                self._autoindexes.move_to_end(key)
+                self._hits[key] += 1
+        created = False
+        for key in wanted:
+            self._counts[key] += 1
+            if self._counts[key] >= self._threshold:
+                created = self._create(factmaps, key) or created
+        return created
+
+    def __str__(self):
+        return "AutoIndexer(threshold={}, max_indexes={}, indexes={})".format(
+            self._threshold, self._max_indexes, list(self._autoindexes.keys())
+        )
+
+    def __repr__(self):
+        return self.__str__()
+
+
+# ------------------------------------------------------------------------------
+# Take a join order heuristic, a list of joins, and a list of clause blocks and
+# and generates a query.
+# ------------------------------------------------------------------------------
+
+
+def make_query_plan(indexed_paths, qspec):
+    qspec = qspec.fill_defaults()
+    root_order = qspec.joh(indexed_paths, qspec)
+    qplan = make_query_plan_preordered_roots(indexed_paths, root_order, qspec)
+    if qspec.cardinality is None:
+        return qplan
+    estimates = JoinCostModel(indexed_paths, qspec).estimate([jqp.root for jqp in qplan])
+    return QueryPlan(list(qplan), estimates)
+
+
+# ------------------------------------------------------------------------------
+# Implementing Queries - taking a QuerySpec, QueryPlan, and a FactMap and
+# generating an actual query.
+# ------------------------------------------------------------------------------
+
+
+# ------------------------------------------------------------------------------
+# Creates a mechanism for sorting using the order_by statements within queries.
+#
+# Works by creating a list of pairs consisting of a keyfunction and reverse
+# flag, corresponding to the orderbyblocks in reverse order. A list can then by
+# sorted by successively applying each sort function. Stable sort guarantees
+# that the the result is a multi-criteria sort.
+# ------------------------------------------------------------------------------
+class InQuerySorter(object):
+    def __init__(self, orderbyblock, insig=None):
+        if insig is None and len(orderbyblock.roots) > 1:
+            raise ValueError(
+                (
+                    "Cannot create an InQuerySorter with no input "
+                    "signature and an OrderByBlock with multiple "
+                    "roots '{}'"
+                ).format(orderbyblock)
+            )
         if insig is not None and not insig:
             raise ValueError("Cannot create an InQuerySorter with an empty signature")
         if not insig:
@@ -3119,6 +4024,44 @@ class InQuerySorter(object):
                 outlist.sort(key=kf, reverse=reverse)
         return outlist
 
+    # Return (as a list) the first k elements of the sorted input. Uses a
+    # bounded heap so only k elements are kept. Note: heapq.nsmallest() and
+    # heapq.nlargest() are stable so the result is the same as sorted()[:k].
+    def topk(self, input, k):
+        keys = tuple([kf for kf, _ in reversed(self._sorter)])
+        flags = tuple([reverse for _, reverse in reversed(self._sorter)])
+        if len(keys) == 1:
+            key = keys[0]
+        elif len(set(flags)) == 1:
+            key = lambda x: tuple([kf(x) for kf in keys])
+        else:
+            key = lambda x: _MixedOrderKey(tuple([kf(x) for kf in keys]), flags)
+            return heapq.nsmallest(k, input, key=key)
+        if flags[0]:
+            return heapq.nlargest(k, input, key=key)
+        return heapq.nsmallest(k, input, key=key)
+
+
+# A sort key for a mix of ascending and descending orderings. Note: heapq
+# compares the (key, index) pairs so keys that tie must compare equal for the
+# index to break the tie.
+class _MixedOrderKey(object):
+    __slots__ = ("values", "flags")
+
+    def __init__(self, values, flags):
+        self.values = values
+        self.flags = flags
+
+    def __eq__(self, other):
+        return self.values == other.values
+
+    def __lt__(self, other):
+        for a, b, reverse in zip(self.values, other.values, self.flags):
+            if a == b:
+                continue
+            return b < a if reverse else a < b
+        return False
+
 
 # ------------------------------------------------------------------------------
 # prejoin query is the querying of the underlying factset or factindex
@@ -3171,14 +4114,45 @@ def make_first_prejoin_query(jqp, factsets, factindexes):
     return unsorted_query
 
 
+# ------------------------------------------------------------------------------
+# If the first JoinQueryPlan is ordered by a single field that has an ordered
+# index (and there is no keyed search) then the facts are generated in order by
+# iterating over the index; so no sorting is needed and the results can be
+# generated lazily. Returns None if this is not possible.
+# ------------------------------------------------------------------------------
+
+
+def make_first_index_ordered_query(jqp, factindexes):
+    orderbys = jqp.prejoin_orderbys or jqp.postjoin_orderbys
+    if not orderbys or len(orderbys) != 1 or jqp.prejoin_key_clause:
+        return None
+    ob = orderbys[0]
+    fi = factindexes.get(hashable_path(ob.path.meta.dealiased), None)
+    if fi is None or not fi.ordered:
+        return None
+    prejcb = jqp.prejoin_clauses
+
+    def ordered_query():
+        if prejcb:
+            cc = prejcb.make_callable([jqp.root.meta.dealiased])
+        else:
+            cc = lambda _: True
+        for f in fi if ob.asc else reversed(fi):
+            if cc((f,)):
+                yield (f,)
+
+    return ordered_query
+
+
 # ------------------------------------------------------------------------------
 #
 # - factsets - a dictionary mapping a predicate to a factset
 # - factindexes - a dictionary mapping a hashable_path to a factindex
+# - limit - only the first limit results of a sorted query are needed
 # ------------------------------------------------------------------------------
 
 
-def make_first_join_query(jqp, factsets, factindexes):
+def make_first_join_query(jqp, factsets, factindexes, limit=None):
 
     if jqp.input_signature:
         raise ValueError(
@@ -3194,6 +4168,10 @@ def make_first_join_query(jqp, factsets, factindexes):
             )
         )
 
+    ordered_query = make_first_index_ordered_query(jqp, factindexes)
+    if ordered_query:
+        return ordered_query
+
     base_query = make_first_prejoin_query(jqp, factsets, factindexes)
     iqs = None
     if jqp.prejoin_orderbys:
@@ -3202,6 +4180,8 @@ def make_first_join_query(jqp, factsets, factindexes):
         iqs = InQuerySorter(jqp.postjoin_orderbys, (jqp.root,))
 
     def sorted_query():
+        if limit is not None:
+            return iqs.topk(base_query(), limit)
         return iqs.sorted(base_query())
 
     if iqs:
@@ -3219,14 +4199,61 @@ def make_first_join_query(jqp, factsets, factindexes):
 #
 # NOTE: We don't use this for the first JoinQueryPlan as that is handled as a
 # special case.
+#
+# If the FactMaps are provided then any data source that has to be built (a
+# temporary FactIndex for the join key or a filtered and/or sorted list) is
+# cached against the FactMap of the root predicate. So re-running the query (for
+# example, with different placeholder values for other predicates) reuses the
+# data source until the facts of the predicate are changed. Clauses containing
+# function comparators are never cached as the function may not be pure.
 # ------------------------------------------------------------------------------
 
 
-def make_prejoin_query_source(jqp, factsets, factindexes):
+def _cacheable_clauses(clause, clauseblock):
+    comparators = list(clause) if clause else []
+    if clauseblock:
+        for cl in clauseblock:
+            comparators.extend(cl)
+    return not any(isinstance(c, FunctionComparator) for c in comparators)
+
+
+# Returns the FactMap and cache key for caching the temporary data source of a
+# JoinQueryPlan (or None if it cannot be cached)
+def _prejoin_source_cachekey(jqp, factmaps, keyed=True):
+    pjk = jqp.prejoin_key_clause
+    pjc = jqp.prejoin_clauses
+    factmap = factmaps.get(jqp.root.meta.predicate, None) if factmaps else None
+    if factmap is None or not _cacheable_clauses(pjk, pjc):
+        return None
+    jk = jqp.join_key if keyed else None
+    if not jk:
+        jk_key_path = None
+    elif isinstance(jk, CompositeComparator):
+        jk_key_path = tuple([hashable_path(sc.args[0].meta.dealiased) for sc in jk])
+    else:
+        jk_key_path = hashable_path(jk.args[0].meta.dealiased)
+    method = jqp.join_method if keyed else None
+    cachekey = ("prejoin_source", jk_key_path, method, pjk, pjc, jqp.prejoin_orderbys)
+    try:
+        hash(cachekey)
+    except TypeError:
+        return None
+    return (factmap, cachekey)
+
+
+# ------------------------------------------------------------------------------
+# Make the data source for a JoinQueryPlan; the facts that satisfy the prejoin
+# clauses either indexed by the join key or as a (possibly ordered) collection.
+# If keyed is False then the join key is ignored (used by a hash join that
+# builds the hash table on the input tuples).
+# ------------------------------------------------------------------------------
+
+
+def make_prejoin_query_source(jqp, factsets, factindexes, factmaps=None, keyed=True):
     pjk = jqp.prejoin_key_clause
     pjc = jqp.prejoin_clauses
     pjob = jqp.prejoin_orderbys
-    jk = jqp.join_key
+    jk = jqp.join_key if keyed else None
     predicate = jqp.root.meta.predicate
     factset = factsets.get(jqp.root.meta.predicate, OrderedSet())
 
@@ -3276,15 +4303,29 @@ def make_prejoin_query_source(jqp, factsets, factindexes):
                 if pjc_check((f,)):
                     yield (f,)
 
-    # If there is a join key
+    # If there is a join key. Note: a composite join key is keyed on a tuple of
+    # paths.
     if jk:
-        jk_key_path = hashable_path(jk.args[0].meta.dealiased)
-        if jk.args[0].meta.predicate != predicate:
-            raise ValueError(
-                ("Internal error: join key '{}' is invalid " "for JoinQueryPlan {}").format(
-                    jk, jqp
+        jkscs = jk.comparators if isinstance(jk, CompositeComparator) else (jk,)
+        for sc in jkscs:
+            if sc.args[0].meta.predicate != predicate:
+                raise ValueError(
+                    ("Internal error: join key '{}' is invalid " "for JoinQueryPlan {}").format(
+                        jk, jqp
+                    )
                 )
-            )
+        if isinstance(jk, CompositeComparator):
+            jk_key_path = tuple([hashable_path(sc.args[0].meta.dealiased) for sc in jkscs])
+        else:
+            jk_key_path = hashable_path(jk.args[0].meta.dealiased)
+
+    # A hash join only needs an (unordered) hash table
+    def new_jk_index():
+        if isinstance(jk_key_path, tuple):
+            return CompositeFactIndex([path(hp) for hp in jk_key_path])
+        if jqp.join_method == "hash":
+            return HashFactIndex(path(jk_key_path))
+        return FactIndex(path(jk_key_path))
 
     if pjob:
         pjiqs = InQuerySorter(pjob)
@@ -3298,20 +4339,20 @@ def make_prejoin_query_source(jqp, factsets, factindexes):
     def query_source():
         if jk:
             if pjc:
-                fi = FactIndex(path(jk_key_path))
+                fi = new_jk_index()
                 for (f,) in query_pjc():
                     fi.add(f)
                 return fi
             elif pjk:
-                fi = FactIndex(path(jk_key_path))
+                fi = new_jk_index()
                 for (f,) in query_pjk():
                     fi.add(f)
                 return fi
             else:
-                fi = factindexes.get(hashable_path(jk_key_path), None)
-                if fi:
+                fi = factindexes.get(jk_key_path, None)
+                if fi and fi.supports(jk.operator):
                     return fi
-                fi = FactIndex(path(jk_key_path))
+                fi = new_jk_index()
                 for f in factset:
                     fi.add(f)
                 return fi
@@ -3323,16 +4364,16 @@ def make_prejoin_query_source(jqp, factsets, factindexes):
                 source = [f for (f,) in query_pjc()]
             elif pjk:
                 source = [f for (f,) in query_pjk()]
-            if source and not pjob:
+            if source is not None and not pjob:
                 return source
 
             if not source and pjob:
                 if len(pjob) == 1:
                     pjo = pjob[0]
                     fi = factindexes.get(hashable_path(pjo.path), None)
-                    if fi and pjo.asc:
+                    if fi and fi.ordered and pjo.asc:
                         return fi
-                    elif fi:
+                    elif fi and fi.ordered:
                         return list(reversed(fi))
 
             if source is None:
@@ -3341,7 +4382,22 @@ def make_prejoin_query_source(jqp, factsets, factindexes):
             # If there is only one sort order use attrgetter
             return pjiqs.sorted(source)
 
-    return query_source
+    # Nothing needs to be built if the source is the factset or an existing index
+    if not jk and not pjc and not pjk and not pjob:
+        return query_source
+    if jk and not pjc and not pjk:
+        fi = factindexes.get(jk_key_path, None)
+        if fi and fi.supports(jk.operator):
+            return query_source
+    cache = _prejoin_source_cachekey(jqp, factmaps, keyed)
+    if cache is None:
+        return query_source
+    factmap, cachekey = cache
+
+    def cached_query_source():
+        return factmap.cached(cachekey, query_source)
+
+    return cached_query_source
 
 
 # ------------------------------------------------------------------------------
@@ -3351,7 +4407,9 @@ def make_prejoin_query_source(jqp, factsets, factindexes):
 # ------------------------------------------------------------------------------
 
 
-def make_chained_join_query(jqp, inquery, factsets, factindexes):
+def make_chained_join_query(
+    jqp, inquery, factsets, factindexes, factmaps=None, ordered_input=False, limit=None
+):
 
     if not jqp.input_signature:
         raise ValueError(
@@ -3372,7 +4430,7 @@ def make_chained_join_query(jqp, inquery, factsets, factindexes):
         prej_iqs = InQuerySorter(prej_order)
 
     # query_source is a function that returns a FactSet, FactIndex, or list
-    query_source = make_prejoin_query_source(jqp, factsets, factindexes)
+    query_source = make_prejoin_query_source(jqp, factsets, factindexes, factmaps)
 
     # Setup any join clauses
     if jc:
@@ -3382,10 +4440,15 @@ def make_chained_join_query(jqp, inquery, factsets, factindexes):
 
     def query_jk():
         operator = jk.operator
-        align_query_input = make_input_alignment_functor(jqp.input_signature, (jk.args[1],))
+        if isinstance(jk, CompositeComparator):
+            jkargs = tuple([sc.args[1] for sc in jk.comparators])
+            align_query_input = make_input_alignment_functor(jqp.input_signature, jkargs)
+        else:
+            align = make_input_alignment_functor(jqp.input_signature, (jk.args[1],))
+            align_query_input = lambda intuple: align(intuple)[0]
         fi = query_source()
         for intuple in inquery():
-            (v,) = align_query_input(intuple)
+            v = align_query_input(intuple)
             result = list(fi.find(operator, v))
             if prej_order:
                 prej_iqs.listsort(result)
@@ -3403,15 +4466,102 @@ def make_chained_join_query(jqp, inquery, factsets, factindexes):
                     yield out
 
     if jk:
-        unsorted_query = query_jk
-    else:
+        if isinstance(jk, CompositeComparator):
+            jkscs = jk.comparators
+            getters = tuple([sc.args[0].meta.dealiased.meta.attrgetter for sc in jkscs])
+            fact_key = lambda f: tuple([g(f) for g in getters])
+            align_key = make_input_alignment_functor(
+                jqp.input_signature, tuple([sc.args[1] for sc in jkscs])
+            )
+        else:
+            fact_key = jk.args[0].meta.dealiased.meta.attrgetter
+            align = make_input_alignment_functor(jqp.input_signature, (jk.args[1],))
+            align_key = lambda intuple: align(intuple)[0]
+
+    # A hash join. If the hash table on the facts is cached (or is an existing
+    # index) then it is always used. Otherwise the hash table is built on the
+    # smaller side; reading at most as many input tuples as there are facts to
+    # decide (unless the input order must be preserved).
+    keyed_cached = jk and (
+        jqp.join_method == "index" or _prejoin_source_cachekey(jqp, factmaps) is not None
+    )
+    if jk and not keyed_cached:
+        fact_source = make_prejoin_query_source(jqp, factsets, factindexes, factmaps, False)
+
+    def query_hash():
+        if keyed_cached:
+            lookup = query_source().lookup
+            for intuple in inquery():
+                for f in lookup(align_key(intuple)):
+                    out = intuple + (f,)
+                    if jc_check(out):
+                        yield out
+            return
+
+        facts = fact_source()
+        if not facts:
+            return
+        initer = iter(inquery())
+        inputs = [] if ordered_input else list(itertools.islice(initer, len(facts)))
+        if len(inputs) < len(facts) and not ordered_input:
+            table = {}
+            for intuple in inputs:
+                table.setdefault(align_key(intuple), []).append(intuple)
+            for f in facts:
+                for intuple in table.get(fact_key(f), ()):
+                    out = intuple + (f,)
+                    if jc_check(out):
+                        yield out
+            return
+
+        table = {}
+        for f in facts:
+            table.setdefault(fact_key(f), []).append(f)
+        for intuple in itertools.chain(inputs, initer):
+            for f in table.get(align_key(intuple), ()):
+                out = intuple + (f,)
+                if jc_check(out):
+                    yield out
+
+    # A sort-merge join for a range join key. Iterating over the facts in key
+    # order (ascending for < and <=, and descending for > and >=) the matching
+    # facts for the sorted input tuples are a growing prefix.
+    def query_merge():
+        op = jk.operator
+        descending = op == operator.gt or op == operator.ge
+        fi = query_source()
+        inputs = [(align_key(intuple), intuple) for intuple in inquery()]
+        inputs.sort(key=lambda x: x[0], reverse=descending)
+        groups = fi.groups(reverse=descending)
+        group = next(groups, None)
+        matched = []
+        for v, intuple in inputs:
+            while group is not None and op(group[0], v):
+                matched.extend(group[1])
+                group = next(groups, None)
+            for f in matched:
+                out = intuple + (f,)
+                if jc_check(out):
+                    yield out
+
+    if not jk:
         unsorted_query = query_no_jk
+    elif jqp.join_method == "hash" or (
+        jqp.join_method == "index" and jk.operator == operator.eq and not prej_order
+    ):
+        unsorted_query = query_hash
+    elif jqp.join_method == "sort-merge" and not ordered_input:
+        unsorted_query = query_merge
+    else:
+        unsorted_query = query_jk
     if not postj_order:
         return unsorted_query
 
     jiqs = InQuerySorter(postj_order, list(jqp.input_signature) + [jqp.root])
 
     def sorted_query():
+        if limit is not None:
+            return iter(jiqs.topk(unsorted_query(), limit))
         return iter(jiqs.sorted(unsorted_query()))
 
     return sorted_query
@@ -3419,11 +4569,17 @@ def make_chained_join_query(jqp, inquery, factsets, factindexes):
 
 # ------------------------------------------------------------------------------
 # Makes a query given a ground QueryPlan and the underlying data. The returned
-# query object is a Python generator function that takes no arguments.
+# query object is a Python generator function that takes no arguments. The
+# optional factmaps (mapping predicates to FactMap) are used to cache any
+# temporary data sources. If only the first limit results are needed then the
+# sort of the last join (if any) only keeps the first limit results. Note: a
+# sort of an earlier join cannot be limited as the later joins can filter the
+# results; but the later joins preserve the order so the results are still
+# generated lazily.
 # ------------------------------------------------------------------------------
 
 
-def make_query(qp, factsets, factindexes):
+def make_query(qp, factsets, factindexes, factmaps=None, limit=None):
     if qp.placeholders:
         raise ValueError(
             (
@@ -3431,11 +4587,17 @@ def make_query(qp, factsets, factindexes):
             ).format(", ".join([str(p) for p in qp.placeholders]))
         )
     query = None
+    ordered = False
+    last = len(qp) - 1
     for idx, jqp in enumerate(qp):
+        jlimit = limit if idx == last else None
         if not query:
-            query = make_first_join_query(jqp, factsets, factindexes)
+            query = make_first_join_query(jqp, factsets, factindexes, jlimit)
         else:
-            query = make_chained_join_query(jqp, query, factsets, factindexes)
+            query = make_chained_join_query(
+                jqp, query, factsets, factindexes, factmaps, ordered, jlimit
+            )
+        ordered = ordered or bool(jqp.prejoin_orderbys or jqp.postjoin_orderbys)
     return query
 
 
@@ -3775,7 +4937,7 @@ class Query(abc.ABC):
     # Add a group_by expression
     # --------------------------------------------------------------------------
     @abc.abstractmethod
-    def group_by(self, *expressions):
+    def group_by(self, *expressions, ordered=True):
         """Specify a grouping over the results.
 
         The grouping specification is similar to an ordering specification but
@@ -3788,8 +4950,16 @@ class Query(abc.ABC):
         ``order_by`` clause is used to sort the elements within each matching
         group.
 
+        By default the groups are returned in the order of the grouping
+        specification, which requires sorting all the query results. If
+        ``ordered=False`` then the results are instead collected into groups
+        by hashing the group identifier and the groups are returned in the
+        order that they are first matched. Only the elements within each group
+        are sorted by any ``order_by`` clause.
+
         Args:
           field_order: an ordering over fields to group by
+          ordered: return the groups in sorted order (default: True)
 
         Returns:
           Returns the modified copy of the query.
@@ -3855,6 +5025,46 @@ class Query(abc.ABC):
         """
         pass
 
+    # --------------------------------------------------------------------------
+    # Limit and offset
+    # --------------------------------------------------------------------------
+    @abc.abstractmethod
+    def limit(self, num):
+        """Return at most ``num`` results.
+
+        When combined with an ``order_by`` clause the query only keeps the
+        first ``num`` results while sorting (rather than sorting all results).
+        Otherwise the query stops as soon as ``num`` results have been
+        returned. For a query with a ``group_by`` clause the limit applies to
+        the groups.
+
+        A query with a limit cannot be used to delete, modify, or replace facts.
+
+        Args:
+          num: the maximum number of results (a non-negative integer).
+
+        Returns:
+          Returns the modified copy of the query.
+
+        """
+        pass
+
+    @abc.abstractmethod
+    def offset(self, num):
+        """Skip the first ``num`` results.
+
+        This is typically combined with :meth:`Query.limit` and an ``order_by``
+        clause to page through the results.
+
+        Args:
+          num: the number of results to skip (a non-negative integer).
+
+        Returns:
+          Returns the modified copy of the query.
+
+        """
+        pass
+
     # --------------------------------------------------------------------------
     # Ground - bind
     # --------------------------------------------------------------------------
@@ -3931,6 +5141,12 @@ class Query(abc.ABC):
         forces the join order to first be the ``G`` predicate followed by the
         ``F`` predicate.
 
+        Alternatively, the ``cost_join_order`` heuristic chooses the join order
+        with the lowest estimated cost based on the number of facts of each
+        predicate, the available indexes, and the ``join`` and ``where``
+        expressions. The estimated number of rows and cost of each join step is
+        then shown in the output of ``query_plan()``.
+
         Args:
           join_order: the join order heuristic
 
@@ -3959,6 +5175,13 @@ class Query(abc.ABC):
         """
         pass
 
+    # --------------------------------------------------------------------------
+    # The set of results when the query is used as the sequence of an in_ or
+    # notin_ membership condition (see MembershipSeq).
+    # --------------------------------------------------------------------------
+    def _membership_set(self):
+        return frozenset(self.all())
+
     # --------------------------------------------------------------------------
     # Show the single element and throw an exception if there is more than one
     # --------------------------------------------------------------------------
@@ -4002,6 +5225,85 @@ class Query(abc.ABC):
         """
         pass
 
+    # --------------------------------------------------------------------------
+    # Aggregation
+    # --------------------------------------------------------------------------
+    @abc.abstractmethod
+    def sum(self, pth):
+        """Return the sum of the value of a path over the matching elements.
+
+           If a ``group_by()`` clause is specified then it returns a generator
+           that iterates over pairs of the group identifier and the sum for
+           that group.
+
+        Args:
+           pth: a path of one of the predicates of the query
+
+        Returns:
+           Returns the sum (or a generator over the sum for each group)
+
+        """
+        pass
+
+    @abc.abstractmethod
+    def min(self, pth):
+        """Return the minimum value of a path over the matching elements.
+
+           An exception is thrown if there are no matching elements. If the
+           path is an indexed field of a single predicate query with no
+           ``where()`` clause then the value is read directly from the index.
+           If a ``group_by()`` clause is specified then it returns a generator
+           over pairs of the group identifier and the minimum for that group.
+
+        Args:
+           pth: a path of one of the predicates of the query
+
+        Returns:
+           Returns the minimum (or a generator over the minimum for each group)
+
+        """
+        pass
+
+    @abc.abstractmethod
+    def max(self, pth):
+        """Return the maximum value of a path over the matching elements.
+
+           The behaviour is the same as for :meth:`Query.min`.
+
+        Args:
+           pth: a path of one of the predicates of the query
+
+        Returns:
+           Returns the maximum (or a generator over the maximum for each group)
+
+        """
+        pass
+
+    @abc.abstractmethod
+    def aggregate(self, *aggregates):
+        """Compute several aggregates in a single pass over the matching elements.
+
+           The aggregates are created with the :func:`count_`, :func:`sum_`,
+           :func:`min_`, and :func:`max_` functions. For example:
+
+           ``query.aggregate(count_(), sum_(Option.cost), max_(Option.cost))``
+
+           Each aggregate is computed as the query results are generated so
+           the results are never stored. Aggregation ignores any ``select()``
+           projection and cannot be combined with the ``distinct()``,
+           ``limit()``, and ``offset()`` modifiers.
+
+        Args:
+           aggregates: one or more aggregates
+
+        Returns:
+           Returns a tuple of the aggregate values. If a ``group_by()`` clause
+           is specified then it returns a generator over pairs of the group
+           identifier and the tuple of aggregate values for that group.
+
+        """
+        pass
+
     # --------------------------------------------------------------------------
     # Show the single element and throw an exception if there is more than one
     # --------------------------------------------------------------------------
@@ -4130,6 +5432,37 @@ class Query(abc.ABC):
         """
         pass
 
+    # --------------------------------------------------------------------------
+    # Prepare the query for repeated execution
+    # --------------------------------------------------------------------------
+    @abc.abstractmethod
+    def prepare(self):
+        """Return a prepared version of the query for repeated execution.
+
+        Executing a query requires building a query plan; deciding the join
+        order and which indexes to use. For a query that is executed many times
+        with different placeholder values this can be more costly than the
+        actual search. A prepared query builds the query plan once, leaving the
+        placeholders in place, and reuses it for every execution. The plan is
+        only rebuilt if the indexes of the ``FactBase`` change.
+
+        The prepared query supports the :meth:`Query.bind` function, to supply
+        the placeholder values, and the :meth:`Query.all`,
+        :meth:`Query.singleton`, :meth:`Query.count`, :meth:`Query.first` and
+        :meth:`Query.query_plan` end-points.
+
+        .. code-block:: python
+
+           pq = fb.query(Option).where(Option.cost < ph1_).prepare()
+           for cost in range(10):
+               print(list(pq.bind(cost).all()))
+
+        Returns:
+           Returns a prepared query object.
+
+        """
+        pass
+
     # --------------------------------------------------------------------------
     # Internal API property
     # --------------------------------------------------------------------------
@@ -4138,6 +5471,110 @@ class Query(abc.ABC):
         pass
 
 
+# ------------------------------------------------------------------------------
+# QueryPlanCache - caches the (ungrounded) query plan of a prepared query. The
+# query plan depends on the indexes that are available so the cached plan is
+# only reused while the index layout of the FactMaps is unchanged (and for the
+# cost based join order while the number of facts of each predicate stays
+# within the same power of two). The plan is then grounded with the placeholder
+# values for each execution. Note: the estimates of a cached plan are not
+# updated.
+# ------------------------------------------------------------------------------
+
+
+class QueryPlanCache(object):
+    def __init__(self):
+        self._layout = None
+        self._qplan = None
+
+    def plan(self, factindexes, qspec):
+        layout = tuple([(hpth, type(fi)) for hpth, fi in factindexes.items()])
+        if qspec.joh is cost_join_order and qspec.cardinality:
+            sizes = [(p, n.bit_length()) for p, n in qspec.cardinality.items()]
+            layout = (layout, frozenset(sizes))
+        if self._qplan is None or layout != self._layout:
+            self._qplan = make_query_plan(factindexes, qspec)
+            self._layout = layout
+        return self._qplan
+
+
+# ------------------------------------------------------------------------------
+# IncrementalQuery evaluates a query so that its results can be maintained as
+# facts are added to the FactMaps (used by a materialized view). The results are
+# tuples of facts aligned with the query roots. delta() returns the result
+# tuples that contain one of a set of new facts of a predicate. It runs the
+# query with the facts of that predicate replaced by the new facts, and plans
+# it with the cost based heuristic so that the (small) set of new facts is the
+# first root and the other roots are joined to it using their indexes (or
+# temporary indexes that are cached against their FactMaps). This doesn't work
+# for a predicate that is the root of more than one query root (a self-join) so
+# then delta() returns None and the query must be re-evaluated.
+#
+# Note: the where clause is fixed when the IncrementalQuery is created so any
+# membership sequence or sub-query is only evaluated once.
+# ------------------------------------------------------------------------------
+
+
+class IncrementalQuery(object):
+    def __init__(self, qspec):
+        qspec = qspec.fill_defaults()
+        where = qspec.where
+        if where and not where.executable:
+            phstr = ",".join("'{}'".format(ph) for ph in where.placeholders)
+            raise ValueError(
+                "Placeholders {} must be bound to values before the query is "
+                "materialized".format(phstr)
+            )
+        if where:
+            qspec = qspec.modp(where=where.fixed())
+        self._qspec = qspec
+        self._roots = tuple(qspec.roots)
+        positions = collections.OrderedDict()
+        for idx, root in enumerate(self._roots):
+            positions.setdefault(path(root).meta.predicate, []).append(idx)
+        self._positions = positions
+        self._deltaspec = qspec.modp(heuristic=True, joh=cost_join_order)
+        self._plancaches = {}
+
+    @property
+    def roots(self):
+        return self._roots
+
+    @property
+    def predicates(self):
+        return tuple(self._positions.keys())
+
+    # The positions of the query roots for a predicate
+    def positions(self, ptype):
+        return tuple(self._positions.get(ptype, ()))
+
+    def _run(self, qplan, factsets, factindexes, factmaps):
+        outsig = [hashable_path(p) for p in qplan.output_signature]
+        idxs = [outsig.index(hashable_path(r)) for r in self._roots]
+        query = make_query(qplan, factsets, factindexes, factmaps)
+        if idxs == list(range(len(idxs))):
+            return [tuple(t) for t in query()]
+        return [tuple([t[i] for i in idxs]) for t in query()]
+
+    def all(self, factmaps):
+        factsets, factindexes = QueryExecutor.get_factmap_data(factmaps, self._qspec)
+        qplan = make_query_plan(factindexes, self._qspec.cardinalityp(factsets))
+        return self._run(qplan, factsets, factindexes, factmaps)
+
+    def delta(self, factmaps, ptype, facts):
+        if len(self._positions.get(ptype, ())) != 1:
+            return None
+        factsets, factindexes = QueryExecutor.get_factmap_data(factmaps, self._qspec)
+        factsets[ptype] = OrderedSet(facts)
+        factindexes = {k: fi for k, fi in factindexes.items() if _index_predicate(k) != ptype}
+        factmaps = {pt: fm for pt, fm in factmaps.items() if pt != ptype}
+        plancache = self._plancaches.get(ptype, None)
+        if plancache is None:
+            plancache = self._plancaches[ptype] = QueryPlanCache()
+        qplan = plancache.plan(factindexes, self._deltaspec.cardinalityp(factsets))
+        return self._run(qplan, factsets, factindexes, factmaps)
+
+
 # ------------------------------------------------------------------------------
 # QueryExecutor - actually executes the query and does the appropriate action
 # (eg., displaying to the user or deleting from the factbase)
@@ -4150,10 +5587,14 @@ class QueryExecutor(object):
     # factmaps - dictionary mapping predicates to FactMap.
     # roots - the roots
     # qspec - dictionary containing the specification of the query and output
+    # plancache - for a prepared query the QueryPlanCache for the (unbound) qspec
+    # bindargs - for a prepared query the bound (args, kwargs) placeholder values
     # --------------------------------------------------------------------------
-    def __init__(self, factmaps, qspec):
+    def __init__(self, factmaps, qspec, plancache=None, bindargs=None):
         self._factmaps = factmaps
         self._qspec = qspec.fill_defaults()
+        self._plancache = plancache
+        self._bindargs = bindargs
 
     # --------------------------------------------------------------------------
     # Support function
@@ -4172,11 +5613,12 @@ class QueryExecutor(object):
         return (factsets, factindexes)
 
     # --------------------------------------------------------------------------
-    # Internal support function
+    # Internal support functions
     # --------------------------------------------------------------------------
-    def _make_plan_and_query(self):
+    def _check_bound(self):
         where = self._qspec.where
-        if where and not where.executable:
+        prepared = self._plancache is not None
+        if where and not where.executable and (not prepared or self._bindargs is None):
             placeholders = where.placeholders
             phstr = ",".join("'{}'".format(ph) for ph in placeholders)
             raise ValueError(
@@ -4184,27 +5626,80 @@ class QueryExecutor(object):
                     phstr
                 )
             )
+
+    def _planning_qspec(self):
+        where = self._qspec.where
+        prepared = self._plancache is not None
         qspec = self._qspec
 
         # FIXUP: This is hacky - if there is a group_by clause replace the
         # order_by list with the group_by list and later when sorting the for
         # each group the order_by list will be used.
 
-        if where:
+        if where and not prepared:
             qspec = qspec.modp(where=where.fixed())
 
-        if qspec.group_by:
+        if qspec.group_by and qspec.hash_group:
+            qspec = qspec.delp(["group_by", "hash_group", "order_by", "ordered"])
+        elif qspec.group_by:
             qspec = qspec.modp(order_by=self._qspec.group_by)
             qspec = qspec.delp(["group_by"])
         elif qspec.ordered:
             qspec = qspec.modp(order_by=process_ordered(qspec.roots))
+        return qspec
 
+    # A prepared query reuses the cached plan and only grounds the placeholders
+    # (and evaluates any sub-queries).
+    def _make_plan(self, qspec):
         factsets, factindexes = QueryExecutor.get_factmap_data(self._factmaps, qspec)
-        qplan = make_query_plan(factindexes.keys(), qspec)
-        #        qplan = qplan.ground()
-        query = make_query(qplan, factsets, factindexes)
+        qspec = qspec.cardinalityp(factsets)
+        if self._plancache is None:
+            return (factsets, factindexes, make_query_plan(factindexes, qspec))
+        qplan = self._plancache.plan(factindexes, qspec)
+        if self._bindargs is not None:
+            args, kwargs = self._bindargs
+            qplan = qplan.ground(*args, **kwargs)
+        return (factsets, factindexes, qplan.fixed())
+
+    def _make_plan_and_query(self):
+        self._check_bound()
+        qspec = self._planning_qspec()
+        factsets, factindexes, qplan = self._make_plan(qspec)
+        autoindex = qspec.autoindex
+        if autoindex and autoindex.record(self._factmaps, qplan, factindexes):
+            factsets, factindexes, qplan = self._make_plan(qspec)
+        query = make_query(qplan, factsets, factindexes, self._factmaps, self._result_limit())
         return (qplan, query)
 
+    # The number of query results that are needed if there is a limit. This is
+    # passed to the query so that a sort only keeps this many results. But it
+    # cannot be used if distinct or group_by change the number of results.
+    def _result_limit(self):
+        limit = self._qspec.limit
+        if limit is None or self._qspec.distinct or self._qspec.group_by:
+            return None
+        return limit + (self._qspec.offset or 0)
+
+    def _check_unlimited(self, name):
+        if self._qspec.limit is not None or self._qspec.offset is not None:
+            raise ValueError(f"'limit' and 'offset' are incompatible with '{name}'")
+
+    # --------------------------------------------------------------------------
+    # Return the query plan. For a prepared query this is the cached plan
+    # (grounded if the placeholders have been bound).
+    # --------------------------------------------------------------------------
+    def query_plan(self):
+        qspec = self._planning_qspec()
+        factsets, factindexes = QueryExecutor.get_factmap_data(self._factmaps, qspec)
+        qspec = qspec.cardinalityp(factsets)
+        if self._plancache is None:
+            return make_query_plan(factindexes, qspec)
+        qplan = self._plancache.plan(factindexes, qspec)
+        if self._bindargs is not None:
+            args, kwargs = self._bindargs
+            qplan = qplan.ground(*args, **kwargs)
+        return qplan
+
     # --------------------------------------------------------------------------
     # Internal function generator for returning all results
     # --------------------------------------------------------------------------
@@ -4221,6 +5716,31 @@ class QueryExecutor(object):
             else:
                 yield output
 
+    # --------------------------------------------------------------------------
+    # Split the query results into (key, group) pairs. Normally the results are
+    # sorted by the group_by paths so consecutive results form a group. For a
+    # hash grouping the results are unsorted and are collected into buckets
+    # (returned in the order that each key is first matched).
+    # --------------------------------------------------------------------------
+    def _groups(self):
+        pp2idx = {hashable_path(pp): idx for idx, pp in enumerate(self._qplan.output_signature)}
+        getters = []
+        for pth in self._qspec.group_by.paths:
+            ag = pth.meta.attrgetter
+            idx = pp2idx[hashable_path(pth.meta.root)]
+            getters.append(lambda x, ag=ag, idx=idx: ag(x[idx]))
+        if len(getters) == 1 and not self._qspec.tuple:
+            keyfunc = getters[0]
+        else:
+            keyfunc = lambda x: tuple([g(x) for g in getters])
+
+        if self._qspec.hash_group:
+            buckets = collections.defaultdict(list)
+            for input in self._query():
+                buckets[keyfunc(input)].append(input)
+            return iter(buckets.items())
+        return itertools.groupby(self._query(), keyfunc)
+
     # --------------------------------------------------------------------------
     # Internal function generator for returning all grouped results
     # --------------------------------------------------------------------------
@@ -4248,16 +5768,9 @@ class QueryExecutor(object):
 
         if qspec.order_by:
             iqs = InQuerySorter(OrderByBlock(qspec.order_by), self._qplan.output_signature)
-        unwrapkey = len(qspec.group_by) == 1 and not qspec.tuple
 
-        group_by_keyfunc = make_input_alignment_functor(
-            self._qplan.output_signature, qspec.group_by.paths
-        )
-        for k, g in itertools.groupby(self._query(), group_by_keyfunc):
-            if unwrapkey:
-                yield k[0], groupiter(g)
-            else:
-                yield k, groupiter(g)
+        for k, g in self._groups():
+            yield k, groupiter(g)
 
     # --------------------------------------------------------------------------
     # Function to return a generator of the query output
@@ -4279,9 +5792,153 @@ class QueryExecutor(object):
         self._distinct = self._qspec.distinct
 
         if len(self._qspec.group_by) > 0:
-            return self._group_by_all()
+            output = self._group_by_all()
         else:
-            return self._all()
+            output = self._all()
+        if self._qspec.limit is None and not self._qspec.offset:
+            return output
+        return self._limit_all(output)
+
+    # --------------------------------------------------------------------------
+    # The set of results of a sub-query used as the sequence of a membership
+    # condition. If the sub-query selects a single path then the values of the
+    # path are collected from the query tuples (the results are not sorted and no
+    # output is created). Furthermore, for a single root query without a where
+    # clause the set is simply the values of the path; read from the keys of an
+    # index if there is one. This is cached with the FactMap so it is only
+    # rebuilt when the facts change.
+    # --------------------------------------------------------------------------
+    def membership_set(self):
+        qspec = self._qspec
+        select = qspec.select
+        if (
+            qspec.group_by
+            or qspec.tuple
+            or qspec.limit is not None
+            or qspec.offset
+            or not select
+            or len(select) != 1
+            or not isinstance(select[0], PredicatePath)
+            or hashable_path(select[0].meta.root) not in [hashable_path(r) for r in qspec.roots]
+        ):
+            return frozenset(self.all())
+
+        pth = select[0]
+        if len(qspec.roots) == 1 and not qspec.where:
+            pth = pth.meta.dealiased
+            fm = self._factmaps[pth.meta.predicate]
+            fi = fm.path2factindex.get(hashable_path(pth), None)
+            if fi is not None:
+                make = lambda: frozenset(fi.keys)
+            else:
+                ag = pth.meta.attrgetter
+                make = lambda: frozenset([ag(f) for f in fm.factset])
+            return fm.cached(("membership", hashable_path(pth)), make)
+
+        qe = QueryExecutor(
+            self._factmaps, qspec.delp(["order_by", "ordered"]), self._plancache, self._bindargs
+        )
+        qplan, query = qe._make_plan_and_query()
+        idx = [hashable_path(p) for p in qplan.output_signature].index(
+            hashable_path(pth.meta.root)
+        )
+        ag = pth.meta.attrgetter
+        return frozenset([ag(input[idx]) for input in query()])
+
+    # --------------------------------------------------------------------------
+    # Skip the offset results and stop after limit results. Stopping early also
+    # stops the underlying query generators.
+    # --------------------------------------------------------------------------
+    def _limit_all(self, output):
+        offset = self._qspec.offset or 0
+        limit = self._qspec.limit
+        stop = None if limit is None else offset + limit
+        yield from itertools.islice(output, offset, stop)
+
+    # --------------------------------------------------------------------------
+    # Aggregate the query results. Each aggregate is a fold over the matching
+    # tuples that is computed as they are generated (so no output objects are
+    # created and the tuples of each group are not sorted). Returns a tuple of
+    # values or, for a grouped query, a generator of (key, tuple of values).
+    # --------------------------------------------------------------------------
+    def aggregate(self, aggregates):
+        if not aggregates:
+            raise ValueError("At least one aggregate must be specified")
+        if self._qspec.distinct:
+            raise ValueError("'distinct' is incompatible with 'aggregate'")
+        self._check_unlimited("aggregate")
+        hroots = set([hashable_path(r) for r in self._qspec.roots])
+        for agg in aggregates:
+            if not isinstance(agg, Aggregate):
+                raise TypeError("'{}' is not an Aggregate".format(agg))
+            if agg.path is not None and hashable_path(agg.path.meta.root) not in hroots:
+                raise ValueError(
+                    "The path of aggregate '{}' is not a path of the query roots {}".format(
+                        agg, self._qspec.roots
+                    )
+                )
+        if not self._qspec.group_by:
+            values = self._aggregate_from_factmap(aggregates)
+            if values is not None:
+                return values
+
+        self._qplan, self._query = self._make_plan_and_query()
+        outsig = self._qplan.output_signature
+        pp2idx = {hashable_path(pp): idx for idx, pp in enumerate(outsig)}
+        steps = []
+        for agg in aggregates:
+            if agg.path is None:
+                getter = lambda x: None
+            else:
+                ag = agg.path.meta.attrgetter
+                idx = pp2idx[hashable_path(agg.path.meta.root)]
+                getter = lambda x, ag=ag, idx=idx: ag(x[idx])
+            steps.append((agg.step, getter))
+
+        # A single aggregate with a reduce function is folded in one call
+        reduce = aggregates[0].reduce if len(aggregates) == 1 else None
+
+        def fold(rows):
+            if reduce is not None:
+                return (aggregates[0].result(reduce(map(steps[0][1], rows))),)
+            accs = [agg.initial for agg in aggregates]
+            for row in rows:
+                for idx, (step, getter) in enumerate(steps):
+                    accs[idx] = step(accs[idx], getter(row))
+            return tuple([agg.result(acc) for agg, acc in zip(aggregates, accs)])
+
+        if not self._qspec.group_by:
+            return fold(self._query())
+
+        def group_by_fold():
+            for k, g in self._groups():
+                yield k, fold(g)
+
+        return group_by_fold()
+
+    # For a single predicate query with no where clause a count is the number of
+    # facts and the min/max of a field with an ordered index is its first/last
+    # key. Returns None if some aggregate cannot be answered this way.
+    def _aggregate_from_factmap(self, aggregates):
+        roots = self._qspec.roots
+        if len(roots) != 1 or self._qspec.where:
+            return None
+        fm = self._factmaps[path(roots[0]).meta.predicate]
+        values = []
+        for agg in aggregates:
+            if agg.name == "count":
+                values.append(len(fm))
+                continue
+            if agg.name not in ("min", "max"):
+                return None
+            fi = fm.path2factindex.get(hashable_path(agg.path.meta.dealiased), None)
+            if fi is None or not fi.ordered:
+                return None
+            keys = fi.keys
+            if not keys:
+                raise ValueError("Query has no matching elements")
+            values.append(keys[0] if agg.name == "min" else keys[-1])
+        return tuple(values)
 
     # --------------------------------------------------------------------------
     # Delete a selection of facts. Maintains a set for each predicate type
@@ -4294,6 +5951,7 @@ class QueryExecutor(object):
             raise ValueError("'group_by' is incompatible with 'delete'")
         if self._qspec.tuple:
             raise ValueError("'tuple' is incompatible with 'delete'")
+        self._check_unlimited("delete")
 
         self._qplan, self._query = self._make_plan_and_query()
 
@@ -4407,6 +6065,7 @@ class QueryExecutor(object):
             raise ValueError(f"'group_by' is incompatible with '{name}'")
         if self._qspec.tuple:
             raise ValueError(f"'tuple' is incompatible with '{name}'")
+        self._check_unlimited(name)
 
         self._qplan, self._query = self._make_plan_and_query()
 
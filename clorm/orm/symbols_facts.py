@@ -13,7 +13,7 @@ from __future__ import annotations
 
 import itertools
 import sys
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 from typing import (
     Dict,
     Iterable,
@@ -87,14 +87,45 @@ class FactParserError(ClormError):
 # A unifier takes a list of predicates to unify against (order matters) and a
 # set of raw clingo symbols against this list. Implementation detail: maintain
 # a lookup of predicates that is determined first by arity and then by name.
+#
+# By default each predicate is unified strictly or lazily as specified by its
+# definition (the 'lazy_unify' meta option). Setting 'lazy_unify' overrides this
+# for all predicates. Note: a lazily unified fact only checks the name, arity,
+# and sign of a symbol, so with predicates that differ only in their field types
+# the first predicate always matches.
+#
+# A non-zero 'cache_size' keeps a bounded LRU cache from symbols to the unified
+# facts (or None if the symbol didn't unify). When the unifier is reused, for
+# example for consecutive models, a repeated symbol returns the same fact
+# without being unified again. This is safe because facts are immutable.
 # ------------------------------------------------------------------------------
 
+_NOT_CACHED = object()
+
 
 class Unifier(object):
-    def __init__(self, predicates: Iterable[Type[Predicate]]) -> None:
+    def __init__(
+        self,
+        predicates: Iterable[Type[Predicate]],
+        *,
+        lazy_unify: Optional[bool] = None,
+        cache_size: int = 0,
+    ) -> None:
+        if cache_size < 0:
+            raise ValueError("The unifier cache size cannot be negative")
         self._predicates = tuple(predicates)
         self._pgroups: _PredicateGroups = defaultdict(list)
-        self._add_predicates(predicates)
+        self._add_predicates(self._predicates)
+        if lazy_unify is None:
+            self._unify_name = "_unify"
+        else:
+            self._unify_name = "_unify_lazy" if lazy_unify else "_unify_strict"
+        self._cache_size = cache_size
+        self._cache: Optional[OrderedDict[AnySymbol, Optional[Predicate]]] = (
+            OrderedDict() if cache_size else None
+        )
+        self._cache_hits = 0
+        self._cache_misses = 0
 
     def _add_predicates(self, predicates: Iterable[Type[Predicate]]) -> None:
         for p in predicates:
@@ -102,21 +133,58 @@ class Unifier(object):
 
     def add_predicate(self, predicate: Type[Predicate]) -> None:
         self._add_predicates([predicate])
+        self.clear_cache()
+
+    @property
+    def cache_size(self) -> int:
+        return self._cache_size
+
+    @property
+    def cache_hits(self) -> int:
+        return self._cache_hits
+
+    @property
+    def cache_misses(self) -> int:
+        return self._cache_misses
+
+    def clear_cache(self) -> None:
+        if self._cache is not None:
+            self._cache.clear()
+        self._cache_hits = 0
+        self._cache_misses = 0
 
     def iter_unify(
         self, symbols: Iterable[AnySymbol], raise_nomatch: bool
     ) -> Iterator[Predicate]:
         known_names = set([name for _, name in self._pgroups.keys()])
+        unify_name = self._unify_name
+        ugroups = {
+            key: [getattr(pred, unify_name) for pred in preds]
+            for key, preds in self._pgroups.items()
+        }
+        cache = self._cache
         for sym in symbols:
             sym_name = sym.name
             instance = None
             if sym_name in known_names:
-                sym_args = sym.arguments
-                for pred in self._pgroups[(len(sym_args), sym_name)]:
-                    instance = pred._unify(sym, sym_args, sym_name)
-                    if instance is not None:
-                        yield instance
-                        break
+                cached = _NOT_CACHED if cache is None else cache.get(sym, _NOT_CACHED)
+                if cached is not _NOT_CACHED:
+                    cache.move_to_end(sym)  # type: ignore
+                    self._cache_hits += 1
+                    instance = cached
+                else:
+                    sym_args = sym.arguments
+                    for unify in ugroups.get((len(sym_args), sym_name), ()):
+                        instance = unify(sym, sym_args, sym_name)
+                        if instance is not None:
+                            break
+                    if cache is not None:
+                        self._cache_misses += 1
+                        cache[sym] = instance
+                        if len(cache) > self._cache_size:
+                            cache.popitem(last=False)
+                if instance is not None:
+                    yield instance
             if raise_nomatch and instance is None:
                 raise UnifierNoMatchError(
                     f"Cannot unify symbol '{sym}' to predicates in {self._predicates}",
@@ -167,8 +235,13 @@ class SymbolPredicateUnifier(object):
         predicates: Iterable[Type[Predicate]] = [],
         indexes: Iterable[PredicatePath] = [],
         suppress_auto_index: bool = False,
+        cache_size: int = 0,
     ) -> None:
+        if cache_size < 0:
+            raise ValueError("The unifier cache size cannot be negative")
         self._suppress_auto_index = suppress_auto_index
+        self._cache_size = cache_size
+        self._unifier: Optional[Unifier] = None
         tmppreds: List[Type[Predicate]] = []
         tmpinds: List[PredicatePath] = []
         tmppredset: Set[Type[Predicate]] = set()
@@ -231,8 +304,16 @@ class SymbolPredicateUnifier(object):
         self._register_predicate(cls, predicates, indexes, tmppredset, tmpindset)
         self._predicates = tuple(predicates)
         self._indexes = tuple(indexes)
+        self._unifier = None
         return cls
 
+    # The Unifier for the registered predicates. It is kept between calls so
+    # that its cache (if any) is reused.
+    def _get_unifier(self) -> Unifier:
+        if self._unifier is None:
+            self._unifier = Unifier(self._predicates, cache_size=self._cache_size)
+        return self._unifier
+
     def unify(
         self,
         symbols: Iterable[AnySymbol],
@@ -240,7 +321,7 @@ class SymbolPredicateUnifier(object):
         raise_on_empty: bool = False,
     ) -> FactBase:
         def _populate():
-            facts = list(_unify(self.predicates, symbols))
+            facts = list(self._get_unifier().iter_unify(symbols, raise_nomatch=False))
             if not facts and raise_on_empty:
                 raise ValueError("FactBase creation: failed to unify any symbols")
             return facts
@@ -258,6 +339,14 @@ class SymbolPredicateUnifier(object):
     def indexes(self):
         return self._indexes
 
+    @property
+    def cache_hits(self) -> int:
+        return self._unifier.cache_hits if self._unifier else 0
+
+    @property
+    def cache_misses(self) -> int:
+        return self._unifier.cache_misses if self._unifier else 0
+
 
 # ------------------------------------------------------------------------------
 # Generate facts from an input array of Symbols.  The `unifier` argument takes a
@@ -308,10 +397,9 @@ def unify(
             ("The unifier must be a list of predicates " "or a SymbolPredicateUnifier")
         )
     if ordered:
-        predicates = (
-            unifier.predicates if isinstance(unifier, SymbolPredicateUnifier) else unifier
-        )
-        return list(_unify(predicates, symbols))
+        if isinstance(unifier, SymbolPredicateUnifier):
+            return list(unifier._get_unifier().iter_unify(symbols, raise_nomatch=False))
+        return list(_unify(unifier, symbols))
     else:
         if not isinstance(unifier, SymbolPredicateUnifier):
             unifier = SymbolPredicateUnifier(predicates=unifier)
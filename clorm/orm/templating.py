@@ -67,12 +67,18 @@ def __init__(self,
     {{%assign_defaults%}}
     {{%check_complex%}}
 
-    self._field_values = ({{%args%}})
+    self._field_values = ({{%args_values%}})
 
-    # Create the raw symbol
+    {{%create_raw%}}
+
+
+def _build_raw(self) -> AnySymbol:
+    # Create the raw symbol from the field values
+    [{{%args%}}] = self._field_values
     self._raw = Function("{pdefn.name}",
                          ({{%args_raw%}}),
                          self._sign)
+    return self._raw
 
 
 @classmethod
@@ -101,10 +107,34 @@ def _unify(cls: Type[_P], raw: AnySymbol, raw_args: Optional[Sequence[AnySymbol]
                           "it is not a clingo Symbol Function object"))
 
 
+@classmethod
+def _unify_lazy(cls: Type[_P], raw: AnySymbol, raw_args: Optional[Sequence[AnySymbol]]=None, raw_name: Optional[str]=None) -> Optional[_P]:
+    try:
+        raw_args = raw_args if raw_args else raw.arguments
+        raw_name = raw_name if raw_name else raw.name
+        if len(raw_args) != {pdefn.arity}:
+            return None
+
+        {{%sign_check_unify%}}
+
+        if raw_name != "{pdefn.name}":
+            return None
+
+        instance = cls.__new__(cls)
+        instance._raw = raw
+        instance._hash = None
+        instance._sign = raw.positive
+        instance._field_values = LazyFieldValues(PREDICATE_DEFN, raw_args)
+        return instance
+    except AttributeError as e:
+        raise ValueError((f"Cannot unify with object {{raw}} ({{type(raw)}}) as "
+                          "it is not a clingo Symbol Function object"))
+
+
 def nontuple__eq__(self, other: Any) -> bool:
     # Deal with a non-tuple predicate
     if isinstance(other, Predicate):
-        return self._raw == other._raw
+        return self._raw == other.symbol
     if isinstance(other, Symbol):
         return self._raw == other
     return NotImplemented
@@ -113,7 +143,7 @@ def nontuple__eq__(self, other: Any) -> bool:
 def tuple__eq__(self, other: Any) -> bool:
     # Deal with a predicate that is a tuple
     if isinstance(other, Predicate):
-        return self._raw == other._raw
+        return self._raw == other.symbol
     if isinstance(other, Symbol):
         return self._raw == other
 #    if isinstance(other, tuple):
@@ -124,7 +154,7 @@ def tuple__eq__(self, other: Any) -> bool:
 def nontuple__lt__(self, other):
     # If it is the same predicate class then compare the underlying clingo symbol
     if isinstance(other, Predicate):
-        return self._raw < other._raw
+        return self._raw < other.symbol
     if isinstance(other, Symbol):
         return self._raw < other
     return NotImplemented
@@ -133,7 +163,7 @@ def nontuple__lt__(self, other):
 def tuple__lt__(self, other):
     # self is always less than a non-tuple predicate
     if isinstance(other, Predicate):
-        return self._raw < other._raw
+        return self._raw < other.symbol
     if isinstance(other, Symbol):
         return self._raw < other
 #    if isinstance(other, tuple):
@@ -143,7 +173,7 @@ def tuple__lt__(self, other):
 
 def nontuple__gt__(self, other):
     if isinstance(other, Predicate):
-        return self._raw > other._raw
+        return self._raw > other.symbol
     if isinstance(other, Symbol):
         return self._raw > other
     return NotImplemented
@@ -152,7 +182,7 @@ def nontuple__gt__(self, other):
 def tuple__gt__(self, other):
     # If it is the same predicate class then compare the sign and fields
     if isinstance(other, Predicate):
-        return self._raw > other._raw
+        return self._raw > other.symbol
     if isinstance(other, Symbol):
         return self._raw > other
 #    if isinstance(other, tuple):
@@ -160,6 +190,35 @@ def tuple__gt__(self, other):
     return NotImplemented
 
 
+def lazy__eq__(self, other: Any) -> bool:
+    # Facts of the same class are compared on their sign and field values so
+    # that the raw symbols don't have to be built
+    if other.__class__ is self.__class__:
+        return (self._sign == other._sign and
+                tuple(self._field_values) == tuple(other._field_values))
+    if isinstance(other, Predicate):
+        return self.symbol == other.symbol
+    if isinstance(other, Symbol):
+        return self.symbol == other
+    return NotImplemented
+
+
+def lazy__lt__(self, other):
+    if isinstance(other, Predicate):
+        return self.symbol < other.symbol
+    if isinstance(other, Symbol):
+        return self.symbol < other
+    return NotImplemented
+
+
+def lazy__gt__(self, other):
+    if isinstance(other, Predicate):
+        return self.symbol > other.symbol
+    if isinstance(other, Symbol):
+        return self.symbol > other
+    return NotImplemented
+
+
 def __ge__(self, other):
     result = self.__lt__(other)
     if result is NotImplemented:
@@ -180,6 +239,13 @@ def __hash__(self):
     return self._hash
 
 
+def lazy__hash__(self):
+    # Must be consistent with lazy__eq__ so is based on the field values
+    if self._hash is None:
+        self._hash = hash((self._sign, tuple(self._field_values)))
+    return self._hash
+
+
 __eq__ = tuple__eq__ if PREDICATE_IS_TUPLE else nontuple__eq__
 __lt__ = tuple__lt__ if PREDICATE_IS_TUPLE else nontuple__lt__
 __gt__ = tuple__gt__ if PREDICATE_IS_TUPLE else nontuple__gt__
@@ -228,6 +294,13 @@ PREDICATE_UNIFY_DOCSTRING = r"""
     Returns None on failure to unify otherwise returns the new fact
 """
 
+PREDICATE_UNIFY_LAZY_DOCSTRING = r"""
+    Unify a (raw) Symbol object with the class, only checking the name, arity,
+    and sign. The field values are converted when they are first accessed.
+
+    Returns None on failure to unify otherwise returns the new fact
+"""
+
 # ------------------------------------------------------------------------------
 # main
 # ------------------------------------------------------------------------------
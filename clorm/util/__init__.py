@@ -1 +1,2 @@
 from .oset import OrderedSet
+from .sortedlist import SortedList
@@ -14,7 +14,7 @@ from collections import OrderedDict
 
 class OrderedSet(object):
     def __init__(self, iterable=[]):
-        self._dict = OrderedDict([(elem, True) for elem in iterable])
+        self._dict = OrderedDict.fromkeys(iterable, True)
 
     def add(self, elem):
         self._dict[elem] = True
@@ -32,7 +32,7 @@ class OrderedSet(object):
         self._dict.clear()
 
     def copy(self):
-        tmp = OrderedSet()
+        tmp = OrderedSet.__new__(OrderedSet)
         tmp._dict = self._dict.copy()
         return tmp
 
@@ -117,7 +117,7 @@ class OrderedSet(object):
             if isinstance(other, self.__class__):
                 self._dict.update(other._dict)
             else:
-                self._dict.update({key: True for key in other})
+                self._dict.update(OrderedDict.fromkeys(other, True))
 
     def intersection_update(self, *others):
         if not others:
@@ -159,8 +159,7 @@ class OrderedSet(object):
         return len(self._dict)
 
     def __iter__(self):
-        for k, v in self._dict.items():
-            yield k
+        return iter(self._dict)
 
     def __eq__(self, other):
         # Not sure why this shouldn't raise a TypeError for set but I want the
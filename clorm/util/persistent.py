@@ -0,0 +1,654 @@
+# -----------------------------------------------------------------------------
+# Persistent (immutable) containers. Modifying a persistent container returns a
+# new container that shares almost all of its structure with the original, so
+# many versions can be kept alive cheaply.
+#
+# PersistentMap is a hash array mapped trie (HAMT). Each node uses 5 bits of the
+# key's hash to select a child from a bitmap-compressed array of children, so
+# an update only copies the O(log32 n) nodes on the path to the key. Keys with
+# the same full hash are stored together in a collision node.
+#
+# PersistentOrderedSet preserves insertion order (for determinism, like
+# OrderedSet). Each element is mapped to an increasing sequence number by a
+# PersistentMap and a radix trie (indexed by the sequence number) stores the
+# elements in sequence order for iteration.
+#
+# PersistentSortedSet is a treap (a binary search tree that is also a heap on a
+# priority derived from the hash of each element) that supports range
+# iteration. An update copies the O(log n) nodes on the path to the element.
+# ------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+from collections.abc import Mapping, Set
+
+__all__ = [
+    "PersistentMap",
+    "PersistentOrderedSet",
+    "PersistentSortedSet",
+]
+
+# ------------------------------------------------------------------------------
+# PersistentMap
+# ------------------------------------------------------------------------------
+
+_BITS = 5
+_MASK = (1 << _BITS) - 1
+_HASHMASK = (1 << 64) - 1
+
+
+def _popcount(x):
+    return bin(x).count("1")
+
+
+# A trie node: a bitmap of the occupied slots and the tuple of children. A child
+# is a leaf (a (hash, key, value) tuple), a _Collision, or another _Node.
+class _Node(object):
+    __slots__ = ("bitmap", "children")
+
+    def __init__(self, bitmap, children):
+        self.bitmap = bitmap
+        self.children = children
+
+
+class _Collision(object):
+    __slots__ = ("hash", "entries")
+
+    def __init__(self, h, entries):
+        self.hash = h
+        self.entries = entries
+
+
+_EMPTY_NODE = _Node(0, ())
+
+
+def _hash(key):
+    return hash(key) & _HASHMASK
+
+
+# Create a node (at some depth) that contains two children with different hashes
+def _pair(shift, h1, child1, h2, child2):
+    i1 = (h1 >> shift) & _MASK
+    i2 = (h2 >> shift) & _MASK
+    if i1 == i2:
+        return _Node(1 << i1, (_pair(shift + _BITS, h1, child1, h2, child2),))
+    if i1 < i2:
+        return _Node((1 << i1) | (1 << i2), (child1, child2))
+    return _Node((1 << i1) | (1 << i2), (child2, child1))
+
+
+# Returns the new node and whether a new key was added. The original node is
+# returned if the key already maps to the same value.
+def _assoc(node, shift, h, key, value):
+    bit = 1 << ((h >> shift) & _MASK)
+    idx = _popcount(node.bitmap & (bit - 1))
+    children = node.children
+    if not node.bitmap & bit:
+        leaf = (h, key, value)
+        return (_Node(node.bitmap | bit, children[:idx] + (leaf,) + children[idx:]), True)
+    child = children[idx]
+    if isinstance(child, _Node):
+        nchild, added = _assoc(child, shift + _BITS, h, key, value)
+    elif isinstance(child, _Collision):
+        if child.hash != h:
+            nchild, added = _pair(shift + _BITS, child.hash, child, h, (h, key, value)), True
+        else:
+            entries = child.entries
+            for pos, (k, v) in enumerate(entries):
+                if k == key:
+                    if v is value:
+                        return (node, False)
+                    entries = entries[:pos] + ((key, value),) + entries[pos + 1 :]
+                    nchild, added = _Collision(h, entries), False
+                    break
+            else:
+                nchild, added = _Collision(h, entries + ((key, value),)), True
+    else:
+        ch, ck, cv = child
+        if ch == h and ck == key:
+            if cv is value:
+                return (node, False)
+            nchild, added = (h, key, value), False
+        elif ch == h:
+            nchild, added = _Collision(h, ((ck, cv), (key, value))), True
+        else:
+            nchild, added = _pair(shift + _BITS, ch, child, h, (h, key, value)), True
+    if nchild is child:
+        return (node, added)
+    return (_Node(node.bitmap, children[:idx] + (nchild,) + children[idx + 1 :]), added)
+
+
+# Returns the new node (None if it is empty) or the original node if the key
+# was not found. A node left with a single leaf (or collision) child is replaced
+# by that child.
+def _dissoc(node, shift, h, key):
+    bit = 1 << ((h >> shift) & _MASK)
+    if not node.bitmap & bit:
+        return node
+    idx = _popcount(node.bitmap & (bit - 1))
+    children = node.children
+    child = children[idx]
+    if isinstance(child, _Node):
+        nchild = _dissoc(child, shift + _BITS, h, key)
+        if nchild is child:
+            return node
+    elif isinstance(child, _Collision):
+        if child.hash != h:
+            return node
+        entries = tuple([(k, v) for k, v in child.entries if k != key])
+        if len(entries) == len(child.entries):
+            return node
+        nchild = _Collision(h, entries) if len(entries) > 1 else (h,) + entries[0]
+    else:
+        if child[0] != h or child[1] != key:
+            return node
+        nchild = None
+    if nchild is None:
+        if len(children) == 1:
+            return None
+        children = children[:idx] + children[idx + 1 :]
+        bitmap = node.bitmap & ~bit
+        if len(children) == 1 and not isinstance(children[0], _Node):
+            return children[0]
+        return _Node(bitmap, children)
+    if len(children) == 1 and not isinstance(nchild, _Node):
+        return nchild
+    return _Node(node.bitmap, children[:idx] + (nchild,) + children[idx + 1 :])
+
+
+def _lookup(node, h, key, default):
+    shift = 0
+    while True:
+        bit = 1 << ((h >> shift) & _MASK)
+        if not node.bitmap & bit:
+            return default
+        child = node.children[_popcount(node.bitmap & (bit - 1))]
+        if isinstance(child, _Node):
+            node = child
+            shift += _BITS
+        elif isinstance(child, _Collision):
+            if child.hash == h:
+                for k, v in child.entries:
+                    if k == key:
+                        return v
+            return default
+        else:
+            if child[0] == h and child[1] == key:
+                return child[2]
+            return default
+
+
+# Bulk build a trie from a list of leaves with distinct keys
+def _build(leaves, shift):
+    if len(leaves) == 1:
+        return leaves[0]
+    h = leaves[0][0]
+    if shift >= 64 or all(leaf[0] == h for leaf in leaves):
+        return _Collision(h, tuple([(k, v) for _, k, v in leaves]))
+    buckets = {}
+    for leaf in leaves:
+        buckets.setdefault((leaf[0] >> shift) & _MASK, []).append(leaf)
+    bitmap = 0
+    children = []
+    for idx in sorted(buckets):
+        bitmap |= 1 << idx
+        children.append(_build(buckets[idx], shift + _BITS))
+    return _Node(bitmap, tuple(children))
+
+
+# The root is always a node (a single leaf or collision is wrapped in a node)
+def _rootnode(root):
+    if isinstance(root, _Node):
+        return root
+    h = root.hash if isinstance(root, _Collision) else root[0]
+    return _Node(1 << (h & _MASK), (root,))
+
+
+def _iter_leaves(node):
+    stack = [iter(node.children)]
+    while stack:
+        for child in stack[-1]:
+            if isinstance(child, _Node):
+                stack.append(iter(child.children))
+                break
+            elif isinstance(child, _Collision):
+                for k, v in child.entries:
+                    yield (k, v)
+            else:
+                yield (child[1], child[2])
+        else:
+            stack.pop()
+
+
+class PersistentMap(Mapping):
+    """An immutable hash map where updates return a new map."""
+
+    __slots__ = ("_root", "_len")
+
+    def __init__(self, items=()):
+        if isinstance(items, Mapping):
+            items = items.items()
+        tmp = {}
+        for key, value in items:
+            tmp[key] = value
+        self._len = len(tmp)
+        self._root = _EMPTY_NODE
+        if tmp:
+            self._root = _rootnode(_build([(_hash(k), k, v) for k, v in tmp.items()], 0))
+
+    @classmethod
+    def _make(cls, root, length):
+        tmp = cls.__new__(cls)
+        tmp._root = _rootnode(root)
+        tmp._len = length
+        return tmp
+
+    def set(self, key, value):
+        """Return a map with the key set to the value."""
+        root, added = _assoc(self._root, 0, _hash(key), key, value)
+        if root is self._root:
+            return self
+        return PersistentMap._make(root, self._len + 1 if added else self._len)
+
+    def remove(self, key):
+        """Return a map without the key (raises KeyError if the key is missing)."""
+        tmp = self.discard(key)
+        if tmp is self:
+            raise KeyError(key)
+        return tmp
+
+    def discard(self, key):
+        """Return a map without the key (if it exists)."""
+        root = _dissoc(self._root, 0, _hash(key), key)
+        if root is self._root:
+            return self
+        if root is None:
+            return PersistentMap._make(_EMPTY_NODE, 0)
+        return PersistentMap._make(root, self._len - 1)
+
+    def get(self, key, default=None):
+        return _lookup(self._root, _hash(key), key, default)
+
+    def __getitem__(self, key):
+        missing = _MISSING
+        value = _lookup(self._root, _hash(key), key, missing)
+        if value is missing:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return _lookup(self._root, _hash(key), key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for k, _ in _iter_leaves(self._root):
+            yield k
+
+    def items(self):
+        return _iter_leaves(self._root)
+
+    def values(self):
+        return (v for _, v in _iter_leaves(self._root))
+
+    def __str__(self):
+        return "{" + ", ".join(["{!r}: {!r}".format(k, v) for k, v in self.items()]) + "}"
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, self.__str__())
+
+
+_MISSING = object()
+
+# ------------------------------------------------------------------------------
+# PersistentOrderedSet
+# ------------------------------------------------------------------------------
+
+_WIDTH = 1 << _BITS
+
+
+# Set the slot of a radix trie of the given depth (None values remove a slot and
+# empty nodes are pruned)
+def _vset(node, depth, idx, value):
+    shift = depth * _BITS
+    pos = (idx >> shift) & _MASK
+    slots = node if node is not None else (None,) * _WIDTH
+    if depth == 0:
+        nchild = value
+    else:
+        nchild = _vset(slots[pos], depth - 1, idx, value)
+    if nchild is None and node is None:
+        return None
+    slots = slots[:pos] + (nchild,) + slots[pos + 1 :]
+    if nchild is None and all(s is None for s in slots):
+        return None
+    return slots
+
+
+def _viter(node, depth):
+    if depth == 0:
+        for value in node:
+            if value is not None:
+                yield value
+        return
+    for child in node:
+        if child is not None:
+            yield from _viter(child, depth - 1)
+
+
+# Bulk build a radix trie of the given depth from a list of values
+def _vbuild(values, depth):
+    if depth == 0:
+        return tuple(values) + (None,) * (_WIDTH - len(values))
+    chunk = _WIDTH**depth
+    children = [_vbuild(values[i : i + chunk], depth - 1) for i in range(0, len(values), chunk)]
+    return tuple(children) + (None,) * (_WIDTH - len(children))
+
+
+class PersistentOrderedSet(Set):
+    """An immutable insertion ordered set where updates return a new set."""
+
+    __slots__ = ("_seqs", "_trie", "_depth", "_next")
+
+    def __init__(self, iterable=()):
+        elems = list(dict.fromkeys(iterable))
+        self._seqs = PersistentMap(zip(elems, range(len(elems))))
+        self._next = len(elems)
+        self._depth = 0
+        while _WIDTH ** (self._depth + 1) < self._next:
+            self._depth += 1
+        self._trie = _vbuild(elems, self._depth) if elems else None
+
+    def _make(self, seqs, trie, depth, next):
+        tmp = PersistentOrderedSet.__new__(PersistentOrderedSet)
+        tmp._seqs = seqs
+        tmp._trie = trie
+        tmp._depth = depth
+        tmp._next = next
+        return tmp
+
+    def add(self, elem):
+        """Return a set with the element added (at the end)."""
+        if elem in self._seqs:
+            return self
+        seq = self._next
+        trie = self._trie
+        depth = self._depth
+        if trie is None:
+            depth = 0
+        while seq >= _WIDTH ** (depth + 1):
+            if trie is not None:
+                trie = (trie,) + (None,) * (_WIDTH - 1)
+            depth += 1
+        trie = _vset(trie, depth, seq, elem)
+        return self._make(self._seqs.set(elem, seq), trie, depth, seq + 1)
+
+    def update(self, iterable):
+        """Return a set with the elements added."""
+        tmp = self
+        for elem in iterable:
+            tmp = tmp.add(elem)
+        return tmp
+
+    def remove(self, elem):
+        """Return a set without the element (raises KeyError if it is missing)."""
+        tmp = self.discard(elem)
+        if tmp is self:
+            raise KeyError(elem)
+        return tmp
+
+    def discard(self, elem):
+        """Return a set without the element (if it exists)."""
+        seq = self._seqs.get(elem, None)
+        if seq is None:
+            return self
+        seqs = self._seqs.remove(elem)
+        if not seqs:
+            return PersistentOrderedSet()
+        trie = _vset(self._trie, self._depth, seq, None)
+        return self._make(seqs, trie, self._depth, self._next)
+
+    def __contains__(self, elem):
+        return elem in self._seqs
+
+    def __len__(self):
+        return len(self._seqs)
+
+    def __bool__(self):
+        return len(self._seqs) > 0
+
+    def __iter__(self):
+        if self._trie is None:
+            return iter(())
+        return _viter(self._trie, self._depth)
+
+    def __reversed__(self):
+        return reversed(list(self))
+
+    def __str__(self):
+        return "{" + ", ".join([repr(e) for e in self]) + "}"
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, self.__str__())
+
+
+# ------------------------------------------------------------------------------
+# PersistentSortedSet
+# ------------------------------------------------------------------------------
+
+
+# The priority is a mix of the element's hash so that a treap built from sorted
+# (or sequential integer) elements is still balanced.
+def _priority(elem):
+    return (((hash(elem) & _HASHMASK) * 0x9E3779B97F4A7C15) & _HASHMASK) >> 32
+
+
+class _TNode(object):
+    __slots__ = ("key", "prio", "left", "right")
+
+    def __init__(self, key, prio, left, right):
+        self.key = key
+        self.prio = prio
+        self.left = left
+        self.right = right
+
+
+def _tinsert(node, key, prio):
+    if node is None:
+        return _TNode(key, prio, None, None)
+    if key < node.key:
+        left = _tinsert(node.left, key, prio)
+        if left is node.left:
+            return node
+        if left.prio > node.prio:
+            return _TNode(
+                left.key,
+                left.prio,
+                left.left,
+                _TNode(node.key, node.prio, left.right, node.right),
+            )
+        return _TNode(node.key, node.prio, left, node.right)
+    if node.key < key:
+        right = _tinsert(node.right, key, prio)
+        if right is node.right:
+            return node
+        if right.prio > node.prio:
+            return _TNode(
+                right.key,
+                right.prio,
+                _TNode(node.key, node.prio, node.left, right.left),
+                right.right,
+            )
+        return _TNode(node.key, node.prio, node.left, right)
+    return node
+
+
+def _tjoin(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.prio > right.prio:
+        return _TNode(left.key, left.prio, left.left, _tjoin(left.right, right))
+    return _TNode(right.key, right.prio, _tjoin(left, right.left), right.right)
+
+
+_TMISSING = _TNode(None, 0, None, None)
+
+
+# Returns the original node if the key was not found
+def _tdelete(node, key):
+    if node is None:
+        return _TMISSING
+    if key < node.key:
+        left = _tdelete(node.left, key)
+        if left is _TMISSING:
+            return left
+        return _TNode(node.key, node.prio, left, node.right)
+    if node.key < key:
+        right = _tdelete(node.right, key)
+        if right is _TMISSING:
+            return right
+        return _TNode(node.key, node.prio, node.left, right)
+    return _tjoin(node.left, node.right)
+
+
+# Bulk build a treap from sorted distinct keys (a Cartesian tree built with a
+# stack of the right spine)
+def _tbuild(keys):
+    stack = []
+    for key in keys:
+        node = _TNode(key, _priority(key), None, None)
+        last = None
+        while stack and stack[-1].prio < node.prio:
+            last = stack.pop()
+        node.left = last
+        if stack:
+            stack[-1].right = node
+        stack.append(node)
+    return stack[0] if stack else None
+
+
+def _titer(node, minimum, maximum, inclusive, reverse):
+    lo_incl, hi_incl = inclusive
+    stack = []
+    while True:
+        while node is not None:
+            if not reverse:
+                if minimum is not None and (
+                    node.key < minimum or (not lo_incl and node.key == minimum)
+                ):
+                    node = node.right
+                    continue
+                stack.append(node)
+                node = node.left
+            else:
+                if maximum is not None and (
+                    maximum < node.key or (not hi_incl and node.key == maximum)
+                ):
+                    node = node.left
+                    continue
+                stack.append(node)
+                node = node.right
+        if not stack:
+            return
+        node = stack.pop()
+        key = node.key
+        if not reverse:
+            if maximum is not None and (maximum < key or (not hi_incl and key == maximum)):
+                return
+            if minimum is None or minimum < key or (lo_incl and key == minimum):
+                yield key
+            node = node.right
+        else:
+            if minimum is not None and (key < minimum or (not lo_incl and key == minimum)):
+                return
+            if maximum is None or key < maximum or (hi_incl and key == maximum):
+                yield key
+            node = node.left
+
+
+class PersistentSortedSet(object):
+    """An immutable sorted set where updates return a new set.
+
+    Supports the same range iteration (``irange``) as SortedList.
+    """
+
+    __slots__ = ("_root", "_len")
+
+    def __init__(self, iterable=()):
+        keys = sorted(set(iterable))
+        self._root = _tbuild(keys)
+        self._len = len(keys)
+
+    def _make(self, root, length):
+        tmp = PersistentSortedSet.__new__(PersistentSortedSet)
+        tmp._root = root
+        tmp._len = length
+        return tmp
+
+    def add(self, key):
+        """Return a set with the element added."""
+        root = _tinsert(self._root, key, _priority(key))
+        if root is self._root:
+            return self
+        return self._make(root, self._len + 1)
+
+    def remove(self, key):
+        """Return a set without the element (raises KeyError if it is missing)."""
+        root = _tdelete(self._root, key)
+        if root is _TMISSING:
+            raise KeyError(key)
+        return self._make(root, self._len - 1)
+
+    def discard(self, key):
+        """Return a set without the element (if it exists)."""
+        root = _tdelete(self._root, key)
+        if root is _TMISSING:
+            return self
+        return self._make(root, self._len - 1)
+
+    def irange(self, minimum=None, maximum=None, inclusive=(True, True), reverse=False):
+        return _titer(self._root, minimum, maximum, inclusive, reverse)
+
+    def __contains__(self, key):
+        node = self._root
+        while node is not None:
+            if key < node.key:
+                node = node.left
+            elif node.key < key:
+                node = node.right
+            else:
+                return True
+        return False
+
+    def __bool__(self):
+        return self._len > 0
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return _titer(self._root, None, None, (True, True), False)
+
+    def __reversed__(self):
+        return _titer(self._root, None, None, (True, True), True)
+
+    def __eq__(self, other):
+        if isinstance(other, PersistentSortedSet):
+            return self._len == other._len and list(self) == list(other)
+        return NotImplemented
+
+    def __str__(self):
+        return "[" + ", ".join([repr(e) for e in self]) + "]"
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, self.__str__())
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    raise RuntimeError("Cannot run modules")
@@ -0,0 +1,248 @@
+# -----------------------------------------------------------------------------
+# A sorted list implemented as a shallow B+-tree. The elements are stored in a
+# sequence of sorted leaf lists (each bounded by a load factor) with a separate
+# list holding the maximum element of each leaf. Locating an element is a
+# bisect over the leaf maximums followed by a bisect within a single leaf. So
+# inserting or deleting an element only shifts the elements of one (bounded)
+# leaf rather than the whole list, as happens with bisect.insort() on a plain
+# Python list.
+#
+# The idea is based on the python sortedcontainers library
+# (https://github.com/grantjenks/python-sortedcontainers).
+# ------------------------------------------------------------------------------
+
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Sequence
+
+__all__ = [
+    "SortedList",
+]
+
+# ------------------------------------------------------------------------------
+#
+# ------------------------------------------------------------------------------
+
+
+class SortedList(object):
+    # Leaves are split when they grow larger than twice the load factor and are
+    # merged with a neighbour when they shrink below half the load factor.
+    _load = 1000
+
+    def __init__(self, iterable=[]):
+        self._leaves = []
+        self._maxes = []
+        self._len = 0
+        if iterable:
+            self.update(iterable)
+
+    # --------------------------------------------------------------------------
+    # Internal functions to maintain the leaves
+    # --------------------------------------------------------------------------
+
+    def _split(self, pos):
+        leaf = self._leaves[pos]
+        if len(leaf) <= 2 * self._load:
+            return
+        half = leaf[self._load :]
+        del leaf[self._load :]
+        self._maxes[pos] = leaf[-1]
+        self._leaves.insert(pos + 1, half)
+        self._maxes.insert(pos + 1, half[-1])
+
+    def _merge(self, pos):
+        leaf = self._leaves[pos]
+        if not leaf:
+            del self._leaves[pos]
+            del self._maxes[pos]
+            return
+        if len(leaf) >= self._load // 2 or len(self._leaves) == 1:
+            return
+        if pos == len(self._leaves) - 1:
+            pos -= 1
+        self._leaves[pos].extend(self._leaves[pos + 1])
+        self._maxes[pos] = self._leaves[pos][-1]
+        del self._leaves[pos + 1]
+        del self._maxes[pos + 1]
+        self._split(pos)
+
+    # Locations are (leaf, offset) pairs. A leaf equal to the number of leaves
+    # is the end location.
+    def _loc_left(self, value):
+        pos = bisect_left(self._maxes, value)
+        if pos == len(self._maxes):
+            return (pos, 0)
+        return (pos, bisect_left(self._leaves[pos], value))
+
+    def _loc_right(self, value):
+        pos = bisect_right(self._maxes, value)
+        if pos == len(self._maxes):
+            return (pos, 0)
+        return (pos, bisect_right(self._leaves[pos], value))
+
+    def _islice(self, start, stop, reverse):
+        (spos, sidx), (epos, eidx) = start, stop
+        if (spos, sidx) >= (epos, eidx):
+            return
+        leaves = self._leaves
+        if spos == epos:
+            chunks = [leaves[spos][sidx:eidx]]
+        else:
+            chunks = [leaves[spos][sidx:]]
+            chunks.extend(leaves[spos + 1 : epos])
+            if epos < len(leaves):
+                chunks.append(leaves[epos][:eidx])
+        if reverse:
+            for chunk in reversed(chunks):
+                yield from reversed(chunk)
+        else:
+            for chunk in chunks:
+                yield from chunk
+
+    # --------------------------------------------------------------------------
+    # Adding and removing elements
+    # --------------------------------------------------------------------------
+
+    def add(self, value):
+        maxes = self._maxes
+        if not maxes:
+            self._leaves.append([value])
+            maxes.append(value)
+        else:
+            pos = bisect_right(maxes, value)
+            if pos == len(maxes):
+                pos -= 1
+                self._leaves[pos].append(value)
+                maxes[pos] = value
+            else:
+                insort(self._leaves[pos], value)
+            self._split(pos)
+        self._len += 1
+
+    # Adding a small number of values to a large list is done one at a time,
+    # otherwise the values are merged with the existing elements (the sort only
+    # has to merge two sorted runs) and the leaves are rebuilt.
+    def update(self, iterable):
+        values = sorted(iterable)
+        if not values:
+            return
+        if self._len:
+            if len(values) * 8 < self._len:
+                for value in values:
+                    self.add(value)
+                return
+            values.extend(self)
+            values.sort()
+        load = self._load
+        self._leaves = [values[i : i + load] for i in range(0, len(values), load)]
+        self._maxes = [leaf[-1] for leaf in self._leaves]
+        self._len = len(values)
+
+    def remove(self, value):
+        pos = bisect_left(self._maxes, value)
+        if pos == len(self._maxes):
+            raise ValueError("{} is not in the SortedList".format(value))
+        leaf = self._leaves[pos]
+        idx = bisect_left(leaf, value)
+        if idx == len(leaf) or leaf[idx] != value:
+            raise ValueError("{} is not in the SortedList".format(value))
+        del leaf[idx]
+        self._len -= 1
+        if leaf and idx == len(leaf):
+            self._maxes[pos] = leaf[-1]
+        self._merge(pos)
+
+    def discard(self, value):
+        if value in self:
+            self.remove(value)
+
+    def clear(self):
+        self._leaves = []
+        self._maxes = []
+        self._len = 0
+
+    def copy(self):
+        tmp = SortedList()
+        tmp._leaves = [list(leaf) for leaf in self._leaves]
+        tmp._maxes = list(self._maxes)
+        tmp._len = self._len
+        return tmp
+
+    # --------------------------------------------------------------------------
+    # Return an iterator over the elements within a (possibly unbounded) range
+    # --------------------------------------------------------------------------
+    def irange(self, minimum=None, maximum=None, inclusive=(True, True), reverse=False):
+        if minimum is None:
+            start = (0, 0)
+        elif inclusive[0]:
+            start = self._loc_left(minimum)
+        else:
+            start = self._loc_right(minimum)
+        if maximum is None:
+            stop = (len(self._leaves), 0)
+        elif inclusive[1]:
+            stop = self._loc_right(maximum)
+        else:
+            stop = self._loc_left(maximum)
+        return self._islice(start, stop, reverse)
+
+    # --------------------------------------------------------------------------
+    # Special functions to support sequence operations
+    # --------------------------------------------------------------------------
+
+    def __contains__(self, value):
+        pos, idx = self._loc_left(value)
+        if pos == len(self._leaves):
+            return False
+        return self._leaves[pos][idx] == value
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return list(self)[idx]
+        if idx < 0:
+            idx += self._len
+        if idx < 0 or idx >= self._len:
+            raise IndexError("SortedList index out of range")
+        if idx == 0:
+            return self._leaves[0][0]
+        if idx == self._len - 1:
+            return self._leaves[-1][-1]
+        for leaf in self._leaves:
+            if idx < len(leaf):
+                return leaf[idx]
+            idx -= len(leaf)
+
+    def __bool__(self):
+        return self._len > 0
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for leaf in self._leaves:
+            yield from leaf
+
+    def __reversed__(self):
+        for leaf in reversed(self._leaves):
+            yield from reversed(leaf)
+
+    def __eq__(self, other):
+        if isinstance(other, SortedList):
+            return self._len == other._len and list(self) == list(other)
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return self._len == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    def __str__(self):
+        return "[" + ", ".join([repr(e) for e in self]) + "]"
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, self.__str__())
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    raise RuntimeError("Cannot run modules")
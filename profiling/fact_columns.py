@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+# ------------------------------------------------------------------------------
+# Creating many facts from columns of field values (as they would come from a
+# CSV file or a data frame) and exporting the facts of a FactBase back to
+# columns. Compares creating the facts one by one with the constructor against
+# creating them from the columns.
+# ------------------------------------------------------------------------------
+
+import sys
+import time
+
+from clorm import ConstantField, FactBase, IntegerField, Predicate, StringField
+
+# ------------------------------------------------------------------------------
+# A data model
+# ------------------------------------------------------------------------------
+
+
+class Sale(Predicate):
+    sid = IntegerField
+    shop = ConstantField
+    amount = IntegerField
+    note = StringField(default="")
+
+
+def create_columns(num):
+    return {
+        "sid": list(range(num)),
+        "shop": ["shop{}".format(i % 20) for i in range(num)],
+        "amount": [(i * 37) % 1000 for i in range(num)],
+    }
+
+
+def profcall(msg, func, *args, **kwargs):
+    starttime = time.process_time()
+    res = func(*args, **kwargs)
+    endtime = time.process_time()
+    print("{} : {:.3f}".format(msg.ljust(60), endtime - starttime))
+    return res
+
+
+def construct(columns):
+    return [Sale(*row) for row in zip(columns["sid"], columns["shop"], columns["amount"])]
+
+
+def add_columns(columns):
+    fb = FactBase()
+    fb.add_columns(Sale, **columns)
+    return fb
+
+
+def to_rows(fb):
+    return [(f.sid, f.shop, f.amount, f.note) for f in fb.query(Sale).all()]
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    columns = create_columns(num)
+    print("\nProfiling creating and exporting {} facts as columns\n".format(num))
+
+    facts1 = profcall("Create facts with the constructor", construct, columns)
+    facts2 = profcall("Create facts from columns", Sale.from_columns, **columns)
+    assert facts1 == facts2
+    profcall("Add facts to a FactBase", FactBase, facts1)
+    fb = profcall("Add columns to a FactBase", add_columns, columns)
+    assert len(fb) == num
+    profcall("Export the facts as rows with a query", to_rows, fb)
+    out = profcall("Export the facts as columns", fb.to_columns, Sale)
+    assert out["amount"] == columns["amount"]
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
@@ -56,6 +56,24 @@ class P(Predicate):
     i = (IntegerField, (IntegerField, (IntegerField, PT.Field)))
 
 
+# The same predicates but with the raw symbol only built when it is needed
+class PTL(Predicate):
+    a = IntegerField
+    b = IntegerField(index=True)
+
+    class Meta:
+        name = "pt"
+        lazy_symbol = True
+
+
+class PL(Predicate):
+    i = (IntegerField, (IntegerField, (IntegerField, PTL.Field)))
+
+    class Meta:
+        name = "p"
+        lazy_symbol = True
+
+
 class PTS(object):
     def __init__(self, a, b):
         self._a = a
@@ -141,6 +159,14 @@ def create_complex_fact(a, b):
     return P(i=(1, (1, (1, PT(a=a, b=b)))))
 
 
+def create_simple_lazy_fact(a, b):
+    return PTL(a=a, b=b)
+
+
+def create_complex_lazy_fact(a, b):
+    return PL(i=(1, (1, (1, PTL(a=a, b=b)))))
+
+
 # --------------------------------------------------------------------------
 # Compare the time to generate a set of P instances vs the time taken to
 # generate equivalent pure clingo symbols.
@@ -218,6 +244,38 @@ def compare_generating_complex_facts_and_symbols():
     print("--------------------------------------------------------\n")
 
 
+# --------------------------------------------------------------------------
+# Compare the time to generate facts that build their raw symbol when created
+# vs facts that only build it when it is needed.
+# --------------------------------------------------------------------------
+def compare_generating_lazy_symbol_facts():
+
+    print("=========================================================")
+    print("Comparing the generation of facts with and without lazy raw symbols\n")
+
+    sfacts, sfacts_t = generate_list(create_simple_fact_named)
+    print("Instantating {} simple Clorm facts in {}".format(len(sfacts), sfacts_t))
+    slfacts, slfacts_t = generate_list(create_simple_lazy_fact)
+    print("Instantating {} simple lazy Clorm facts in {}".format(len(slfacts), slfacts_t))
+    print_comparison(slfacts_t, sfacts_t)
+
+    cfacts, cfacts_t = generate_list(create_complex_fact)
+    print("Instantating {} complex Clorm facts in {}".format(len(cfacts), cfacts_t))
+    clfacts, clfacts_t = generate_list(create_complex_lazy_fact)
+    print("Instantating {} complex lazy Clorm facts in {}".format(len(clfacts), clfacts_t))
+    print_comparison(clfacts_t, cfacts_t)
+
+    with Timer() as fb_t:
+        fb = FactBase(indexes=PL.meta.indexes, facts=clfacts)
+    print("Importing {} complex lazy facts to factbase: {}".format(len(fb), fb_t))
+
+    with Timer() as raw_t:
+        symbols = [f.raw for f in clfacts]
+    print("Building the raw symbols of {} complex lazy facts: {}".format(len(symbols), raw_t))
+    assert symbols == [f.raw for f in cfacts]
+    print("--------------------------------------------------------\n")
+
+
 # --------------------------------------------------------------------------
 # Time to instantiate facts from raw symbols
 # --------------------------------------------------------------------------
@@ -313,6 +371,7 @@ def main():
 
     compare_generating_simple_facts_and_symbols()
     compare_generating_complex_facts_and_symbols()
+    compare_generating_lazy_symbol_facts()
     time_to_instantiate_simple_from_raw()
     time_to_instantiate_complex_from_raw()
     compare_query_times()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+# ------------------------------------------------------------------------------
+# Building an indexed FactBase from a large collection of facts. Compares adding
+# the facts one at a time (so each fact is inserted into each FactIndex
+# individually) with the bulk load path used by the FactBase constructor and
+# FactBase.add() when passed a collection of facts.
+# ------------------------------------------------------------------------------
+
+import random
+import sys
+import time
+
+from clorm import ConstantField, FactBase, IntegerField, Predicate
+
+# ------------------------------------------------------------------------------
+# A simple data model
+# ------------------------------------------------------------------------------
+
+
+class P(Predicate):
+    a = IntegerField
+    b = IntegerField
+    c = ConstantField
+
+
+def create_facts(num):
+    keys = list(range(num))
+    random.Random(0).shuffle(keys)
+    return [P(a, a % 1000, "c{}".format(a % 100)) for a in keys]
+
+
+def profcall(msg, func, *args, **kwargs):
+    starttime = time.process_time()
+    res = func(*args, **kwargs)
+    endtime = time.process_time()
+    print("{} : {:.3f}".format(msg.ljust(50), endtime - starttime))
+    return res
+
+
+def add_individually(facts):
+    fb = FactBase(indexes=[P.a, P.b, P.c])
+    for f in facts:
+        fb.add(f)
+    return fb
+
+
+def add_bulk(facts):
+    return FactBase(facts, indexes=[P.a, P.b, P.c])
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    facts = profcall("Creating {} facts".format(num), create_facts, num)
+    print("\nBuilding a FactBase with 3 indexes\n")
+    fb1 = profcall("Adding facts individually", add_individually, facts)
+    fb2 = profcall("Bulk loading facts", add_bulk, facts)
+    assert fb1 == fb2
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+# ------------------------------------------------------------------------------
+# Finding the facts that changed in a FactBase after a few facts are added and
+# removed. Compares the symmetric difference of the FactBase with a copy taken
+# before the changes, with the changes recorded in the journal of a FactBase
+# created with journal=True.
+# ------------------------------------------------------------------------------
+
+import sys
+import time
+
+from clorm import FactBase, IntegerField, Predicate
+
+# ------------------------------------------------------------------------------
+# A data model
+# ------------------------------------------------------------------------------
+
+
+class F(Predicate):
+    a = IntegerField
+    b = IntegerField
+
+
+def profcall(msg, func, *args, **kwargs):
+    starttime = time.process_time()
+    res = func(*args, **kwargs)
+    endtime = time.process_time()
+    print("{} : {:.3f}".format(msg.ljust(60), endtime - starttime))
+    return res
+
+
+def change(fb, idx):
+    fb.add(F(-idx, idx))
+    fb.remove(F(idx, idx))
+
+
+def run_copies(fb, num):
+    count = 0
+    for idx in range(num):
+        old = fb.copy()
+        change(fb, idx)
+        count += len(fb ^ old)
+    return count
+
+
+def run_journal(fb, num):
+    count = 0
+    for idx in range(num):
+        version = fb.version
+        change(fb, idx)
+        for inserted, deleted in fb.changes_since(version).values():
+            count += len(inserted) + len(deleted)
+        fb.discard_changes(version)
+    return count
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    facts = [F(i, i) for i in range(num)]
+    print("\nProfiling 100 changes to a FactBase of {} facts\n".format(num))
+    c1 = profcall("Symmetric difference with a copy", run_copies, FactBase(facts), 100)
+    c2 = profcall("Changes from the journal", run_journal, FactBase(facts, journal=True), 100)
+    assert c1 == c2
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
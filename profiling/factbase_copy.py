@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+# ------------------------------------------------------------------------------
+# Taking a snapshot of a FactBase before making a few changes. FactBase.copy()
+# is copy-on-write so the snapshot shares the storage of the FactBase and only
+# the modified predicate is copied. For comparison the FactBase is also copied
+# by rebuilding it (passing it to the FactBase constructor).
+# ------------------------------------------------------------------------------
+
+import sys
+import time
+
+from clorm import FactBase, IntegerField, Predicate
+
+# ------------------------------------------------------------------------------
+# A data model
+# ------------------------------------------------------------------------------
+
+
+class F(Predicate):
+    a = IntegerField
+    b = IntegerField
+
+
+class G(Predicate):
+    a = IntegerField
+    b = IntegerField
+
+
+def create_facts(num):
+    return [F(i, i % 10) for i in range(num)] + [G(i, i % 10) for i in range(num)]
+
+
+def profcall(msg, func, *args, **kwargs):
+    starttime = time.process_time()
+    res = func(*args, **kwargs)
+    endtime = time.process_time()
+    print("{} : {:.3f}".format(msg.ljust(60), endtime - starttime))
+    return res
+
+
+def run_snapshots(fb, copy, num):
+    snapshots = []
+    for idx in range(num):
+        snapshots.append(copy(fb))
+        fb.add(F(-idx, idx))
+    return snapshots
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    facts = create_facts(num)
+    print("\nProfiling 50 snapshots of a FactBase of {} facts\n".format(2 * num))
+    fb1 = FactBase(facts, indexes=[F.a, F.b, G.a])
+    s1 = profcall("Rebuild the FactBase", run_snapshots, fb1, FactBase, 50)
+    fb2 = FactBase(facts, indexes=[F.a, F.b, G.a])
+    s2 = profcall("Copy-on-write copy()", run_snapshots, fb2, FactBase.copy, 50)
+    assert s1 == s2
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+# ------------------------------------------------------------------------------
+# Keeping many versions of a fact base alive, where each version adds a fact to
+# the previous one. A FactBase version is a copy() followed by an add(), which
+# copies the modified predicate's facts and indexes. A FrozenFactBase version
+# is an add() that shares almost all of its storage with the previous version.
+# Reports the time and the memory used to create the versions, and the time of
+# a query on the last version.
+# ------------------------------------------------------------------------------
+
+import sys
+import time
+import tracemalloc
+
+from clorm import FactBase, FrozenFactBase, IntegerField, Predicate
+
+# ------------------------------------------------------------------------------
+# A data model
+# ------------------------------------------------------------------------------
+
+
+class F(Predicate):
+    a = IntegerField
+    b = IntegerField
+
+
+def profcall(msg, func, *args, **kwargs):
+    starttime = time.process_time()
+    res = func(*args, **kwargs)
+    endtime = time.process_time()
+    print("{} : {:.3f}".format(msg.ljust(60), endtime - starttime))
+    return res
+
+
+def profmem(msg, func, *args, **kwargs):
+    tracemalloc.start()
+    res = func(*args, **kwargs)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("{} : {:.1f} MB".format(msg.ljust(60), size / 1e6))
+    return res
+
+
+def factbase_versions(fb, num):
+    versions = [fb]
+    for idx in range(num):
+        fb = fb.copy()
+        fb.add(F(-idx - 1, idx))
+        versions.append(fb)
+    return versions
+
+
+def frozen_versions(ffb, num):
+    versions = [ffb]
+    for idx in range(num):
+        ffb = ffb.add(F(-idx - 1, idx))
+        versions.append(ffb)
+    return versions
+
+
+def run_query(fb):
+    return len(list(fb.query(F).where(F.a < 0).all()))
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    facts = [F(i, i % 10) for i in range(num)]
+    indexes = [F.a, F.b]
+    print("\nProfiling 100 versions of a fact base of {} facts\n".format(num))
+    fb = profcall("Create FactBase", FactBase, facts, indexes=indexes)
+    ffb = profcall("Create FrozenFactBase", FrozenFactBase, facts, indexes=indexes)
+    fbs = profcall("FactBase versions (copy and add)", factbase_versions, fb, 100)
+    ffbs = profcall("FrozenFactBase versions (add)", frozen_versions, ffb, 100)
+    profmem("Memory of the FactBase versions", factbase_versions, fb, 100)
+    profmem("Memory of the FrozenFactBase versions", frozen_versions, ffb, 100)
+    c1 = profcall("Query the last FactBase version", run_query, fbs[-1])
+    c2 = profcall("Query the last FrozenFactBase version", run_query, ffbs[-1])
+    assert c1 == c2 == 100
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
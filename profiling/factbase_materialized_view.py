@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+# ------------------------------------------------------------------------------
+# Maintaining the results of a join query while the FactBase is changed a few
+# facts at a time. Compares re-running the query after each change with a
+# materialized view that only joins the added facts with the existing facts and
+# drops the results of the removed facts.
+# ------------------------------------------------------------------------------
+
+import sys
+import time
+
+from clorm import FactBase, IntegerField, Predicate, StringField
+
+# ------------------------------------------------------------------------------
+# A data model
+# ------------------------------------------------------------------------------
+
+
+class Customer(Predicate):
+    cid = IntegerField
+    name = StringField
+
+
+class Sale(Predicate):
+    sid = IntegerField
+    cid = IntegerField
+    item = StringField
+
+
+def create_facts(num_customers, sales_per_customer):
+    tmp = []
+    saleid = 1
+    for idx in range(1, num_customers + 1):
+        tmp.append(Customer(cid=idx, name="Customer {}".format(idx)))
+        for _ in range(sales_per_customer):
+            tmp.append(Sale(sid=saleid, cid=idx, item="Item {}".format(saleid)))
+            saleid += 1
+    return tmp
+
+
+def profcall(msg, func, *args, **kwargs):
+    starttime = time.process_time()
+    res = func(*args, **kwargs)
+    endtime = time.process_time()
+    print("{} : {:.3f}".format(msg.ljust(60), endtime - starttime))
+    return res
+
+
+def make_query(fb):
+    return fb.query(Customer, Sale).join(Customer.cid == Sale.cid).where(Sale.item != "Item 1")
+
+
+def run_changes(fb, num, results):
+    count = 0
+    for idx in range(1, num + 1):
+        fb.add(Sale(sid=-2 * idx, cid=idx, item="New"))
+        fb.remove(Sale(sid=2 * idx, cid=(2 * idx - 1) // 10 + 1, item="Item {}".format(2 * idx)))
+        count += len(results())
+    return count
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    facts = create_facts(num * 2, 10)
+    print("\nProfiling {} changes to a FactBase of {} facts\n".format(num, len(facts)))
+
+    fb1 = FactBase(facts, indexes=[Customer.cid, Sale.cid])
+    query = make_query(fb1)
+    c1 = profcall(
+        "Re-run the query after each change", run_changes, fb1, num, lambda: list(query.all())
+    )
+
+    fb2 = FactBase(facts, indexes=[Customer.cid, Sale.cid])
+    view = profcall("Create the materialized view", fb2.materialize, make_query(fb2))
+    c2 = profcall(
+        "Materialized view maintained after each change", run_changes, fb2, num, lambda: view
+    )
+    assert c1 == c2
+    assert set(view) == set(make_query(fb2).all())
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+# ------------------------------------------------------------------------------
+# Set operations on FactBases with indexes. Most of the facts are of predicates
+# that are only in one of the FactBases (or are identical in both), so only the
+# FactMaps of the predicates that actually change should need any work.
+# ------------------------------------------------------------------------------
+
+import sys
+import time
+
+from clorm import FactBase, IntegerField, Predicate
+
+# ------------------------------------------------------------------------------
+# A data model
+# ------------------------------------------------------------------------------
+
+
+class F(Predicate):
+    a = IntegerField
+    b = IntegerField
+
+
+class G(Predicate):
+    a = IntegerField
+    b = IntegerField
+
+
+class H(Predicate):
+    a = IntegerField
+    b = IntegerField
+
+
+def create_factbases(num):
+    indexes = [F.a, F.b, G.a, G.b, H.a, H.b]
+    fb1 = FactBase(
+        [F(i, i % 100) for i in range(num)] + [G(i, i % 100) for i in range(num)],
+        indexes=indexes,
+    )
+    fb2 = FactBase(
+        [G(i, i % 100) for i in range(num // 2, num + num // 2)]
+        + [H(i, i % 100) for i in range(num)],
+        indexes=indexes,
+    )
+    return fb1, fb2
+
+
+def profcall(msg, func, *args, **kwargs):
+    starttime = time.process_time()
+    res = func(*args, **kwargs)
+    endtime = time.process_time()
+    print("{} : {:.3f}".format(msg.ljust(60), endtime - starttime))
+    return res
+
+
+def run_inplace(fb1, fb2, name):
+    fb = fb1.copy()
+    getattr(fb, name)(fb2)
+    return fb
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    fb1, fb2 = create_factbases(num)
+    print("\nProfiling set operations on FactBases of {} facts\n".format(len(fb1)))
+
+    fb = profcall("Union", fb1.union, fb2)
+    assert len(fb) == len(fb1) + len(fb2) - num // 2
+    fb = profcall("Intersection", fb1.intersection, fb2)
+    assert len(fb) == num // 2
+    fb = profcall("Difference", fb1.difference, fb2)
+    assert len(fb) == num + num // 2
+    fb = profcall("Symmetric difference", fb1.symmetric_difference, fb2)
+    assert len(fb) == 3 * num
+    fb = profcall("Update", run_inplace, fb1, fb2, "update")
+    assert len(fb) == len(fb1) + len(fb2) - num // 2
+    fb = profcall("Intersection update", run_inplace, fb1, fb2, "intersection_update")
+    assert len(fb) == num // 2
+    fb = profcall("Difference update", run_inplace, fb1, fb2, "difference_update")
+    assert len(fb) == num + num // 2
+    fb = profcall(
+        "Symmetric difference update", run_inplace, fb1, fb2, "symmetric_difference_update"
+    )
+    assert len(fb) == 3 * num
+    assert set(fb.query(G).where(G.b == 5).all()) == set(
+        [G(i, 5) for i in range(5, num // 2, 100)]
+        + [G(i, 5) for i in range(num + 5, num + num // 2, 100)]
+    )
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
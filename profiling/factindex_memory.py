@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+# ------------------------------------------------------------------------------
+# The memory used by the indexes of a FactBase where the indexed fields are
+# (nearly) unique, such as ids and timestamps, so most index keys have a single
+# fact. The memory of the facts themselves is measured separately.
+# ------------------------------------------------------------------------------
+
+import sys
+import time
+import tracemalloc
+
+from clorm import FactBase, IntegerField, Predicate
+
+# ------------------------------------------------------------------------------
+# A data model
+# ------------------------------------------------------------------------------
+
+
+class Event(Predicate):
+    eid = IntegerField
+    timestamp = IntegerField
+    kind = IntegerField
+
+
+def create_facts(num):
+    return [Event(eid=i, timestamp=2 * i + (i % 7), kind=i % 10) for i in range(num)]
+
+
+def profcall(msg, func, *args, **kwargs):
+    starttime = time.process_time()
+    res = func(*args, **kwargs)
+    endtime = time.process_time()
+    print("{} : {:.3f}".format(msg.ljust(60), endtime - starttime))
+    return res
+
+
+def profmem(msg, func, *args, **kwargs):
+    tracemalloc.start()
+    res = func(*args, **kwargs)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("{} : {:.1f} MB".format(msg.ljust(60), size / 1e6))
+    return res
+
+
+def run_queries(fb, num):
+    count = 0
+    for i in range(0, num, num // 1000):
+        count += len(list(fb.query(Event).where(Event.eid == i).all()))
+        count += len(list(fb.query(Event).where(Event.timestamp == 2 * i + (i % 7)).all()))
+    count += fb.query(Event).where(Event.eid < num // 10).count()
+    return count
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print("\nProfiling the indexes of a FactBase of {} facts\n".format(num))
+
+    facts = profmem("Memory of the facts", create_facts, num)
+    profmem("Memory of a FactBase without indexes", FactBase, facts)
+    profmem(
+        "Memory of a FactBase with two unique-key indexes",
+        FactBase,
+        facts,
+        indexes=[Event.eid, Event.timestamp],
+    )
+    fb = profcall(
+        "Create a FactBase with two unique-key indexes",
+        FactBase,
+        facts,
+        indexes=[Event.eid, Event.timestamp],
+    )
+    profcall("Copy and modify the FactBase", lambda: fb.copy().add(Event(-1, -1, -1)))
+    count = profcall("Indexed queries", run_queries, fb, num)
+    assert count == 2000 + num // 10
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
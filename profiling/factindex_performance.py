@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+# ------------------------------------------------------------------------------
+# Building a FactIndex on a field with many unique keys. Compares the default
+# SortedList (B+-tree) key container with a key container that maintains a
+# plain Python list with bisect.insort() (the original FactIndex
+# implementation). Because every insertion into the plain list is O(n) the
+# bisect version is only run on smaller inputs.
+# ------------------------------------------------------------------------------
+
+import bisect
+import random
+import sys
+import time
+
+from clorm import IntegerField, Predicate
+from clorm.orm.factcontainers import FactIndex
+from clorm.util import SortedList
+
+# ------------------------------------------------------------------------------
+# A key container that uses bisect on a plain list
+# ------------------------------------------------------------------------------
+
+
+class BisectKeyList(object):
+    def __init__(self):
+        self._list = []
+
+    def add(self, key):
+        bisect.insort_left(self._list, key)
+
+    def update(self, keys):
+        for key in keys:
+            self.add(key)
+
+    def remove(self, key):
+        del self._list[bisect.bisect_left(self._list, key)]
+
+    def irange(self, minimum=None, maximum=None, inclusive=(True, True), reverse=False):
+        lst = self._list
+        if minimum is None:
+            start = 0
+        elif inclusive[0]:
+            start = bisect.bisect_left(lst, minimum)
+        else:
+            start = bisect.bisect_right(lst, minimum)
+        if maximum is None:
+            end = len(lst)
+        elif inclusive[1]:
+            end = bisect.bisect_right(lst, maximum)
+        else:
+            end = bisect.bisect_left(lst, maximum)
+        if reverse:
+            return reversed(lst[start:end])
+        return iter(lst[start:end])
+
+    def __contains__(self, key):
+        posn = bisect.bisect_left(self._list, key)
+        return posn < len(self._list) and self._list[posn] == key
+
+    def __len__(self):
+        return len(self._list)
+
+    def __iter__(self):
+        return iter(self._list)
+
+    def __reversed__(self):
+        return reversed(self._list)
+
+
+# ------------------------------------------------------------------------------
+# A simple data model
+# ------------------------------------------------------------------------------
+
+
+class P(Predicate):
+    a = IntegerField
+    b = IntegerField
+
+
+def create_facts(num):
+    keys = list(range(num))
+    random.Random(0).shuffle(keys)
+    return [P(a, 0) for a in keys]
+
+
+def profcall(msg, func, *args, **kwargs):
+    starttime = time.process_time()
+    res = func(*args, **kwargs)
+    endtime = time.process_time()
+    print("{} : {:.3f}".format(msg.ljust(60), endtime - starttime))
+    return res
+
+
+def build_index(facts, keylist):
+    fi = FactIndex(P.a, keylist=keylist)
+    for f in facts:
+        fi.add(f)
+    return fi
+
+
+def remove_half(fi, facts):
+    for f in facts[: len(facts) // 2]:
+        fi.remove(f)
+
+
+def run(num, keylist):
+    facts = create_facts(num)
+    name = keylist.__name__
+    fi = profcall(
+        "Building index with {} on {} unique keys".format(name, num), build_index, facts, keylist
+    )
+    profcall("Removing {} keys with {}".format(num // 2, name), remove_half, fi, facts)
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print("\nProfiling FactIndex construction on unique keys\n")
+    for n in [num // 20, num // 10]:
+        run(n, BisectKeyList)
+    for n in [num // 20, num // 10, num]:
+        run(n, SortedList)
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
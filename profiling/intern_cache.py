@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+# ------------------------------------------------------------------------------
+# The memory used by the facts of a model where the constant and string fields,
+# and the complex-term sub-facts, come from a small vocabulary. Compares facts
+# that are unified normally with facts of a predicate that interns its field
+# values, so that equal values share a single instance.
+# ------------------------------------------------------------------------------
+
+import sys
+import time
+import tracemalloc
+
+from clingo import Function, Number, String
+
+from clorm import (
+    ConstantField,
+    FactBase,
+    IntegerField,
+    InternCache,
+    Predicate,
+    StringField,
+    Unifier,
+)
+
+# ------------------------------------------------------------------------------
+# A data model
+# ------------------------------------------------------------------------------
+
+
+class Point(Predicate):
+    x = IntegerField
+    y = IntegerField
+
+
+class Visit(Predicate):
+    vid = IntegerField
+    who = ConstantField
+    where = Point.Field
+    note = StringField
+
+
+class IVisit(Predicate):
+    vid = IntegerField
+    who = ConstantField
+    where = Point.Field
+    note = StringField
+
+    class Meta:
+        name = "visit"
+        intern = InternCache()
+
+
+def create_symbols(num):
+    return [
+        Function(
+            "visit",
+            [
+                Number(i),
+                Function("person{}".format(i % 100)),
+                Function("point", [Number(i % 50), Number(i % 30)]),
+                String("a note about place {}".format(i % 200)),
+            ],
+        )
+        for i in range(num)
+    ]
+
+
+def profmem(msg, func, *args, **kwargs):
+    tracemalloc.start()
+    starttime = time.process_time()
+    res = func(*args, **kwargs)
+    endtime = time.process_time()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("{} : {:.3f} sec {:.1f} MB".format(msg.ljust(60), endtime - starttime, size / 1e6))
+    return res
+
+
+def unify(ptype, symbols):
+    return FactBase(Unifier([ptype]).iter_unify(symbols, False))
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    symbols = create_symbols(num)
+    print("\nProfiling the memory of {} unified facts\n".format(num))
+
+    fb1 = profmem("Unify into a FactBase", unify, Visit, symbols)
+    fb2 = profmem("Unify into a FactBase (interned)", unify, IVisit, symbols)
+    assert len(fb1) == len(fb2) == num
+    cache = IVisit.meta.intern_cache
+    print(
+        "{} : {:.1f} MB".format(
+            "Memory saved by the intern cache".ljust(60), cache.saved_bytes / 1e6
+        )
+    )
+    print("{} : {} / {}".format("Intern cache hits / misses".ljust(60), cache.hits, cache.misses))
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
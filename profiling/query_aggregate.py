@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+# ------------------------------------------------------------------------------
+# Aggregating over query results. Compares aggregating the output of the query
+# in Python with the query aggregation end-points. A count (with no where
+# clause) is the number of facts and the min/max of an indexed field is read
+# from the index, while the other aggregates are computed as the query results
+# are generated.
+# ------------------------------------------------------------------------------
+
+import sys
+import time
+
+from clorm import FactBase, IntegerField, Predicate, count_, sum_
+
+# ------------------------------------------------------------------------------
+# A data model
+# ------------------------------------------------------------------------------
+
+
+class P(Predicate):
+    a = IntegerField
+    b = IntegerField
+
+
+def create_facts(num):
+    return [P(a=i, b=i % 100) for i in range(num)]
+
+
+def profcall(msg, func, *args, **kwargs):
+    starttime = time.process_time()
+    res = func(*args, **kwargs)
+    endtime = time.process_time()
+    print("{} : {:.3f}".format(msg.ljust(60), endtime - starttime))
+    return res
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    fb = FactBase(create_facts(num), indexes=[P.a])
+    q = fb.query(P)
+    qg = fb.query(P).group_by(P.b)
+    print("\nProfiling aggregation over {} facts\n".format(num))
+
+    r1 = profcall("Count by iterating", lambda: sum(1 for _ in q.all()))
+    r2 = profcall("Count end-point", q.count)
+    assert r1 == r2
+    r1 = profcall("Max of an indexed field by iterating", lambda: max(q.select(P.a).all()))
+    r2 = profcall("Max end-point", q.max, P.a)
+    assert r1 == r2
+    r1 = profcall("Sum by iterating", lambda: sum(q.select(P.a).all()))
+    r2 = profcall("Sum end-point", q.sum, P.a)
+    assert r1 == r2
+    r1 = profcall(
+        "Grouped count and sum by iterating",
+        lambda: [
+            (k, (len(v), sum(v))) for k, v in ((k, list(g)) for k, g in qg.select(P.a).all())
+        ],
+    )
+    r2 = profcall("Grouped aggregate end-point", lambda: list(qg.aggregate(count_(), sum_(P.a))))
+    assert r1 == r2
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
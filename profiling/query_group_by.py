@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+# ------------------------------------------------------------------------------
+# Grouping the results of a join query by fields of both predicates. The default
+# (ordered) grouping sorts the full join result by the group_by paths, while a
+# hash grouping (group_by(..., ordered=False)) collects the results into groups
+# in one pass and only sorts the elements within each group.
+# ------------------------------------------------------------------------------
+
+import sys
+import time
+
+from clorm import FactBase, IntegerField, Predicate, StringField, count_
+
+# ------------------------------------------------------------------------------
+# A data model
+# ------------------------------------------------------------------------------
+
+
+class Customer(Predicate):
+    cid = IntegerField
+    name = StringField
+
+
+class Sale(Predicate):
+    sid = IntegerField
+    cid = IntegerField
+    item = StringField
+
+
+def create_facts(num_customers, sales_per_customer):
+    tmp = []
+    saleid = 1
+    for idx in range(1, num_customers + 1):
+        tmp.append(Customer(cid=idx, name="Customer {}".format(idx)))
+    for _ in range(sales_per_customer):
+        for idx in range(num_customers, 0, -1):
+            tmp.append(Sale(sid=saleid, cid=idx, item="Item {}".format(saleid % 1000)))
+            saleid += 1
+    return tmp
+
+
+def profcall(msg, func, *args, **kwargs):
+    starttime = time.process_time()
+    res = func(*args, **kwargs)
+    endtime = time.process_time()
+    print("{} : {:.3f}".format(msg.ljust(60), endtime - starttime))
+    return res
+
+
+def run_groups(query):
+    return {k: list(g) for k, g in query.all()}
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    fb = FactBase(create_facts(num, 10), indexes=[Sale.cid])
+    q = fb.query(Customer, Sale).join(Customer.cid == Sale.cid).select(Sale.sid)
+
+    print("\nProfiling grouping of {} join results\n".format(num * 10))
+    r1 = profcall("Ordered group_by", run_groups, q.group_by(Sale.item, Customer.name))
+    r2 = profcall(
+        "Hash group_by", run_groups, q.group_by(Sale.item, Customer.name, ordered=False)
+    )
+    assert r1 == r2
+    r1 = profcall(
+        "Ordered group_by with count", lambda: dict(q.group_by(Sale.item, Customer.name).count())
+    )
+    r2 = profcall(
+        "Hash group_by with count",
+        lambda: dict(q.group_by(Sale.item, Customer.name, ordered=False).aggregate(count_())),
+    )
+    assert r1 == {k: v[0] for k, v in r2.items()}
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
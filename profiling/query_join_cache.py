@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+# ------------------------------------------------------------------------------
+# Re-running a join query (with different placeholder values) on an unindexed
+# join key. The temporary FactIndex for the join key is cached against the
+# FactMap so only the first run and the first run after the FactBase is modified
+# have to build it.
+# ------------------------------------------------------------------------------
+
+import sys
+import time
+
+from clorm import FactBase, IntegerField, Predicate, StringField, ph1_
+from clorm.orm.query import fixed_join_order
+
+# ------------------------------------------------------------------------------
+# A data model
+# ------------------------------------------------------------------------------
+
+
+class Customer(Predicate):
+    cid = IntegerField
+    name = StringField
+
+
+class Sale(Predicate):
+    sid = IntegerField
+    cid = IntegerField
+    item = StringField
+
+
+def create_facts(num_customers, sales_per_customer):
+    tmp = []
+    saleid = 1
+    for idx in range(1, num_customers + 1):
+        tmp.append(Customer(cid=idx, name="Customer {}".format(idx)))
+        for _ in range(sales_per_customer):
+            tmp.append(Sale(sid=saleid, cid=idx, item="Item {}".format(saleid)))
+            saleid += 1
+    return tmp
+
+
+def profcall(msg, func, *args, **kwargs):
+    starttime = time.process_time()
+    res = func(*args, **kwargs)
+    endtime = time.process_time()
+    print("{} : {:.3f}".format(msg.ljust(60), endtime - starttime))
+    return res
+
+
+def run_queries(query, num):
+    count = 0
+    for cid in range(1, num + 1):
+        count += len(list(query.bind(cid).all()))
+    return count
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    fb = FactBase(create_facts(num, 10), indexes=[Customer.cid])
+    query = (
+        fb.query(Customer, Sale)
+        .join(Customer.cid == Sale.cid)
+        .where(Customer.cid == ph1_)
+        .heuristic(fixed_join_order(Customer, Sale))
+    )
+    print("\nProfiling {} executions of a join query on an unindexed join key\n".format(num))
+    profcall("Cached join index (unchanged FactBase)", run_queries, query, num)
+
+    def run_modified(query, num):
+        count = 0
+        for cid in range(1, num + 1):
+            fb.add(Sale(sid=-cid, cid=cid, item="New"))
+            count += len(list(query.bind(cid).all()))
+        return count
+
+    profcall("Rebuilt join index (FactBase modified before each run)", run_modified, query, num)
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
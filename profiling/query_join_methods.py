@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+# ------------------------------------------------------------------------------
+# Joins on an unindexed join key. An equality join key uses a hash join and a
+# range join key uses a sort-merge join (rather than probing a temporary
+# FactIndex for each input tuple). For comparison the same joins are run with
+# an index on the join key.
+# ------------------------------------------------------------------------------
+
+import sys
+import time
+
+from clorm import FactBase, IntegerField, Predicate
+from clorm.orm.query import fixed_join_order
+
+# ------------------------------------------------------------------------------
+# A data model
+# ------------------------------------------------------------------------------
+
+
+class F(Predicate):
+    a = IntegerField
+    b = IntegerField
+
+
+class G(Predicate):
+    a = IntegerField
+    b = IntegerField
+
+
+def create_facts(num):
+    return [F(i % (num // 10), i) for i in range(num)] + [G(i, i) for i in range(num)]
+
+
+def profcall(msg, func, *args, **kwargs):
+    starttime = time.process_time()
+    res = func(*args, **kwargs)
+    endtime = time.process_time()
+    print("{} : {:.3f}".format(msg.ljust(60), endtime - starttime))
+    return res
+
+
+def run_query(query):
+    return len(list(query.all()))
+
+
+def run(fb, num, msg):
+    fjo = fixed_join_order(F, G)
+    q1 = fb.query(F, G).join(F.a == G.a).heuristic(fjo)
+    q2 = fb.query(F, G).join(G.a < F.b).where(F.b < num // 20).heuristic(fjo)
+    print("{}: {}".format(msg, q1.query_plan()[1].join_method))
+    profcall("Equality join {}".format(msg), run_query, q1)
+    print("{}: {}".format(msg, q2.query_plan()[1].join_method))
+    profcall("Range join {}".format(msg), run_query, q2)
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    facts = create_facts(num)
+    print("\nProfiling joins of {} facts\n".format(2 * num))
+    run(FactBase(facts), num, "(unindexed)")
+    run(FactBase(facts, indexes=[G.a]), num, "(indexed)")
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
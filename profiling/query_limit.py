@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+# ------------------------------------------------------------------------------
+# Returning the first few results of an ordered query. Compares taking the first
+# results of the full (sorted) output with a query limit; which only keeps the
+# first results while sorting (or uses an index ordered scan if the ordering
+# field is indexed).
+# ------------------------------------------------------------------------------
+
+import itertools
+import sys
+import time
+
+from clorm import FactBase, IntegerField, Predicate, desc
+
+# ------------------------------------------------------------------------------
+# A data model
+# ------------------------------------------------------------------------------
+
+
+class P(Predicate):
+    a = IntegerField
+    b = IntegerField
+
+
+def create_facts(num):
+    return [P(a=(i * 7919) % num, b=i % 100) for i in range(num)]
+
+
+def profcall(msg, func, *args, **kwargs):
+    starttime = time.process_time()
+    res = func(*args, **kwargs)
+    endtime = time.process_time()
+    print("{} : {:.3f}".format(msg.ljust(60), endtime - starttime))
+    return res
+
+
+def run_islice(query, runs):
+    return [list(itertools.islice(query.all(), 10)) for _ in range(runs)]
+
+
+def run_limit(query, runs):
+    return [list(query.limit(10).all()) for _ in range(runs)]
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    runs = 10
+    facts = create_facts(num)
+    print("\nProfiling {} runs returning the first 10 of {} facts\n".format(runs, num))
+    for fb, msg in [(FactBase(facts), "unindexed"), (FactBase(facts, indexes=[P.a]), "indexed")]:
+        q = fb.query(P).where(P.b < 50).order_by(desc(P.a))
+        r1 = profcall("Sorting all results ({})".format(msg), run_islice, q, runs)
+        r2 = profcall("Limit 10 ({})".format(msg), run_limit, q, runs)
+        assert r1 == r2
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
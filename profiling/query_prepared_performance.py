@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+# ------------------------------------------------------------------------------
+# Executing a parameterised query many times. Compares the normal (ad-hoc)
+# execution, where binding the placeholders and executing the query builds a
+# new query plan each time, with a prepared query that builds the query plan
+# once and only substitutes the placeholder values for each execution.
+# ------------------------------------------------------------------------------
+
+import sys
+import time
+
+from clorm import FactBase, IntegerField, Predicate, StringField, ph1_
+
+# ------------------------------------------------------------------------------
+# A data model
+# ------------------------------------------------------------------------------
+
+
+class Customer(Predicate):
+    cid = IntegerField
+    name = StringField
+
+
+class Sale(Predicate):
+    sid = IntegerField
+    cid = IntegerField
+    item = StringField
+
+
+def create_facts(num_customers, sales_per_customer):
+    tmp = []
+    saleid = 1
+    for idx in range(1, num_customers + 1):
+        tmp.append(Customer(cid=idx, name="Customer {}".format(idx)))
+        for _ in range(sales_per_customer):
+            tmp.append(Sale(sid=saleid, cid=idx, item="Item {}".format(saleid)))
+            saleid += 1
+    return tmp
+
+
+def profcall(msg, func, *args, **kwargs):
+    starttime = time.process_time()
+    res = func(*args, **kwargs)
+    endtime = time.process_time()
+    print("{} : {:.3f}".format(msg.ljust(60), endtime - starttime))
+    return res
+
+
+def run_queries(query, num):
+    count = 0
+    for cid in range(1, num + 1):
+        count += len(list(query.bind(cid).all()))
+    return count
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    fb = FactBase(create_facts(num, 5), indexes=[Customer.cid, Sale.cid])
+    q1 = fb.query(Customer).where(Customer.cid == ph1_)
+    q2 = fb.query(Customer, Sale).join(Customer.cid == Sale.cid).where(Customer.cid == ph1_)
+
+    print("\nProfiling {} executions of parameterised queries\n".format(num))
+    c1 = profcall("Single predicate query (ad-hoc)", run_queries, q1, num)
+    c2 = profcall("Single predicate query (prepared)", run_queries, q1.prepare(), num)
+    assert c1 == c2
+    c1 = profcall("Join query (ad-hoc)", run_queries, q2, num)
+    c2 = profcall("Join query (prepared)", run_queries, q2.prepare(), num)
+    assert c1 == c2
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
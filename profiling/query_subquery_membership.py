@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+# ------------------------------------------------------------------------------
+# Queries with in_/notin_ sub-query membership conditions. A sub-query that is a
+# simple projection is the set of the values of a path, which is read from an
+# index (or built in one pass over the facts) and cached until the facts change.
+# The sub-query set is the build side of a hash semi-join/anti-join (or probes an
+# index on the outer path).
+# ------------------------------------------------------------------------------
+
+import sys
+import time
+
+from clorm import FactBase, IntegerField, Predicate, StringField, in_, notin_
+
+# ------------------------------------------------------------------------------
+# A data model
+# ------------------------------------------------------------------------------
+
+
+class Customer(Predicate):
+    cid = IntegerField
+    name = StringField
+
+
+class Sale(Predicate):
+    sid = IntegerField
+    cid = IntegerField
+
+
+def create_facts(num):
+    customers = [Customer(cid=idx, name="Customer {}".format(idx)) for idx in range(num)]
+    sales = [Sale(sid=idx, cid=idx % (num // 2)) for idx in range(num * 5)]
+    return customers + sales
+
+
+def profcall(msg, func, *args, **kwargs):
+    starttime = time.process_time()
+    res = func(*args, **kwargs)
+    endtime = time.process_time()
+    print("{} : {:.3f}".format(msg.ljust(60), endtime - starttime))
+    return res
+
+
+def run_queries(query, num):
+    count = 0
+    for _ in range(num):
+        count += len(list(query.all()))
+    return count
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    runs = 20
+    facts = create_facts(num)
+    print("\nProfiling {} executions of sub-query membership queries\n".format(runs))
+    for msg, fb in [
+        ("(unindexed)", FactBase(facts)),
+        ("(indexed)", FactBase(facts, indexes=[Customer.cid, Sale.cid])),
+    ]:
+        sq = fb.query(Sale).select(Sale.cid)
+        q1 = fb.query(Customer).where(in_(Customer.cid, sq))
+        q2 = fb.query(Customer).where(notin_(Customer.cid, sq))
+        profcall("Semi-join {}".format(msg), run_queries, q1, runs)
+        profcall("Anti-join {}".format(msg), run_queries, q2, runs)
+
+        sqw = fb.query(Sale).where(Sale.sid >= 0).select(Sale.cid)
+        q3 = fb.query(Customer).where(in_(Customer.cid, sqw))
+        profcall("Semi-join with a filtered sub-query {}".format(msg), run_queries, q3, runs)
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+# ------------------------------------------------------------------------------
+# Enumerating many models where most of the atoms are the same in every model.
+# Compares extracting the facts of each model with a unifier that unifies every
+# symbol again against one that caches the unified facts of the symbols.
+# ------------------------------------------------------------------------------
+
+import sys
+import time
+
+from clingo import Function, String
+
+from clorm import ConstantField, IntegerField, Predicate, StringField, SymbolPredicateUnifier
+from clorm.clingo import Control
+
+# ------------------------------------------------------------------------------
+# A data model and an ASP program with many models that share most atoms
+# ------------------------------------------------------------------------------
+
+
+class Task(Predicate):
+    tid = IntegerField
+    owner = ConstantField
+    label = StringField
+
+
+class Selected(Predicate):
+    tid = IntegerField
+
+
+PROGRAM = """
+task(T, @owner(T), @label(T)) :- T = 1..{num}.
+{{ selected(1..{choices}) }}.
+"""
+
+
+class Context:
+    def owner(self, t):
+        return Function("person{}".format(t.number % 20))
+
+    def label(self, t):
+        return String("the task number {}".format(t.number))
+
+
+def profcall(msg, func, *args, **kwargs):
+    starttime = time.process_time()
+    res = func(*args, **kwargs)
+    endtime = time.process_time()
+    print("{} : {:.3f}".format(msg.ljust(60), endtime - starttime))
+    return res
+
+
+def enumerate_models(num, choices, cache_size):
+    spu = SymbolPredicateUnifier([Task, Selected], cache_size=cache_size)
+    ctrl = Control(["0"], unifier=spu)
+    ctrl.add("base", [], PROGRAM.format(num=num, choices=choices))
+    ctrl.ground([("base", [])], context=Context())
+    total = 0
+    with ctrl.solve(yield_=True) as sh:
+        for model in sh:
+            total += len(model.facts(atoms=True))
+    return total, spu
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    choices = 8
+    print("\nProfiling the facts of {} models of {} atoms\n".format(2**choices, num))
+
+    total1, _ = profcall("Extract the facts of each model", enumerate_models, num, choices, 0)
+    total2, spu = profcall(
+        "Extract the facts of each model (cached)", enumerate_models, num, choices, 2 * num
+    )
+    assert total1 == total2
+    print(
+        "{} : {} / {}".format("Cache hits / misses".ljust(60), spu.cache_hits, spu.cache_misses)
+    )
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+# ------------------------------------------------------------------------------
+# Unifying the symbols of a model where the facts are only used for membership
+# tests or have one of their fields accessed. Compares the default (strict)
+# unification with lazy unification, which only converts a field value when it
+# is first accessed.
+# ------------------------------------------------------------------------------
+
+import sys
+import time
+
+from clingo import Function, Number, String
+
+from clorm import ConstantField, IntegerField, Predicate, StringField, Unifier
+
+# ------------------------------------------------------------------------------
+# A data model
+# ------------------------------------------------------------------------------
+
+
+class Point(Predicate):
+    x = IntegerField
+    y = IntegerField
+
+
+class Visit(Predicate):
+    vid = IntegerField
+    who = ConstantField
+    where = Point.Field
+    note = StringField
+
+
+def create_symbols(num):
+    return [
+        Function(
+            "visit",
+            [
+                Number(i),
+                Function("p{}".format(i % 100)),
+                Function("point", [Number(i % 50), Number(i % 30)]),
+                String("note {}".format(i)),
+            ],
+        )
+        for i in range(num)
+    ]
+
+
+def profcall(msg, func, *args, **kwargs):
+    starttime = time.process_time()
+    res = func(*args, **kwargs)
+    endtime = time.process_time()
+    print("{} : {:.3f}".format(msg.ljust(60), endtime - starttime))
+    return res
+
+
+def unify(symbols, lazy_unify):
+    return list(Unifier([Visit], lazy_unify=lazy_unify).iter_unify(symbols, False))
+
+
+def membership(facts, probes):
+    return len(set(facts).intersection(probes))
+
+
+def one_field(facts):
+    return sum([f.vid for f in facts])
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    symbols = create_symbols(num)
+    probes = [
+        Visit(i, "p{}".format(i % 100), Point(i % 50, i % 30), "note {}".format(i))
+        for i in range(0, num, 10)
+    ]
+    print("\nProfiling the unification of {} symbols\n".format(num))
+
+    for lazy_unify in [False, True]:
+        mode = "lazy" if lazy_unify else "strict"
+        facts = profcall("Unify ({})".format(mode), unify, symbols, lazy_unify)
+        count = profcall("Membership tests ({})".format(mode), membership, facts, probes)
+        assert count == len(probes)
+        total = profcall("Access one field ({})".format(mode), one_field, facts)
+        assert total == num * (num - 1) // 2
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
@@ -22,5 +22,7 @@ from .test_orm_noclingo import *
 from .test_orm_query import *
 from .test_orm_symbols_facts import *
 from .test_util_oset import OrderedSetTestCase
+from .test_util_persistent import PersistentContainersTestCase
+from .test_util_sortedlist import SortedListTestCase
 from .test_util_tools import *
 from .test_util_wrapper import *
@@ -8,7 +8,15 @@ import unittest
 import clingo
 
 import clorm.json as cjson
-from clorm import ComplexTerm, FactBase, IntegerField, Predicate, StringField
+from clorm import (
+    ComplexTerm,
+    FactBase,
+    IntegerField,
+    Predicate,
+    StringField,
+    hash_index,
+    hashable_path,
+)
 
 # ------------------------------------------------------------------------------
 # ------------------------------------------------------------------------------
@@ -291,6 +299,19 @@ class JSONPredicateTestCase(unittest.TestCase):
         self.assertEqual(set(fb_in), set(fb_out))
         self.assertEqual(fb_in, fb_out)
 
+        fb_in = FactBase(facts=allf, indexes=[hash_index(Afact.aint), Bfact.astr])
+        fb_out = pc.loads(pc.dumps(fb_in))
+        self.assertEqual(fb_out.indexes[0], hash_index(Afact.aint))
+        self.assertEqual(fb_in, fb_out)
+
+        fb_in = FactBase(facts=allf, indexes=[(Afact.aint, Afact.afun)])
+        fb_out = pc.loads(pc.dumps(fb_in))
+        self.assertEqual(
+            [hashable_path(p) for p in fb_out.indexes[0]],
+            [hashable_path(Afact.aint), hashable_path(Afact.afun)],
+        )
+        self.assertEqual(fb_in, fb_out)
+
 
 # ------------------------------------------------------------------------------
 # main
@@ -37,6 +37,7 @@ from clorm import (
     HeadList,
     HeadListReversed,
     IntegerField,
+    InternCache,
     Number,
     Predicate,
     Raw,
@@ -1142,6 +1143,95 @@ class PredicateTestCase(unittest.TestCase):
         raw_q = Function("q", [String("silly")])
         self.assertEqual(q.raw, raw_q)
 
+    # --------------------------------------------------------------------------
+    # Test creating facts from columns of field values
+    # --------------------------------------------------------------------------
+    def test_predicate_from_columns(self):
+        class P(Predicate):
+            anum = IntegerField
+            astr = StringField(default="x")
+            atup = (IntegerField, ConstantField)
+            alst = IntegerField(default_factory=lambda: 3)
+
+        class Q(Predicate):
+            anum = IntegerField
+
+            class Meta:
+                sign = False
+
+        class Column(list):
+            def tolist(self):
+                return list(self)
+
+        facts = P.from_columns([1, 2, 2], atup=[(1, "a"), (2, "b"), (2, "b")])
+        self.assertEqual(facts, [P(1, "x", (1, "a")), P(2, "x", (2, "b")), P(2, "x", (2, "b"))])
+        self.assertEqual(hash(facts[0]), hash(P(1, "x", (1, "a"))))
+        self.assertEqual(facts[0].raw, P(1, "x", (1, "a")).raw)
+        self.assertEqual(facts[1].atup.arg2, "b")
+
+        atup = P.meta["atup"].defn.complex(3, "c")
+        facts = P.from_columns(Column([1, 2]), ("a", "b"), [atup, atup], [4, 5], sign=False)
+        self.assertEqual(
+            facts, [P(1, "a", (3, "c"), 4, sign=False), P(2, "b", (3, "c"), 5, sign=False)]
+        )
+        self.assertIs(facts[0].atup, atup)
+        self.assertEqual(P.from_columns(anum=[], atup=[]), [])
+        self.assertEqual(Q.from_columns([1], sign=False), [Q(1, sign=False)])
+
+        with self.assertRaises(ValueError) as ctx:
+            Q.from_columns([1])
+        with self.assertRaises(ValueError) as ctx:
+            P.from_columns([1, 2], atup=[(1, "a")])
+        check_errmsg("The columns must all have the same length", ctx)
+        with self.assertRaises(ValueError) as ctx:
+            P.from_columns()
+        with self.assertRaises(TypeError) as ctx:
+            P.from_columns([1], atup=[(1, "a")], bad=[1])
+        check_errmsg('P has no field "bad"', ctx)
+        with self.assertRaises(TypeError) as ctx:
+            P.from_columns([1], anum=[1], atup=[(1, "a")])
+        check_errmsg('Multiple columns for field "anum"', ctx)
+        with self.assertRaises(TypeError) as ctx:
+            P.from_columns([1])
+        check_errmsg('Missing column for field "atup"', ctx)
+        with self.assertRaises(TypeError) as ctx:
+            P.from_columns([1], atup=[1])
+        with self.assertRaises(TypeError) as ctx:
+            P.from_columns([1, "a"], atup=[(1, "a")] * 2)
+        with self.assertRaises(TypeError) as ctx:
+            P.from_columns([1], [1], [(1, "a")], [1], [1])
+
+        # Lazy symbol predicates still check the values but don't build the symbols
+        class L(Predicate):
+            anum = IntegerField
+            sub = Q.Field
+
+            class Meta:
+                lazy_symbol = True
+
+        q1 = Q(1, sign=False)
+        facts = L.from_columns([1, 2], [q1, q1])
+        self.assertEqual(facts, [L(1, q1), L(2, q1)])
+        self.assertIsNone(facts[0]._raw)
+        self.assertEqual(facts[1].raw, L(2, q1).raw)
+        with self.assertRaises(TypeError) as ctx:
+            L.from_columns([1, "a"], [q1, q1])
+        with self.assertRaises(TypeError) as ctx:
+            L.from_columns([1, 2], [q1, 1])
+
+        # Interned predicates share equal field values
+        cache = InternCache()
+
+        class I(Predicate):
+            astr = StringField
+
+            class Meta:
+                intern = cache
+
+        facts = I.from_columns(["".join(["a", "b"]), "".join(["a", "b"])])
+        self.assertIs(facts[0].astr, facts[1].astr)
+        self.assertIs(I("ab").astr, facts[0].astr)
+
     # --------------------------------------------------------------------------
     # Test default value for anonymous tuple
     # --------------------------------------------------------------------------
@@ -1945,6 +2035,14 @@ class PickleH(Predicate):
 PickleI = simple_predicate("I", 1)
 
 
+class PickleL(Predicate):
+    anum = IntegerField
+    astr = StringField
+
+    class Meta:
+        lazy_symbol = True
+
+
 class FactPicklingTestCase(unittest.TestCase):
     def setUp(self):
         pass
@@ -1974,6 +2072,14 @@ class FactPicklingTestCase(unittest.TestCase):
         self.assertEqual(hash(fin), hash(fout))
         self.assertEqual(fin.raw, fout.raw)
 
+    def test_lazy_symbol_predicate_pickling(self):
+        fout = PickleL(1, "a")
+        fin = pickle.loads(pickle.dumps(fout))
+        self.assertIsNone(fin._raw)
+        self.assertEqual(fin, fout)
+        self.assertEqual(hash(fin), hash(fout))
+        self.assertEqual(fin.raw, fout.raw)
+
     ##FIXUP - PickleH cannot be pickled because it relies on an internally
     ##generated anonymous tuple class. Maybe there is a way around this using
     ##the __reduce__() function.
@@ -2545,6 +2651,151 @@ class PredicateInternalUnifyTestCase(unittest.TestCase):
             self.assertTrue(af1 <= f2)
             self.assertTrue(f2 >= af1)
 
+    # --------------------------------------------------------------------------
+    # Test that a lazy symbol predicate only builds the raw symbol when needed
+    # --------------------------------------------------------------------------
+    def test_predicate_lazy_symbol(self):
+        class Fact(Predicate):
+            anum = IntegerField
+            atup = (IntegerField, StringField)
+
+            class Meta:
+                name = "fact"
+                lazy_symbol = True
+
+        class Fact2(Predicate):
+            anum = IntegerField
+            atup = (IntegerField, StringField)
+
+            class Meta:
+                name = "fact"
+
+        class Empty(Predicate):
+            class Meta:
+                lazy_symbol = True
+
+        self.assertTrue(Fact.meta.lazy_symbol)
+        self.assertFalse(Fact2.meta.lazy_symbol)
+
+        f1 = Fact(1, (2, "a"))
+        f1_c = Fact(1, (2, "a"))
+        f2 = Fact(2, (2, "a"))
+        nf1 = Fact(1, (2, "a"), sign=False)
+        g1 = Fact2(1, (2, "a"))
+        r1 = Function("fact", [Number(1), Function("", [Number(2), String("a")])])
+
+        # Field access, hashing and equality of the same class don't build the
+        # raw symbol
+        self.assertEqual(f1.anum, 1)
+        self.assertEqual(f1.atup[1], "a")
+        self.assertEqual(f1, f1_c)
+        self.assertNotEqual(f1, f2)
+        self.assertNotEqual(f1, nf1)
+        self.assertEqual(hash(f1), hash(f1_c))
+        self.assertEqual(len({f1, f1_c, f2, nf1}), 3)
+        self.assertIn(f1_c, {f1})
+        self.assertIsNone(f1._raw)
+        self.assertIsNone(f1_c._raw)
+
+        # Comparison with other classes, symbols, and ordering builds it
+        self.assertEqual(f1, g1)
+        self.assertEqual(g1, f1)
+        self.assertEqual(f1, r1)
+        self.assertTrue(f1 < f2)
+        self.assertTrue(f2 >= f1)
+        self.assertEqual(f1.raw, r1)
+        self.assertEqual(f1.symbol, r1)
+        self.assertEqual(str(nf1), '-fact(1,(2,"a"))')
+        self.assertEqual(hash(f1), hash(f1_c))
+
+        # A unified fact is equal to a constructed fact
+        u1 = Fact._unify(r1)
+        self.assertEqual(u1, f1)
+        self.assertEqual(hash(u1), hash(f1))
+        self.assertEqual(Empty(), Empty())
+        self.assertEqual(Empty().raw, Function("empty", []))
+
+        # Bad field values are only detected when the raw symbol is built
+        bad = Fact("x", (2, "a"))
+        with self.assertRaises(TypeError):
+            bad.raw
+
+        # A sub-fact field's raw symbol is built with the fact's raw symbol
+        class Outer(Predicate):
+            inner = Fact.Field
+
+            class Meta:
+                lazy_symbol = True
+
+        o1 = Outer(Fact(1, (2, "a")))
+        self.assertIsNone(o1.inner._raw)
+        self.assertEqual(o1.raw, Function("outer", [r1]))
+        with self.assertRaises(TypeError):
+            Outer(1).raw
+
+    # --------------------------------------------------------------------------
+    # Test that a predicate with the intern option shares equal field values
+    # --------------------------------------------------------------------------
+    def test_predicate_intern(self):
+        class Point(Predicate):
+            x = IntegerField
+            y = IntegerField
+
+        cache = InternCache(maxsize=4)
+
+        class Visit(Predicate):
+            who = ConstantField
+            where = Point.Field
+            note = StringField
+
+            class Meta:
+                intern = cache
+
+        class Visit2(Predicate, intern=True):
+            who = ConstantField
+
+        self.assertIs(Visit.meta.intern_cache, cache)
+        self.assertIsInstance(Visit2.meta.intern_cache, InternCache)
+        self.assertIsNone(Point.meta.intern_cache)
+
+        def vsym(who, x, note):
+            return Function(
+                "visit",
+                [Function(who), Function("point", [Number(x), Number(2)]), String(note)],
+            )
+
+        v1 = Visit._unify(vsym("dave", 1, "a note"))
+        v2 = Visit._unify(vsym("dave", 1, "a note"))
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (3, 3, 3))
+        self.assertTrue(cache.saved_bytes > 0)
+        self.assertEqual(v1, Visit("dave", Point(1, 2), "a note"))
+        self.assertEqual(v1, v2)
+        self.assertIs(v1.who, v2.who)
+        self.assertIs(v1.where, v2.where)
+        self.assertIs(v1.note, v2.note)
+
+        # Values passed to the constructor are also interned
+        v3 = Visit("".join(["da", "ve"]), Point(1, 2), "note")
+        v4 = Visit("".join(["da", "ve"]), Point(1, 2), "note")
+        self.assertIs(v3.who, v4.who)
+        self.assertIs(v3.where, v4.where)
+        self.assertEqual(v3.raw, vsym("dave", 1, "note"))
+
+        # The cache is bounded and unhashable values are not interned
+        for i in range(10):
+            Visit._unify(vsym("p{}".format(i), i, "note"))
+        self.assertEqual(len(cache), 8)
+        self.assertEqual(cache.intern([1]), [1])
+        self.assertEqual(cache.intern(1.0), 1.0)
+        self.assertIs(type(cache.intern(1)), int)
+        cache.clear()
+        self.assertEqual((cache.hits, cache.misses, cache.saved_bytes, len(cache)), (0, 0, 0, 0))
+
+        # Unification failures are not cached
+        self.assertIsNone(Visit._unify(Function("visit", [Number(1), Number(1), Number(1)])))
+        with self.assertRaises(ValueError) as ctx:
+            InternCache(maxsize=0)
+
     # --------------------------------------------------------------------------
     # Test predicate equality
     # --------------------------------------------------------------------------
@@ -8,6 +8,7 @@
 # to be completed.
 # ------------------------------------------------------------------------------
 
+import operator
 import pickle
 import unittest
 from typing import Tuple
@@ -15,24 +16,33 @@ from typing import Tuple
 # Official Clorm API imports for the fact base components
 # Official Clorm API imports for the core complements
 from clorm.orm import (
+    AutoIndexer,
     ComplexTerm,
     ConstantField,
     FactBase,
+    FrozenFactBase,
     IntegerField,
     Predicate,
     SimpleField,
     StringField,
     alias,
+    and_,
     asc,
+    count_,
     desc,
     func,
+    hash_index,
     hashable_path,
     in_,
+    max_,
+    min_,
     notin_,
+    or_,
     path,
     ph1_,
     ph2_,
     ph_,
+    sum_,
 )
 from clorm.orm.core import field
 from clorm.orm.query import fixed_join_order
@@ -53,6 +63,10 @@ __all__ = [
     "SelectJoinTestCase",
     "MembershipQueriesTestCase",
     "FactBasePicklingTestCase",
+    "FactBaseAutoIndexTestCase",
+    "MaterializedViewTestCase",
+    "FactBaseJournalTestCase",
+    "FrozenFactBaseTestCase",
 ]
 
 # ------------------------------------------------------------------------------
@@ -377,6 +391,15 @@ class FactBaseTestCase(unittest.TestCase):
         r = fb1 | fb2 | [af2, bf3]
         self.assertEqual(r, fb4)  # overload version
 
+        # A predicate that is only in the other factbases gets no indexes, as the
+        # receiver has none for it, and the others are not changed
+        fb6 = FactBase([cf1, cf2], indexes=[Cfact.num1])
+        r = fb1.union(fb6, [cf3])
+        self.assertEqual(r, FactBase([af1, bf1, cf1, cf2, cf3]))
+        self.assertEqual(r._factmaps[Cfact].indexes, ())
+        self.assertEqual(fb6._factmaps[Cfact].indexes, (Cfact.num1,))
+        self.assertEqual(fb6, FactBase([cf1, cf2]))
+
         # Test intersection
         r = fb0.intersection(fb1)
         self.assertEqual(r, fb0)
@@ -485,6 +508,108 @@ class FactBaseTestCase(unittest.TestCase):
         self.assertEqual(set(hpaths(fb2.indexes)), set([]))
         self.assertEqual(set(hpaths(fb3.indexes)), set(hpaths(fb1.indexes)))
 
+    # --------------------------------------------------------------------------
+    # Test that a copy is a snapshot that is independent of the original even
+    # though the storage is shared until one of them is modified
+    # --------------------------------------------------------------------------
+    def test_factbase_copy_snapshot(self):
+        class Afact(Predicate):
+            num = IntegerField
+
+        class Bfact(Predicate):
+            num = IntegerField
+
+        afacts = [Afact(i) for i in range(10)]
+        bfacts = [Bfact(i) for i in range(10)]
+        fb1 = FactBase(afacts + bfacts, indexes=[Afact.num])
+        fb2 = fb1.copy()
+        fb3 = fb2.copy()
+        fb1.add(Afact(20))
+        fb2.remove(Afact(0))
+        fb3.clear()
+        fb3.add(Bfact(1))
+        self.assertEqual(fb1, FactBase(afacts + bfacts + [Afact(20)]))
+        self.assertEqual(fb2, FactBase(afacts[1:] + bfacts))
+        self.assertEqual(fb3, FactBase([Bfact(1)]))
+        self.assertEqual(list(fb1.query(Afact).where(Afact.num > 8).all()), [Afact(9), Afact(20)])
+        self.assertEqual(list(fb2.query(Afact).where(Afact.num < 2).all()), [Afact(1)])
+        self.assertEqual(list(fb3.query(Afact).all()), [])
+
+        # Set operations on the copies
+        fb4 = fb2.copy()
+        self.assertEqual(fb4 ^ fb1, FactBase([Afact(0), Afact(20)]))
+        fb4 ^= FactBase([Afact(0), Bfact(1)])
+        self.assertEqual(fb4, FactBase(afacts + bfacts[:1] + bfacts[2:]))
+        self.assertEqual(fb2, FactBase(afacts[1:] + bfacts))
+
+    # --------------------------------------------------------------------------
+    # Test adding and exporting the facts of a predicate as columns
+    # --------------------------------------------------------------------------
+    def test_factbase_columns(self):
+        class Afact(Predicate):
+            num = IntegerField
+            name = ConstantField(default="x")
+            pair = (IntegerField, StringField)
+
+        class Bfact(Predicate):
+            num = IntegerField
+
+        fb = FactBase([Bfact(1)], indexes=[Afact.num], journal=True)
+        version = fb.version
+        fb.add_columns(Afact, [1, 2, 3], pair=[(1, "a"), (2, "b"), (3, "c")])
+        fb.add_columns(Afact, num=[3, 4], name=["x", "y"], pair=[(3, "c"), (4, "d")])
+        afacts = [Afact(1, "x", (1, "a")), Afact(2, "x", (2, "b")), Afact(3, "x", (3, "c"))]
+        afacts.append(Afact(4, "y", (4, "d")))
+        self.assertEqual(fb, FactBase(afacts + [Bfact(1)]))
+        self.assertEqual(list(fb.query(Afact).where(Afact.num == 4).all()), afacts[3:])
+        self.assertEqual(fb.changes_since(version), {Afact: (set(afacts), set())})
+
+        columns = fb.to_columns(Afact)
+        self.assertEqual(list(columns), ["num", "name", "pair"])
+        self.assertEqual(sorted(columns["num"]), [1, 2, 3, 4])
+        self.assertEqual(
+            sorted(zip(columns["num"], columns["name"], columns["pair"])),
+            [(f.num, f.name, f.pair) for f in afacts],
+        )
+        self.assertEqual(Afact.from_columns(**columns), list(fb.query(Afact).all()))
+        self.assertEqual(fb.to_columns(Bfact), {"num": [1]})
+        self.assertEqual(FrozenFactBase(fb).to_columns(Afact), columns)
+
+        fb2 = FactBase(lambda: [Bfact(1)])
+        self.assertEqual(fb2.to_columns(Afact), {"num": [], "name": [], "pair": []})
+        with self.assertRaises(TypeError) as ctx:
+            fb2.to_columns(int)
+        check_errmsg("'<class 'int'>' is not a Predicate sub-class", ctx)
+
+    # --------------------------------------------------------------------------
+    # Test that adding and querying lazy symbol facts doesn't build their raw
+    # symbols
+    # --------------------------------------------------------------------------
+    def test_factbase_lazy_symbol_facts(self):
+        class F(Predicate):
+            anum = IntegerField
+            atup = (IntegerField, StringField)
+
+            class Meta:
+                lazy_symbol = True
+
+        facts = [F(i, (i % 2, "a")) for i in range(10)]
+        fb = FactBase(facts, indexes=[F.anum])
+        fb.add(F(10, (0, "b")))
+        fb.update(F.from_columns([11, 12], [(1, "b"), (0, "b")]))
+        fb.discard(F(12, (0, "b")))
+
+        q = fb.query(F).where(F.atup[0] == 1).order_by(desc(F.anum))
+        self.assertEqual([f.anum for f in q.all()], [11, 9, 7, 5, 3, 1])
+        self.assertEqual(fb.query(F).where(F.anum == 1).count(), 1)
+        self.assertEqual(set(fb.query(F).select(F.atup[1]).distinct().all()), {"a", "b"})
+        self.assertIn(F(1, (1, "a")), fb)
+        self.assertEqual(len(fb), 12)
+        self.assertTrue(all(f._raw is None for f in fb))
+
+        # Building the symbols later gives the same facts
+        self.assertEqual(fb.asp_str(), FactBase([F(f.anum, f.atup) for f in fb]).asp_str())
+
     # --------------------------------------------------------------------------
     # Test deterministic iteration. Namely, that there is determinism when
     # iterating over two factbases that have been constructed identically
@@ -1245,6 +1370,111 @@ class QueryAPI1TestCase(unittest.TestCase):
         self.assertEqual(set([f for f in s2.get(2, b=2)]), set([f2]))
         self.assertEqual(facts, set([f1, f2, f3]))
 
+    # --------------------------------------------------------------------------
+    #   Test that a hash index is only used for equality and membership lookups
+    # --------------------------------------------------------------------------
+    def test_api_factbase_select_hash_indexing(self):
+        class Afact(Predicate):
+            num1 = IntegerField()
+            num2 = IntegerField()
+
+        class Bfact(Predicate):
+            num1 = IntegerField()
+
+        f1 = Afact(3, 1)
+        f2 = Afact(1, 2)
+        f3 = Afact(2, 3)
+        f4 = Afact(1, 1)
+        bf1 = Bfact(1)
+        bf2 = Bfact(2)
+        fb1 = FactBase([f1, f2, f3, f4, bf1, bf2], indexes=[hash_index(Afact.num1)])
+        self.assertEqual(fb1.indexes, (hash_index(Afact.num1),))
+
+        facts = set()
+
+        def track(f):
+            nonlocal facts
+            facts.add(f)
+            return f.num2 == 2
+
+        q1 = fb1.query(Afact).where(Afact.num1 == ph1_, func([Afact], track))
+        self.assertEqual(list(q1.bind(1).all()), [f2])
+        self.assertEqual(facts, set([f2, f4]))
+
+        q2 = fb1.query(Afact).where(Afact.num1 < 3).order_by(Afact.num1, Afact.num2)
+        self.assertEqual(list(q2.all()), [f4, f2, f3])
+        q3 = fb1.query(Afact).where(in_(Afact.num1, [2, 3])).order_by(desc(Afact.num1))
+        self.assertEqual(list(q3.all()), [f1, f3])
+        q4 = fb1.query(Afact).order_by(Afact.num1)
+        self.assertEqual([f.num1 for f in q4.all()], [1, 1, 2, 3])
+
+        # Joins on the hash indexed path for equality and non-equality
+        q5 = fb1.query(Bfact, Afact).join(Bfact.num1 == Afact.num1).order_by(Afact.num2)
+        self.assertEqual(list(q5.all()), [(bf1, f4), (bf1, f2), (bf2, f3)])
+        q6 = (
+            fb1.query(Bfact, Afact).join(Bfact.num1 < Afact.num1).order_by(Bfact.num1, Afact.num1)
+        )
+        self.assertEqual(list(q6.all()), [(bf1, f3), (bf1, f1), (bf2, f1)])
+
+        # Copying the factbase preserves the hash index
+        fb2 = FactBase(fb1)
+        self.assertEqual(fb2.indexes, (hash_index(Afact.num1),))
+        self.assertEqual(list(fb2.query(Afact).where(Afact.num1 > 2).all()), [f1])
+
+    # --------------------------------------------------------------------------
+    #   Test that a composite index is used for a conjunction of equalities
+    # --------------------------------------------------------------------------
+    def test_api_factbase_select_composite_indexing(self):
+        class Afact(Predicate):
+            num1 = IntegerField()
+            num2 = IntegerField()
+            num3 = IntegerField()
+
+        class Bfact(Predicate):
+            num1 = IntegerField()
+            num2 = IntegerField()
+
+        afacts = [Afact(n1, n2, n1 * 10 + n2) for n1 in range(3) for n2 in range(3)]
+        bf1 = Bfact(1, 2)
+        bf2 = Bfact(2, 0)
+        bf3 = Bfact(5, 0)
+        fb1 = FactBase(afacts + [bf1, bf2, bf3], indexes=[(Afact.num1, Afact.num2)])
+
+        facts = set()
+
+        def track(f):
+            nonlocal facts
+            facts.add(f)
+            return True
+
+        q1 = fb1.query(Afact).where(Afact.num2 == ph1_, Afact.num1 == 1, func([Afact], track))
+        self.assertEqual(list(q1.bind(2).all()), [Afact(1, 2, 12)])
+        self.assertEqual(facts, set([Afact(1, 2, 12)]))
+
+        q2 = (
+            fb1.query(Afact)
+            .where((Afact.num1 == 1) & (Afact.num2 > 0))
+            .order_by(desc(Afact.num2))
+        )
+        self.assertEqual(list(q2.all()), [Afact(1, 2, 12), Afact(1, 1, 11)])
+
+        q3 = (
+            fb1.query(Bfact, Afact)
+            .join(Bfact.num1 == Afact.num1, Bfact.num2 == Afact.num2)
+            .order_by(Bfact.num1)
+        )
+        self.assertEqual(list(q3.all()), [(bf1, Afact(1, 2, 12)), (bf2, Afact(2, 0, 20))])
+
+        # A composite join key without an existing index
+        fb2 = FactBase(fb1, indexes=[(Bfact.num1, Bfact.num2)])
+        q4 = (
+            fb2.query(Afact, Bfact)
+            .join(Bfact.num1 == Afact.num1, Bfact.num2 == Afact.num2)
+            .where(Afact.num3 > 15)
+            .order_by(Bfact.num1)
+        )
+        self.assertEqual(list(q4.all()), [(Afact(2, 0, 20), bf2)])
+
     # --------------------------------------------------------------------------
     #   Test the delete
     # --------------------------------------------------------------------------
@@ -1712,6 +1942,295 @@ class QueryAPI2TestCase(unittest.TestCase):
             tmp = list(fb.query(F, G).all())
         check_errmsg("A query over multiple predicates is incomplete", ctx)
 
+    # --------------------------------------------------------------------------
+    #   Test aggregation
+    # --------------------------------------------------------------------------
+    def test_api_aggregate(self):
+        F = self.F
+        G = self.G
+        facts = [F(n % 7, str(n)) for n in range(30)] + [G(n % 5, str(n)) for n in range(20)]
+        fnums = [n % 7 for n in range(30)]
+
+        for indexes in [[], [F.anum], [hash_index(F.anum)]]:
+            fb = FactBase(facts, indexes=indexes)
+            q = fb.query(F)
+            self.assertEqual(q.count(), 30)
+            self.assertEqual(q.sum(F.anum), sum(fnums))
+            self.assertEqual(q.min(F.anum), 0)
+            self.assertEqual(q.max(F.anum), 6)
+            self.assertEqual(q.max(F.astr), "9")
+            self.assertEqual(q.aggregate(count_(), min_(F.anum), max_(F.anum)), (30, 0, 6))
+
+            qw = q.where(F.anum > 2)
+            self.assertEqual(qw.count(), len([n for n in fnums if n > 2]))
+            self.assertEqual(qw.sum(F.anum), sum([n for n in fnums if n > 2]))
+            self.assertEqual(qw.min(F.anum), 3)
+            with self.assertRaises(ValueError) as ctx:
+                q.where(F.anum > 10).max(F.anum)
+            check_errmsg("Query has no matching elements", ctx)
+            self.assertEqual(q.where(F.anum > 10).aggregate(count_(), sum_(F.anum)), (0, 0))
+
+            # Joins and grouped queries
+            qj = fb.query(F, G).join(F.anum == G.anum)
+            self.assertEqual(qj.count(), len(list(qj.all())))
+            self.assertEqual(qj.sum(G.anum), sum([g.anum for _, g in qj.all()]))
+            qg = fb.query(F).group_by(F.anum)
+            self.assertEqual(list(qg.count()), [(n, fnums.count(n)) for n in range(7)])
+            self.assertEqual(list(qg.sum(F.anum)), [(n, n * fnums.count(n)) for n in range(7)])
+            self.assertEqual(list(qg.min(F.astr))[0], (0, "0"))
+            self.assertEqual(
+                list(qj.group_by(G.anum).aggregate(count_(), max_(F.astr)))[0], (0, (20, "7"))
+            )
+
+            # Prepared queries
+            pq = q.where(F.anum == ph1_).prepare()
+            self.assertEqual(pq.bind(3).count(), 4)
+            self.assertEqual(pq.bind(3).sum(F.anum), 12)
+            self.assertEqual(pq.bind(3).aggregate(min_(F.astr), max_(F.astr)), ("10", "3"))
+
+        # Count with distinct and limit still count the output elements
+        fb = FactBase(facts)
+        self.assertEqual(fb.query(F).select(F.anum).distinct().count(), 7)
+        self.assertEqual(fb.query(F).limit(3).count(), 3)
+
+        # Bad aggregates
+        with self.assertRaises(ValueError) as ctx:
+            fb.query(F).sum(G.anum)
+        check_errmsg("The path of aggregate 'sum(G.anum)' is not a path of", ctx)
+        with self.assertRaises(TypeError) as ctx:
+            fb.query(F).aggregate(F.anum)
+        check_errmsg("'F.anum' is not an Aggregate", ctx)
+        with self.assertRaises(ValueError) as ctx:
+            fb.query(F).select(F.anum).distinct().sum(F.anum)
+        check_errmsg("'distinct' is incompatible with 'aggregate'", ctx)
+        with self.assertRaises(ValueError) as ctx:
+            fb.query(F).limit(2).max(F.anum)
+        check_errmsg("'limit' and 'offset' are incompatible with 'aggregate'", ctx)
+
+    # --------------------------------------------------------------------------
+    #   Test hash grouping (group_by with ordered=False)
+    # --------------------------------------------------------------------------
+    def test_api_group_by_unordered(self):
+        F = self.F
+        G = self.G
+        nums = [3, 1, 4, 1, 5, 9, 2, 6, 5, 3, 5]
+        facts = [F(n, str(i)) for i, n in enumerate(nums)] + [G(n, str(n)) for n in range(10)]
+        firstseen = list(dict.fromkeys(nums))
+
+        for indexes in [[], [F.anum]]:
+            fb = FactBase(facts, indexes=indexes)
+            q = fb.query(F)
+            qs = q.group_by(F.anum).order_by(desc(F.astr)).select(F.astr)
+            qh = q.group_by(F.anum, ordered=False).order_by(desc(F.astr)).select(F.astr)
+            sgroups = {k: list(g) for k, g in qs.all()}
+            hgroups = [(k, list(g)) for k, g in qh.all()]
+            self.assertEqual(dict(hgroups), sgroups)
+            self.assertEqual(len(hgroups), len(sgroups))
+
+            # The groups are in the order that they are first matched (for an
+            # unindexed query this is the insertion order)
+            hkeys = [k for k, _ in hgroups]
+            if not indexes:
+                self.assertEqual(hkeys, firstseen)
+            self.assertEqual(hkeys, [k for k, _ in qh.all()])
+
+            # Aggregates, count, and limit over hash groups
+            qa = q.group_by(F.anum, ordered=False)
+            self.assertEqual(sorted(qa.count()), sorted(q.group_by(F.anum).count()))
+            self.assertEqual(dict(qa.aggregate(count_(), sum_(F.anum)))[5], (3, 15))
+            self.assertEqual(list(qa.limit(2).count()), list(qa.count())[:2])
+
+            # Tuple keys and joins
+            qj = fb.query(F, G).join(F.anum == G.anum)
+            qjh = qj.group_by(G.astr, F.anum, ordered=False).select(F.astr)
+            jgroups = {k: sorted(g) for k, g in qjh.all()}
+            self.assertEqual(
+                jgroups,
+                {k: sorted(g) for k, g in qj.group_by(G.astr, F.anum).select(F.astr).all()},
+            )
+            self.assertEqual(jgroups[("5", 5)], ["10", "4", "8"])
+
+    # --------------------------------------------------------------------------
+    #   Test limit and offset
+    # --------------------------------------------------------------------------
+    def test_api_limit_offset(self):
+        F = self.F
+        G = self.G
+        facts = [F(n % 7, str(n)) for n in range(30)] + [G(n % 5, str(n)) for n in range(20)]
+
+        for indexes in [[], [F.anum]]:
+            fb = FactBase(facts, indexes=indexes)
+            for obs in [[F.anum], [desc(F.anum)], [F.anum, desc(F.astr)]]:
+                q = fb.query(F).order_by(*obs)
+                allf = list(q.all())
+                self.assertEqual(list(q.limit(5).all()), allf[:5])
+                self.assertEqual(list(q.offset(3).all()), allf[3:])
+                self.assertEqual(list(q.offset(3).limit(5).all()), allf[3:8])
+                self.assertEqual(list(q.limit(0).all()), [])
+                self.assertEqual(q.limit(4).count(), 4)
+                self.assertEqual(q.first(), allf[0])
+                self.assertEqual(q.offset(29).singleton(), allf[29])
+
+            # Paging a mixed asc/desc ordering where every key ties
+            q = fb.query(F).where(F.anum == 3).order_by(F.anum, desc(F.anum))
+            allf = list(q.all())
+            pages = [list(q.offset(o).limit(2).all()) for o in range(0, len(allf), 2)]
+            self.assertEqual(sum(pages, []), allf)
+
+            # Ordered joins
+            q = fb.query(F, G).join(F.anum == G.anum).order_by(desc(G.astr), F.astr)
+            allfg = list(q.all())
+            self.assertEqual(list(q.limit(7).all()), allfg[:7])
+            self.assertEqual(list(q.offset(5).limit(7).all()), allfg[5:12])
+            q = fb.query(F, G).join(F.anum < G.anum).order_by(F.astr)
+            allfg = list(q.all())
+            self.assertEqual(list(q.offset(5).limit(7).all()), allfg[5:12])
+
+            # The joins after an ordered root preserve the order
+            fjo = fixed_join_order(F, G)
+            for join in [F.anum < G.anum, F.anum == G.anum]:
+                q = fb.query(F, G).join(join).order_by(F.astr).heuristic(fjo)
+                qw = q.where(func([G.astr], lambda x: x != "3"))
+                for query in [q, qw]:
+                    astrs = [f.astr for f, _ in query.all()]
+                    self.assertEqual(astrs, sorted(astrs))
+                self.assertNotIn("sort-merge", str(q.query_plan()))
+
+            # Unordered, distinct, and grouped queries
+            q = fb.query(F).where(F.anum > 2)
+            self.assertEqual(list(q.limit(3).all()), list(q.all())[:3])
+            q = fb.query(F).select(F.anum).distinct().order_by(F.anum)
+            self.assertEqual(list(q.limit(3).all()), [0, 1, 2])
+            q = fb.query(F).group_by(F.anum).select(F.astr).offset(1).limit(2)
+            self.assertEqual([k for k, _ in q.all()], [1, 2])
+            self.assertEqual(list(q.count()), [(1, 5), (2, 4)])
+
+        # Prepared queries
+        pq = fb.query(F).where(F.anum >= ph1_).order_by(desc(F.astr)).limit(2).prepare()
+        self.assertEqual(list(pq.bind(6).all()), [F(6, "6"), F(6, "27")])
+        self.assertEqual(pq.bind(6).first(), F(6, "6"))
+
+        with self.assertRaises(ValueError) as ctx:
+            fb.query(F).limit(-1)
+        check_errmsg("'limit' must be a non-negative integer", ctx)
+        with self.assertRaises(ValueError) as ctx:
+            fb.query(F).offset("1")
+        check_errmsg("'offset' must be a non-negative integer", ctx)
+        with self.assertRaises(ValueError) as ctx:
+            fb.query(F).limit(1).limit(2)
+        check_errmsg("Cannot specify 'limit' multiple times", ctx)
+        with self.assertRaises(ValueError) as ctx:
+            fb.query(F).limit(1).delete()
+        check_errmsg("'limit' and 'offset' are incompatible with 'delete'", ctx)
+        with self.assertRaises(ValueError) as ctx:
+            fb.query(F).offset(1).modify(lambda f: (None, None))
+        check_errmsg("'limit' and 'offset' are incompatible with 'modify'", ctx)
+
+    # --------------------------------------------------------------------------
+    #   The join method depends on the join operator and the available indexes
+    # --------------------------------------------------------------------------
+    def test_api_join_methods(self):
+        F = self.F
+        G = self.G
+        facts = [F(n % 7, str(n)) for n in range(30)] + [G(n % 5, str(n)) for n in range(20)]
+
+        def expected(op, cond=lambda f, g: True):
+            return sorted(
+                [
+                    (f, g)
+                    for f in facts
+                    if isinstance(f, F)
+                    for g in facts
+                    if isinstance(g, G) and op(f.anum, g.anum) and cond(f, g)
+                ]
+            )
+
+        methods = {
+            operator.eq: ("hash", "index", "index"),
+            operator.lt: ("sort-merge", "index", "sort-merge"),
+            operator.le: ("sort-merge", "index", "sort-merge"),
+            operator.gt: ("sort-merge", "index", "sort-merge"),
+            operator.ge: ("sort-merge", "index", "sort-merge"),
+            operator.ne: ("index", "index", "index"),
+        }
+        indexes = [[], [F.anum, G.anum], [hash_index(F.anum), hash_index(G.anum)]]
+        for idx, fbindexes in enumerate(indexes):
+            fb = FactBase(facts, indexes=fbindexes)
+            for op, method in methods.items():
+                for order in [(F, G), (G, F)]:
+                    q = (
+                        fb.query(F, G)
+                        .join(op(F.anum, G.anum))
+                        .heuristic(fixed_join_order(*order))
+                    )
+                    self.assertEqual(sorted(q.all()), expected(op))
+                    self.assertIn("Join method: {}".format(method[idx]), str(q.query_plan()))
+
+                    # Prejoin filtering and a non-cacheable function where clause
+                    qw = q.where(func([F.astr, G.astr], lambda x, y: x < y), G.astr < "5")
+                    cond = lambda f, g: f.astr < g.astr and g.astr < "5"
+                    self.assertEqual(sorted(qw.all()), expected(op, cond))
+
+            # A composite join key
+            q = fb.query(F, G).join(F.anum == G.anum, F.astr == G.astr)
+            cond = lambda f, g: f.astr == g.astr
+            self.assertEqual(sorted(q.all()), expected(operator.eq, cond))
+
+    # --------------------------------------------------------------------------
+    #   Prepared queries reuse the query plan
+    # --------------------------------------------------------------------------
+    def test_api_prepared_query(self):
+        F = self.F
+        G = self.G
+        fb = FactBase(self.factbase, indexes=[F.anum])
+
+        q = fb.query(F).where(F.anum <= ph1_).order_by(desc(F.anum))
+        pq = q.prepare()
+        for n in range(5):
+            self.assertEqual(list(pq.bind(n).all()), list(q.bind(n).all()))
+        self.assertEqual(pq.bind(2).count(), 2)
+        self.assertEqual(pq.bind(2).first(), F(2, "a"))
+        self.assertEqual(pq.bind(1).singleton(), F(1, "a"))
+        self.assertIn("Prejoin keyed search: [ F.anum <= ph1_ ]", str(pq.query_plan()))
+        self.assertIn("Prejoin keyed search: [ F.anum <= 2 ]", str(pq.bind(2).query_plan()))
+
+        # The plan is reused until the indexes change
+        plan = pq.query_plan()
+        fb.add(F(4, "b"))
+        self.assertTrue(pq.query_plan() is plan)
+        self.assertEqual(pq.bind(4).first(), F(4, "b"))
+        fb.factmaps[F].remove_index(F.anum)
+        self.assertFalse(pq.query_plan() is plan)
+        self.assertIn("Prejoin filter clauses: ( [ F.anum <= ph1_ ] )", str(pq.query_plan()))
+        self.assertEqual(list(pq.bind(1).all()), [F(1, "a")])
+
+        # Joins, named placeholders and sub-queries
+        pq = fb.query(G, F).join(F.anum == G.anum).where(F.astr == ph_("s")).prepare()
+        self.assertEqual(
+            set(pq.bind(s="a").all()), set([(G(1, "c"), F(1, "a")), (G(2, "d"), F(2, "a"))])
+        )
+        pq = fb.query(F).where(in_(F.anum, fb.query(G).select(G.anum))).ordered().prepare()
+        self.assertEqual(list(pq.all()), [F(1, "a"), F(2, "a")])
+        fb.add(G(3, "f"))
+        self.assertEqual(list(pq.all()), [F(1, "a"), F(2, "a"), F(3, "b")])
+
+        # Grouped queries
+        pq = fb.query(F).group_by(F.astr).select(F.anum).prepare()
+        self.assertEqual([(k, list(g)) for k, g in pq.all()], [("a", [1, 2]), ("b", [3, 4])])
+        self.assertEqual(list(pq.count()), [("a", 2), ("b", 2)])
+
+        # Errors
+        pq = fb.query(F).where(F.anum == ph1_).prepare()
+        with self.assertRaises(ValueError) as ctx:
+            list(pq.all())
+        check_errmsg("Placeholders 'ph1_' must be bound", ctx)
+        with self.assertRaises(ValueError) as ctx:
+            pq.bind(1, 2)
+        check_errmsg("Trying to bind value '2' to positional", ctx)
+        with self.assertRaises(ValueError) as ctx:
+            fb.query(F, G).prepare()
+        check_errmsg("A query over multiple predicates is incomplete", ctx)
+
 
 # ------------------------------------------------------------------------------------------
 # Test some special cases involving passing a Python tuple instead of using the clorm tuple.
@@ -1963,6 +2482,70 @@ class MembershipQueriesTestCase(unittest.TestCase):
         query = fb.query(F).where(in_(F.anum, ph1_)).order_by(F.anum).bind(subquery).bind(3)
         self.assertEqual(list(query.all()), [f1, f3])
 
+    # --------------------------------------------------------------------------
+    #  Test membership sub-queries executed as semi-joins and anti-joins
+    # --------------------------------------------------------------------------
+
+    def test_membership_subquery_semijoin(self):
+        F = self.F
+
+        class G(Predicate):
+            anum = IntegerField
+            astr = StringField
+
+        fs = [F(n) for n in range(10)]
+        gs = [G(n % 4 * 2, str(n)) for n in range(8)]
+        evens = [f for f in fs if f.anum in (0, 2, 4, 6)]
+        others = [f for f in fs if f not in evens]
+
+        for indexes in [[], [F.anum], [G.anum], [hash_index(F.anum), hash_index(G.anum)]]:
+            fb = FactBase(fs + gs, indexes=indexes)
+            sq = fb.query(G).select(G.anum)
+            q = fb.query(F).order_by(F.anum)
+            self.assertEqual(list(q.where(in_(F.anum, sq)).all()), evens)
+            self.assertEqual(list(q.where(notin_(F.anum, sq)).all()), others)
+            GA = alias(G)
+            sqa = fb.query(GA).select(GA.anum)
+            self.assertEqual(list(q.where(in_(F.anum, sqa)).all()), evens)
+
+            # The sub-query result reflects changes to the FactBase
+            pq = q.where(notin_(F.anum, sq)).prepare()
+            self.assertEqual(list(pq.all()), others)
+            fb.add(G(1, "x"))
+            self.assertEqual(list(q.where(in_(F.anum, sq)).all()), fs[:3] + evens[2:])
+            self.assertEqual(list(pq.all()), others[1:])
+            fb.remove(G(1, "x"))
+
+            # Sub-queries that are not a simple projection
+            sqw = fb.query(G).where(G.astr < "4").select(G.anum)
+            self.assertEqual(list(q.where(in_(F.anum, sqw)).all()), evens)
+            sqw = fb.query(G).where(G.astr < "2").select(G.anum)
+            self.assertEqual(list(q.where(notin_(F.anum, sqw)).all()), fs[1:2] + fs[3:])
+            sqj = fb.query(G, F).join(G.anum == F.anum).order_by(G.astr).select(F.anum)
+            self.assertEqual(list(q.where(in_(F.anum, sqj)).all()), evens)
+            sqt = fb.query(G).select(G.anum, G.astr)
+            self.assertEqual(list(fb.query(G).where(in_(G.anum, sqt)).all()), [])
+
+        # The sub-query is evaluated once per execution even when the where
+        # clause normalisation duplicates the membership condition.
+        calls = []
+
+        def check(anum):
+            calls.append(anum)
+            return True
+
+        fb = FactBase(fs + gs)
+        sq = fb.query(G).where(func([G.anum], check)).select(G.anum)
+        cond = or_(and_(F.anum > 2, F.anum < 5), in_(F.anum, sq))
+        q = fb.query(F).where(cond).order_by(F.anum)
+        self.assertEqual([f.anum for f in q.all()], [0, 2, 3, 4, 6])
+        self.assertEqual(len(calls), len(gs))
+        del calls[:]
+        pq = q.prepare()
+        self.assertEqual([f.anum for f in pq.all()], [0, 2, 3, 4, 6])
+        self.assertEqual([f.anum for f in pq.all()], [0, 2, 3, 4, 6])
+        self.assertEqual(len(calls), 2 * len(gs))
+
 
 # ------------------------------------------------------------------------------
 # Test piclking and unpickling a FactBase and then performing a query on the
@@ -2060,6 +2643,455 @@ class FactBasePicklingTestCase(unittest.TestCase):
             self.assertEqual(f, fpickled)
 
 
+# ------------------------------------------------------------------------------
+# Test automatic index creation
+# ------------------------------------------------------------------------------
+
+
+class FactBaseAutoIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        class F(Predicate):
+            anum = IntegerField
+            bnum = IntegerField
+
+        class G(Predicate):
+            anum = IntegerField
+
+        self.F = F
+        self.G = G
+        self.facts = [F(n, n % 5) for n in range(20)] + [G(1), G(3)]
+
+    def test_api_auto_index_join_and_where(self):
+        F = self.F
+        G = self.G
+        hp = hashable_path
+        ai = AutoIndexer(threshold=2, max_indexes=1)
+        fb = FactBase(self.facts, auto_index=ai)
+        self.assertEqual(fb.auto_index, ai)
+
+        # The join key is indexed after the threshold is reached
+        q1 = fb.query(G, F).join(G.anum == F.bnum).heuristic(fixed_join_order(G, F))
+        self.assertEqual(len(list(q1.all())), 8)
+        self.assertEqual(ai.indexes, ())
+        self.assertEqual(ai.counts, {hp(F.bnum): 1})
+        self.assertEqual(len(list(q1.all())), 8)
+        self.assertEqual(ai.indexes, (hp(F.bnum),))
+        self.assertEqual(ai.created, {hp(F.bnum): 1})
+        self.assertEqual(ai.counts, {})
+        self.assertEqual(len(list(q1.all())), 8)
+        self.assertEqual(ai.hits, {hp(F.bnum): 1})
+
+        # The new index is maintained by the fact base
+        fb.add(F(100, 1))
+        fb.remove(F(1, 1))
+        self.assertEqual(len(list(q1.all())), 8)
+
+        # A where clause index evicts the join key index
+        q2 = fb.query(F).where(F.anum < ph1_).order_by(F.anum)
+        self.assertEqual(list(q2.bind(2).all()), [F(0, 0)])
+        self.assertEqual(list(q2.bind(3).all()), [F(0, 0), F(2, 2)])
+        self.assertEqual(ai.indexes, (hp(F.anum),))
+        self.assertEqual(ai.evicted, {hp(F.bnum): 1})
+        self.assertTrue(hp(F.anum) in fb.factmaps[F].path2factindex)
+        self.assertFalse(hp(F.bnum) in fb.factmaps[F].path2factindex)
+        self.assertIn("Prejoin keyed search: [ F.anum < 3 ]", str(q2.bind(3).query_plan()))
+
+    def test_api_auto_index_not_enabled(self):
+        F = self.F
+        fb = FactBase(self.facts, indexes=[F.anum])
+        self.assertEqual(fb.auto_index, None)
+        for _ in range(5):
+            list(fb.query(F).where(F.bnum == 1).all())
+        self.assertEqual(list(fb.factmaps[F].path2factindex.keys()), [hashable_path(F.anum)])
+
+        # Existing indexes are not automatically created or evicted
+        ai = AutoIndexer(threshold=1, max_indexes=1)
+        fb = FactBase(self.facts, indexes=[F.anum], auto_index=ai)
+        list(fb.query(F).where(F.anum == 1).all())
+        list(fb.query(F).where(F.bnum == 1).all())
+        self.assertEqual(ai.indexes, (hashable_path(F.bnum),))
+        self.assertTrue(hashable_path(F.anum) in fb.factmaps[F].path2factindex)
+
+        with self.assertRaises(ValueError) as ctx:
+            AutoIndexer(threshold=0)
+        with self.assertRaises(TypeError) as ctx:
+            FactBase(auto_index=True)
+
+
+# ------------------------------------------------------------------------------
+# Test incrementally maintained materialized views
+# ------------------------------------------------------------------------------
+
+
+class MaterializedViewTestCase(unittest.TestCase):
+    def setUp(self):
+        class F(Predicate):
+            anum = IntegerField
+            bnum = IntegerField
+
+        class G(Predicate):
+            anum = IntegerField
+            astr = StringField
+
+        self.F = F
+        self.G = G
+        self.facts = [F(n, n % 3) for n in range(10)] + [G(n % 4, str(n)) for n in range(6)]
+
+    def assertView(self, view, query):
+        self.assertEqual(set(view), set(query.all()))
+        self.assertEqual(len(view), len(list(query.all())))
+
+    def test_where_view(self):
+        F = self.F
+        fb = FactBase(self.facts)
+        query = fb.query(F).where(F.bnum == 0)
+        view = fb.materialize(query)
+        self.assertView(view, query)
+        self.assertEqual(len(view), 4)
+        self.assertTrue(F(3, 0) in view)
+        self.assertFalse(F(1, 1) in view)
+        self.assertEqual(view.factbase, FactBase(query.all()))
+
+        fb.add(F(30, 0))
+        fb.add([F(31, 1), F(33, 0)])
+        self.assertView(view, query)
+        self.assertTrue(F(33, 0) in view)
+        self.assertEqual(view.query(F).where(F.anum > 30).count(), 1)
+        fb.remove(F(3, 0))
+        fb.discard(F(3, 0))
+        fb.discard(F(1, 1))
+        self.assertView(view, query)
+        self.assertFalse(F(3, 0) in view)
+        fb.add(F(0, 0))
+        self.assertView(view, query)
+
+        # Set operations on the FactBase
+        fb -= FactBase([F(6, 0), F(9, 0)])
+        self.assertView(view, query)
+        fb |= FactBase([F(6, 0), F(40, 0)])
+        self.assertView(view, query)
+        fb ^= FactBase([F(6, 0), F(41, 0)])
+        self.assertView(view, query)
+        fb.clear()
+        self.assertView(view, query)
+        self.assertFalse(view)
+        self.assertEqual(len(view.factbase), 0)
+
+    def test_join_view(self):
+        F = self.F
+        G = self.G
+        for indexes in [[], [F.anum, G.anum], [hash_index(G.anum)]]:
+            fb = FactBase(self.facts, indexes=indexes)
+            query = fb.query(F, G).join(F.anum == G.anum).where(F.bnum != 1)
+            view = fb.materialize(query, indexes=[G.astr])
+            self.assertView(view, query)
+            fb.add([F(1, 0), G(2, "x"), G(20, "a"), F(20, 2), F(21, 0)])
+            self.assertView(view, query)
+            fb.add(G(21, "b"))
+            self.assertView(view, query)
+            fb.remove(G(0, "0"))
+            fb.remove(F(3, 0))
+            self.assertView(view, query)
+            self.assertEqual(
+                set(view.query(G).where(G.astr == "x").all()),
+                set([g for _, g in query.all() if g.astr == "x"]),
+            )
+
+            # The facts are only in the view's FactBase while they are in a result
+            fb.remove(F(2, 2))
+            fb.remove(F(1, 0))
+            self.assertView(view, query)
+            self.assertFalse(G(2, "x") in view.factbase)
+            fb.clear()
+            self.assertView(view, query)
+            self.assertEqual(len(view.factbase), 0)
+
+        # A tuple view of a single predicate and a self-join
+        fb = FactBase(self.facts)
+        query = fb.query(F).where(F.anum < 3).tuple()
+        view = fb.materialize(query)
+        self.assertEqual(set(view), set([(F(n, n % 3),) for n in range(3)]))
+        self.assertTrue((F(1, 1),) in view)
+        FA = alias(F)
+        query = fb.query(F, FA).join(F.anum == FA.bnum)
+        view = fb.materialize(query)
+        self.assertView(view, query)
+        fb.add([F(n, n % 3) for n in range(10, 15)])
+        self.assertView(view, query)
+        fb.remove(F(2, 2))
+        self.assertView(view, query)
+
+    def test_bad_view(self):
+        F = self.F
+        fb = FactBase(self.facts)
+        with self.assertRaises(ValueError) as ctx:
+            fb.materialize(fb.query(F).order_by(F.anum))
+        check_errmsg("'order_by' is not supported by a materialized view", ctx)
+        with self.assertRaises(ValueError) as ctx:
+            fb.materialize(fb.query(F).select(F.anum))
+        check_errmsg("'select' is not supported by a materialized view", ctx)
+        with self.assertRaises(ValueError) as ctx:
+            fb.materialize(fb.query(F).where(F.anum == ph1_))
+        check_errmsg("Placeholders 'ph1_' must be bound", ctx)
+        with self.assertRaises(TypeError) as ctx:
+            fb.materialize([F(1, 1)])
+
+        # A bound query and closing the view
+        view = fb.materialize(fb.query(F).where(F.anum == ph1_).bind(1))
+        self.assertEqual(list(view), [F(1, 1)])
+        view.close()
+        fb.remove(F(1, 1))
+        self.assertEqual(list(view), [F(1, 1)])
+
+        # The view is not pickled with the FactBase
+        fb = FactBase([FBP_F(1, "a")])
+        view = fb.materialize(fb.query(FBP_F))
+        fb2 = pickle.loads(pickle.dumps(fb))
+        fb2.add(FBP_F(2, "b"))
+        self.assertEqual(fb2, FactBase([FBP_F(1, "a"), FBP_F(2, "b")]))
+        self.assertEqual(list(view), [FBP_F(1, "a")])
+
+
+# ------------------------------------------------------------------------------
+# Test the journal of changes to a FactBase
+# ------------------------------------------------------------------------------
+
+
+class FactBaseJournalTestCase(unittest.TestCase):
+    def setUp(self):
+        class F(Predicate):
+            anum = IntegerField
+
+        class G(Predicate):
+            astr = StringField
+
+        self.F = F
+        self.G = G
+
+    def test_changes_since(self):
+        F = self.F
+        G = self.G
+        fb = FactBase([F(1), F(2)], journal=True)
+        self.assertEqual(fb.version, 0)
+        self.assertEqual(fb.changes_since(0), {})
+
+        fb.add([F(3), F(1), G("a")])
+        fb.add(F(4))
+        self.assertEqual(fb.version, 3)
+        fb.remove(F(2))
+        fb.discard(F(10))
+        fb.discard(F(4))
+        self.assertEqual(fb.version, 5)
+        changes = fb.changes_since(0)
+        self.assertEqual(set(changes.keys()), set([F, G]))
+        self.assertEqual(list(changes[F][0]), [F(3)])
+        self.assertEqual(list(changes[F][1]), [F(2)])
+        self.assertEqual(list(changes[G][0]), [G("a")])
+        self.assertEqual(list(changes[G][1]), [])
+
+        # Net changes: removing and re-adding a fact is not a change
+        v = fb.version
+        fb.remove(F(1))
+        fb.add(F(1))
+        self.assertEqual(fb.changes_since(v), {})
+        self.assertEqual(fb.version, v + 2)
+        self.assertEqual(fb.changes_since(fb.version), {})
+
+        # The changes from the set operations and clear
+        v = fb.version
+        fb |= FactBase([G("b"), F(5)])
+        fb -= [F(3)]
+        fb.query(G).where(G.astr == "a").delete()
+        changes = fb.changes_since(v)
+        self.assertEqual(set(changes[F][0]), set([F(5)]))
+        self.assertEqual(set(changes[F][1]), set([F(3)]))
+        self.assertEqual(set(changes[G][0]), set([G("b")]))
+        self.assertEqual(set(changes[G][1]), set([G("a")]))
+        fb.clear()
+        changes = fb.changes_since(v)
+        self.assertEqual(set(changes[F][1]), set([F(1), F(3)]))
+        self.assertEqual(set(changes[G][1]), set([G("a")]))
+        self.assertEqual(set(changes[G][0]), set())
+        self.assertEqual(set(fb.changes_since(0)[F][1]), set([F(1), F(2)]))
+
+        # A new predicate from a symmetric difference update
+        fb2 = FactBase(journal=True)
+        fb2 ^= FactBase([F(1)])
+        self.assertEqual(list(fb2.changes_since(0)[F][0]), [F(1)])
+
+    def test_discard_changes(self):
+        F = self.F
+        fb = FactBase(journal=True)
+        fb.add(F(1))
+        fb.add(F(2))
+        fb.discard_changes(1)
+        self.assertEqual(list(fb.changes_since(1)[F][0]), [F(2)])
+        with self.assertRaises(ValueError) as ctx:
+            fb.changes_since(0)
+        check_errmsg("Journal version '0' has been discarded", ctx)
+        with self.assertRaises(ValueError) as ctx:
+            fb.changes_since(3)
+        check_errmsg("Invalid journal version '3'", ctx)
+        fb.discard_changes(fb.version)
+        self.assertEqual(fb.version, 2)
+        self.assertEqual(fb.changes_since(2), {})
+
+    def test_no_journal(self):
+        F = self.F
+        fb = FactBase([F(1)])
+        with self.assertRaises(ValueError) as ctx:
+            fb.version
+        check_errmsg("The FactBase was not created with a journal", ctx)
+        with self.assertRaises(ValueError) as ctx:
+            fb.changes_since(0)
+        check_errmsg("The FactBase was not created with a journal", ctx)
+
+        # Copies don't have a journal
+        fb = FactBase([F(1)], journal=True)
+        with self.assertRaises(ValueError) as ctx:
+            fb.copy().version
+
+    def test_delayed_init_and_pickling(self):
+        F = self.F
+        fb = FactBase(lambda: [F(1), F(2)], journal=True)
+        fb.add(F(3))
+        self.assertEqual(fb.version, 1)
+        self.assertEqual(list(fb.changes_since(0)[F][0]), [F(3)])
+
+        fb = FactBase([FBP_F(1, "a")], journal=True)
+        fb.add(FBP_F(2, "b"))
+        fb2 = pickle.loads(pickle.dumps(fb))
+        fb2.remove(FBP_F(1, "a"))
+        self.assertEqual(fb2.version, 2)
+        self.assertEqual(fb.version, 1)
+        changes = fb2.changes_since(0)
+        self.assertEqual(list(changes[FBP_F][0]), [FBP_F(2, "b")])
+        self.assertEqual(list(changes[FBP_F][1]), [FBP_F(1, "a")])
+
+
+# ------------------------------------------------------------------------------
+# Test the immutable FrozenFactBase
+# ------------------------------------------------------------------------------
+
+
+class FrozenFactBaseTestCase(unittest.TestCase):
+    def setUp(self):
+        class F(Predicate):
+            anum = IntegerField
+            astr = StringField
+
+        class G(Predicate):
+            anum = IntegerField
+
+        self.F = F
+        self.G = G
+        self.facts = [F(n, str(n % 3)) for n in range(20)] + [G(n) for n in range(0, 20, 4)]
+
+    def test_add_remove(self):
+        F = self.F
+        G = self.G
+        ffb1 = FrozenFactBase(self.facts, indexes=[F.anum])
+        ffb2 = ffb1.add(F(30, "x"))
+        ffb3 = ffb2.add([G(1), G(2), F(30, "x")]).remove(F(0, "0"))
+        ffb4 = ffb3.discard(F(0, "0"))
+        self.assertTrue(ffb4 is ffb3)
+        self.assertEqual(ffb1, FactBase(self.facts))
+        self.assertEqual(ffb2, FactBase(self.facts + [F(30, "x")]))
+        self.assertEqual(ffb3, FactBase(self.facts[1:] + [F(30, "x"), G(1), G(2)]))
+        self.assertEqual(len(ffb1), 25)
+        self.assertEqual(len(ffb3), 27)
+        self.assertTrue(F(0, "0") in ffb1)
+        self.assertFalse(F(0, "0") in ffb3)
+        self.assertFalse(1 in ffb3)
+        self.assertEqual([f for f in ffb2 if isinstance(f, F)][-1], F(30, "x"))
+        self.assertEqual(set(ffb3.predicates), set([F, G]))
+        self.assertEqual(ffb3.indexes, (F.anum,))
+        self.assertEqual(ffb3.facts(), list(ffb3))
+        self.assertTrue(ffb1 != ffb2)
+        self.assertFalse(FrozenFactBase())
+        self.assertEqual(FrozenFactBase(ffb3), ffb3)
+        self.assertEqual(FrozenFactBase(ffb3).indexes, (F.anum,))
+
+        # Converting to a FactBase
+        fb = ffb3.thaw()
+        self.assertEqual(fb, ffb3)
+        self.assertEqual(fb.indexes, (F.anum,))
+        fb.add(G(100))
+        self.assertFalse(G(100) in ffb3)
+
+        # Zero-arity facts are falsy but must still be kept
+        class Z(Predicate):
+            pass
+
+        ffb5 = FrozenFactBase([Z(), Z(sign=False)]).discard(Z(sign=False))
+        self.assertEqual(list(ffb5), [Z()])
+        self.assertEqual(len(ffb5), 1)
+        self.assertTrue(Z() in ffb5)
+
+        with self.assertRaises(KeyError) as ctx:
+            ffb3.remove(F(0, "0"))
+        with self.assertRaises(TypeError) as ctx:
+            ffb3.add(1)
+        with self.assertRaises(TypeError) as ctx:
+            ffb3.add([F(1, "1"), 2])
+
+    def test_query(self):
+        F = self.F
+        G = self.G
+        for indexes in [[], [F.anum, G.anum], [hash_index(F.astr), (F.anum, F.astr)]]:
+            fb = FactBase(self.facts, indexes=indexes)
+            ffb = FrozenFactBase(self.facts, indexes=indexes)
+            for _ in range(2):
+                queries = [
+                    lambda x: x.query(F).where(F.anum > 10).order_by(F.anum),
+                    lambda x: x.query(F).where(F.astr == "1").order_by(desc(F.anum)),
+                    lambda x: x.query(F).where(in_(F.anum, [1, 2, 50])),
+                    lambda x: x.query(F).where((F.anum == 4) & (F.astr == "1")),
+                    lambda x: x.query(F, G).join(F.anum == G.anum).order_by(F.anum),
+                    lambda x: x.query(F, G).join(F.anum < G.anum).where(G.anum < 5),
+                ]
+                for q in queries:
+                    self.assertEqual(list(q(ffb).all()), list(q(fb).all()))
+                q = lambda x: x.query(F).group_by(F.astr).select(F.anum).order_by(F.anum)
+                self.assertEqual(
+                    [(k, list(g)) for k, g in q(ffb).all()],
+                    [(k, list(g)) for k, g in q(fb).all()],
+                )
+                self.assertEqual(ffb.query(F).count(), fb.query(F).count())
+                self.assertEqual(ffb.query(G).where(G.anum == ph1_).bind(4).singleton(), G(4))
+                newfacts = [F(n, "z") for n in range(30, 40)] + [G(32)]
+                fb.add(newfacts)
+                fb.discard(F(1, "1"))
+                ffb = ffb.add(newfacts).discard(F(1, "1"))
+
+        # The query end-points that modify the fact base are not supported
+        ffb = FrozenFactBase(self.facts)
+        with self.assertRaises(TypeError) as ctx:
+            ffb.query(F).where(F.anum == 1).delete()
+        check_errmsg("A FrozenFactMap cannot be modified", ctx)
+        with self.assertRaises(TypeError) as ctx:
+            ffb.query(F).where(F.anum == 1).replace(lambda f: f.clone(anum=100))
+        self.assertEqual(ffb, FactBase(self.facts))
+
+        # A query of a predicate with no facts
+        class H(Predicate):
+            anum = IntegerField
+
+        factmaps = dict(ffb._factmaps)
+        self.assertEqual(list(ffb.query(H).all()), [])
+        self.assertEqual(list(ffb.query(F, H).join(F.anum == H.anum).all()), [])
+        self.assertEqual(ffb, FactBase(self.facts))
+        self.assertEqual(ffb._factmaps, factmaps)
+
+    def test_pickling(self):
+        ffb1 = FrozenFactBase([FBP_F(n, str(n)) for n in range(10)], indexes=[FBP_F.aint])
+        ffb2 = pickle.loads(pickle.dumps(ffb1))
+        self.assertEqual(ffb1, ffb2)
+        self.assertEqual(
+            list(ffb2.query(FBP_F).where(FBP_F.aint > 7).all()), [FBP_F(8, "8"), FBP_F(9, "9")]
+        )
+
+
 # ------------------------------------------------------------------------------
 # main
 # ------------------------------------------------------------------------------
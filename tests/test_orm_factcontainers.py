@@ -3,6 +3,7 @@
 # ------------------------------------------------------------------------------
 
 import operator
+import random
 import unittest
 
 # Official Clorm API imports for the core complements
@@ -17,7 +18,15 @@ from clorm.orm import (
 from clorm.orm.core import notcontains
 
 # Implementation imports
-from clorm.orm.factcontainers import FactIndex, FactMap
+from clorm.orm.factcontainers import (
+    CompositeFactIndex,
+    FactIndex,
+    FactMap,
+    HashFactIndex,
+    PersistentFactIndex,
+    hash_index,
+)
+from clorm.util import SortedList
 
 # ------------------------------------------------------------------------------
 # ------------------------------------------------------------------------------
@@ -130,6 +139,38 @@ randlist.sort(key=attrgetter('anum'))
         self.assertEqual(fi1.keys, [1, 2, 3])
         self.assertEqual(fi2.keys, ["b", "c"])
 
+    def test_add_facts(self):
+        Afact = self.Afact
+        Bfact = self.Bfact
+
+        af1a = Afact(num1=1, str1="a")
+        af2a = Afact(num1=2, str1="a")
+        af2b = Afact(num1=2, str1="b")
+        af3a = Afact(num1=3, str1="a")
+        af4a = Afact(num1=4, str1="a")
+
+        # Bulk loading gives the same index as adding the facts individually
+        fi1 = FactIndex(Afact.num1)
+        fi2 = FactIndex(Afact.num1)
+        fi1.add_facts([af3a, af1a, af2b])
+        for f in [af3a, af1a, af2b]:
+            fi2.add(f)
+        self.assertEqual(fi1, fi2)
+        self.assertEqual(fi1.keys, [1, 2, 3])
+
+        # Merge into an existing index
+        fi1.add_facts(iter([af4a, af2a, af1a]))
+        self.assertEqual(fi1.keys, [1, 2, 3, 4])
+        self.assertEqual(list(fi1), [af1a, af2b, af2a, af3a, af4a])
+
+        hfi = HashFactIndex(Afact.num1)
+        hfi.add_facts([af3a, af1a, af2b, af2a])
+        self.assertEqual(hfi.keys, [3, 1, 2])
+        self.assertEqual(list(hfi.find(operator.eq, 2)), [af2b, af2a])
+
+        with self.assertRaises(TypeError) as ctx:
+            fi1.add_facts([Bfact(num1=1, str1="a")])
+
     def test_remove(self):
         Afact = self.Afact
         Bfact = self.Bfact
@@ -164,6 +205,78 @@ randlist.sort(key=attrgetter('anum'))
         fi.remove(af3b)
         self.assertEqual(fi.keys, [])
 
+    # --------------------------------------------------------------------------
+    # The facts of a key are stored as a single fact, a tuple, or a FactSet
+    # depending on their number. Test adding and removing across these forms.
+    # --------------------------------------------------------------------------
+    def test_buckets(self):
+        Afact = self.Afact
+        afacts = [Afact(num1=1, str1=str(n)) for n in range(20)]
+        bfact = Afact(num1=2, str1="b")
+
+        for fitype in [FactIndex, HashFactIndex]:
+            fi = fitype(Afact.num1)
+            fi.add(bfact)
+            for f in afacts:
+                fi.add(f)
+                fi.add(f)
+            self.assertEqual(len(fi), 21)
+            self.assertEqual(list(fi.find(operator.eq, 1)), afacts)
+            self.assertEqual(list(fi.lookup(1)), afacts)
+            self.assertEqual(list(fi.lookup(2)), [bfact])
+            self.assertEqual(list(fi.lookup(3)), [])
+
+            # A copy doesn't share the FactSet of the key
+            fi2 = fi.copy()
+            fi2.remove(afacts[0])
+            self.assertEqual(list(fi.lookup(1)), afacts)
+            self.assertEqual(list(fi2.lookup(1)), afacts[1:])
+            self.assertEqual(fi, fi.copy())
+            self.assertNotEqual(fi, fi2)
+
+            for f in afacts[:19]:
+                fi.remove(f)
+                with self.assertRaises(KeyError) as ctx:
+                    fi.remove(f)
+            self.assertEqual(list(fi.find(operator.eq, 1)), afacts[19:])
+            self.assertEqual(set(fi), set([afacts[19], bfact]))
+            fi.remove(afacts[19])
+            fi.remove(bfact)
+            self.assertFalse(fi)
+            self.assertEqual(list(fi.keys), [])
+
+        fi = FactIndex(Afact.num1)
+        fi.add_facts(afacts[:3] + afacts[:2] + [bfact])
+        self.assertEqual(list(reversed(fi)), [bfact] + afacts[:3])
+        self.assertEqual([list(facts) for _, facts in fi.groups()], [afacts[:3], [bfact]])
+
+    def test_merge_remove_facts(self):
+        Afact = self.Afact
+        Bfact = self.Bfact
+
+        af1a = Afact(num1=1, str1="a")
+        af2a = Afact(num1=2, str1="a")
+        af2b = Afact(num1=2, str1="b")
+        af3a = Afact(num1=3, str1="a")
+
+        for fitype in [FactIndex, HashFactIndex]:
+            fi1 = fitype(Afact.num1)
+            fi2 = fitype(Afact.num1)
+            fi1.add_facts([af3a, af2a])
+            fi2.add_facts([af2b, af1a, af2a])
+            fi1.merge(fi2)
+            self.assertEqual(set(fi1.keys), set([1, 2, 3]))
+            self.assertEqual(list(fi1.find(operator.eq, 2)), [af2a, af2b])
+            self.assertEqual(list(fi2.find(operator.eq, 2)), [af2b, af2a])
+
+            fi1.remove_facts([af2a, af3a, Afact(num1=4, str1="a")])
+            self.assertEqual(set(fi1.keys), set([1, 2]))
+            self.assertEqual(set(fi1), set([af1a, af2b]))
+            fi1.remove_facts([af1a, af2b])
+            self.assertEqual(list(fi1.keys), [])
+            with self.assertRaises(TypeError) as ctx:
+                fi1.remove_facts([Bfact(num1=1, str1="a")])
+
     def test_find(self):
         Afact = self.Afact
 
@@ -238,6 +351,114 @@ randlist.sort(key=attrgetter('anum'))
         self.assertEqual(list(fi.find(operator.gt, 2, reverse=True)), [af9, af7, af5, af3])
         self.assertEqual(list(fi.find(operator.ge, 0, reverse=True)), allfacts)
 
+    def test_many_keys_pluggable_keylist(self):
+        Afact = self.Afact
+
+        class SmallSortedList(SortedList):
+            _load = 4
+
+        allfacts = [Afact(num1=n, str1="a") for n in range(100)]
+        tmp = list(allfacts)
+        random.Random(1).shuffle(tmp)
+        fi = FactIndex(Afact.num1, keylist=SmallSortedList)
+        for f in tmp:
+            fi.add(f)
+        self.assertTrue(isinstance(fi.keys, SmallSortedList))
+        self.assertEqual(fi.keys, list(range(100)))
+        self.assertEqual(list(fi), allfacts)
+        self.assertEqual(list(reversed(fi)), list(reversed(allfacts)))
+        self.assertEqual(list(fi.find(operator.lt, 10)), allfacts[:10])
+        self.assertEqual(list(fi.find(operator.ge, 90, reverse=True)), allfacts[:89:-1])
+        self.assertEqual(list(fi.find(operator.ne, 50)), allfacts[:50] + allfacts[51:])
+
+        for f in tmp[:95]:
+            fi.remove(f)
+        self.assertEqual(fi.keys, sorted([f.num1 for f in tmp[95:]]))
+        fi.clear()
+        self.assertTrue(isinstance(fi.keys, SmallSortedList))
+        self.assertEqual(fi.keys, [])
+
+    def test_hash_factindex(self):
+        Afact = self.Afact
+
+        af3a = Afact(num1=3, str1="a")
+        af1a = Afact(num1=1, str1="a")
+        af3b = Afact(num1=3, str1="b")
+        af2a = Afact(num1=2, str1="a")
+
+        fi = HashFactIndex(Afact.num1)
+        self.assertFalse(fi.ordered)
+        self.assertTrue(fi.supports(operator.eq))
+        self.assertTrue(fi.supports(operator.contains))
+        self.assertFalse(fi.supports(operator.lt))
+        self.assertFalse(fi.supports(notcontains))
+        self.assertTrue(FactIndex(Afact.num1).supports(operator.lt))
+
+        for f in [af3a, af1a, af3b, af2a]:
+            fi.add(f)
+        self.assertEqual(len(fi), 4)
+
+        # Keys and iteration are in key insertion order
+        self.assertEqual(fi.keys, [3, 1, 2])
+        self.assertEqual(list(fi), [af3a, af3b, af1a, af2a])
+        self.assertEqual(list(reversed(fi)), [af2a, af1a, af3a, af3b])
+
+        self.assertEqual(list(fi.find(operator.eq, 3)), [af3a, af3b])
+        self.assertEqual(list(fi.find(operator.eq, 5)), [])
+        self.assertEqual(list(fi.find(operator.contains, [3, 2, 5])), [af2a, af3a, af3b])
+        self.assertEqual(
+            list(fi.find(operator.contains, [3, 2], reverse=True)), [af3a, af3b, af2a]
+        )
+        with self.assertRaises(ValueError) as ctx:
+            list(fi.find(operator.lt, 3))
+
+        # Direct access to the facts of a key and the key groups
+        self.assertEqual(list(fi.lookup(3)), [af3a, af3b])
+        self.assertEqual(list(fi.lookup(5)), [])
+        self.assertEqual([k for k, _ in fi.groups()], [3, 1, 2])
+        sfi = FactIndex(Afact.num1)
+        sfi.add_facts([af3a, af1a, af3b, af2a])
+        self.assertEqual([(k, list(v)) for k, v in sfi.groups()][0], (1, [af1a]))
+        self.assertEqual([k for k, _ in sfi.groups(reverse=True)], [3, 2, 1])
+
+        fi.remove(af3a)
+        fi.discard(af3a)
+        with self.assertRaises(KeyError) as ctx:
+            fi.remove(af3a)
+        fi.remove(af3b)
+        self.assertEqual(fi.keys, [1, 2])
+        fi.clear()
+        self.assertEqual(fi.keys, [])
+        self.assertFalse(fi)
+
+    def test_composite_factindex(self):
+        Afact = self.Afact
+        Bfact = self.Bfact
+
+        af1b = Afact(num1=1, str1="b")
+        af1a = Afact(num1=1, str1="a")
+        af2a = Afact(num1=2, str1="a")
+
+        fi = CompositeFactIndex([Afact.num1, Afact.str1])
+        self.assertEqual(fi.path, (Afact.num1, Afact.str1))
+        self.assertTrue(fi.supports(operator.eq))
+        self.assertFalse(fi.supports(operator.lt))
+        fi.add_facts([af1b, af2a])
+        fi.add(af1a)
+        self.assertEqual(fi.keys, [(1, "a"), (1, "b"), (2, "a")])
+        self.assertEqual(list(fi), [af1a, af1b, af2a])
+        self.assertEqual(list(fi.find(operator.eq, (1, "b"))), [af1b])
+        self.assertEqual(list(fi.find(operator.eq, (2, "b"))), [])
+        fi.remove(af1b)
+        self.assertEqual(fi.keys, [(1, "a"), (2, "a")])
+
+        with self.assertRaises(ValueError) as ctx:
+            CompositeFactIndex([Afact.num1])
+        with self.assertRaises(ValueError) as ctx:
+            CompositeFactIndex([Afact.num1, Bfact.str1])
+        with self.assertRaises(TypeError) as ctx:
+            CompositeFactIndex([Afact.num1, 1])
+
     def test_clear(self):
         Afact = self.Afact
         fi = FactIndex(Afact.num1)
@@ -283,6 +504,41 @@ randlist.sort(key=attrgetter('anum'))
         self.assertEqual(fi2.keys, [1, 2, 3, 4])
         self.assertEqual(set(fi3.keys), set([CT(10, "a"), CT(20, "b"), CT(30, "c"), CT(40, "d")]))
 
+    # --------------------------------------------------------------------------
+    # A PersistentFactIndex finds the same facts as the FactIndex it is created
+    # from, and adding or removing facts returns a new index
+    # --------------------------------------------------------------------------
+    def test_persistent_factindex(self):
+        Afact = self.Afact
+        afacts = [Afact(num1=n % 7, str1=str(n)) for n in range(30)]
+        ops = [operator.eq, operator.ne, operator.lt, operator.le, operator.gt, operator.ge]
+        for fi in [FactIndex(Afact.num1), HashFactIndex(Afact.num1)]:
+            pfi1 = PersistentFactIndex(fi).with_facts(afacts[:20])
+            pfi2 = pfi1.with_facts(afacts[20:]).without_facts(afacts[:5])
+            fi.add_facts(afacts)
+            for f in afacts[:5]:
+                fi.remove(f)
+            self.assertEqual(len(pfi1), 20)
+            self.assertEqual(set(pfi2), set(fi))
+            self.assertEqual(pfi2.ordered, fi.ordered)
+            self.assertEqual(list(pfi2.keys), list(fi.keys))
+            self.assertEqual(pfi2.num_keys, fi.num_keys)
+            for op in ops:
+                if not fi.supports(op):
+                    self.assertFalse(pfi2.supports(op))
+                    continue
+                for key in [0, 3, 6, 10]:
+                    self.assertEqual(list(pfi2.find(op, key)), list(fi.find(op, key)))
+            self.assertEqual(
+                list(pfi2.find(operator.contains, [1, 9, 2])),
+                list(fi.find(operator.contains, [1, 9, 2])),
+            )
+            self.assertEqual(list(pfi2.lookup(3)), list(fi.lookup(3)))
+            with self.assertRaises(TypeError) as ctx:
+                pfi2.add(afacts[0])
+            with self.assertRaises(TypeError) as ctx:
+                pfi2.with_facts([1])
+
 
 # ------------------------------------------------------------------------------
 # Test FactMap
@@ -336,6 +592,117 @@ class FactMapTestCase(unittest.TestCase):
         self.assertFalse(fm)
         self.assertFalse(set(fm.factset))
 
+    # --------------------------------------------------------------------------
+    # Hash indexes are created for hash_index() paths and are preserved when
+    # copying. A sorted index takes precedence over a hash index for the same
+    # path.
+    # --------------------------------------------------------------------------
+    def test_factmap_hash_index(self):
+        Afact = self.Afact
+        hp = hashable_path
+
+        fm = FactMap(Afact, [hash_index(Afact.anum), Afact.aconst])
+        self.assertTrue(isinstance(fm.path2factindex[hp(Afact.anum)], HashFactIndex))
+        self.assertFalse(isinstance(fm.path2factindex[hp(Afact.aconst)], HashFactIndex))
+        self.assertEqual(fm.indexes[0], hash_index(Afact.anum))
+        self.assertEqual(hp(fm.indexes[1]), hp(Afact.aconst))
+
+        fm.add_facts([Afact(1, "bbb"), Afact(2, "ccc")])
+        fm2 = fm.copy()
+        self.assertTrue(isinstance(fm2.path2factindex[hp(Afact.anum)], HashFactIndex))
+        self.assertEqual(set(fm2.path2factindex[hp(Afact.anum)]), set(fm.factset))
+
+        fm3 = FactMap(Afact, [hash_index(Afact.anum), Afact.anum])
+        self.assertFalse(isinstance(fm3.path2factindex[hp(Afact.anum)], HashFactIndex))
+        with self.assertRaises(ValueError) as ctx:
+            FactMap(Afact, [hash_index(self.Afact.meta.path)])
+
+    # --------------------------------------------------------------------------
+    # Indexes can be added and removed after creation
+    # --------------------------------------------------------------------------
+    def test_factmap_add_remove_index(self):
+        Afact = self.Afact
+        hp = hashable_path
+
+        af1 = Afact(1, "bbb")
+        af2 = Afact(2, "ccc")
+        fm = FactMap(Afact, [Afact.anum])
+        fm.add_facts([af1, af2])
+        fi = fm.add_index(Afact.aconst)
+        self.assertEqual(list(fi.find(operator.eq, "ccc")), [af2])
+        self.assertTrue(fm.add_index(Afact.aconst) is fi)
+        self.assertEqual(list(fm.path2factindex.keys()), [hp(Afact.anum), hp(Afact.aconst)])
+        fm.remove(af2)
+        self.assertEqual(list(fi.find(operator.eq, "ccc")), [])
+
+        fm.remove_index(Afact.anum)
+        self.assertEqual(list(fm.path2factindex.keys()), [hp(Afact.aconst)])
+        fm.add_fact(af2)
+        self.assertEqual(list(fi), [af1, af2])
+        with self.assertRaises(KeyError) as ctx:
+            fm.remove_index(Afact.anum)
+        with self.assertRaises(ValueError) as ctx:
+            fm.add_index(Afact)
+
+    # --------------------------------------------------------------------------
+    # Every change increments the version and invalidates the cache
+    # --------------------------------------------------------------------------
+    def test_factmap_version_and_cache(self):
+        Afact = self.Afact
+        calls = []
+
+        def make(value):
+            def _make():
+                calls.append(value)
+                return value
+
+            return _make
+
+        af1 = Afact(1, "bbb")
+        af2 = Afact(2, "ccc")
+        fm = FactMap(Afact)
+        self.assertEqual(fm.version, 0)
+        self.assertEqual(fm.cached("a", make([1])), [1])
+        self.assertEqual(fm.cached("a", make([2])), [1])
+        self.assertEqual(calls, [[1]])
+
+        fm.add_fact(af1)
+        self.assertEqual(fm.version, 1)
+        self.assertEqual(fm.cached("a", make([2])), [2])
+        fm.add_facts([af2])
+        fm.remove(af2)
+        fm.discard(af2)
+        fm.clear()
+        self.assertEqual(fm.version, 5)
+        self.assertEqual(fm.cached("a", make([3])), [3])
+        self.assertEqual(calls, [[1], [2], [3]])
+
+        # The cache is bounded with least recently used items discarded
+        for i in range(FactMap._cache_size - 1):
+            fm.cached(i, make([i]))
+        self.assertEqual(fm.cached("a", make([4])), [3])
+        fm.cached("b", make([5]))
+        self.assertEqual(fm.cached(0, make([6])), [6])
+        self.assertEqual(fm.cached("a", make([7])), [3])
+
+    # --------------------------------------------------------------------------
+    # A tuple of paths creates a composite index
+    # --------------------------------------------------------------------------
+    def test_factmap_composite_index(self):
+        Afact = self.Afact
+        hp = hashable_path
+
+        fm = FactMap(Afact, [(Afact.anum, Afact.aconst), Afact.anum])
+        key = (hp(Afact.anum), hp(Afact.aconst))
+        self.assertEqual(list(fm.path2factindex.keys()), [key, hp(Afact.anum)])
+        self.assertTrue(isinstance(fm.path2factindex[key], CompositeFactIndex))
+        self.assertEqual(fm.indexes[0], (Afact.anum, Afact.aconst))
+
+        af1 = Afact(1, "bbb")
+        fm.add_fact(af1)
+        fm2 = fm.copy()
+        self.assertEqual(list(fm2.path2factindex[key].find(operator.eq, (1, "bbb"))), [af1])
+
     # --------------------------------------------------------------------------
     #
     # --------------------------------------------------------------------------
@@ -452,14 +819,105 @@ class FactMapTestCase(unittest.TestCase):
 
         fm2 = fm1.copy()
 
+        # The copy shares the storage until it is modified
         self.assertTrue(not fm1 is fm2)
+        self.assertTrue(fm1.factset is fm2.factset)
+        self.assertEqual(fm1.path2factindex, fm2.path2factindex)
+
+        af5 = Afact(anum=5, aconst="e")
+        fm2.add_fact(af5)
         self.assertTrue(not fm1.factset is fm2.factset)
         self.assertTrue(not fm1.path2factindex is fm2.path2factindex)
         self.assertTrue(
             not fm1.path2factindex[hp(Afact.anum)] is fm2.path2factindex[hp(Afact.anum)]
         )
+        self.assertEqual(set(fm1.factset), set([af1, af2, af3, af4]))
+        self.assertEqual(set(fm2.factset), set([af1, af2, af3, af4, af5]))
+        self.assertEqual(list(fm1.path2factindex[hp(Afact.anum)]), [af1, af2, af3, af4])
+        self.assertEqual(list(fm2.path2factindex[hp(Afact.anum)]), [af1, af2, af3, af4, af5])
+
+        # The last sharer doesn't copy
+        factset = fm1.factset
+        fm1.remove(af1)
+        self.assertTrue(fm1.factset is factset)
+        self.assertEqual(list(fm1.path2factindex[hp(Afact.anum)]), [af2, af3, af4])
+
+    def test_factmap_copy_on_write(self):
+        Afact = self.Afact
+        hp = hashable_path
+        afacts = [Afact(anum=n, aconst="a") for n in range(5)]
 
-        self.assertEqual(fm1.path2factindex, fm2.path2factindex)
+        fm1 = FactMap(Afact, [Afact.anum, hash_index(Afact.aconst)])
+        fm1.add_facts(afacts)
+        fm2 = fm1.copy()
+        fm3 = fm2.copy()
+
+        # Modifying the original, clearing and removing from the copies
+        fm1.discard(afacts[0])
+        fm2.clear()
+        fm3.remove(afacts[4])
+        fm3.add_index((Afact.anum, Afact.aconst))
+        self.assertEqual(list(fm1.factset), afacts[1:])
+        self.assertEqual(list(fm2.factset), [])
+        self.assertEqual(list(fm3.factset), afacts[:4])
+        self.assertEqual(list(fm1.path2factindex[hp(Afact.anum)]), afacts[1:])
+        self.assertEqual(list(fm2.path2factindex[hp(Afact.anum)]), [])
+        self.assertEqual(list(fm3.path2factindex[hp(Afact.anum)]), afacts[:4])
+        self.assertEqual(list(fm1.path2factindex[hp(Afact.aconst)]), afacts[1:])
+        self.assertEqual(list(fm2.path2factindex[hp(Afact.aconst)]), [])
+        self.assertEqual(len(fm1.indexes), 2)
+        self.assertEqual(len(fm3.indexes), 3)
+        fm2.add_fact(afacts[0])
+        self.assertEqual(list(fm1.path2factindex[hp(Afact.anum)]), afacts[1:])
+        self.assertEqual(list(fm2.path2factindex[hp(Afact.anum)]), afacts[:1])
+
+    # --------------------------------------------------------------------------
+    # A set operation that doesn't change the facts shares the storage with the
+    # original FactMap, while the indexes of a changed FactMap are kept in step
+    # with the facts (whether merged, added, or removed in bulk).
+    # --------------------------------------------------------------------------
+    def test_factmap_set_operation_sharing(self):
+        Afact = self.Afact
+        hp = hashable_path
+        afacts = [Afact(anum=n, aconst="c{}".format(n % 3)) for n in range(10)]
+        indexes = [Afact.anum, hash_index(Afact.aconst)]
+
+        def check_indexes(fm, expected):
+            self.assertEqual(list(fm.factset), expected)
+            anum = fm.path2factindex[hp(Afact.anum)]
+            self.assertEqual(list(anum), sorted(expected, key=lambda f: f.anum))
+            for fact in expected:
+                aconst = fm.path2factindex[hp(Afact.aconst)]
+                self.assertTrue(fact in aconst.lookup(fact.aconst))
+            self.assertEqual(len(fm.path2factindex[hp(Afact.aconst)]), len(expected))
+
+        fm1 = FactMap(Afact, indexes)
+        fm1.add_facts(afacts[:6])
+        fm2 = FactMap(Afact, indexes)
+        fm2.add_facts(afacts[6:])
+        fm3 = FactMap(Afact, [Afact.aconst])
+        fm3.add_facts(afacts[2:4])
+
+        # Unchanged results share the storage
+        for r in [fm1.union(fm3), fm1.intersection(fm1), fm1.difference(fm2)]:
+            self.assertTrue(r.factset is fm1.factset)
+            check_indexes(r, afacts[:6])
+
+        # Merging a FactMap with the same indexes, adding the facts of one with
+        # different indexes, and removing facts in bulk
+        check_indexes(fm1.union(fm2), afacts)
+        check_indexes(fm2.union(fm1, fm3), afacts[6:] + afacts[:6])
+        check_indexes(fm1.intersection(fm3), afacts[2:4])
+        check_indexes(fm1.difference(fm3, [afacts[5]]), afacts[:2] + afacts[4:5])
+        check_indexes(fm1.symmetric_difference(fm3), afacts[:2] + afacts[4:6])
+        check_indexes(fm1, afacts[:6])
+
+        fm1.remove_facts([afacts[0], afacts[9], afacts[4]])
+        check_indexes(fm1, afacts[1:4] + afacts[5:6])
+        fm1.update(fm2)
+        check_indexes(fm1, afacts[1:4] + afacts[5:])
+        fm1.intersection_update(fm2, afacts[7:])
+        check_indexes(fm1, afacts[7:])
 
 
 # ------------------------------------------------------------------------------
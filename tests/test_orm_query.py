@@ -43,6 +43,7 @@ from clorm.orm.factcontainers import FactIndex, FactMap, FactSet
 from clorm.orm.query import (
     Clause,
     ClauseBlock,
+    CompositeComparator,
     FunctionComparator,
     InQuerySorter,
     JoinQueryPlan,
@@ -56,6 +57,8 @@ from clorm.orm.query import (
     QuerySpec,
     StandardComparator,
     basic_join_order,
+    compile_clauses,
+    cost_join_order,
     fixed_join_order,
     is_boolean_qcondition,
     is_comparison_qcondition,
@@ -1131,6 +1134,61 @@ class WhereExpressionTestCase(unittest.TestCase):
     #        self.assertTrue(trivialtrue((f2,g2)))
     #        self.assertTrue(trivialtrue((f1,g1)))
 
+    # ------------------------------------------------------------------------------
+    # Test compiling clauses into a single function
+    # ------------------------------------------------------------------------------
+    def test_nonapi_compile_clauses(self):
+        F = self.F
+        G = self.G
+        FA = alias(F)
+        wsc = StandardComparator.from_where_qcondition
+        mfc = FunctionComparator.from_specification
+
+        f1 = F(1, "a", (2, "b"))
+        f2 = F(2, "a", (3, "c"))
+        nf3 = F(3, "b", (3, "c"), sign=False)
+        g1 = G(2, "a")
+
+        # A conjunction of disjunctions with tuple sub-fields, the sign and
+        # membership
+        clauses = [
+            [wsc(F.anum == 1), wsc(F.atuple[0] == G.anum)],
+            [wsc(F.sign == True)],
+            [wsc(in_(F.astr, ["a", "c"])).fixed()],
+        ]
+        cc = compile_clauses(clauses, [F, G])
+        self.assertTrue(cc((f1, g1)))
+        self.assertFalse(cc((f2, g1)))
+        self.assertFalse(cc((nf3, G(3, "c"))))
+        self.assertEqual(
+            cc((f1, g1)),
+            ClauseBlock([Clause(c) for c in clauses]).make_callable([F, G])((f1, g1)),
+        )
+
+        # Aliases and comparisons between paths of the same predicate
+        cc = compile_clauses([[wsc(F.anum < FA.anum)], [wsc(FA.astr != "b")]], [F, FA])
+        self.assertTrue(cc((f1, f2)))
+        self.assertFalse(cc((f2, f1)))
+        self.assertFalse(cc((f1, nf3)))
+
+        # Function comparators and composite comparators
+        fc = mfc([F.anum, G.anum], lambda x, y: x + y == 3).ground()
+        comp = CompositeComparator([wsc(F.astr == G.astr), wsc(F.anum == 1)])
+        cc = compile_clauses([[fc], [comp]], [G, F])
+        self.assertTrue(cc((g1, f1)))
+        self.assertFalse(cc((g1, f2)))
+
+        # An empty set of clauses is always true
+        self.assertTrue(compile_clauses([], [F])((f1,)))
+
+        # Errors are the same as for the comparators
+        with self.assertRaises(TypeError) as ctx:
+            compile_clauses([[wsc(F.anum == ph1_)]], [F])
+        check_errmsg("Internal bug", ctx)
+        with self.assertRaises(TypeError) as ctx:
+            compile_clauses([[wsc(F.anum == G.anum)]], [F])
+        check_errmsg("Invalid signature match", ctx)
+
     # ------------------------------------------------------------------------------
     # ------------------------------------------------------------------------------
     def test_nonapi_normalise_where_expression(self):
@@ -1517,6 +1575,45 @@ class QueryPlanTestCase(unittest.TestCase):
         self.assertEqual(prejoinsc, None)
         self.assertEqual(prejoincb, where)
 
+    def test_nonapi_make_prejoin_pair_composite(self):
+        F = path(self.F)
+        FA = alias(F)
+        pw = process_where
+        wsc = StandardComparator.from_where_qcondition
+
+        # A composite index is preferred over a single index
+        clauses = pw((F.anum == 4) & (F.astr == ph1_) & (F.anum < 10), [F])
+        prejoinsc, prejoincb = make_prejoin_pair([F.anum, (F.astr, F.anum)], clauses)
+        ccomp = CompositeComparator([wsc(F.astr == ph1_), wsc(F.anum == 4)])
+        self.assertEqual(prejoinsc, Clause([ccomp]))
+        self.assertEqual(prejoincb, pw(F.anum < 10, [F]))
+        self.assertEqual(
+            ccomp.keyable([(F.astr, F.anum)]),
+            (tuple(hpaths((F.astr, F.anum))), operator.eq, (ph1_, 4)),
+        )
+        self.assertEqual(ccomp.keyable([(F.anum, F.astr)]), None)
+        self.assertEqual(ccomp.placeholders, set([ph1_]))
+        self.assertEqual(
+            ccomp.ground(3), CompositeComparator([wsc(F.astr == 3), wsc(F.anum == 4)])
+        )
+
+        # The values are swapped to be the second argument and aliases work
+        clauses = pw((4 == FA.anum) & (FA.astr == 3), [FA])
+        prejoinsc, prejoincb = make_prejoin_pair([(F.anum, F.astr)], clauses)
+        self.assertEqual(
+            prejoinsc.dealias(),
+            Clause([CompositeComparator([wsc(F.anum == 4), wsc(F.astr == 3)])]),
+        )
+        self.assertEqual(prejoincb, None)
+
+        # The composite index is only used if all its fields are tested for equality
+        clauses = pw((F.anum == 4) & ((F.astr == 3) | (F.astr == 2)), [F])
+        prejoinsc, prejoincb = make_prejoin_pair([(F.anum, F.astr)], clauses)
+        self.assertEqual(prejoinsc, None)
+        clauses = pw((F.anum == 4) & (F.astr < 3), [F])
+        prejoinsc, prejoincb = make_prejoin_pair([F.anum, (F.anum, F.astr)], clauses)
+        self.assertEqual(prejoinsc, Clause([wsc(F.anum == 4)]))
+
     # ------------------------------------------------------------------------------
     # Test generating the join components of a JoinQueryPlan
     # ------------------------------------------------------------------------------
@@ -1546,6 +1643,32 @@ class QueryPlanTestCase(unittest.TestCase):
         self.assertEqual(joinsc, None)
         self.assertEqual(joincb, None)
 
+    def test_nonapi_make_join_pair_composite(self):
+        F = path(self.F)
+        G = path(self.G)
+        pj = process_join
+        pw = process_where
+        jsc = StandardComparator.from_join_qcondition
+
+        joins = pj([G.anum == F.anum, F.astr == G.astr, F.anum < G.astr], [F, G])
+        joinsc, joincb = make_join_pair(joins, None, [], G, [(G.astr, G.anum)])
+        self.assertEqual(
+            joinsc, CompositeComparator([jsc(G.astr == F.astr), jsc(G.anum == F.anum)])
+        )
+        self.assertEqual(joincb, ClauseBlock([Clause([jsc(F.anum < G.astr)])]))
+
+        # No matching composite index for the root
+        joinsc, joincb = make_join_pair(joins, None, [], F, [(G.astr, G.anum)])
+        self.assertEqual(joinsc, jsc(G.anum == F.anum))
+        self.assertEqual(len(joincb), 2)
+
+        # Make the plan and check that the join key is aligned with the root
+        qspec = QuerySpec(roots=[F, G], join=joins, where=pw(G.anum > 1, [G]))
+        qplan = make_query_plan_preordered_roots([(G.anum, G.astr)], [F, G], qspec)
+        self.assertEqual(
+            qplan[1].join_key, CompositeComparator([jsc(G.anum == F.anum), jsc(G.astr == F.astr)])
+        )
+
     # ------------------------------------------------------------------------------
     # Test the JoinQueryPlan class
     # ------------------------------------------------------------------------------
@@ -1970,6 +2093,54 @@ class QueryPlanTestCase(unittest.TestCase):
             qorder = fixed_join_order()
         check_errmsg("Missing query roots", ctx)
 
+    # ------------------------------------------------------------------------------
+    # Test the cost based join order heuristic and the query plan estimates
+    # ------------------------------------------------------------------------------
+    def test_nonapi_cost_join_order(self):
+        F = path(self.F)
+        G = path(self.G)
+        pj = process_join
+        pw = process_where
+
+        # The smaller predicate is the outer loop of the join
+        joins = pj([F.anum == G.anum], [F, G])
+        card = {self.F: 1000, self.G: 10}
+        qspec = QuerySpec(roots=[F, G], join=joins, where=[], order_by=[], cardinality=card)
+        self.assertEqual(cost_join_order([], qspec), [G, F])
+        card = {self.F: 10, self.G: 1000}
+        qspec = QuerySpec(roots=[F, G], join=joins, where=[], order_by=[], cardinality=card)
+        self.assertEqual(cost_join_order([], qspec), [F, G])
+
+        # An indexed lookup on a selective where clause is cheaper
+        card = {self.F: 1000, self.G: 10}
+        where = pw(F.anum == 1, [F, G])
+        qspec = QuerySpec(roots=[F, G], join=joins, where=where, order_by=[], cardinality=card)
+        self.assertEqual(cost_join_order([F.anum], qspec), [F, G])
+
+        # Without statistics the default cardinality is used for every predicate
+        qspec = QuerySpec(roots=[F, G], join=joins, where=[], order_by=[])
+        self.assertEqual(cost_join_order([], qspec), [F, G])
+
+        # The estimates are attached to the query plan
+        qspec = QuerySpec(
+            roots=[F, G],
+            join=joins,
+            where=where,
+            order_by=[],
+            joh=cost_join_order,
+            cardinality=card,
+        )
+        qp = make_query_plan([F.anum], qspec)
+        self.assertEqual(hashable_path(qp[0].root), hashable_path(F))
+        self.assertEqual(len(qp.estimates), 2)
+        self.assertEqual(qp.estimates[0], (100.0, 100.0))
+        self.assertIn("Estimated rows: 100.0, cost: 100.0", str(qp))
+        self.assertIn("Estimated total cost:", str(qp))
+        self.assertEqual(qp.ground().estimates, qp.estimates)
+
+        qspec = QuerySpec(roots=[F, G], join=joins, where=where, order_by=[])
+        self.assertEqual(make_query_plan([F.anum], qspec).estimates, None)
+
     # ------------------------------------------------------------------------------
     # Test making a plan from joins and whereclauses
     # ------------------------------------------------------------------------------
@@ -2168,6 +2339,27 @@ class InQuerySorterTestCase(unittest.TestCase):
         ]
         self.assertEqual(outlistF, expected)
 
+    def test_InQuerySorter_topk(self):
+        F = self.F
+        G = self.G
+        factsetF = self.factsets[F]
+        factsetG = self.factsets[G]
+        roots = [F, G]
+        pob = process_orderby
+        cp = [(f, g) for f in factsetF for g in factsetG]
+
+        # Single, uniform, and mixed direction orderings match sorted()[:k]
+        for obs in [
+            [F.astr],
+            [desc(G.astr)],
+            [F.anum, G.anum],
+            [desc(F.anum), desc(G.astr)],
+            [desc(F.anum), G.anum, desc(F.astr), desc(G.astr)],
+        ]:
+            iqs = InQuerySorter(pob(obs, roots), roots)
+            for k in [0, 1, 5, 16, 20]:
+                self.assertEqual(iqs.topk(cp, k), iqs.sorted(cp)[:k])
+
 
 # ------------------------------------------------------------------------------
 # QueryTest. Test functions for the underlying query mechanism
@@ -2343,6 +2535,67 @@ class QueryTestCase(unittest.TestCase):
         self.assertEqual(hashable_path(out.path), hashable_path(G.astr))
         self.assertEqual(set(out), set([G(1, "a"), G(1, "foo")]))
 
+    # ------------------------------------------------------------------------------
+    # Test that the prejoin query source is cached against the FactMap
+    # ------------------------------------------------------------------------------
+
+    def test_nonapi_make_prejoin_query_source_cached(self):
+        F = self.F
+        G = self.G
+        pw = process_where
+        pj = process_join
+        roots = [F, G]
+        bjoh = oppref_join_order
+
+        fmG = FactMap(G, [G.astr])
+        fmG.add_facts(self.factsets[G])
+        factmaps = {G: fmG}
+        factsets = {G: fmG.factset}
+        indexes = dict(fmG.path2factindex)
+
+        # Joining on an unindexed field builds and caches a temporary index
+        join = pj([F.anum == G.anum], roots)
+        qspec = QuerySpec(roots=roots, join=join, where=[], order_by=[], joh=bjoh)
+        qp = make_query_plan(indexes.keys(), qspec)
+        out1 = make_prejoin_query_source(qp[1], factsets, indexes, factmaps)()
+        out2 = make_prejoin_query_source(qp[1], factsets, indexes, factmaps)()
+        self.assertTrue(isinstance(out1, FactIndex))
+        self.assertTrue(out1 is out2)
+        self.assertTrue(make_prejoin_query_source(qp[1], factsets, indexes)() is not out1)
+
+        # Modifying the facts invalidates the cached index
+        fmG.add_fact(G(7, "a"))
+        out3 = make_prejoin_query_source(qp[1], factsets, indexes, factmaps)()
+        self.assertTrue(out3 is not out1)
+        self.assertEqual(set(out3), set(fmG.factset))
+
+        # The filtered source depends on the (ground) prejoin clauses
+        where1 = pw(G.anum == 1, roots)
+        where5 = pw(G.anum == 5, roots)
+        qp1 = make_query_plan(indexes.keys(), qspec.modp(where=where1))
+        qp5 = make_query_plan(indexes.keys(), qspec.modp(where=where5))
+        out1 = make_prejoin_query_source(qp1[1], factsets, indexes, factmaps)()
+        out5 = make_prejoin_query_source(qp5[1], factsets, indexes, factmaps)()
+        self.assertEqual(set(out1), set([G(1, "a"), G(1, "foo")]))
+        self.assertEqual(set(out5), set([G(5, "a"), G(5, "foo")]))
+        self.assertTrue(make_prejoin_query_source(qp1[1], factsets, indexes, factmaps)() is out1)
+
+        # Function comparators are not cached
+        where = pw(func([G.anum], lambda x: x == 1), roots).fixed()
+        qpf = make_query_plan(indexes.keys(), qspec.modp(where=where))
+        outf = make_prejoin_query_source(qpf[1], factsets, indexes, factmaps)()
+        self.assertEqual(set(outf), set([G(1, "a"), G(1, "foo")]))
+        self.assertTrue(
+            make_prejoin_query_source(qpf[1], factsets, indexes, factmaps)() is not outf
+        )
+
+        # An existing index is passed through
+        join = pj([F.astr == G.astr], roots)
+        qspec = QuerySpec(roots=roots, join=join, where=[], order_by=[], joh=bjoh)
+        qp = make_query_plan(indexes.keys(), qspec)
+        out = make_prejoin_query_source(qp[1], factsets, indexes, factmaps)()
+        self.assertTrue(out is fmG.path2factindex[hashable_path(G.astr)])
+
     # ------------------------------------------------------------------------------
     # Test generating the prejoin query source function
     # ------------------------------------------------------------------------------
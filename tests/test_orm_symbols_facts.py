@@ -27,6 +27,7 @@ from clorm import (
     StringField,
     SymbolMode,
     SymbolPredicateUnifier,
+    Unifier,
     UnifierNoMatchError,
     control_add_facts,
     define_nested_list_field,
@@ -279,6 +280,135 @@ class UnifyTestCase(unittest.TestCase):
         self.assertTrue(f1_alt in res)
         self.assertTrue(f2 in res)
 
+    # --------------------------------------------------------------------------
+    # Lazy unification only checks the name, arity, and sign of a symbol and
+    # converts each field value when it is first accessed. It can be set for a
+    # predicate and overridden by a Unifier.
+    # --------------------------------------------------------------------------
+    def test_unify_lazy(self):
+        class Point(ComplexTerm):
+            x = IntegerField
+            y = IntegerField
+
+        class Fact1(Predicate):
+            aint = IntegerField
+            apoint = Point.Field
+
+            class Meta:
+                name = "fact"
+                sign = True
+                lazy_unify = True
+
+        class Fact2(Predicate, name="fact"):
+            aint = IntegerField
+            astr = StringField
+
+        r1 = Function("fact", [Number(1), Function("point", [Number(2), Number(3)])])
+        r2 = Function("fact", [Number(1), String("bob")])
+        r3 = Function("fact", [Number(1), Function("point", [Number(2), String("3")])])
+
+        self.assertTrue(Fact1.meta.lazy_unify)
+        self.assertFalse(Fact2.meta.lazy_unify)
+        f1 = Fact1._unify(r1)
+        self.assertEqual(f1, Fact1(1, Point(2, 3)))
+        self.assertEqual(hash(f1), hash(Fact1(1, Point(2, 3))))
+        self.assertEqual(f1.apoint.y, 3)
+        self.assertEqual(f1.aint, 1)
+        self.assertEqual(list(f1), [1, Point(2, 3)])
+        self.assertEqual(Fact1._unify(Function("fact", [Number(1)])), None)
+        self.assertEqual(Fact1._unify(Function("fact", [Number(1), String("a")], False)), None)
+
+        # The mismatch is only found when the field is accessed
+        f2 = Fact1._unify(r2)
+        self.assertEqual(f2.aint, 1)
+        with self.assertRaises(ValueError) as ctx:
+            f2.apoint
+        check_errmsg("Cannot unify the symbol '\"bob\"' with field 'apoint'", ctx)
+        with self.assertRaises(ValueError) as ctx:
+            Fact1._unify(r3).apoint
+        self.assertEqual(Fact1._unify_strict(r2), None)
+        self.assertEqual(Fact1._unify_strict(r3), None)
+
+        # The Unifier can override the predicate definition
+        self.assertEqual(list(Unifier([Fact1, Fact2]).iter_unify([r1, r2], False))[1], f2)
+        res = list(Unifier([Fact1, Fact2], lazy_unify=False).iter_unify([r1, r2], False))
+        self.assertEqual(res, [f1, Fact2(1, "bob")])
+        self.assertEqual(res[0].apoint, Point(2, 3))
+        res = list(Unifier([Fact2, Fact1], lazy_unify=True).iter_unify([r1, r2], False))
+        self.assertEqual([type(f) for f in res], [Fact2, Fact2])
+        self.assertEqual(res[1].astr, "bob")
+        with self.assertRaises(ValueError) as ctx:
+            res[0].astr
+
+        # Queries and pickling access the field values of a lazy fact
+        fb = unify(
+            [Fact1],
+            [r1, Function("fact", [Number(2), Function("point", [Number(4), Number(5)])])],
+        )
+        self.assertEqual(
+            list(fb.query(Fact1).where(Fact1.apoint.x == 4).select(Fact1.aint).all()), [2]
+        )
+        state = Fact1._unify(r1).__getstate__()
+        self.assertEqual(state["_field_values"], (1, Point(2, 3)))
+
+    # --------------------------------------------------------------------------
+    # Test that a unifier with a cache returns the same fact for a repeated
+    # symbol
+    # --------------------------------------------------------------------------
+    def test_unify_cache(self):
+        class Afact(Predicate):
+            anum = IntegerField
+            astr = StringField
+
+        class Bfact(Predicate):
+            anum = IntegerField
+
+        def asym(num):
+            return Function("afact", [Number(num), String("a")])
+
+        bad = Function("afact", [String("a"), String("a")])
+        other = Function("other", [])
+
+        unifier = Unifier([Afact], cache_size=3)
+        self.assertEqual(unifier.cache_size, 3)
+        res1 = list(unifier.iter_unify([asym(1), asym(2), bad, other], False))
+        res2 = list(unifier.iter_unify([asym(2), asym(1), bad, other], False))
+        self.assertEqual(res1, [Afact(1, "a"), Afact(2, "a")])
+        self.assertIs(res1[0], res2[1])
+        self.assertIs(res1[1], res2[0])
+        self.assertEqual((unifier.cache_hits, unifier.cache_misses), (3, 3))
+        with self.assertRaises(UnifierNoMatchError) as ctx:
+            list(unifier.iter_unify([bad], True))
+
+        # The least recently used symbol is removed from the cache
+        self.assertEqual(unifier.unify_symbol(asym(3)), Afact(3, "a"))
+        self.assertEqual(unifier.cache_misses, 4)
+        self.assertIs(unifier.unify_symbol(asym(1)), res1[0])
+        self.assertIsNot(unifier.unify_symbol(asym(2)), res1[1])
+        self.assertEqual((unifier.cache_hits, unifier.cache_misses), (5, 5))
+
+        # Adding a predicate clears the cache
+        unifier.add_predicate(Bfact)
+        self.assertEqual((unifier.cache_hits, unifier.cache_misses), (0, 0))
+        self.assertEqual(unifier.unify_symbol(Function("bfact", [Number(1)])), Bfact(1))
+        self.assertIsNot(unifier.unify_symbol(asym(1)), res1[0])
+
+        # A SymbolPredicateUnifier keeps its cache between calls
+        spu = SymbolPredicateUnifier([Afact], cache_size=10)
+        fb1 = spu.unify([asym(1), asym(2)])
+        fb2 = spu.unify([asym(1), asym(3)])
+        self.assertEqual(fb2, FactBase([Afact(1, "a"), Afact(3, "a")]))
+        self.assertIs(list(fb1.query(Afact).where(Afact.anum == 1).all())[0], list(fb2)[0])
+        self.assertEqual(unify(spu, [asym(3)], ordered=True), [Afact(3, "a")])
+        self.assertEqual((spu.cache_hits, spu.cache_misses), (2, 3))
+        spu.register(Bfact)
+        self.assertEqual((spu.cache_hits, spu.cache_misses), (0, 0))
+
+        with self.assertRaises(ValueError) as ctx:
+            Unifier([Afact], cache_size=-1)
+        with self.assertRaises(ValueError) as ctx:
+            SymbolPredicateUnifier([Afact], cache_size=-1)
+
     # --------------------------------------------------------------------------
     # Test unifying with negative facts
     # --------------------------------------------------------------------------
@@ -0,0 +1,173 @@
+# ------------------------------------------------------------------------------
+# Unit tests for the persistent containers
+# ------------------------------------------------------------------------------
+
+import random
+import unittest
+
+from clorm.util.persistent import PersistentMap, PersistentOrderedSet, PersistentSortedSet
+
+# ------------------------------------------------------------------------------
+# ------------------------------------------------------------------------------
+
+__all__ = [
+    "PersistentContainersTestCase",
+]
+
+
+# ------------------------------------------------------------------------------
+# A key with a chosen hash value so that hash collisions can be tested
+# ------------------------------------------------------------------------------
+
+
+class Key(object):
+    def __init__(self, value, hashval):
+        self.value = value
+        self.hashval = hashval
+
+    def __hash__(self):
+        return self.hashval
+
+    def __eq__(self, other):
+        return isinstance(other, Key) and self.value == other.value
+
+    def __repr__(self):
+        return "Key({})".format(self.value)
+
+
+# ------------------------------------------------------------------------------
+# ------------------------------------------------------------------------------
+
+
+class PersistentContainersTestCase(unittest.TestCase):
+    def test_map(self):
+        pm1 = PersistentMap({"a": 1, "b": 2})
+        pm2 = pm1.set("c", 3)
+        pm3 = pm2.remove("a")
+        self.assertEqual(dict(pm1), {"a": 1, "b": 2})
+        self.assertEqual(dict(pm2), {"a": 1, "b": 2, "c": 3})
+        self.assertEqual(dict(pm3), {"b": 2, "c": 3})
+        self.assertEqual(pm3["b"], 2)
+        self.assertEqual(pm3.get("a", 0), 0)
+        self.assertFalse("a" in pm3)
+        self.assertTrue(pm2.set("c", 3) is pm2)
+        self.assertTrue(pm3.discard("a") is pm3)
+        with self.assertRaises(KeyError) as ctx:
+            pm3.remove("a")
+        with self.assertRaises(KeyError) as ctx:
+            pm3["a"]
+        self.assertFalse(PersistentMap().discard("a"))
+        self.assertEqual(pm1, {"a": 1, "b": 2})
+
+    def test_map_random(self):
+        rand = random.Random(1)
+        # Small hash values force collisions and deep tries with shared prefixes
+        keys = [
+            Key(i, rand.choice([rand.getrandbits(64), rand.randint(0, 3), -1]))
+            for i in range(300)
+        ]
+        ref = {k: k.value for k in keys[:150]}
+        pm = PersistentMap(ref)
+        versions = []
+        for _ in range(2000):
+            k = rand.choice(keys)
+            if rand.random() < 0.6:
+                v = rand.randint(0, 3)
+                pm = pm.set(k, v)
+                ref[k] = v
+            else:
+                pm = pm.discard(k)
+                ref.pop(k, None)
+            self.assertEqual(len(pm), len(ref))
+            versions.append((pm, dict(ref)))
+        for pm, ref in versions[::97]:
+            self.assertEqual(dict(pm.items()), ref)
+            for k in keys:
+                self.assertEqual(pm.get(k, None), ref.get(k, None))
+
+    def test_ordered_set(self):
+        ps1 = PersistentOrderedSet([3, 1, 2, 1])
+        ps2 = ps1.add(0).remove(1)
+        self.assertEqual(list(ps1), [3, 1, 2])
+        self.assertEqual(list(ps2), [3, 2, 0])
+        self.assertEqual(list(reversed(ps2)), [0, 2, 3])
+        self.assertTrue(ps2.add(0) is ps2)
+        self.assertTrue(ps2.discard(1) is ps2)
+        self.assertEqual(ps2, set([0, 2, 3]))
+        self.assertEqual(ps1 & ps2, set([2, 3]))
+        with self.assertRaises(KeyError) as ctx:
+            ps2.remove(1)
+
+        # Falsy elements are kept when the other elements of a node are removed
+        for falsy in [0, "", ()]:
+            ps = PersistentOrderedSet([5, falsy]).discard(5)
+            self.assertEqual(list(ps), [falsy])
+            self.assertEqual(len(ps), 1)
+            self.assertEqual(list(ps.discard(falsy)), [])
+
+        # Insertion order is preserved over many additions and removals
+        rand = random.Random(2)
+        ps = PersistentOrderedSet(range(40))
+        ref = list(range(40))
+        for _ in range(5000):
+            x = rand.randint(0, 3000)
+            if rand.random() < 0.7:
+                ps = ps.add(x)
+                if x not in ref:
+                    ref.append(x)
+            else:
+                ps = ps.discard(x)
+                if x in ref:
+                    ref.remove(x)
+        self.assertEqual(list(ps), ref)
+        self.assertEqual(len(ps), len(ref))
+        self.assertEqual(list(PersistentOrderedSet(ref)), ref)
+
+    def test_sorted_set(self):
+        rand = random.Random(3)
+        ref = set(rand.sample(range(1000), 100))
+        pss = PersistentSortedSet(ref)
+        old = pss
+        for _ in range(1000):
+            x = rand.randint(0, 1000)
+            if rand.random() < 0.6:
+                pss = pss.add(x)
+                ref.add(x)
+            else:
+                pss = pss.discard(x)
+                ref.discard(x)
+        ref = sorted(ref)
+        self.assertEqual(list(pss), ref)
+        self.assertEqual(list(reversed(pss)), list(reversed(ref)))
+        self.assertEqual(len(pss), len(ref))
+        self.assertEqual(len(old), 100)
+        self.assertTrue(ref[0] in pss)
+        self.assertFalse(-1 in pss)
+        with self.assertRaises(KeyError) as ctx:
+            pss.remove(-1)
+
+        for _ in range(100):
+            lo, hi = sorted(rand.sample(range(-5, 1005), 2))
+            incl = (rand.random() < 0.5, rand.random() < 0.5)
+            expected = [
+                x
+                for x in ref
+                if (lo < x or (incl[0] and lo == x)) and (x < hi or (incl[1] and x == hi))
+            ]
+            self.assertEqual(list(pss.irange(lo, hi, incl)), expected)
+            self.assertEqual(list(pss.irange(lo, hi, incl, reverse=True)), expected[::-1])
+        self.assertEqual(list(pss.irange(maximum=ref[5])), ref[:6])
+        self.assertEqual(list(pss.irange(minimum=ref[-5], inclusive=(False, True))), ref[-4:])
+
+        # Sequential keys still create a balanced tree
+        pss = PersistentSortedSet()
+        for x in range(2000):
+            pss = pss.add(x)
+        self.assertEqual(list(pss.irange(10, 12)), [10, 11, 12])
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    raise RuntimeError("Cannot run modules")
@@ -0,0 +1,107 @@
+# ------------------------------------------------------------------------------
+# Unit tests for the SortedList container
+# ------------------------------------------------------------------------------
+
+import random
+import unittest
+
+from clorm.util.sortedlist import SortedList
+
+# ------------------------------------------------------------------------------
+# ------------------------------------------------------------------------------
+
+__all__ = [
+    "SortedListTestCase",
+]
+
+
+# ------------------------------------------------------------------------------
+# ------------------------------------------------------------------------------
+
+
+class SortedListTestCase(unittest.TestCase):
+    def setUp(self):
+        # Use a small load factor so that the tests exercise leaf splitting and
+        # merging.
+        class SmallSortedList(SortedList):
+            _load = 4
+
+        self.SL = SmallSortedList
+
+    # --------------------------------------------------------------------------
+    # --------------------------------------------------------------------------
+    def test_add_remove(self):
+        SL = self.SL
+        inlist = list(range(100))
+        random.Random(1).shuffle(inlist)
+        sl = SL()
+        for v in inlist:
+            sl.add(v)
+        self.assertEqual(len(sl), 100)
+        self.assertEqual(list(sl), list(range(100)))
+        self.assertEqual(list(reversed(sl)), list(reversed(range(100))))
+        self.assertTrue(len(sl._leaves) > 1)
+
+        for v in inlist[:90]:
+            sl.remove(v)
+        self.assertEqual(list(sl), sorted(inlist[90:]))
+        self.assertEqual(len(sl), 10)
+
+        with self.assertRaises(ValueError) as ctx:
+            sl.remove(inlist[0])
+        sl.discard(inlist[0])
+        for v in inlist[90:]:
+            sl.remove(v)
+        self.assertFalse(sl)
+        self.assertEqual(sl, [])
+
+    def test_update_contains_getitem(self):
+        SL = self.SL
+        sl = SL([5, 1, 3])
+        sl.update([4, 2, 0])
+        self.assertEqual(sl, [0, 1, 2, 3, 4, 5])
+        self.assertEqual(sl, SL(range(6)))
+        self.assertNotEqual(sl, [0, 1])
+        self.assertTrue(3 in sl)
+        self.assertFalse(10 in sl)
+        self.assertEqual(sl[0], 0)
+        self.assertEqual(sl[-1], 5)
+        self.assertEqual(sl[2], 2)
+        self.assertEqual(sl[1:3], [1, 2])
+        with self.assertRaises(IndexError) as ctx:
+            sl[6]
+
+        # Adding a few values to a large list inserts them individually
+        sl3 = SL(range(0, 200, 2))
+        sl3.update([7, 3])
+        self.assertEqual(list(sl3), sorted(list(range(0, 200, 2)) + [3, 7]))
+        self.assertEqual(len(sl3), 102)
+
+        sl2 = sl.copy()
+        sl2.add(10)
+        self.assertEqual(sl, [0, 1, 2, 3, 4, 5])
+        self.assertEqual(sl2, [0, 1, 2, 3, 4, 5, 10])
+        sl.clear()
+        self.assertEqual(len(sl), 0)
+
+    def test_irange(self):
+        SL = self.SL
+        sl = SL(range(0, 40, 2))
+        self.assertEqual(list(sl.irange(10, 16)), [10, 12, 14, 16])
+        self.assertEqual(list(sl.irange(10, 16, inclusive=(False, False))), [12, 14])
+        self.assertEqual(list(sl.irange(9, 15)), [10, 12, 14])
+        self.assertEqual(list(sl.irange(maximum=4)), [0, 2, 4])
+        self.assertEqual(list(sl.irange(maximum=4, inclusive=(True, False))), [0, 2])
+        self.assertEqual(list(sl.irange(minimum=34)), [34, 36, 38])
+        self.assertEqual(list(sl.irange(minimum=34, reverse=True)), [38, 36, 34])
+        self.assertEqual(list(sl.irange(minimum=40)), [])
+        self.assertEqual(list(sl.irange(maximum=-1)), [])
+        self.assertEqual(list(sl.irange(20, 10)), [])
+        self.assertEqual(list(sl.irange()), list(range(0, 40, 2)))
+
+
+# ------------------------------------------------------------------------------
+# main
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    raise RuntimeError("Cannot run modules")